@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步数据源并发基准测试
+
+在本地子进程中启动一个模拟新浪K线接口的 asyncio HTTP 服务器（每个请求延迟 RESPONSE_DELAY 返回，
+模拟上游的慢响应），同时发起 N 个K线请求（各方式先预热一轮），对比：
+1. 异步数据源 get_kline_data_from_sina_async：同一事件循环上 N 个协程
+2. 同步数据源 + 每请求一个线程（ThreadPoolExecutor(max_workers=N)）
+3. 同步数据源 + 有界线程池（与 kline 执行器规模相当，KLINE_POOL_WORKERS 个线程）
+统计总耗时、进程峰值线程数、上游同时在途的请求数
+
+使用方法：
+    python benchmarks/bench_async_sources.py
+    python benchmarks/bench_async_sources.py --requests 800 --delay 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from service.kline.a import sina_a
+from service.utils.async_http_client import get_async_http_stats
+
+REQUESTS = 500
+RESPONSE_DELAY = 0.3      # 模拟上游响应耗时（秒）
+KLINE_POOL_WORKERS = 32   # 有界线程池大小
+
+PAYLOAD = json.dumps([
+    {"day": f"2024-01-{d:02d}", "open": "10.0", "high": "10.8", "low": "9.9", "close": "10.5", "volume": "123456"}
+    for d in range(2, 30)
+]).encode()
+
+
+class StandInServer:
+    """在独立进程中运行的模拟上游（asyncio，keep-alive，统计同时在途请求数），不与被测代码争用 GIL"""
+
+    def __init__(self, delay: float):
+        self._counters = multiprocessing.Array('i', 3)  # 在途数、峰值在途数、连接数
+        port_queue = multiprocessing.Queue()
+        self._process = multiprocessing.Process(
+            target=_serve, args=(delay, self._counters, port_queue), daemon=True
+        )
+        self._process.start()
+        self.port = port_queue.get(timeout=10)
+
+    @property
+    def peak_in_flight(self) -> int:
+        return self._counters[1]
+
+    @property
+    def connections(self) -> int:
+        return self._counters[2]
+
+    def reset(self):
+        with self._counters.get_lock():
+            self._counters[1] = self._counters[0]
+            self._counters[2] = 0
+
+
+def _serve(delay: float, counters, port_queue):
+    async def handle(reader, writer):
+        counters[2] += 1
+        try:
+            while True:
+                await reader.readuntil(b'\r\n\r\n')
+                counters[0] += 1
+                counters[1] = max(counters[1], counters[0])
+                await asyncio.sleep(delay)
+                counters[0] -= 1
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                    + f'Content-Length: {len(PAYLOAD)}\r\n\r\n'.encode() + PAYLOAD
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, '127.0.0.1', 0, backlog=4096)
+        port_queue.put(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    asyncio.run(main())
+
+
+class ThreadSampler:
+    """后台采样进程线程数峰值"""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, threading.active_count())
+            time.sleep(0.005)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _fetch_args(i: int):
+    code = f"{600000 + i:06d}"
+    return dict(code=code, formatted_code=code, market_type='a', start_date='2024-01-01', end_date='2024-01-31')
+
+
+# 异步客户端与事件循环绑定：各轮共用一个事件循环，与服务进程中的情形一致
+_client_loop = asyncio.new_event_loop()
+
+
+def bench_async(n: int):
+    async def run():
+        results = await asyncio.gather(*(sina_a.get_kline_data_from_sina_async(**_fetch_args(i)) for i in range(n)))
+        return sum(1 for r in results if r and r.get('data'))
+    return _client_loop.run_until_complete(run())
+
+
+def bench_threads(n: int, workers: int):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda i: sina_a.get_kline_data_from_sina(**_fetch_args(i)), range(n)))
+    return sum(1 for r in results if r and r.get('data'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=REQUESTS)
+    parser.add_argument('--delay', type=float, default=RESPONSE_DELAY)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    server = StandInServer(args.delay)
+    sina_a.SINA_API_URL = f"http://127.0.0.1:{server.port}/kline"
+    n = args.requests
+    print(f"并发请求 {n} 个，模拟上游每请求 {args.delay * 1000:.0f}ms\n")
+    print(f"{'方式':<28}{'成功':>6}{'总耗时':>10}{'峰值线程':>10}{'上游峰值在途':>14}{'新建连接':>10}")
+
+    cases = [
+        ("异步（单事件循环）", lambda: bench_async(n)),
+        (f"同步 + 每请求一个线程", lambda: bench_threads(n, n)),
+        (f"同步 + {KLINE_POOL_WORKERS} 线程池", lambda: bench_threads(n, KLINE_POOL_WORKERS)),
+    ]
+    for name, run in cases:
+        # 预热：建立连接池、创建客户端，只统计稳定状态
+        run_warmup = {"异步": lambda: bench_async(50)}.get(name[:2], lambda: bench_threads(50, 50))
+        run_warmup()
+        server.reset()
+        baseline = threading.active_count()
+        with ThreadSampler() as sampler:
+            t0 = time.perf_counter()
+            ok = run()
+            elapsed = time.perf_counter() - t0
+        print(
+            f"{name:<24}{ok:>8}{elapsed:>9.2f}s{sampler.peak - baseline:>12}"
+            f"{server.peak_in_flight:>16}{server.connections:>12}"
+        )
+
+    host_stats = get_async_http_stats().get('127.0.0.1', {})
+    print(f"\n异步传输统计: {host_stats}")
+
+
+if __name__ == "__main__":
+    main()
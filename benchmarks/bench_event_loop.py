@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事件循环响应性基准测试
+
+在 50 个冷 /api/kline 请求（每个阻塞 UPSTREAM_DELAY 秒，模拟慢数据源）同时进行时，
+持续探测 /api/health 并统计其 p50 / p99 延迟
+
+使用方法：
+    python benchmarks/bench_event_loop.py            # 使用有界执行器（当前实现）
+    python benchmarks/bench_event_loop.py --inline   # 在事件循环中直接调用（旧实现，对照组）
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+CONCURRENT_KLINE = 50
+UPSTREAM_DELAY = 1.0   # 模拟一次冷数据源拉取的阻塞耗时（秒）
+PROBE_INTERVAL = 0.01  # /api/health 探测间隔（秒）
+
+
+def fake_get_kline_data(code, start_date=None, end_date=None, force=False):
+    """模拟阻塞的数据源调用（requests/akshare 的同步 I/O）"""
+    time.sleep(UPSTREAM_DELAY)
+    return {"market": "a", "data_source": "bench", "data": []}
+
+
+async def inline_run_blocking(workload, func, *args, **kwargs):
+    """对照组：直接在事件循环中调用阻塞函数"""
+    return func(*args, **kwargs)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def run_benchmark(inline: bool):
+    import logging
+    import main
+
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    import service.kline.kline as kline_module
+
+    kline_module.get_kline_data = fake_get_kline_data
+    if inline:
+        main.run_blocking = inline_run_blocking
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # 预热：建立 ASGI 应用状态，避免首个请求的初始化耗时计入结果
+        await client.get("/api/health")
+
+        health_latencies = []
+        done = asyncio.Event()
+
+        async def probe_health():
+            # 延迟从“计划发起时间”算起，这样事件循环被阻塞导致的探测推迟也计入延迟
+            scheduled = time.perf_counter()
+            while True:
+                await client.get("/api/health")
+                now = time.perf_counter()
+                health_latencies.append((now - scheduled) * 1000)
+                if done.is_set():
+                    break
+                await asyncio.sleep(PROBE_INTERVAL)
+                scheduled = now + PROBE_INTERVAL
+
+        async def fire_klines():
+            t0 = time.perf_counter()
+            responses = await asyncio.gather(*[
+                client.get("/api/kline", params={"code": f"{600000 + i}"})
+                for i in range(CONCURRENT_KLINE)
+            ])
+            elapsed = time.perf_counter() - t0
+            done.set()
+            return responses, elapsed
+
+        prober = asyncio.create_task(probe_health())
+        responses, kline_elapsed = await fire_klines()
+        await prober
+
+    status_counts = {}
+    for r in responses:
+        status_counts[r.status_code] = status_counts.get(r.status_code, 0) + 1
+
+    mode = "inline（事件循环内直接调用）" if inline else "bounded executor（有界线程池）"
+    print(f"\n{'=' * 60}")
+    print(f"模式: {mode}")
+    print(f"{'=' * 60}")
+    print(f"并发 /api/kline: {CONCURRENT_KLINE}，单次上游阻塞 {UPSTREAM_DELAY}s")
+    print(f"/api/kline 全部完成耗时: {kline_elapsed:.2f}s，状态码分布: {status_counts}")
+    print(f"/api/health 探测次数: {len(health_latencies)}")
+    if health_latencies:
+        print(f"/api/health p50: {statistics.median(health_latencies):.2f}ms")
+        print(f"/api/health p99: {percentile(health_latencies, 99):.2f}ms")
+        print(f"/api/health max: {max(health_latencies):.2f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark(inline="--inline" in sys.argv))
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP 连接复用基准测试
+
+在本地启动一个支持 keep-alive 的模拟行情服务器（每次新建连接额外延迟 CONNECT_DELAY，
+模拟公网 TCP/TLS 握手），分别用裸 requests.get 和共享传输 http_get 顺序请求 N 次，
+对比单次请求延迟与新建连接数
+
+使用方法：
+    python benchmarks/bench_http_pool.py
+    python benchmarks/bench_http_pool.py --tls    # 使用自签名证书走 HTTPS（需要 openssl 命令）
+"""
+
+import json
+import os
+import socket
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+import urllib3
+
+from service.utils.http_client import HttpTransport
+
+REQUESTS = 200
+CONNECT_DELAY = 0.02  # 模拟每次新建连接的握手耗时（秒）
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+PAYLOAD = json.dumps({
+    "rc": 0,
+    "data": {"klines": [f"2024-01-{d:02d},10.0,10.5,10.8,9.9,123456,1234567.0" for d in range(1, 29)]},
+}).encode()
+
+
+class QuoteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持 keep-alive
+    disable_nagle_algorithm = True  # 避免响应头/响应体分两次发送时触发延迟确认
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SlowHandshakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    connections = 0
+
+    def get_request(self):
+        conn, addr = super().get_request()
+        SlowHandshakeServer.connections += 1
+        time.sleep(CONNECT_DELAY)
+        return conn, addr
+
+
+def _make_cert(tmpdir):
+    cert = os.path.join(tmpdir, "cert.pem")
+    key = os.path.join(tmpdir, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+        check=True, capture_output=True
+    )
+    return cert, key
+
+
+def start_server(tls: bool, tmpdir: str):
+    server = SlowHandshakeServer(("127.0.0.1", 0), QuoteHandler)
+    scheme = "http"
+    if tls:
+        cert, key = _make_cert(tmpdir)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://localhost:{server.server_address[1]}/api/qt/stock/kline/get"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(label, get_func, url):
+    SlowHandshakeServer.connections = 0
+    latencies = []
+    for i in range(REQUESTS):
+        t0 = time.perf_counter()
+        response = get_func(url, params={"secid": f"1.{600000 + i}"}, timeout=5, verify=False)
+        response.json()
+        latencies.append((time.perf_counter() - t0) * 1000)
+    print(f"{label:<28} p50 {statistics.median(latencies):7.2f}ms  "
+          f"p99 {percentile(latencies, 99):7.2f}ms  新建连接 {SlowHandshakeServer.connections}")
+    return statistics.median(latencies)
+
+
+def main():
+    tls = "--tls" in sys.argv
+    with tempfile.TemporaryDirectory() as tmpdir:
+        server, url = start_server(tls, tmpdir)
+        socket.setdefaulttimeout(10)
+        print(f"\n本地模拟服务器: {url}（每次新建连接额外 {CONNECT_DELAY * 1000:.0f}ms），顺序请求 {REQUESTS} 次\n")
+
+        bare = run("requests.get（每次新连接）", requests.get, url)
+        transport = HttpTransport()
+        pooled = run("http_get（共享连接池）", transport.get, url)
+
+        print(f"\n单次请求 p50 延迟降低: {bare - pooled:.2f}ms（{(1 - pooled / bare) * 100:.0f}%）")
+        print(f"传输统计: {transport.get_stats()}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线缓存存储格式基准测试
+
+以一只股票 5 年日K线（约 1260 根）为例，对比按条字典（每根K线一个子文档）与
+列式格式（kline_columns.KlineColumns）的：
+1. MongoDB 文档大小（BSON 编码后字节数）
+2. BSON 解码耗时（含还原为内存结构）
+3. 内存占用（tracemalloc 统计解码后结构的分配量）
+4. 切出最近 90 天并转换为接口格式的耗时
+
+使用方法：
+    python benchmarks/bench_kline_columnar.py
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+import numpy as np
+
+from service.cache.kline_columns import KlineColumns
+
+YEARS = 5
+REPEAT = 200
+
+
+def make_bars():
+    rng = np.random.default_rng(7)
+    bars = []
+    day = date.today() - timedelta(days=365 * YEARS)
+    price = 100.0
+    while day <= date.today():
+        if day.weekday() < 5:
+            price = round(max(1.0, price * (1 + rng.normal(0, 0.02))), 2)
+            bars.append({
+                'date': day.isoformat(),
+                'open': round(price * 0.99, 2),
+                'high': round(price * 1.02, 2),
+                'low': round(price * 0.97, 2),
+                'close': price,
+                'volume': int(rng.integers(1_000_000, 50_000_000)),
+            })
+        day += timedelta(days=1)
+    return bars
+
+
+def timeit(func):
+    t0 = time.perf_counter()
+    for _ in range(REPEAT):
+        func()
+    return (time.perf_counter() - t0) / REPEAT * 1000
+
+
+def measure_memory(func):
+    tracemalloc.start()
+    obj = func()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return current
+
+
+def main():
+    bars = make_bars()
+    columns = KlineColumns.from_bars(bars)
+    assert columns.to_bars() == bars, "列式格式往返后与原数据不一致"
+
+    row_doc = bson.encode({'cache_key': 'kline:600519:bars', 'bars': bars})
+    col_doc = bson.encode({'cache_key': 'kline:600519:bars', 'columns': columns.to_document()})
+
+    row_decode = timeit(lambda: bson.decode(row_doc)['bars'])
+    col_decode = timeit(lambda: KlineColumns.from_document(bson.decode(col_doc)['columns']))
+
+    row_memory = measure_memory(lambda: bson.decode(row_doc)['bars'])
+    col_memory = measure_memory(lambda: KlineColumns.from_document(bson.decode(col_doc)['columns']))
+
+    start = (date.today() - timedelta(days=90)).isoformat()
+    end = date.today().isoformat()
+    dates = [bar['date'] for bar in bars]
+    row_slice = timeit(lambda: bars[bisect_left(dates, start):bisect_right(dates, end)])
+    col_slice = timeit(lambda: columns.slice(start, end).to_bars())
+
+    print(f"\n{YEARS} 年日K线，共 {len(bars)} 根\n")
+    print(f"{'':<26}{'按条字典':>12}{'列式':>12}{'变化':>10}")
+    rows = [
+        ("MongoDB 文档大小 (KB)", len(row_doc) / 1024, len(col_doc) / 1024),
+        ("BSON 解码+还原 (ms)", row_decode, col_decode),
+        ("内存占用 (KB)", row_memory / 1024, col_memory / 1024),
+        ("切 90 天转接口格式 (ms)", row_slice, col_slice),
+    ]
+    for label, before, after in rows:
+        print(f"{label:<24}{before:>12.2f}{after:>12.2f}{(after / before - 1) * 100:>+9.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线对冲请求基准测试
+
+A股主数据源（新浪）替换为固定延迟 SLOW_DELAY 秒的模拟实现，次数据源（东方财富）为 FAST_DELAY 秒，
+经 /api/kline（BarStore 缓存未命中 → get_kline_data_async）分别在开启 / 关闭对冲时请求 ROUNDS 只不同的股票，对比：
+1. 未命中请求的平均耗时
+2. 响应中的对冲信息：开启对冲时未命中的响应必须带 hedge（胜出数据源为东方财富），序列命中的响应不带
+
+使用方法：
+    python benchmarks/bench_kline_hedging.py
+    python benchmarks/bench_kline_hedging.py --slow 5 --rounds 3
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from main import app
+from service.kline import kline
+
+SLOW_DELAY = 3.0
+FAST_DELAY = 0.05
+ROUNDS = 2
+START, END = '2026-06-01', '2026-06-30'
+
+
+def make_bars(start: str, end: str):
+    bars = []
+    day = datetime.strptime(start, '%Y-%m-%d')
+    while day.strftime('%Y-%m-%d') <= end:
+        if day.weekday() < 5:
+            bars.append({'date': day.strftime('%Y-%m-%d'), 'open': 10.0, 'high': 10.5, 'low': 9.8, 'close': 10.2, 'volume': 1000})
+        day += timedelta(days=1)
+    return bars
+
+
+def install_stand_in(source: str, delay: float):
+    """把数据源替换为固定延迟的模拟实现（同步与协程版本）"""
+    def fetch(code, market_type, formatted_code, start_date, end_date, **kwargs):
+        time.sleep(delay)
+        return {'code': code, 'market': market_type, 'data_source': source, 'data': make_bars(start_date, end_date)}
+
+    async def fetch_async(code, market_type, formatted_code, start_date, end_date, **kwargs):
+        await asyncio.sleep(delay)
+        return {'code': code, 'market': market_type, 'data_source': source, 'data': make_bars(start_date, end_date)}
+
+    kline.SOURCE_REGISTRY[source] = (fetch, lambda: True, None)
+    if source in kline.ASYNC_SOURCE_REGISTRY:
+        kline.ASYNC_SOURCE_REGISTRY[source] = fetch_async
+
+
+def run(client: TestClient, codes, hedged: bool):
+    kline.DATA_SOURCES_CONFIG['a']['hedge']['enabled'] = hedged
+    elapsed = []
+    for code in codes:
+        params = {'code': code, 'start': START, 'end': END}
+        t0 = time.perf_counter()
+        payload = client.get('/api/kline', params=params).json()
+        elapsed.append(time.perf_counter() - t0)
+        if hedged:
+            hedge = payload.get('hedge')
+            assert hedge and hedge.get('winner') == 'eastmoney_a', f"{code} 未命中的对冲响应缺少对冲信息: {hedge}"
+            assert client.get('/api/kline', params=params).json().get('hedge') is None, f"{code} 序列命中的响应不应带对冲信息"
+        else:
+            assert payload.get('hedge') is None, f"{code} 未开启对冲时不应带对冲信息"
+    return sum(elapsed) / len(elapsed) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--slow', type=float, default=SLOW_DELAY, help='主数据源延迟（秒）')
+    parser.add_argument('--rounds', type=int, default=ROUNDS, help='每种方式请求的股票数')
+    args = parser.parse_args()
+
+    install_stand_in('sina', args.slow)
+    install_stand_in('eastmoney_a', FAST_DELAY)
+    client = TestClient(app)
+
+    hedged = run(client, [f"6000{i:02d}" for i in range(args.rounds)], hedged=True)
+    sequential = run(client, [f"6010{i:02d}" for i in range(args.rounds)], hedged=False)
+
+    print(f"\n主数据源延迟 {args.slow:.1f}s，次数据源 {FAST_DELAY:.2f}s，各 {args.rounds} 次未命中请求")
+    print(f"{'方式':<12}{'平均耗时(ms)':>14}")
+    print(f"{'开启对冲':<12}{hedged:>14.0f}")
+    print(f"{'关闭对冲':<12}{sequential:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内存缓存准入策略基准测试
+
+模拟服务的访问模式回放到两种内存缓存上（每次访问先 get，未命中再 set，与 MongoDBCache 的用法一致）：
+- 3 份热点市场列表（每份约 10000 只股票），占 20% 的访问
+- 500 只股票的K线区间，按 Zipf 分布访问
+- 每隔一段时间突发一批只访问一次的股票代码（如批量扫描）
+对比：
+1. 改动前：按条目数限制的 LRU（max_size=20）
+2. 改动后：按字节限制（与改动前同等内存占用 / MEMORY_CACHE_MAX_MB）+ TinyLFU 准入
+统计总体命中率、市场列表命中率、淘汰数与占用内存
+
+使用方法：
+    python benchmarks/bench_memory_cache.py
+    python benchmarks/bench_memory_cache.py --accesses 200000 --max-mb 64
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from service.cache.memory_cache import MemoryLRUCache, estimate_size
+
+ACCESSES = 100000
+SYMBOLS = 500
+MARKET_SHARE = 0.2
+BURST_EVERY = 5000       # 每隔多少次访问突发一批一次性代码
+BURST_SIZE = 300
+MAX_MB = 32
+
+
+class CountBoundedLRU:
+    """改动前的内存缓存：只按条目数限制，新条目总是写入"""
+
+    def __init__(self, max_size: int = 20):
+        self.cache = OrderedDict()
+        self.max_size = max_size
+        self.evictions = 0
+
+    def get(self, key):
+        if key not in self.cache:
+            return None
+        self.cache.move_to_end(key)
+        return self.cache[key]
+
+    def set(self, key, value):
+        if key in self.cache:
+            self.cache.move_to_end(key)
+        elif len(self.cache) >= self.max_size:
+            self.cache.popitem(last=False)
+            self.evictions += 1
+        self.cache[key] = value
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(estimate_size(v) for v in self.cache.values())
+
+
+def build_market(market: str, n: int = 10000):
+    return {
+        "market": market,
+        "count": n,
+        "stocks": [
+            {"code": f"{market.upper()}{i}", "name": f"示例公司 {market}{i}", "market": market, "full_code": f"105.{i}"}
+            for i in range(n)
+        ],
+    }
+
+
+def build_kline(code: str, bars: int = 120):
+    return {
+        "code": code,
+        "data": [
+            {"date": f"2024-{1 + d // 28:02d}-{1 + d % 28:02d}", "open": 10.0 + d, "high": 11.0 + d,
+             "low": 9.0 + d, "close": 10.5 + d, "volume": 100000 + d}
+            for d in range(bars)
+        ],
+    }
+
+
+def build_trace(accesses: int, seed: int = 7):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(SYMBOLS)]
+    symbols = [f"kline:{600000 + i}" for i in range(SYMBOLS)]
+    trace = []
+    one_off = 0
+    for i in range(accesses):
+        if i and i % BURST_EVERY == 0:
+            for _ in range(BURST_SIZE):
+                trace.append(f"kline:once{one_off}")
+                one_off += 1
+        if rng.random() < MARKET_SHARE:
+            trace.append(f"market:{rng.choice(('a', 'hk', 'us'))}")
+        else:
+            trace.append(rng.choices(symbols, weights)[0])
+    return trace
+
+
+def replay(cache, trace, values):
+    hits = market_hits = market_total = 0
+    t0 = time.perf_counter()
+    for key in trace:
+        is_market = key.startswith("market:")
+        market_total += is_market
+        if cache.get(key) is not None:
+            hits += 1
+            market_hits += is_market
+        else:
+            cache.set(key, values(key))
+    elapsed = time.perf_counter() - t0
+    return hits / len(trace), market_hits / market_total, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--accesses', type=int, default=ACCESSES)
+    parser.add_argument('--max-mb', type=float, default=MAX_MB)
+    args = parser.parse_args()
+
+    markets = {f"market:{m}": build_market(m) for m in ('a', 'hk', 'us')}
+    kline_template = build_kline("600000")
+    values = lambda key: markets.get(key) or kline_template
+    trace = build_trace(args.accesses)
+    print(f"访问 {len(trace)} 次（含 {len(trace) - args.accesses} 次一次性代码），"
+          f"市场列表每份约 {estimate_size(markets['market:us']) / 1048576:.1f}MB，"
+          f"K线每段约 {estimate_size(kline_template) / 1024:.0f}KB\n")
+
+    before = CountBoundedLRU(max_size=20)
+    after = MemoryLRUCache(max_bytes=int(args.max_mb * 1024 * 1024), ttl_seconds=3600, rss_limit_bytes=0)
+    print(f"{'方式':<32}{'命中率':>8}{'市场列表命中率':>14}{'淘汰数':>8}{'占用':>10}{'回放耗时':>10}")
+    for name, cache in (("改动前（LRU，20 个条目）", before), (f"改动后（{args.max_mb:.0f}MB，TinyLFU 准入）", after)):
+        hit_rate, market_rate, elapsed = replay(cache, trace, values)
+        evictions = cache.evictions if isinstance(cache, CountBoundedLRU) else cache.get_stats()['evictions']
+        print(f"{name:<26}{hit_rate:>10.1%}{market_rate:>16.1%}{evictions:>10}"
+              f"{cache.total_bytes / 1048576:>10.1f}MB{elapsed:>9.2f}s")
+
+    print(f"\n改动后统计: {after.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
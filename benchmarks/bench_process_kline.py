@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+process_kline_data 微基准测试
+
+对比逐行 iterrows 的旧实现与整列运算的新实现在 5000 行 K 线上的耗时，
+并校验两者在各类输入（字符串日期 / datetime 列 / 中文列名 / NaN / Inf / 字符串数值）上的输出完全一致
+
+使用方法：
+    python benchmarks/bench_process_kline.py
+"""
+
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from service.kline.utils import process_kline_data, KLINE_COLUMN_MAPPING
+
+ROWS = 5000
+REPEAT = 5
+
+
+def legacy_process_kline_data(data: pd.DataFrame, source: str):
+    """旧实现（逐行 iterrows），作为输出一致性的参照"""
+    if data is None or data.empty:
+        return []
+
+    if 'date' not in data.columns and data.index.name in ('date', 'Date', 'Date'):
+        data = data.reset_index()
+    elif 'date' not in data.columns:
+        data = data.reset_index()
+        if 'index' in data.columns:
+            data = data.rename(columns={'index': 'date'})
+
+    for target_col, possible_cols in KLINE_COLUMN_MAPPING.items():
+        for col in possible_cols:
+            if col in data.columns:
+                if col != target_col:
+                    data = data.rename(columns={col: target_col})
+                break
+
+    for col in ['date', 'open', 'high', 'low', 'close']:
+        if col not in data.columns:
+            return []
+
+    result = []
+    for _, row in data.iterrows():
+        date_val = row['date']
+        try:
+            if isinstance(date_val, (pd.Timestamp, np.datetime64)):
+                date_str = pd.Timestamp(date_val).strftime('%Y-%m-%d')
+            elif hasattr(date_val, 'strftime'):
+                date_str = date_val.strftime('%Y-%m-%d')
+            else:
+                parsed = pd.to_datetime(str(date_val), errors='coerce')
+                if pd.isna(parsed):
+                    continue
+                date_str = parsed.strftime('%Y-%m-%d')
+        except Exception:
+            continue
+
+        try:
+            o = float(row['open'])
+            h = float(row['high'])
+            l = float(row['low'])
+            c = float(row['close'])
+            if any(math.isnan(v) or math.isinf(v) for v in (o, h, l, c)):
+                continue
+        except (ValueError, TypeError):
+            continue
+
+        item = {'date': date_str, 'open': o, 'high': h, 'low': l, 'close': c}
+        if 'volume' in data.columns:
+            try:
+                v = row['volume']
+                if pd.notna(v) and not (isinstance(v, float) and (math.isnan(v) or math.isinf(v))):
+                    item['volume'] = int(v)
+                else:
+                    item['volume'] = 0
+            except (ValueError, TypeError):
+                item['volume'] = 0
+        result.append(item)
+    return result
+
+
+def make_frames(rows: int):
+    rng = np.random.default_rng(42)
+    dates = pd.date_range('2005-01-01', periods=rows, freq='D')
+    close = 100 + rng.standard_normal(rows).cumsum()
+    base = {
+        'open': close + rng.standard_normal(rows),
+        'high': close + 2,
+        'low': close - 2,
+        'close': close,
+        'volume': rng.integers(1_000, 10_000_000, rows),
+    }
+
+    # 1. 东方财富/新浪风格：字符串日期 + 浮点数值
+    eastmoney = pd.DataFrame({'date': dates.strftime('%Y-%m-%d'), **base})
+
+    # 2. yfinance 风格：DatetimeIndex + 首字母大写列名 + 浮点成交量含 NaN
+    yf = pd.DataFrame({k.capitalize(): v for k, v in base.items()}, index=dates.rename('Date'))
+    yf['Volume'] = yf['Volume'].astype(float)
+    yf.iloc[::50, yf.columns.get_loc('Volume')] = np.nan
+
+    # 3. akshare 风格：中文列名 + 含 NaN / Inf 的价格
+    ak = pd.DataFrame({
+        '日期': dates.strftime('%Y-%m-%d'),
+        '开盘': base['open'], '收盘': base['close'], '最高': base['high'], '最低': base['low'],
+        '成交量': base['volume'],
+    })
+    ak.iloc[::97, ak.columns.get_loc('收盘')] = np.nan
+    ak.iloc[::131, ak.columns.get_loc('开盘')] = np.inf
+
+    # 4. baostock 风格：全部为字符串（含空值和非法数值）
+    bs = pd.DataFrame({
+        'date': dates.strftime('%Y-%m-%d'),
+        **{k: [f"{x:.4f}" for x in base[k]] for k in ('open', 'high', 'low', 'close')},
+        'volume': [str(v) for v in base['volume']],
+    })
+    bs.iloc[::113, bs.columns.get_loc('high')] = ''
+    bs.iloc[::89, bs.columns.get_loc('volume')] = '12.5'
+    bs.iloc[::211, bs.columns.get_loc('date')] = 'not-a-date'
+
+    # 5. finnhub 风格：短列名 + datetime 列
+    fh = pd.DataFrame({'t': dates, 'o': base['open'], 'h': base['high'], 'l': base['low'],
+                       'c': base['close'], 'v': base['volume']})
+
+    return {'eastmoney': eastmoney, 'yfinance': yf, 'akshare': ak, 'baostock': bs, 'finnhub': fh}
+
+
+def bench(func, frame, source):
+    best = float('inf')
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        func(frame.copy(), source)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main():
+    print(f"\nprocess_kline_data 基准（{ROWS} 行，取 {REPEAT} 次最优）\n")
+    print(f"{'数据风格':<12}{'旧实现(ms)':>12}{'新实现(ms)':>12}{'加速':>8}  输出一致")
+    for source, frame in make_frames(ROWS).items():
+        expected = legacy_process_kline_data(frame.copy(), source)
+        actual = process_kline_data(frame.copy(), source)
+        identical = expected == actual and all(
+            type(a[k]) is type(e[k]) for a, e in zip(actual, expected) for k in e
+        )
+        legacy_ms = bench(legacy_process_kline_data, frame, source)
+        new_ms = bench(process_kline_data, frame, source)
+        print(f"{source:<12}{legacy_ms:>12.1f}{new_ms:>12.1f}{legacy_ms / new_ms:>7.1f}x  "
+              f"{'✅' if identical else '❌'} ({len(actual)} 行)")
+        if not identical:
+            diffs = [(e, a) for e, a in zip(expected, actual) if e != a][:3]
+            print(f"    差异示例: {diffs or (len(expected), len(actual))}")
+
+
+if __name__ == "__main__":
+    main()
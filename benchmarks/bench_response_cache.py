@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预序列化响应缓存基准测试
+
+内存缓存中放入一份 10000 只股票的市场列表（market:us），用与 /api/stock/market 相同的两种方式返回：
+1. 改动前：每次命中都返回 dict，由 FastAPI 执行 jsonable_encoder + json.dumps
+2. 改动后：第一次命中时预序列化（含 gzip/br），挂在内存缓存条目上，之后直接返回字节
+通过 ASGI 传输在进程内顺序请求，统计每秒响应数与传输字节数
+（gzip / br 的每秒响应数包含了客户端解压的耗时）
+
+使用方法：
+    python benchmarks/bench_response_cache.py
+    python benchmarks/bench_response_cache.py --stocks 20000 --seconds 5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, Request
+
+from service.cache.mongodb_cache import get_cache
+from service.cache.response_cache import brotli, encode_payload, get_attached_response, attach_response
+
+STOCKS = 10000
+SECONDS = 3.0
+
+
+def build_market(n: int):
+    return {
+        "market": "us",
+        "count": n,
+        "stocks": [
+            {
+                "code": f"SYM{i}",
+                "name": f"示例公司 {i} Holdings Inc.",
+                "market": "us",
+                "full_code": f"105.SYM{i}",
+                "industry": "Technology",
+                "list_date": "2001-05-17",
+            }
+            for i in range(n)
+        ],
+        "timestamp": "2024-06-28T08:00:00",
+    }
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    cache = get_cache()
+
+    @app.get("/before")
+    async def before(marketCode: str = "us"):
+        result = cache.get(marketCode)
+        return {
+            "market": marketCode,
+            "count": result["count"],
+            "stocks": result["stocks"],
+            "timestamp": result["timestamp"],
+        }
+
+    @app.get("/after")
+    async def after(request: Request, marketCode: str = "us"):
+        accept_encoding = request.headers.get('accept-encoding', '')
+        cache_key = f"market:{marketCode}"
+        variant = f"api:{marketCode}"
+        encoded = get_attached_response(cache_key, variant)
+        if encoded is not None:
+            return encoded.to_response(accept_encoding)
+        result = cache.get(marketCode)
+        payload = {
+            "market": marketCode,
+            "count": result["count"],
+            "stocks": result["stocks"],
+            "timestamp": result["timestamp"],
+        }
+        encoded = encode_payload(payload)
+        attach_response(cache_key, variant, source=result, encoded=encoded)
+        return encoded.to_response(accept_encoding)
+
+    return app
+
+
+async def measure(client: httpx.AsyncClient, path: str, accept_encoding: str, seconds: float):
+    headers = {"Accept-Encoding": accept_encoding}
+    # 预热（改动后的路径在这里完成第一次编码）
+    first = await client.get(path, headers=headers)
+    wire_bytes = len(first.content) if not first.headers.get('content-encoding') else int(first.headers['content-length'])
+    count = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        response = await client.get(path, headers=headers)
+        assert response.status_code == 200
+        count += 1
+    elapsed = time.perf_counter() - t0
+    return count / elapsed, wire_bytes
+
+
+async def main_async(args):
+    app = build_app()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        cases = [
+            ("改动前（每次序列化）", "/before", "identity"),
+            ("改动后（预序列化）", "/after", "identity"),
+            ("改动后 + gzip", "/after", "gzip"),
+        ]
+        if brotli is not None:
+            cases.append(("改动后 + br", "/after", "br"))
+        baseline = None
+        print(f"{'方式':<26}{'响应/秒':>10}{'加速':>8}{'传输字节':>12}")
+        for name, path, accept_encoding in cases:
+            rps, wire_bytes = await measure(client, path, accept_encoding, args.seconds)
+            baseline = baseline or rps
+            print(f"{name:<22}{rps:>12.1f}{rps / baseline:>9.1f}x{wire_bytes:>14,}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stocks', type=int, default=STOCKS)
+    parser.add_argument('--seconds', type=float, default=SECONDS)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    get_cache().memory_cache.set("market:us", build_market(args.stocks))
+    print(f"市场列表: {args.stocks} 只股票，每种方式持续请求 {args.seconds:.0f}s\n")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
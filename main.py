@@ -1,11 +1,25 @@
 from dotenv import load_dotenv
+import asyncio
+import json
 import logging
 import time
+from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 
+from service.utils.executors import run_blocking, get_executor_stats, shutdown_executors, ExecutorSaturatedError
+from service.kline.hedging import get_hedge_stats
+from service.utils.provider_health import get_provider_registry
+from service.cache.revalidator import get_revalidator
+from service.stocks.spot_snapshot import get_spot_snapshots
+from service.stocks.symbol_index import get_symbol_index, load_market_index, SEARCH_MARKETS
+from service.main_force.indicators import get_indicator_engine
+from service.main_force.ranking import get_main_force_ranker, RANK_MARKETS, RANK_MAX_LIMIT, RANK_FORCE_REFRESH
+from service.utils.metrics import get_metrics_registry
+
 # 加载环境变量
 load_dotenv()
 
@@ -34,6 +48,35 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def start_cache_warmer():
+    """启动后台缓存预热（CACHE_WARMER_ENABLED=false 时不启动）"""
+    from service.cache.cache_warmer import get_cache_warmer
+
+    get_cache_warmer().start()
+
+
+@app.on_event("shutdown")
+async def shutdown_blocking_executors():
+    """进程退出时关闭缓存预热线程、主力排行计算、各工作负载的线程池、数据源健康探测线程、异步 HTTP 连接和 Baostock 会话"""
+    from service.utils.async_http_client import get_async_http_transport
+    from service.utils.baostock_session import get_baostock_session
+    from service.cache.cache_warmer import get_cache_warmer
+
+    get_cache_warmer().stop()
+    get_main_force_ranker().stop()
+    shutdown_executors()
+    await get_async_http_transport().aclose()
+    get_provider_registry().stop()
+    get_baostock_session().close()
+
+
+def raise_service_busy(e: ExecutorSaturatedError):
+    """执行器满载时返回 503，提示客户端稍后重试"""
+    print(f'服务繁忙：{e}')
+    raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
 @app.get("/api/health")
 async def health_check():
     """
@@ -59,6 +102,16 @@ async def detailed_health_check():
     仅用于运维监控，不建议频繁调用
     """
     from service.utils.lazy_loader import get_all_service_stats
+    # 延迟导入 - 各模块依赖 numpy / pandas / pymongo / requests / httpx，不在应用启动时加载
+    from service.kline.indicator_series import get_indicator_series_cache
+    from service.main_force.datasets import get_main_force_datasets
+    from service.utils.baostock_session import get_baostock_session
+    from service.cache.bar_store import get_bar_store
+    from service.utils.http_client import get_http_stats
+    from service.utils.async_http_client import get_async_http_stats
+    from service.cache.response_cache import get_response_cache_stats
+    from service.cache.mongodb_cache import get_memory_cache_stats
+    from service.cache.cache_warmer import get_cache_warmer
 
     start_time = time.time()
 
@@ -70,16 +123,47 @@ async def detailed_health_check():
         "message": "detailed health check",
         "response_time_ms": round((time.time() - start_time) * 1000, 2),
         "services": service_stats,
+        "executors": get_executor_stats(),
+        "kline_hedging": get_hedge_stats(),
+        "providers": get_provider_registry().get_stats(),
+        "http": get_http_stats(),
+        "async_http": get_async_http_stats(),
+        "baostock": get_baostock_session().get_stats(),
+        "memory_cache": get_memory_cache_stats(),
+        "bar_store": get_bar_store().get_stats(),
+        "response_cache": get_response_cache_stats(),
+        "revalidation": get_revalidator().get_stats(),
+        "cache_warmer": get_cache_warmer().get_stats(),
+        "spot_snapshots": get_spot_snapshots().get_stats(),
+        "symbol_index": get_symbol_index().get_stats(),
+        "indicators": get_indicator_engine().get_stats(),
+        "main_force_ranking": get_main_force_ranker().get_stats(),
+        "indicator_series": get_indicator_series_cache().get_stats(),
+        "main_force_datasets": get_main_force_datasets().get_stats(),
         "timestamp": time.strftime('%Y-%m-%d %H:%M:%S')
     }
     return JSONResponse(content=result)
 
 
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus 指标（文本格式 0.0.4）
+
+    缓存各层（内存 / MongoDB）的命中、未命中、写入次数与耗时直方图，按键类型和市场细分；
+    内存缓存占用、BarStore、预序列化响应的统计，以及 MongoDB 的估算文档数（后台定期刷新）。
+    只读取进程内数据，不访问 MongoDB
+    """
+    return PlainTextResponse(get_metrics_registry().render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.delete("/api/cache/clear")
 async def clear_all_cache():
     from service.cache.mongodb_cache import get_cache
+    from service.cache.bar_store import get_bar_store
     cache = get_cache()
     cache.clear_all()
+    get_bar_store().clear()
     return JSONResponse(content={"message": "所有K线缓存已清除"})
 
 
@@ -89,20 +173,15 @@ async def cache_status():
     诊断接口：查看当前缓存连接状态
     用于排查 "MongoDB未连接" 这类问题
     """
-    from service.cache.mongodb_cache import get_cache
+    from service.cache.mongodb_cache import get_cache, get_memory_cache_stats
     cache = get_cache()
 
     # 打印到终端日志
     info = cache.get_connection_info()
     print(f"[Cache Status] {info}")
 
-    # 统计一下库里有多少数据
-    stats = {"mongodb_records": None}
-    try:
-        if cache.is_connected():
-            stats["mongodb_records"] = cache.collection.count_documents({})
-    except Exception as e:
-        stats["count_error"] = str(e)
+    # 统计一下库里有多少数据（估算值，读取集合元数据，不扫描文档）
+    stats = {"mongodb_records": cache.estimated_count(), "memory_cache": get_memory_cache_stats()}
 
     return {
         "status": "ok",
@@ -111,6 +190,17 @@ async def cache_status():
     }
 
 
+@app.get("/api/cache/warmer")
+async def cache_warmer_status():
+    """
+    诊断接口：查看缓存预热状态
+    包括当前热门股票、最近刷新的对象 / 原因 / 时间 / 结果，以及因前台负载暂停、令牌不足的次数
+    """
+    from service.cache.cache_warmer import get_cache_warmer
+
+    return get_cache_warmer().get_stats()
+
+
 @app.get("/api/cache/reconnect")
 async def cache_reconnect():
     """
@@ -129,9 +219,11 @@ async def clear_all_cache_get():
     浏览器友好版本：清空所有缓存（GET 请求直接访问即可）
     """
     from service.cache.mongodb_cache import get_cache
+    from service.cache.bar_store import get_bar_store
     cache = get_cache()
     print("[Cache Clear] 清空所有缓存...")
     cache.clear_all()
+    get_bar_store().clear()
     print("[Cache Clear] ✅ 所有缓存已清空")
     return {"success": True, "message": "✅ 所有缓存已清空，下次请求将从数据源重新获取"}
 
@@ -148,12 +240,14 @@ async def clear_kline_cache(code: str = None):
     用法: /api/cache/clear/kline?code=00700      → 只清空 00700
     """
     from service.cache.mongodb_cache import get_cache
+    from service.cache.bar_store import get_bar_store
     cache = get_cache()
 
     if not code:
         # 不传 code → 清空所有 K线
         print("[Cache Clear] 清空所有 K线 缓存...")
         result = cache.delete_all_kline()
+        get_bar_store().clear()
         print(f"[Cache Clear] → 结果: {result}")
         return {
             "success": result["success"],
@@ -165,6 +259,7 @@ async def clear_kline_cache(code: str = None):
     # 传 code → 清空该股票的缓存
     print(f"[Cache Clear] 清空股票 {code} 的缓存...")
     result = cache.delete_by_code(code)
+    get_bar_store().clear(code)
     print(f"[Cache Clear] → 结果: {result}")
     return {
         "success": result["success"],
@@ -212,11 +307,13 @@ def normalize_date(date_str: str) -> str:
 
 
 @app.get("/api/kline")
-async def get_kline(code: str, start_date: str = None, end_date: str = None, start: str = None, end: str = None, name: str = None, force: bool = False):
+async def get_kline(request: Request, code: str, start_date: str = None, end_date: str = None, start: str = None, end: str = None, name: str = None, force: bool = False):
     """
     获取股票K线数据
 
     注意：此接口会触发kline模块的延迟加载（首次调用较慢）
+    K线序列命中时响应体会预序列化并挂在序列上，之后的命中直接返回已编码的字节（按 Accept-Encoding 选择压缩版本）
+    响应带 ETag（由序列内容的写入时间生成）和 Cache-Control，If-None-Match 一致时返回 304
     :param code: 股票代码
     :param start_date: 开始日期（格式：YYYY-MM-DD）
     :param end_date: 结束日期（格式：YYYY-MM-DD）
@@ -227,23 +324,62 @@ async def get_kline(code: str, start_date: str = None, end_date: str = None, sta
     :return: K线数据
     """
     # 延迟导入 - 仅在首次调用时加载重型模块
-    from service.kline.kline import get_kline_data
+    from service.kline.kline import get_kline_data_async
+    from service.cache.bar_store import get_bar_store, resolve_date_range
+    from service.cache.response_cache import encode_payload, make_etag, not_modified_response
 
     final_start_date = normalize_date(start_date) or normalize_date(start)
     final_end_date = normalize_date(end_date) or normalize_date(end)
     print(f'获取股票K线数据，股票代码：{code}，开始日期：{final_start_date}，结束日期：{final_end_date}，股票名称：{name}，force={force}')
 
+    accept_encoding = request.headers.get('accept-encoding', '')
+    if_none_match = request.headers.get('if-none-match', '')
+    variant = f"{code}:{name or code}"
+    if not force:
+        encoded = get_bar_store().get_response(code, final_start_date, final_end_date, variant)
+        if encoded is not None:
+            return encoded.to_response(accept_encoding, if_none_match)
+
     try:
-        result = get_kline_data(code, final_start_date, final_end_date, force=force)
+        result = await get_kline_data_async(code, final_start_date, final_end_date, force=force)
 
-        return {
+        payload = {
             "code": code,
             "name": name or code,
             "market": result["market"],
             "data_source": result["data_source"],
+            "hedge": result.get("_hedge"),
             "data": result["data"]
         }
-
+        if result.get("_stale"):
+            # 已有K线（尾部在后台补拉，或数据源失败时兜底）
+            payload["stale"] = True
+        if not result.get("_cache_timestamp"):
+            # 上游错误等未经序列的结果：不带缓存验证头
+            return payload
+
+        # 未指定日期时区间随当天变化，ETag 使用解析后的区间
+        etag = make_etag(
+            "kline", variant, *resolve_date_range(final_start_date, final_end_date),
+            result["_cache_timestamp"], *(("stale",) if result.get("_stale") else ())
+        )
+        not_modified = not_modified_response(if_none_match, etag, result["_expires_at"])
+        if not_modified is not None:
+            return not_modified
+
+        encoded = encode_payload(payload, etag=etag, expires_at=result["_expires_at"])
+        if encoded is None:
+            return payload
+        # 只保存序列命中的结果：同一区间被再次请求才视为热点
+        if result.get("_cached") and not result.get("_stale") and result["data"]:
+            get_bar_store().put_response(
+                code, final_start_date, final_end_date, variant,
+                result["_series_version"], encoded, len(result["data"])
+            )
+        return encoded.to_response(accept_encoding)
+
+    except ExecutorSaturatedError as e:
+        raise_service_busy(e)
     except ImportError:
         raise HTTPException(status_code=500, detail="OpenBB未安装，请先安装openbb")
     except Exception as e:
@@ -252,6 +388,99 @@ async def get_kline(code: str, start_date: str = None, end_date: str = None, sta
 
 
 
+@app.get("/api/indicators")
+async def get_indicators(code: str, names: str = None, start: str = None, end: str = None):
+    """
+    技术指标序列（按列返回，供图表直接绘制）
+
+    基于缓存中的K线（区间之前自动多取预热K线）用 NumPy 向量化计算整段序列，
+    计算结果按 (代码, 指标, 参数, 最后一根K线) 缓存，平移 / 缩放图表时直接截取
+
+    用法: /api/indicators?code=600519&names=ma,macd,boll,rsi,kdj,atr,obv&start=2026-01-01&end=2026-10-16
+    用法: /api/indicators?code=AAPL&names=ma:5:20,boll:20:2.5,kdj:9:3:3
+
+    :param code: 股票代码
+    :param names: 逗号分隔的指标（ma / macd / boll / rsi / kdj / atr / obv），可用 名称:参数1:参数2 指定参数，默认 ma,macd,boll,rsi,kdj
+    :param start: 开始日期（YYYY-MM-DD 或 YYYYMMDD，默认 90 天前）
+    :param end: 结束日期（YYYY-MM-DD 或 YYYYMMDD，默认今天）
+    :return: dates 与各指标的列（等长数组，窗口未满的位置为 null）
+    """
+    # 延迟导入 - 仅在首次调用时加载重型模块
+    from service.kline.indicator_series import parse_indicator_names, get_indicator_series
+    from service.cache.bar_store import resolve_date_range
+
+    try:
+        specs = parse_indicator_names(names)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    start_date, end_date = resolve_date_range(normalize_date(start), normalize_date(end))
+    for day in (start_date, end_date):
+        try:
+            time.strptime(day, '%Y-%m-%d')
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"日期格式错误：{day}（YYYY-MM-DD 或 YYYYMMDD）")
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail=f"开始日期 {start_date} 晚于结束日期 {end_date}")
+
+    try:
+        result = await run_blocking('kline', get_indicator_series, code, specs, start_date, end_date)
+    except ExecutorSaturatedError as e:
+        raise_service_busy(e)
+    except Exception as e:
+        print(f'计算技术指标出错：{e}')
+        raise HTTPException(status_code=500, detail=f"计算技术指标失败：{str(e)}")
+
+    if not result["dates"]:
+        raise HTTPException(status_code=404, detail=f"未找到股票 {code} 在 {start_date} ~ {end_date} 的K线")
+
+    return {
+        "code": code,
+        "start": start_date,
+        "end": end_date,
+        "count": len(result["dates"]),
+        **result,
+    }
+
+
+class KlineBatchRequest(BaseModel):
+    """批量K线请求体"""
+    codes: List[str]
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    force: bool = False
+
+
+@app.post("/api/kline/batch")
+async def get_kline_batch(request: KlineBatchRequest):
+    """
+    批量获取多只股票的K线数据（自选股列表）
+
+    以 NDJSON 流式返回：每只股票就绪后立即输出一行
+    {"type": "result", "code": ..., "status": "ok"/"error", ...}，
+    最后输出一行 {"type": "summary", ...}。单只股票失败只影响该行，不影响整批
+
+    :param request: codes 股票代码列表，start_date/end_date 日期范围（YYYY-MM-DD 或 YYYYMMDD），force 强制刷新
+    :return: application/x-ndjson 流
+    """
+    # 延迟导入 - 仅在首次调用时加载重型模块
+    from service.kline.batch import stream_kline_batch, MAX_BATCH_SIZE
+
+    if not request.codes:
+        raise HTTPException(status_code=400, detail="codes 不能为空")
+    if len(request.codes) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"单次最多支持 {MAX_BATCH_SIZE} 只股票，收到 {len(request.codes)} 只")
+
+    final_start_date = normalize_date(request.start_date)
+    final_end_date = normalize_date(request.end_date)
+    print(f'批量获取股票K线数据，股票数量：{len(request.codes)}，开始日期：{final_start_date}，结束日期：{final_end_date}，force={request.force}')
+
+    async def ndjson_lines():
+        async for item in stream_kline_batch(request.codes, final_start_date, final_end_date, force=request.force):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
 @app.get("/api/stock/main-force")
 async def api_get_main_force(code: str):
     """
@@ -265,7 +494,7 @@ async def api_get_main_force(code: str):
     print(f'获取股票主力动向分析，股票代码：{code}')
 
     try:
-        result = get_main_force_analysis(code)
+        result = await run_blocking('main_force', get_main_force_analysis, code)
 
         if result is None:
             raise HTTPException(status_code=404, detail=f"未找到股票 {code} 的主力动向信息")
@@ -274,11 +503,75 @@ async def api_get_main_force(code: str):
 
     except HTTPException:
         raise
+    except ExecutorSaturatedError as e:
+        raise_service_busy(e)
     except Exception as e:
         print(f'获取股票主力动向分析出错：{e}')
         raise HTTPException(status_code=500, detail=f"获取股票主力动向分析失败：{str(e)}")
 
 
+@app.get("/api/stock/main-force/ranking")
+async def api_get_main_force_ranking(market: str = 'a', date: str = None, limit: int = 100, offset: int = 0, refresh: bool = False):
+    """
+    全市场主力动向排行（按综合评分、近5日主力净流入降序）
+
+    排行表在后台对整个市场列表批量计算（K线获取用线程池，指标与评分用进程池），按日写入 MongoDB；
+    有更新的交易日收盘确定后，读取时在后台重新计算，计算期间继续返回上一张表。
+    还没有任何排行表时返回 202 和计算进度，稍后再请求
+
+    Args:
+        market: 市场代码（a / hk / us，默认 a）
+        date: 指定日期的排行表（YYYY-MM-DD 或 YYYYMMDD），默认最新一张
+        limit: 返回条数（默认 100，最多 RANK_MAX_LIMIT）
+        offset: 从第几名之后开始返回（分页）
+        refresh: 排行表已过期时立即在后台重新计算（已有计算进行中时忽略）；
+            只有 MAIN_FORCE_RANK_FORCE_REFRESH=true 时才会重新计算已是最新的排行表
+
+    Returns:
+        排行表（rows 为当前页）；running 为进行中的计算进度
+    """
+    market = market.lower()
+    if market not in RANK_MARKETS:
+        raise HTTPException(status_code=400, detail=f"不支持的市场代码：{market}（可选 a / hk / us）")
+    day = normalize_date(date)
+    if day is not None:
+        try:
+            time.strptime(day, '%Y-%m-%d')
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"日期格式错误：{date}（YYYY-MM-DD 或 YYYYMMDD）")
+    limit = max(1, min(limit, RANK_MAX_LIMIT))
+    offset = max(0, offset)
+
+    ranker = get_main_force_ranker()
+    if refresh:
+        # 匿名请求不能随意触发全市场重算：默认只在排行表过期时计算
+        ranker.start_run(market, force=RANK_FORCE_REFRESH)
+
+    try:
+        # 内存中没有排行表时从 MongoDB 读取
+        table = await run_blocking('main_force', ranker.get_table, market, day)
+    except ExecutorSaturatedError as e:
+        raise_service_busy(e)
+
+    running = ranker.get_progress(market)
+    if table is None:
+        if day is not None:
+            raise HTTPException(status_code=404, detail=f"没有 {market} 市场 {day} 的主力排行")
+        return JSONResponse(status_code=202, content={"market": market, "status": "computing", "running": running})
+
+    return {
+        "market": market,
+        "as_of": table.get("as_of"),
+        "generated_at": table.get("generated_at"),
+        "count": table.get("count", len(table["rows"])),
+        "flows_available": table.get("flows_available"),
+        "offset": offset,
+        "limit": limit,
+        "rows": table["rows"][offset:offset + limit],
+        "running": running,
+    }
+
+
 @app.get("/api/stock/baseinfo")
 async def api_get_stock_baseinfo(code: str):
     """
@@ -292,7 +585,7 @@ async def api_get_stock_baseinfo(code: str):
     print(f'获取股票基本信息，股票代码：{code}')
 
     try:
-        result = get_stock_baseinfo(code)
+        result = await run_blocking('profile', get_stock_baseinfo, code)
 
         if result is None or not result.get("full_name"):
             raise HTTPException(status_code=404, detail=f"未找到股票 {code} 的档案信息")
@@ -301,16 +594,23 @@ async def api_get_stock_baseinfo(code: str):
 
     except HTTPException:
         raise
+    except ExecutorSaturatedError as e:
+        raise_service_busy(e)
     except Exception as e:
         print(f'获取股票基本信息出错：{e}')
         raise HTTPException(status_code=500, detail=f"获取股票基本信息失败：{str(e)}")
 
 
 @app.get("/api/stock/market")
-async def get_stock_market(marketCode: str, force: bool = False):
+async def get_stock_market(request: Request, marketCode: str, force: bool = False):
     """
     获取指定市场的所有股票列表
 
+    缓存中的列表第一次返回时把响应体预序列化（含 gzip/br 版本）挂在内存缓存条目上，
+    之后的命中直接返回已编码的字节；条目被替换、删除或过期时一并失效。
+    响应带 ETag（由列表的写入时间 _cache_timestamp 生成）和与缓存有效期一致的 Cache-Control，
+    If-None-Match 一致时返回 304
+
     Args:
         marketCode: 市场代码 (a, hk, us)
         force: 是否强制跳过缓存，从数据源重新获取（默认 False）
@@ -320,30 +620,105 @@ async def get_stock_market(marketCode: str, force: bool = False):
     """
     # 延迟导入
     from service.stocks.stocks import get_stock_by_market
+    from service.cache.response_cache import (
+        encode_payload, get_attached_response, attach_response, make_etag, not_modified_response
+    )
+    from service.cache.decorators import market_cache_expires_at
 
     print(f'获取市场股票列表，市场代码：{marketCode}，force：{force}')
 
+    accept_encoding = request.headers.get('accept-encoding', '')
+    if_none_match = request.headers.get('if-none-match', '')
+    # 与 cache_market_stocks 写入的缓存键一致
+    cache_key = f"market:{marketCode.lower()}"
+    variant = f"api:{marketCode}"
+    if not force:
+        encoded = get_attached_response(cache_key, variant)
+        if encoded is not None:
+            return encoded.to_response(accept_encoding, if_none_match)
+
     try:
         # 调用股票市场服务获取数据
-        result = get_stock_by_market(marketCode, force=force)
+        result = await run_blocking('market', get_stock_by_market, marketCode, force=force)
 
         if result is None:
             raise HTTPException(status_code=404, detail=f"未找到市场代码为 {marketCode} 的股票列表")
 
         # 转换结果为API响应格式
-        return {
+        payload = {
             "market": marketCode,
             "count": result["count"],
             "stocks": result["stocks"],
             "timestamp": result["timestamp"]
         }
+        if result.get("_stale"):
+            # 过期的列表（后台刷新中，或数据源失败时兜底）
+            payload["stale"] = True
+        etag = expires_at = None
+        if result.get("_cache_timestamp"):
+            etag = make_etag("market", variant, result["_cache_timestamp"], *(("stale",) if result.get("_stale") else ()))
+            expires_at = market_cache_expires_at(marketCode, result["_cache_timestamp"])
+            not_modified = not_modified_response(if_none_match, etag, expires_at)
+            if not_modified is not None:
+                return not_modified
+
+        # 上万条的列表编码和压缩较慢，放到执行器中进行，避免阻塞事件循环
+        encoded = await run_blocking('market', encode_payload, payload, etag, expires_at)
+        if encoded is not None:
+            attach_response(cache_key, variant, source=result, encoded=encoded)
+            return encoded.to_response(accept_encoding)
+        return payload
 
     except HTTPException:
         raise
+    except ExecutorSaturatedError as e:
+        raise_service_busy(e)
     except Exception as e:
         print(f'获取市场股票列表出错：{e}')
         raise HTTPException(status_code=500, detail=f"获取市场股票列表失败：{str(e)}")
 
+@app.get("/api/stock/search")
+async def search_stocks(q: str, market: Optional[str] = None, limit: int = 10):
+    """
+    搜索股票（代码前缀、名称片段、拼音首字母）
+
+    索引由缓存中的 A股 / 港股 / 美股列表在内存中建立，市场列表刷新时自动更新；
+    某个市场第一次被搜索且尚未建立索引时，先在 market 执行器中加载该市场的列表
+
+    Args:
+        q: 搜索词，如 600519、茅台、gzmt、aapl
+        market: 只搜索某个市场（a / hk / us），默认全部市场
+        limit: 返回条数（默认 10，最多 SEARCH_MAX_LIMIT）
+
+    Returns:
+        匹配的股票（按匹配方式和代码排序）；unavailable 为暂时无法建立索引的市场
+    """
+    if market is not None and market.lower() not in SEARCH_MARKETS:
+        raise HTTPException(status_code=400, detail=f"不支持的市场代码：{market}（可选 a / hk / us）")
+
+    index = get_symbol_index()
+    markets = [market.lower()] if market else list(SEARCH_MARKETS)
+    missing = index.markets_to_load(markets)
+    if missing:
+        # 加载失败（数据源不可用、执行器繁忙）的市场本次不参与搜索
+        outcomes = await asyncio.gather(
+            *(run_blocking('market', load_market_index, m) for m in missing), return_exceptions=True
+        )
+        for m, outcome in zip(missing, outcomes):
+            if isinstance(outcome, Exception):
+                print(f'加载 {m} 市场股票列表失败：{outcome}')
+
+    t0 = time.perf_counter()
+    results = index.search(q, market, limit)
+    return {
+        "query": q,
+        "count": len(results),
+        "results": results,
+        "took_ms": round((time.perf_counter() - t0) * 1000, 3),
+        "unavailable": index.missing_markets(markets),
+    }
+
+
 @app.get("/api/stock-basic-info")
 async def api_get_stock_basic_info(code: str):
     """
@@ -352,12 +727,12 @@ async def api_get_stock_basic_info(code: str):
     :return: 股票基本信息
     """
     # 延迟导入
-    from service.stocks.basic_info import get_stock_basic_info
+    from service.stocks.basic_info import get_stock_basic_info_async
 
     print(f'获取股票基本信息，股票代码：{code}')
 
     try:
-        result = get_stock_basic_info(code)
+        result = await get_stock_basic_info_async(code)
 
         if result is None:
             raise HTTPException(status_code=404, detail=f"未找到股票 {code} 的基本信息")
@@ -366,6 +741,8 @@ async def api_get_stock_basic_info(code: str):
 
     except HTTPException:
         raise
+    except ExecutorSaturatedError as e:
+        raise_service_busy(e)
     except Exception as e:
         print(f'获取股票基本信息出错：{e}')
         raise HTTPException(status_code=500, detail=f"获取股票基本信息失败：{str(e)}")
@@ -18,7 +18,7 @@ def _get_from_akshare(code: str) -> dict:
 def _get_from_eastmoney(code: str) -> dict:
     # 从东方财富获取 A 股基本面数据
     # 东财的F10接口能获取到公司资料
-    import requests
+    from service.utils.http_client import http_get
     try:
         # A股：上交所SH开头，深交所SZ开头
         prefix = "SH" if code.startswith(('60', '68')) else "SZ"
@@ -29,7 +29,7 @@ def _get_from_eastmoney(code: str) -> dict:
             'Referer': f'https://emweb.securities.eastmoney.com/PC_HSF10/CompanySurvey/Index?type=web&code={prefix}{code}'
         }
         
-        res = requests.get(url, headers=headers, timeout=5)
+        res = http_get(url, headers=headers)
         if res.status_code == 200:
             data = res.json()
             if data and data.get("jbzl"):
@@ -47,24 +47,21 @@ def _get_from_eastmoney(code: str) -> dict:
     return {}
 
 def _get_from_baostock(code: str) -> dict:
-    import baostock as bs
+    from service.utils.baostock_session import get_baostock_session
     # baostock 的代码格式需要加前缀：sh.600519 或 sz.000001
     prefix = "sh." if code.startswith(('60', '68')) else "sz."
     full_code = f"{prefix}{code}"
     
-    bs.login()
-    try:
-        rs = bs.query_stock_basic(code=full_code)
-        df = rs.get_data()
-        if not df.empty:
-            record = df.iloc[0]
-            return {
-                "full_name": str(record.get("code_name", "")),
-                "listing_date": str(record.get("ipoDate", ""))
-                # baostock 不提供 industry 和 main_business，能取到什么算什么
-            }
-    finally:
-        bs.logout()
+    # 复用共享会话，无需每次登录/登出
+    rs = get_baostock_session().query('query_stock_basic', code=full_code)
+    df = rs.to_dataframe()
+    if not df.empty:
+        record = df.iloc[0]
+        return {
+            "full_name": str(record.get("code_name", "")),
+            "listing_date": str(record.get("ipoDate", ""))
+            # baostock 不提供 industry 和 main_business，能取到什么算什么
+        }
         
     return {}
 
@@ -1,6 +1,7 @@
 import logging
 import os
-import requests
+
+from service.utils.http_client import http_get
 
 logger = logging.getLogger(__name__)
 
@@ -8,7 +9,7 @@ def _get_from_finnhub(code: str) -> dict:
     finnhub_key = os.environ.get("FINNHUB_API_KEY")
     if finnhub_key:
         url = f"https://finnhub.io/api/v1/stock/profile2?symbol={code}&token={finnhub_key}"
-        res = requests.get(url, timeout=10)
+        res = http_get(url)
         if res.status_code == 200:
             data = res.json()
             if data and data.get("name"):
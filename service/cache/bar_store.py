@@ -0,0 +1,931 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按股票维护的日K线序列存储 - 增量拉取，只补缺失区间
+
+核心原理：
+1. 每只股票只保存一份规范化的日K线序列（按日期去重合并），以及它已覆盖的请求区间
+   [covered_start, covered_end]；任何一次拉取得到的K线都合并进同一份序列
+2. 区间请求直接从序列中切片返回；只有头部（start < covered_start）或尾部
+   （end > covered_end）缺失的部分才去上游拉取，覆盖区间始终保持连续
+3. 当天的K线在收盘前会变化：序列按所属市场的交易日历（service.utils.trading_calendar）记录已确定的
+   最后日期 settled_end（收盘确定之后为当天，否则为前一天），之前的K线视为不再变化；
+   settled_end 之后的尾部只在交易时段内每 BAR_STORE_LIVE_TTL 秒、收盘确定时、以及下一次开盘后重新拉取，
+   夜间、周末和节假日不会重复拉取
+4. 缺口两端的休市日（周末 / 节假日）不访问上游，缺口只剩休市日时直接视为已覆盖
+5. 序列以列式格式保存（见 kline_columns.KlineColumns），只在返回结果时转换为按条字典
+6. 内存中按 LRU 保留最多 BAR_STORE_MAX_SYMBOLS 只股票，同时持久化到 MongoDB
+   （缓存键 kline:{code}:bars，会被 delete_by_code / delete_all_kline 一并清理）
+7. 序列命中的接口响应可以预序列化后挂在序列上（get_response / put_response），
+   序列合并新K线时一并失效
+8. 序列记录内容最后一次变化的时间 written_at（重新拉取到相同的K线不算变化），
+   结果中的 _cache_timestamp 即为该时间，_expires_at 为结果在不补拉的前提下保持有效的截止时间，
+   供接口生成 ETag 和 Cache-Control
+9. stale-while-revalidate：只缺盘中尾部、且尾部过期不超过 BAR_STORE_STALE_WHILE_REVALIDATE 秒时，
+   直接返回已有K线（_stale=True），尾部在后台补拉（见 revalidator.py）；
+   缺口拉取失败但序列中已有该区间的K线时，同样返回已有K线并标记 _stale（stale-if-error）
+10. 各数据源的复权方式不同（新浪 / baostock 不复权，东方财富 / akshare 前复权，见 kline.SOURCE_ADJUSTMENT），
+   前复权的历史K线在每次除权除息后都会变化：序列在 meta 中记录复权方式（adjust），
+   拉取缺口时优先使用复权方式相同的数据源，并连同缺口旁一根已有K线（锚点）一起拉取；
+   复权方式不同或锚点价格对不上时不拼接，以本次结果重建序列（缺失的部分随后按缺口补拉）
+
+使用方法：
+    from service.cache.bar_store import get_bar_store
+
+    result = get_bar_store().get_range(code, start_date, end_date, fetch)
+    # fetch(start_date, end_date, adjust) -> get_kline_data 格式的结果字典（adjust 为期望的复权方式，可为None）
+
+    result = await get_bar_store().get_range_async(code, start_date, end_date, fetch_async)
+"""
+
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .mongodb_cache import get_cache
+from .cache_metrics import record_lookup
+from .revalidator import get_revalidator
+from service.utils.trading_calendar import get_trading_calendar, TradingCalendar
+from service.utils.executors import run_blocking, ExecutorSaturatedError
+from service.utils.single_flight import get_single_flight
+from utils_stock.stock import get_market_type
+
+if TYPE_CHECKING:
+    # 列式存储依赖 numpy，用到时才导入，应用启动时不加载
+    from .kline_columns import KlineColumns
+
+logger = logging.getLogger(__name__)
+
+LIVE_TTL = float(os.getenv('BAR_STORE_LIVE_TTL', '300'))
+MAX_SYMBOLS = int(os.getenv('BAR_STORE_MAX_SYMBOLS', '500'))
+TTL_DAYS = int(os.getenv('BAR_STORE_TTL_DAYS', '30'))
+# 盘中尾部过期（超过 LIVE_TTL）后仍可直接返回、同时后台补拉的时长（秒）
+STALE_WHILE_REVALIDATE = float(os.getenv('BAR_STORE_STALE_WHILE_REVALIDATE', '1800'))
+
+# 未指定日期时的默认区间，与 get_kline_data 保持一致
+DEFAULT_RANGE_DAYS = 90
+
+DATE_FORMAT = '%Y-%m-%d'
+
+# 每只股票最多保留的预序列化响应数（不同日期区间 / 响应形式）
+MAX_RESPONSES_PER_SYMBOL = 4
+
+_series_versions = itertools.count(1)
+
+
+def resolve_date_range(start_date: Optional[str], end_date: Optional[str]) -> Tuple[str, str]:
+    """补全默认日期区间：结束日期默认今天，开始日期默认 90 天前"""
+    now = datetime.now()
+    if end_date is None:
+        end_date = now.strftime(DATE_FORMAT)
+    if start_date is None:
+        start_date = (now - timedelta(days=DEFAULT_RANGE_DAYS)).strftime(DATE_FORMAT)
+    return start_date, end_date
+
+
+def _shift(day: str, days: int) -> str:
+    return (datetime.strptime(day, DATE_FORMAT) + timedelta(days=days)).strftime(DATE_FORMAT)
+
+
+def _calendar_of(code: str) -> TradingCalendar:
+    """股票所属市场的交易日历（与 get_kline_data 选择数据源时的市场判断一致）"""
+    return get_trading_calendar(get_market_type(code.split('.')[0]))
+
+
+def _is_valid_bar(item: Any) -> bool:
+    """K线条目是否有效（有日期和开高低收，且不含 NaN/Inf）"""
+    from .kline_columns import PRICE_FIELDS
+
+    if not isinstance(item, dict) or not item.get('date'):
+        return False
+    if not all(isinstance(item.get(field), (int, float)) for field in PRICE_FIELDS):
+        return False
+    for v in item.values():
+        if isinstance(v, float) and (v != v or v in (float('inf'), float('-inf'))):
+            return False
+    return True
+
+
+class _BarSeries:
+    """单只股票的日K线序列"""
+
+    __slots__ = ('columns', 'covered_start', 'covered_end', 'settled_end', 'refreshed_at', 'meta', 'lock',
+                 'version', 'responses', 'written_at', 'calendar')
+
+    def __init__(self, calendar: TradingCalendar):
+        from .kline_columns import KlineColumns
+
+        self.calendar = calendar
+        self.columns = KlineColumns.empty()
+        self.covered_start: Optional[str] = None
+        self.covered_end: Optional[str] = None
+        self.settled_end: Optional[str] = None
+        self.refreshed_at = 0.0
+        self.meta: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+        # 每次合并更新（全局递增，序列被淘汰重建后也不会重复）；预序列化响应 (start, end, variant) → (响应, K线条数)
+        self.version = next(_series_versions)
+        self.responses: Dict[Tuple[str, str, str], Tuple[Any, int]] = {}
+        # 内容最后一次变化的时间（UTC ISO 格式，持久化）
+        self.written_at: Optional[str] = None
+
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any], calendar: TradingCalendar) -> '_BarSeries':
+        from .kline_columns import KlineColumns
+
+        series = cls(calendar)
+        series.columns = KlineColumns.from_document(doc.get('columns'))
+        series.covered_start = doc.get('covered_start')
+        series.covered_end = doc.get('covered_end')
+        series.settled_end = doc.get('settled_end') or series.covered_end
+        series.refreshed_at = float(doc.get('refreshed_at') or 0.0)
+        series.meta = doc.get('meta') or {}
+        series.written_at = doc.get('written_at')
+        return series
+
+    def to_document(self) -> Dict[str, Any]:
+        return {
+            'columns': self.columns.to_document(),
+            'covered_start': self.covered_start,
+            'covered_end': self.covered_end,
+            'settled_end': self.settled_end,
+            'refreshed_at': self.refreshed_at,
+            'meta': self.meta,
+            'written_at': self.written_at,
+        }
+
+    def tail_expires_at(self) -> float:
+        """
+        settled_end 之后的盘中K线需要重新拉取的时间
+
+        Returns:
+            上次拉取时处于交易时段：LIVE_TTL 秒后与该时段结束（收盘确定）中较早者；
+            否则为下一次开盘（夜间、周末、节假日期间K线不会变化）
+        """
+        if not self.refreshed_at:
+            return 0.0
+        live_until = self.calendar.live_until(self.refreshed_at)
+        if live_until is not None:
+            return min(self.refreshed_at + LIVE_TTL, live_until)
+        return self.calendar.next_open(self.refreshed_at)
+
+    def trim(self, start: str, end: str) -> Optional[Tuple[str, str]]:
+        """去掉缺口两端的休市日，缺口只剩休市日时返回None"""
+        return self.calendar.trim(start, end)
+
+    @property
+    def adjust(self) -> Optional[str]:
+        """序列的复权方式（旧版本持久化的序列没有记录，为None）"""
+        return self.meta.get('adjust')
+
+    def anchor(self, gap_start: str, gap_end: str) -> Optional[str]:
+        """与缺口相邻的一根已有K线的日期（拉取缺口时一并取回，用于核对复权是否变化），没有时返回None"""
+        if self.covered_start is None or not len(self.columns):
+            return None
+        if gap_start > self.covered_start:
+            before = self.columns.slice(self.covered_start, _shift(gap_start, -1))
+            return before.date_at(-1) if len(before) else None
+        after = self.columns.slice(_shift(gap_end, 1), self.covered_end)
+        return after.date_at(0) if len(after) else None
+
+    def plan(self, start: str, end: str, now: float) -> List[Tuple[str, str]]:
+        """计算 [start, end] 中需要从上游拉取的缺口（头部在前，尾部在后）"""
+        if self.covered_start is None:
+            return [(start, end)]
+
+        gaps = []
+        if start < self.covered_start:
+            # 头部缺口一直补到 covered_start 前一天，保持覆盖区间连续
+            gaps.append((start, _shift(self.covered_start, -1)))
+
+        # settled_end 之后的K线是盘中数据：按交易日历到期后重新拉取
+        tail_stale = end > self.settled_end and now >= self.tail_expires_at()
+        if end > self.covered_end or tail_stale:
+            gaps.append((_shift(self.settled_end, 1), end))
+        return gaps
+
+    def merge(self, gap_start: str, gap_end: str, bars: List[Dict[str, Any]], meta: Dict[str, Any],
+              now: float, anchor: Optional[str] = None) -> bool:
+        """
+        合并一段拉取结果，并扩展覆盖区间（调用方持有 lock）
+
+        Args:
+            gap_start: 缺口开始日期
+            gap_end: 缺口结束日期
+            bars: 拉取到的K线（锚点不为None时包含锚点当天）
+            meta: 结果中除K线外的字段（含 adjust）
+            now: 当前时间戳
+            anchor: 随缺口一并拉取的已有K线日期（见 anchor）
+
+        Returns:
+            是否因复权方式不同或锚点价格对不上而重建了序列
+        """
+        from .kline_columns import KlineColumns
+
+        self.version = next(_series_versions)
+        self.responses.clear()
+        previous = self.columns
+        fetched = KlineColumns.from_bars(bars)
+        if anchor is not None:
+            gap_start, gap_end = min(gap_start, anchor), max(gap_end, anchor)
+        contiguous = (
+            self.covered_start is not None
+            and gap_start <= _shift(self.covered_end, 1)
+            and gap_end >= _shift(self.covered_start, -1)
+        )
+        rebuilt = contiguous and bool(bars) and not (
+            meta.get('adjust') == self.adjust
+            and (anchor is None or self.columns.same_prices(fetched, anchor))
+        )
+        if not contiguous or rebuilt:
+            # 与已有序列不相连，或复权口径不一致：以本次结果重建，避免覆盖区间出现空洞或混入不同口径的K线
+            self.columns = KlineColumns.empty()
+            self.covered_start, self.covered_end = gap_start, gap_end
+            self.settled_end = _shift(gap_start, -1)
+
+        # 本次区间内的旧K线以新结果为准（例如当天盘中的K线）
+        self.columns = self.columns.replace_range(gap_start, gap_end, fetched)
+
+        self.covered_start = min(self.covered_start, gap_start)
+        self.covered_end = max(self.covered_end, gap_end)
+        if gap_start <= _shift(self.settled_end, 1):
+            # 本次区间接上了已确定部分：按交易日历已收盘确定的K线不会再变化
+            settled_through = self.calendar.settled_through(now)
+            self.settled_end = max(self.settled_end, min(gap_end, settled_through))
+            if gap_end > settled_through:
+                self.refreshed_at = now
+        if not self.columns.equals(previous) or (meta and meta != self.meta):
+            self.written_at = datetime.utcnow().isoformat()
+        if meta:
+            self.meta = meta
+        return rebuilt
+
+    def stamp(self, end: str, now: float) -> Dict[str, Any]:
+        """
+        切片时的版本信息（调用方持有 lock）
+
+        Args:
+            end: 切片的结束日期
+            now: 当前时间戳
+
+        Returns:
+            {'_series_version', '_cache_timestamp', '_expires_at'}：结束日期不晚于 settled_end 的区间
+            只含已确定的K线，有效期与序列的持久化期限一致；否则到盘中K线下一次重新拉取为止
+        """
+        if self.settled_end is not None and end <= self.settled_end:
+            expires_at = now + TTL_DAYS * 86400
+        else:
+            expires_at = max(now, self.tail_expires_at())
+        return {
+            '_series_version': self.version,
+            '_cache_timestamp': self.written_at,
+            '_expires_at': expires_at,
+        }
+
+    def slice(self, start: str, end: str) -> 'KlineColumns':
+        return self.columns.slice(start, end)
+
+
+class BarStore:
+    """按股票维护的日K线序列存储（线程安全）"""
+
+    def __init__(self, max_symbols: int = MAX_SYMBOLS):
+        self._max_symbols = max_symbols
+        self._series: 'OrderedDict[str, _BarSeries]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self._requests = 0
+        self._hits = 0
+        self._partial_hits = 0
+        self._misses = 0
+        self._stale_hits = 0
+        self._upstream_calls = 0
+        self._upstream_failures = 0
+        self._skipped_gaps = 0
+        self._adjust_rebuilds = 0
+        self._bars_fetched = 0
+        self._bars_served = 0
+
+    @staticmethod
+    def _cache_key(code: str) -> str:
+        return f"kline:{code}:bars"
+
+    @staticmethod
+    def _normalize(code: str) -> str:
+        return code.strip().lower()
+
+    def _remember(self, code: str, series: _BarSeries) -> _BarSeries:
+        with self._lock:
+            existing = self._series.get(code)
+            if existing is not None:
+                self._series.move_to_end(code)
+                return existing
+            self._series[code] = series
+            while len(self._series) > self._max_symbols:
+                self._series.popitem(last=False)
+            return series
+
+    def _load_many(self, codes: List[str]) -> Dict[str, _BarSeries]:
+        """从内存加载序列，内存未命中的合并为一次 MongoDB 查询"""
+        loaded = {}
+        missing = []
+        t0 = time.perf_counter()
+        with self._lock:
+            for code in codes:
+                series = self._series.get(code)
+                if series is not None:
+                    self._series.move_to_end(code)
+                    loaded[code] = series
+                else:
+                    missing.append(code)
+        elapsed = time.perf_counter() - t0
+        for code in loaded:
+            record_lookup(self._cache_key(code), 'memory_hit', elapsed)
+
+        get_documents = getattr(get_cache(), 'get_documents', None)
+        if missing and get_documents is not None:
+            docs = get_documents([self._cache_key(code) for code in missing])
+            for code in missing:
+                doc = docs.get(self._cache_key(code))
+                if doc and doc.get('covered_start'):
+                    loaded[code] = self._remember(code, _BarSeries.from_document(doc, _calendar_of(code)))
+        return loaded
+
+    def _persist(self, code: str, document: Dict[str, Any]) -> None:
+        set_document = getattr(get_cache(), 'set_document', None)
+        if set_document is not None:
+            set_document(self._cache_key(code), document, ttl_days=TTL_DAYS)
+
+    def _build_result(self, series: _BarSeries, columns: 'KlineColumns', cached: bool,
+                      stamp: Dict[str, Any]) -> Dict[str, Any]:
+        # 序列内部为列式存储，只在这里转换为接口返回的按条字典
+        result = dict(series.meta)
+        result['data'] = columns.to_bars()
+        result['_cached'] = cached
+        # 切片时的序列版本（put_response 据此判断响应是否仍与序列一致）、写入时间与有效期
+        result.update(stamp)
+        return result
+
+    def get_response(self, code: str, start_date: Optional[str], end_date: Optional[str], variant: str) -> Optional[Any]:
+        """
+        获取序列命中时预序列化的接口响应（只查内存，不发起拉取）
+
+        Args:
+            code: 股票代码
+            start_date: 开始日期（None 表示默认区间）
+            end_date: 结束日期（None 表示今天）
+            variant: 响应形式（同一区间不同的接口参数）
+
+        Returns:
+            put_response 保存的响应；序列不在内存中、需要补拉或尚未保存时返回None
+        """
+        key = self._normalize(code)
+        t0 = time.perf_counter()
+        with self._lock:
+            series = self._series.get(key)
+            if series is not None:
+                self._series.move_to_end(key)
+        if series is None:
+            return None
+
+        start, end = resolve_date_range(start_date, end_date)
+        with series.lock:
+            cached = series.responses.get((start, end, variant))
+            if cached is None or any(series.trim(*g) for g in series.plan(start, end, time.time())):
+                return None
+
+        response, bar_count = cached
+        with self._lock:
+            self._requests += 1
+            self._hits += 1
+            self._bars_served += bar_count
+        record_lookup(self._cache_key(key), 'memory_hit', time.perf_counter() - t0)
+        return response
+
+    def put_response(self, code: str, start_date: Optional[str], end_date: Optional[str], variant: str,
+                     version: int, response: Any, bar_count: int) -> bool:
+        """
+        保存序列命中时的预序列化响应
+
+        Args:
+            code: 股票代码
+            start_date: 开始日期（None 表示默认区间）
+            end_date: 结束日期（None 表示今天）
+            variant: 响应形式
+            version: 生成响应时的序列版本（结果中的 _series_version）；序列已合并新K线时不保存
+            response: 预序列化响应
+            bar_count: 响应中的K线条数（用于统计）
+
+        Returns:
+            是否保存
+        """
+        key = self._normalize(code)
+        with self._lock:
+            series = self._series.get(key)
+        if series is None:
+            return False
+
+        start, end = resolve_date_range(start_date, end_date)
+        with series.lock:
+            if series.version != version:
+                return False
+            series.responses.pop((start, end, variant), None)
+            while len(series.responses) >= MAX_RESPONSES_PER_SYMBOL:
+                series.responses.pop(next(iter(series.responses)))
+            series.responses[(start, end, variant)] = (response, bar_count)
+        return True
+
+    def peek_many(self, requests: List[Tuple[str, Optional[str], Optional[str]]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        批量查询：只返回无需访问上游即可完整切片的结果，不发起任何拉取
+
+        Args:
+            requests: [(股票代码, 开始日期, 结束日期), ...]
+
+        Returns:
+            与 requests 顺序一致的结果列表，需要补拉的位置为None
+        """
+        codes = [self._normalize(code) for code, _, _ in requests]
+        loaded = self._load_many(list(dict.fromkeys(codes)))
+        now = time.time()
+
+        results: List[Optional[Dict[str, Any]]] = []
+        for code, (_, start_date, end_date) in zip(codes, requests):
+            series = loaded.get(code)
+            result = None
+            if series is not None:
+                start, end = resolve_date_range(start_date, end_date)
+                with series.lock:
+                    gaps = [g for g in series.plan(start, end, now) if series.trim(*g)]
+                    bars = series.slice(start, end) if not gaps else None
+                    stamp = series.stamp(end, now)
+                if bars:
+                    result = self._build_result(series, bars, cached=True, stamp=stamp)
+            if result is not None:
+                # 未命中的请求随后会走 get_range，由那里计数
+                with self._lock:
+                    self._requests += 1
+                    self._hits += 1
+                    self._bars_served += len(result['data'])
+            results.append(result)
+        return results
+
+    def _open_series(self, key: str, loaded: Optional[_BarSeries]) -> _BarSeries:
+        return loaded if loaded is not None else self._remember(key, _BarSeries(_calendar_of(key)))
+
+    def _skip_gap(self, series: _BarSeries, gap_start: str, gap_end: str) -> None:
+        """缺口只有休市日（周末 / 节假日），没有交易日：直接视为已覆盖"""
+        with self._lock:
+            self._skipped_gaps += 1
+        with series.lock:
+            series.merge(gap_start, gap_end, [], {}, time.time())
+
+    @staticmethod
+    def _valid_bars(result: Any) -> List[Dict[str, Any]]:
+        if not isinstance(result, dict):
+            return []
+        return [bar for bar in result.get('data') or [] if _is_valid_bar(bar)]
+
+    def _count_upstream(self, result: Any) -> Any:
+        """统计一次上游拉取（在 single-flight 的领头调用内执行，合并的请求不重复计数）"""
+        fetched = len(self._valid_bars(result))
+        with self._lock:
+            self._upstream_calls += 1
+            self._bars_fetched += fetched
+            if not fetched:
+                self._upstream_failures += 1
+        return result
+
+    def _merge_fetched(
+        self,
+        key: str,
+        series: _BarSeries,
+        gap: Tuple[str, str],
+        trimmed: Tuple[str, str],
+        result: Any,
+        anchor: Optional[str]
+    ) -> Tuple[bool, bool]:
+        """合并一个缺口的拉取结果，返回 (是否得到了有效K线, 是否重建了序列)"""
+        bars = self._valid_bars(result)
+        if not bars:
+            logger.warning(f"[BarStore] {key} 缺口 {trimmed[0]} ~ {trimmed[1]} 拉取失败或无数据，使用已有K线")
+            return False, False
+
+        meta = {k: v for k, v in result.items() if k != 'data' and not k.startswith('_')}
+        with series.lock:
+            previous_adjust = series.adjust
+            rebuilt = series.merge(gap[0], gap[1], bars, meta, time.time(), anchor)
+        if rebuilt:
+            with self._lock:
+                self._adjust_rebuilds += 1
+            logger.info(
+                f"[BarStore] {key} 复权口径变化（{previous_adjust} → {meta.get('adjust')}，锚点 {anchor}），"
+                f"以 {trimmed[0]} ~ {trimmed[1]} 的结果重建序列"
+            )
+        return True, rebuilt
+
+    @staticmethod
+    def _fetch_plan(series: _BarSeries, gap: Tuple[str, str],
+                    trimmed: Tuple[str, str]) -> Tuple[Optional[str], Optional[str], Tuple[str, str]]:
+        """(锚点, 期望的复权方式, 实际拉取区间)：拉取区间扩展到包含锚点"""
+        with series.lock:
+            anchor = series.anchor(*gap)
+            adjust = series.adjust if len(series.columns) else None
+        if anchor is None:
+            return None, adjust, trimmed
+        return anchor, adjust, (min(trimmed[0], anchor), max(trimmed[1], anchor))
+
+    def _finish(
+        self,
+        key: str,
+        series: _BarSeries,
+        start: str,
+        end: str,
+        gaps: List[Tuple[str, str]],
+        is_new: bool,
+        force: bool,
+        changed: bool,
+        fetched_any: bool,
+        failed: bool,
+        last_error: Optional[Dict[str, Any]],
+        hedge: Optional[Dict[str, Any]] = None
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        切片并统计，返回 (结果, 需要持久化的文档或None)；有缺口拉取失败时返回的已有K线标记 _stale，
+        本次有对冲拉取时带上其对冲信息 _hedge
+        """
+        with series.lock:
+            bars = series.slice(start, end)
+            stamp = series.stamp(end, time.time())
+            document = series.to_document() if changed else None
+
+        with self._lock:
+            self._requests += 1
+            if not gaps:
+                self._hits += 1
+            elif is_new or force:
+                self._misses += 1
+            else:
+                self._partial_hits += 1
+            self._bars_served += len(bars)
+
+        if not bars:
+            if last_error is not None:
+                return dict(last_error), document
+            return self._build_result(series, bars, cached=not fetched_any, stamp=stamp), document
+
+        logger.info(
+            f"[BarStore] {key} {start} ~ {end}: 返回 {len(bars)} 条"
+            + (f"，补拉 {len(gaps)} 个缺口" if gaps else "（序列命中）")
+        )
+        result = self._build_result(series, bars, cached=not fetched_any, stamp=stamp)
+        if hedge is not None:
+            result['_hedge'] = hedge
+        if failed:
+            # 数据源失败：返回已有K线兜底（stale-if-error）
+            result['_stale'] = True
+            get_revalidator().record_stale('error')
+        return result, document
+
+    def _slice_stale(self, series: _BarSeries, start: str, end: str, gaps: List[Tuple[str, str]],
+                     now: float) -> Optional[Tuple['KlineColumns', Dict[str, Any]]]:
+        """
+        只缺盘中尾部且尾部过期不久时，返回已有K线的切片（调用方持有 lock）
+
+        Returns:
+            (切片, 版本信息)；有头部缺口、尾部过期太久、缺口只有休市日或切片为空时返回None
+        """
+        if not gaps or series.covered_start is None or start < series.covered_start:
+            return None
+        if not series.refreshed_at or now > series.tail_expires_at() + STALE_WHILE_REVALIDATE:
+            return None
+        if not any(series.trim(*gap) for gap in gaps):
+            return None
+        bars = series.slice(start, end)
+        if not bars:
+            return None
+        return bars, series.stamp(end, now)
+
+    def _serve_stale(self, key: str, series: _BarSeries, bars: 'KlineColumns',
+                     stamp: Dict[str, Any]) -> Dict[str, Any]:
+        """返回已有K线（尾部在后台补拉）"""
+        with self._lock:
+            self._requests += 1
+            self._stale_hits += 1
+            self._bars_served += len(bars)
+        get_revalidator().record_stale('revalidate')
+        logger.info(f"[BarStore] {key} 盘中尾部已过期，先返回已有 {len(bars)} 条，后台补拉")
+        result = self._build_result(series, bars, cached=True, stamp=stamp)
+        result['_stale'] = True
+        return result
+
+    def _fill_gaps(
+        self,
+        key: str,
+        series: _BarSeries,
+        gaps: List[Tuple[str, str]],
+        fetch: Callable[[str, str, Optional[str]], Dict[str, Any]],
+        span: Tuple[str, str]
+    ) -> Tuple[bool, bool, bool, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        依次拉取并合并缺口；序列因复权口径变化重建后，按请求区间 span 重新计算剩余缺口（每次最多一次）
+
+        Returns:
+            (是否拉取到K线, 序列是否变化, 是否有缺口拉取失败, 最后一次失败的上游结果, 最后一次成功拉取的对冲信息)；
+            序列中已有K线时，拉取异常按失败处理，否则向上抛出
+        """
+        fetched_any = changed = failed = False
+        last_error: Optional[Dict[str, Any]] = None
+        hedge: Optional[Dict[str, Any]] = None
+        pending, replanned = list(gaps), False
+        while pending:
+            gap_start, gap_end = pending.pop(0)
+            trimmed = series.trim(gap_start, gap_end)
+            if trimmed is None:
+                self._skip_gap(series, gap_start, gap_end)
+                changed = True
+                continue
+
+            anchor, adjust, (fetch_start, fetch_end) = self._fetch_plan(series, (gap_start, gap_end), trimmed)
+            flight_key = f"bars:{key}:{fetch_start}:{fetch_end}:{adjust}"
+            try:
+                result, _shared = get_single_flight().do(
+                    flight_key, lambda: self._count_upstream(fetch(fetch_start, fetch_end, adjust))
+                )
+            except Exception as e:
+                if series.covered_start is None:
+                    raise
+                logger.warning(f"[BarStore] {key} 缺口 {trimmed[0]} ~ {trimmed[1]} 拉取异常，使用已有K线: {e}")
+                failed = True
+                continue
+            merged, rebuilt = self._merge_fetched(key, series, (gap_start, gap_end), trimmed, result, anchor)
+            if merged:
+                fetched_any = changed = True
+                # 对冲信息（胜出数据源、节省的时间）不随 meta 存入序列，只随本次结果返回
+                hedge = result.get('_hedge') or hedge
+                if rebuilt and not replanned:
+                    # 重建后序列只剩本次结果：请求区间内其余部分按新序列重新计算缺口
+                    replanned = True
+                    with series.lock:
+                        pending = series.plan(span[0], span[1], time.time())
+            else:
+                # 返回空数据不算失败（如节假日），带错误信息或异常结果才算
+                failed = failed or not isinstance(result, dict) or bool(result.get('error'))
+                last_error = result if isinstance(result, dict) else None
+        return fetched_any, changed, failed, last_error, hedge
+
+    async def _fill_gaps_async(
+        self,
+        key: str,
+        series: _BarSeries,
+        gaps: List[Tuple[str, str]],
+        fetch: Callable[[str, str, Optional[str]], Awaitable[Dict[str, Any]]],
+        span: Tuple[str, str]
+    ) -> Tuple[bool, bool, bool, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """_fill_gaps 的协程版本"""
+        fetched_any = changed = failed = False
+        last_error: Optional[Dict[str, Any]] = None
+        hedge: Optional[Dict[str, Any]] = None
+        pending, replanned = list(gaps), False
+        while pending:
+            gap_start, gap_end = pending.pop(0)
+            trimmed = series.trim(gap_start, gap_end)
+            if trimmed is None:
+                self._skip_gap(series, gap_start, gap_end)
+                changed = True
+                continue
+
+            anchor, adjust, (fetch_start, fetch_end) = self._fetch_plan(series, (gap_start, gap_end), trimmed)
+            flight_key = f"bars:{key}:{fetch_start}:{fetch_end}:{adjust}"
+            try:
+                result, _shared = await get_single_flight().do_async(
+                    flight_key, self._fetch_counted, fetch, fetch_start, fetch_end, adjust
+                )
+            except Exception as e:
+                if series.covered_start is None:
+                    raise
+                logger.warning(f"[BarStore] {key} 缺口 {trimmed[0]} ~ {trimmed[1]} 拉取异常，使用已有K线: {e}")
+                failed = True
+                continue
+            merged, rebuilt = self._merge_fetched(key, series, (gap_start, gap_end), trimmed, result, anchor)
+            if merged:
+                fetched_any = changed = True
+                # 对冲信息（胜出数据源、节省的时间）不随 meta 存入序列，只随本次结果返回
+                hedge = result.get('_hedge') or hedge
+                if rebuilt and not replanned:
+                    # 重建后序列只剩本次结果：请求区间内其余部分按新序列重新计算缺口
+                    replanned = True
+                    with series.lock:
+                        pending = series.plan(span[0], span[1], time.time())
+            else:
+                # 返回空数据不算失败（如节假日），带错误信息或异常结果才算
+                failed = failed or not isinstance(result, dict) or bool(result.get('error'))
+                last_error = result if isinstance(result, dict) else None
+        return fetched_any, changed, failed, last_error, hedge
+
+    def _revalidate(self, key: str, series: _BarSeries, gaps: List[Tuple[str, str]],
+                    fetch: Callable[[str, str, Optional[str]], Dict[str, Any]], span: Tuple[str, str]) -> bool:
+        """后台补拉尾部并持久化，返回是否拉取到K线（span 为触发补拉的请求区间）"""
+        fetched_any, changed, _failed, _error, _hedge = self._fill_gaps(key, series, gaps, fetch, span)
+        if changed:
+            with series.lock:
+                document = series.to_document()
+            self._persist(key, document)
+        return fetched_any
+
+    async def _revalidate_async(self, key: str, series: _BarSeries, gaps: List[Tuple[str, str]],
+                                fetch: Callable[[str, str, Optional[str]], Awaitable[Dict[str, Any]]],
+                                span: Tuple[str, str]) -> bool:
+        """_revalidate 的协程版本（持久化在 kline 执行器中进行）"""
+        fetched_any, changed, _failed, _error, _hedge = await self._fill_gaps_async(key, series, gaps, fetch, span)
+        if changed:
+            with series.lock:
+                document = series.to_document()
+            try:
+                await run_blocking('kline', self._persist, key, document)
+            except ExecutorSaturatedError:
+                logger.warning(f"[BarStore] {key} 执行器繁忙，跳过本次持久化")
+        return fetched_any
+
+    def get_range(
+        self,
+        code: str,
+        start_date: Optional[str],
+        end_date: Optional[str],
+        fetch: Callable[[str, str, Optional[str]], Dict[str, Any]],
+        force: bool = False,
+        refresh_ahead: float = 0.0
+    ) -> Dict[str, Any]:
+        """
+        获取 [start_date, end_date] 的日K线：从序列切片，只拉取缺失的头部/尾部
+
+        Args:
+            code: 股票代码
+            start_date: 开始日期（None 表示默认区间）
+            end_date: 结束日期（None 表示今天）
+            fetch: 上游拉取函数 fetch(start, end, adjust)，返回 get_kline_data 格式的结果字典；
+                adjust 为序列的复权方式（优先使用该复权方式的数据源），新序列为None
+            force: 忽略已有序列，重新拉取整个区间
+            refresh_ahead: 大于0时提前补拉 refresh_ahead 秒内将要过期的盘中尾部，且不返回过期数据（缓存预热使用）
+
+        Returns:
+            get_kline_data 格式的结果字典；全部缺口拉取失败且序列中没有数据时返回上游的错误结果；
+            返回的是已有K线（尾部后台补拉中，或缺口拉取失败）时带 _stale=True
+        """
+        key = self._normalize(code)
+        start, end = resolve_date_range(start_date, end_date)
+        series = self._open_series(key, self._load_many([key]).get(key))
+        now = time.time()
+        with series.lock:
+            is_new = series.covered_start is None
+            gaps = [(start, end)] if force else series.plan(start, end, now + refresh_ahead)
+            stale = None if force or refresh_ahead else self._slice_stale(series, start, end, gaps, now)
+
+        if stale is not None:
+            get_revalidator().submit(
+                f"bars:{key}:{end}", lambda: self._revalidate(key, series, gaps, fetch, (start, end))
+            )
+            return self._serve_stale(key, series, *stale)
+
+        fetched_any, changed, failed, last_error, hedge = self._fill_gaps(key, series, gaps, fetch, (start, end))
+        result, document = self._finish(
+            key, series, start, end, gaps, is_new, force, changed, fetched_any, failed, last_error, hedge
+        )
+        if document is not None:
+            self._persist(key, document)
+        return result
+
+    async def _fetch_counted(self, fetch: Callable[[str, str, Optional[str]], Awaitable[Dict[str, Any]]],
+                             range_start: str, range_end: str, adjust: Optional[str]) -> Dict[str, Any]:
+        return self._count_upstream(await fetch(range_start, range_end, adjust))
+
+    async def get_range_async(
+        self,
+        code: str,
+        start_date: Optional[str],
+        end_date: Optional[str],
+        fetch: Callable[[str, str, Optional[str]], Awaitable[Dict[str, Any]]],
+        force: bool = False,
+        refresh_ahead: float = 0.0
+    ) -> Dict[str, Any]:
+        """
+        get_range 的协程版本：fetch 为协程函数，上游拉取期间不占用线程
+
+        内存未命中时的 MongoDB 读取和写回在 kline 执行器中进行，参数与返回值同 get_range
+        """
+        key = self._normalize(code)
+        start, end = resolve_date_range(start_date, end_date)
+        t0 = time.perf_counter()
+        with self._lock:
+            loaded = self._series.get(key)
+            if loaded is not None:
+                self._series.move_to_end(key)
+        if loaded is not None:
+            record_lookup(self._cache_key(key), 'memory_hit', time.perf_counter() - t0)
+        else:
+            loaded = (await run_blocking('kline', self._load_many, [key])).get(key)
+        series = self._open_series(key, loaded)
+        now = time.time()
+        with series.lock:
+            is_new = series.covered_start is None
+            gaps = [(start, end)] if force else series.plan(start, end, now + refresh_ahead)
+            stale = None if force or refresh_ahead else self._slice_stale(series, start, end, gaps, now)
+
+        if stale is not None:
+            get_revalidator().submit_async(
+                f"bars:{key}:{end}", lambda: self._revalidate_async(key, series, gaps, fetch, (start, end))
+            )
+            return self._serve_stale(key, series, *stale)
+
+        fetched_any, changed, failed, last_error, hedge = await self._fill_gaps_async(
+            key, series, gaps, fetch, (start, end)
+        )
+        result, document = self._finish(
+            key, series, start, end, gaps, is_new, force, changed, fetched_any, failed, last_error, hedge
+        )
+        if document is not None:
+            try:
+                await run_blocking('kline', self._persist, key, document)
+            except ExecutorSaturatedError:
+                # 序列已在内存中更新，写回失败只影响重启后的命中
+                logger.warning(f"[BarStore] {key} 执行器繁忙，跳过本次持久化")
+        return result
+
+    def refresh_reason(self, code: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                       ahead: float = 0.0) -> Optional[str]:
+        """
+        序列是否需要预热（只查内存，不发起拉取）
+
+        Args:
+            code: 股票代码
+            start_date: 开始日期（None 表示默认区间）
+            end_date: 结束日期（None 表示今天）
+            ahead: 把 ahead 秒内将要过期的盘中尾部也视为需要补拉
+
+        Returns:
+            'cold'（序列不在内存中）/ 'expiring'（区间内有含交易日的缺口）/ None（无需预热）
+        """
+        key = self._normalize(code)
+        with self._lock:
+            series = self._series.get(key)
+        if series is None:
+            return 'cold'
+        start, end = resolve_date_range(start_date, end_date)
+        with series.lock:
+            gaps = series.plan(start, end, time.time() + ahead)
+        return 'expiring' if any(series.trim(*gap) for gap in gaps) else None
+
+    def clear(self, code: Optional[str] = None) -> None:
+        """清空内存中的序列（code 为 None 时清空全部）"""
+        with self._lock:
+            if code is None:
+                self._series.clear()
+            else:
+                self._series.pop(self._normalize(code), None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取序列存储统计信息（用于监控）"""
+        with self._lock:
+            requests = self._requests
+            return {
+                'symbols': len(self._series),
+                'requests': requests,
+                'hits': self._hits,
+                'partial_hits': self._partial_hits,
+                'misses': self._misses,
+                'stale_hits': self._stale_hits,
+                'hit_rate': round(self._hits / requests, 3) if requests else 0.0,
+                'upstream_calls': self._upstream_calls,
+                'upstream_failures': self._upstream_failures,
+                'upstream_calls_per_request': round(self._upstream_calls / requests, 3) if requests else 0.0,
+                'skipped_closed_gaps': self._skipped_gaps,
+                'adjust_rebuilds': self._adjust_rebuilds,
+                'bars_fetched': self._bars_fetched,
+                'bars_served': self._bars_served,
+            }
+
+
+# 全局存储实例
+_store_instance: Optional[BarStore] = None
+_instance_lock = threading.Lock()
+
+
+def get_bar_store() -> BarStore:
+    """
+    获取全局日K线序列存储（单例模式）
+
+    Returns:
+        BarStore实例
+    """
+    global _store_instance
+    if _store_instance is None:
+        with _instance_lock:
+            if _store_instance is None:
+                _store_instance = BarStore()
+    return _store_instance
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缓存指标 - 各层缓存的命中、未命中、写入次数与耗时，按键类型（kline / market / fund_flow / shareholders）和市场细分
+
+核心原理：
+1. 查询结果分为 memory_hit（内存层：MemoryLRUCache / BarStore 内存中的序列）、
+   mongo_hit（MongoDB 层）、mongo_stale（MongoDB 中已过新鲜期、仍在保留期内的数据）、miss 四类；
+   写入结果分为 ok、failed（MongoDB 写入失败）、memory_only（MongoDB 不可用，只写了内存层）
+2. 计数器与延迟直方图记录在 service.utils.metrics 的全局注册表中，由 /metrics 接口输出
+3. 内存层占用、淘汰、BarStore 和预序列化响应的统计在输出时读取（collector），不在记录路径上维护
+4. MongoDB 文档数使用 estimated_document_count（读取集合元数据，不扫描文档），
+   在后台线程中最多每 MONGO_COUNT_INTERVAL 秒刷新一次，/metrics 接口本身不访问 MongoDB
+
+使用方法：
+    from service.cache.cache_metrics import record_lookup, record_write
+
+    record_lookup(cache_key, 'memory_hit', elapsed_seconds)
+    record_write(cache_key, 'ok', elapsed_seconds)
+"""
+
+import functools
+import logging
+import threading
+import time
+from typing import Any, Iterable, List, Optional, Tuple
+
+from service.utils.metrics import MetricFamily, get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+# MongoDB 文档数的刷新间隔（秒）
+MONGO_COUNT_INTERVAL = 60.0
+
+_registry = get_metrics_registry()
+
+LOOKUPS = _registry.counter(
+    'stock_cache_lookups_total',
+    '缓存查询次数（result: memory_hit / mongo_hit / mongo_stale / miss）',
+    ('key_type', 'market', 'result'),
+)
+LOOKUP_SECONDS = _registry.histogram(
+    'stock_cache_lookup_seconds',
+    '缓存查询耗时（秒）',
+    ('key_type', 'market', 'result'),
+)
+WRITES = _registry.counter(
+    'stock_cache_writes_total',
+    '缓存写入次数（result: ok / failed / memory_only）',
+    ('key_type', 'market', 'result'),
+)
+WRITE_SECONDS = _registry.histogram(
+    'stock_cache_write_seconds',
+    '缓存写入耗时（秒）',
+    ('key_type', 'market'),
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def _market_of_code(code: str) -> str:
+    from .decorators import _infer_market_from_code
+    return _infer_market_from_code(code)
+
+
+def classify_key(cache_key: str) -> Tuple[str, str]:
+    """
+    缓存键 → (键类型, 市场)
+
+    Args:
+        cache_key: market:{market} / kline:{code}:{start}:{end} / kline:{code}:bars /
+                   fund_flow:{code} / shareholders:{code}（主力动向数据集，只有A股）
+
+    Returns:
+        ('market', 市场) / ('kline', 由股票代码推断的市场) / ('fund_flow' | 'shareholders', 'a') / ('other', 'unknown')
+    """
+    key_type, _, rest = cache_key.partition(':')
+    if key_type == 'market':
+        return 'market', rest or 'unknown'
+    if key_type == 'kline':
+        return 'kline', _market_of_code(rest.split(':', 1)[0])
+    if key_type in ('fund_flow', 'shareholders'):
+        return key_type, 'a'
+    return 'other', 'unknown'
+
+
+def record_lookup(cache_key: str, result: str, elapsed: float) -> None:
+    """
+    记录一次缓存查询
+
+    Args:
+        cache_key: 缓存键
+        result: memory_hit / mongo_hit / mongo_stale / miss
+        elapsed: 耗时（秒）
+    """
+    key_type, market = classify_key(cache_key)
+    LOOKUPS.inc(key_type, market, result)
+    LOOKUP_SECONDS.observe(elapsed, key_type, market, result)
+
+
+def record_write(cache_key: str, result: str, elapsed: float) -> None:
+    """
+    记录一次缓存写入
+
+    Args:
+        cache_key: 缓存键
+        result: ok / failed / memory_only
+        elapsed: 耗时（秒）
+    """
+    key_type, market = classify_key(cache_key)
+    WRITES.inc(key_type, market, result)
+    WRITE_SECONDS.observe(elapsed, key_type, market)
+
+
+class _MongoCountSampler:
+    """在后台线程中定期读取 MongoDB 的估算文档数，读取时只返回上一次的结果"""
+
+    def __init__(self, interval: float = MONGO_COUNT_INTERVAL):
+        self._interval = interval
+        self._value: Optional[int] = None
+        self._refreshed_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        from .mongodb_cache import get_cache
+        try:
+            estimate = getattr(get_cache(), 'estimated_count', None)
+            self._value = estimate() if estimate is not None else None
+        finally:
+            with self._lock:
+                self._refreshed_at = time.time()
+                self._refreshing = False
+
+    def sample(self) -> Optional[int]:
+        with self._lock:
+            stale = time.time() - self._refreshed_at > self._interval
+            if stale and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, name='mongo-count-sampler', daemon=True).start()
+        return self._value
+
+
+_mongo_count = _MongoCountSampler()
+
+
+def _family(name: str, metric_type: str, documentation: str, value: Any) -> MetricFamily:
+    return name, metric_type, documentation, [({}, value)]
+
+
+def collect_cache_metrics() -> Iterable[MetricFamily]:
+    """输出时读取的缓存统计：内存层、BarStore、预序列化响应、后台刷新、缓存预热、MongoDB 文档数"""
+    from .mongodb_cache import get_memory_cache_stats
+    from .bar_store import get_bar_store
+    from .response_cache import get_response_cache_stats
+    from .revalidator import get_revalidator
+    from .cache_warmer import get_cache_warmer
+
+    families: List[MetricFamily] = []
+
+    memory = get_memory_cache_stats()
+    if memory:
+        families += [
+            _family('stock_cache_memory_entries', 'gauge', '内存缓存条目数', memory['entries']),
+            _family('stock_cache_memory_bytes', 'gauge', '内存缓存占用字节数（估算）', memory['bytes']),
+            _family('stock_cache_memory_max_bytes', 'gauge', '内存缓存容量（字节）', memory['max_bytes']),
+            _family('stock_cache_memory_evictions_total', 'counter', '内存缓存淘汰次数', memory['evictions']),
+            _family('stock_cache_memory_expired_total', 'counter', '内存缓存过期次数', memory['expired']),
+            _family('stock_cache_memory_admission_rejections_total', 'counter',
+                    '内存缓存准入拒绝次数（TinyLFU）', memory['admission_rejections']),
+            _family('stock_cache_memory_rss_shrinks_total', 'counter',
+                    '进程 RSS 超限导致的内存缓存收缩次数', memory['rss_shrinks']),
+        ]
+
+    bars = get_bar_store().get_stats()
+    families += [
+        _family('stock_bar_store_symbols', 'gauge', 'BarStore 内存中的股票数', bars['symbols']),
+        ('stock_bar_store_requests_total', 'counter', 'BarStore 区间请求数（result: hit / partial_hit / miss / stale_hit）', [
+            ({'result': 'hit'}, bars['hits']),
+            ({'result': 'partial_hit'}, bars['partial_hits']),
+            ({'result': 'miss'}, bars['misses']),
+            ({'result': 'stale_hit'}, bars['stale_hits']),
+        ]),
+        _family('stock_bar_store_upstream_calls_total', 'counter', 'BarStore 上游拉取次数', bars['upstream_calls']),
+        _family('stock_bar_store_bars_served_total', 'counter', 'BarStore 返回的K线条数', bars['bars_served']),
+    ]
+
+    responses = get_response_cache_stats()
+    families += [
+        ('stock_response_cache_served_total', 'counter', '预序列化响应返回次数', [
+            ({'encoding': encoding}, count) for encoding, count in sorted(responses['served_by_encoding'].items())
+        ]),
+        _family('stock_response_cache_not_modified_total', 'counter', '条件请求返回 304 的次数', responses['not_modified']),
+        _family('stock_response_cache_encoded_total', 'counter', '响应预序列化次数', responses['encoded']),
+    ]
+
+    revalidation = get_revalidator().get_stats()
+    families += [
+        ('stock_cache_stale_served_total', 'counter', '返回过期数据的次数（reason: revalidate / error）', [
+            ({'reason': reason}, count) for reason, count in sorted(revalidation['stale_served'].items())
+        ]),
+        ('stock_cache_revalidations_total', 'counter', '后台刷新次数（result: succeeded / failed / deduplicated / dropped）', [
+            ({'result': result}, revalidation[result]) for result in ('succeeded', 'failed', 'deduplicated', 'dropped')
+        ]),
+        _family('stock_cache_revalidations_in_progress', 'gauge', '进行中的后台刷新数', revalidation['in_progress']),
+    ]
+
+    warmer = get_cache_warmer().get_stats()
+    families += [
+        ('stock_cache_warmer_refreshes_total', 'counter', '缓存预热刷新次数（result: ok / failed）', [
+            ({'result': 'ok'}, warmer['refreshed']),
+            ({'result': 'failed'}, warmer['failed']),
+        ]),
+        ('stock_cache_warmer_skipped_total', 'counter',
+         '缓存预热跳过次数（reason: busy 前台负载 / rate_limited 令牌不足 / circuit_open 数据源熔断）', [
+            ({'reason': 'busy'}, warmer['paused']),
+            ({'reason': 'rate_limited'}, warmer['rate_limited']),
+            ({'reason': 'circuit_open'}, warmer['skipped_circuit_open']),
+        ]),
+        _family('stock_cache_warmer_tracked_symbols', 'gauge', '缓存预热统计热度的股票数', warmer['tracked_symbols']),
+    ]
+
+    families.append(_family(
+        'stock_cache_mongo_documents_estimated', 'gauge',
+        'MongoDB 缓存集合的估算文档数（集合元数据，定期刷新）', _mongo_count.sample()
+    ))
+    return families
+
+
+_registry.register_collector(collect_cache_metrics)
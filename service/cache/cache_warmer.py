@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缓存预热 - 按访问热度在后台提前刷新热门股票的K线序列和三个市场的股票列表
+
+核心原理：
+1. cache_kline_data 每次被调用时记录一次股票代码（record_kline），热度统计使用带时间衰减的
+   heavy-hitter 表（HotSymbols）：得分按 CACHE_WARMER_HALF_LIFE 秒的半衰期衰减，
+   超出容量时只保留得分最高的条目，内存占用有上限
+2. 后台线程每 CACHE_WARMER_INTERVAL 秒执行一轮：
+   - a / hk / us 市场列表：缓存缺失、已过期或 CACHE_WARMER_MARKET_LEAD_SECONDS 秒内将要过期时强制刷新
+   - 得分最高的 CACHE_WARMER_TOP_N 只股票：K线序列不在内存中、或盘中尾部在 CACHE_WARMER_LEAD_SECONDS
+     秒内将要过期时，按默认区间调用 get_kline_data（只补拉缺口，见 BarStore.get_range 的 refresh_ahead）
+3. 不与前台请求抢资源：最近 FOREGROUND_WINDOW 秒内前台K线请求超过 CACHE_WARMER_PAUSE_REQUESTS 次，
+   或 kline / market 执行器有排队 / 已满时，本轮暂停（每刷新一项之前都会重新检查）
+4. 遵守数据源限流：预热的上游调用经过令牌桶（每分钟 CACHE_WARMER_RATE_PER_MINUTE 次），
+   令牌不足时本轮结束；股票所在市场的K线数据源全部熔断时跳过该股票；预热失败不重试，留给下一轮
+5. 热门股票列表定期写入 MongoDB（缓存键 warmer:hot_symbols），重启后据此恢复热度，
+   避免重启后热门股票全部冷启动
+6. 每次刷新的对象、原因、时间、耗时和结果记录在 get_stats() 的 history 中（最近 HISTORY_SIZE 条）
+
+使用方法：
+    from service.cache.cache_warmer import get_cache_warmer
+
+    warmer = get_cache_warmer()
+    warmer.start()           # 应用启动时（CACHE_WARMER_ENABLED=false 时不启动）
+    warmer.record_kline(code)
+    warmer.get_stats()
+    warmer.stop()            # 应用退出时
+"""
+
+import contextlib
+import contextvars
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .mongodb_cache import get_cache
+from .bar_store import get_bar_store
+from service.utils.executors import get_executor_stats
+from service.utils.provider_health import get_provider_registry, STATE_OPEN
+
+logger = logging.getLogger(__name__)
+
+WARMER_ENABLED = os.getenv('CACHE_WARMER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+WARMER_INTERVAL = float(os.getenv('CACHE_WARMER_INTERVAL', '60'))
+WARMER_TOP_N = int(os.getenv('CACHE_WARMER_TOP_N', '50'))
+# 得分低于该值的股票不预热（只访问过一两次的代码）
+WARMER_MIN_SCORE = float(os.getenv('CACHE_WARMER_MIN_SCORE', '2'))
+WARMER_HALF_LIFE = float(os.getenv('CACHE_WARMER_HALF_LIFE', '3600'))
+WARMER_CAPACITY = int(os.getenv('CACHE_WARMER_CAPACITY', '2000'))
+WARMER_LEAD_SECONDS = float(os.getenv('CACHE_WARMER_LEAD_SECONDS', '120'))
+MARKET_LEAD_SECONDS = float(os.getenv('CACHE_WARMER_MARKET_LEAD_SECONDS', '21600'))
+WARMER_RATE_PER_MINUTE = float(os.getenv('CACHE_WARMER_RATE_PER_MINUTE', '30'))
+WARMER_BURST = int(os.getenv('CACHE_WARMER_BURST', '5'))
+WARMER_PAUSE_REQUESTS = int(os.getenv('CACHE_WARMER_PAUSE_REQUESTS', '20'))
+
+FOREGROUND_WINDOW = 10.0
+PERSIST_INTERVAL = 300.0
+HISTORY_SIZE = 50
+MARKETS = ('a', 'hk', 'us')
+HOT_SYMBOLS_KEY = 'warmer:hot_symbols'
+
+# 预热线程中调用 get_kline_data 时设置：提前补拉的秒数（None 表示前台请求）
+_warming: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar('cache_warming', default=None)
+
+
+def warming_ahead() -> Optional[float]:
+    """当前调用是否由缓存预热发起：返回提前补拉的秒数，前台请求返回None"""
+    return _warming.get()
+
+
+@contextlib.contextmanager
+def background_fetch():
+    """后台批量任务（如全市场主力排行）中调用 get_kline_data 时使用：不计入访问热度，也不提前补拉"""
+    token = _warming.set(0.0)
+    try:
+        yield
+    finally:
+        _warming.reset(token)
+
+
+class HotSymbols:
+    """
+    带时间衰减的热点统计
+
+    使用前向衰减：第 t 秒的一次访问记为 2^((t - epoch) / half_life)，读取时统一除以当前时刻的权重，
+    等价于每个得分按半衰期衰减，但记录时不需要遍历已有条目；权重过大时整体换算到新的 epoch。
+    条目数超过两倍容量时只保留得分最高的 capacity 个
+    """
+
+    def __init__(self, capacity: int = WARMER_CAPACITY, half_life: float = WARMER_HALF_LIFE):
+        self.capacity = capacity
+        self.half_life = half_life
+        self._scores: Dict[str, float] = {}
+        self._epoch = time.time()
+        self._lock = threading.Lock()
+
+    def _weight(self, now: float) -> float:
+        return 2.0 ** ((now - self._epoch) / self.half_life)
+
+    def add(self, key: str, count: float = 1.0, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            weight = self._weight(now)
+            if weight > 2.0 ** 40:
+                # 换算到新的 epoch，避免浮点溢出
+                self._scores = {k: v / weight for k, v in self._scores.items()}
+                self._epoch = now
+                weight = 1.0
+            self._scores[key] = self._scores.get(key, 0.0) + count * weight
+            if len(self._scores) > self.capacity * 2:
+                self._scores = dict(heapq.nlargest(self.capacity, self._scores.items(), key=lambda kv: kv[1]))
+
+    def top(self, n: int, now: Optional[float] = None) -> List[Tuple[str, float]]:
+        """得分最高的 n 个条目：[(键, 衰减到当前时刻的得分), ...]"""
+        now = time.time() if now is None else now
+        with self._lock:
+            weight = self._weight(now)
+            top = heapq.nlargest(n, self._scores.items(), key=lambda kv: kv[1])
+        return [(key, score / weight) for key, score in top]
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+
+class CacheWarmer:
+    """后台缓存预热"""
+
+    def __init__(self, interval: float = WARMER_INTERVAL, top_n: int = WARMER_TOP_N,
+                 rate_per_minute: float = WARMER_RATE_PER_MINUTE, burst: int = WARMER_BURST):
+        self.interval = interval
+        self.top_n = top_n
+        self.hot = HotSymbols()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 最近的前台请求时间（只需要判断窗口内是否超过阈值）
+        self._foreground: Deque[float] = deque(maxlen=WARMER_PAUSE_REQUESTS + 1)
+
+        # 令牌桶
+        self._rate = rate_per_minute / 60.0
+        self._burst = max(1, burst)
+        self._tokens = float(self._burst)
+        self._refilled_at = time.time()
+
+        self._restored = False
+        self._persisted_at = 0.0
+
+        # 统计信息
+        self._cycles = 0
+        self._paused = 0
+        self._rate_limited = 0
+        self._skipped_open = 0
+        self._refreshed = 0
+        self._failed = 0
+        self._last_cycle_at: Optional[str] = None
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=HISTORY_SIZE)
+
+    def record_kline(self, code: str) -> None:
+        """记录一次前台K线请求"""
+        now = time.time()
+        self.hot.add(code.strip().lower(), now=now)
+        self._foreground.append(now)
+
+    def foreground_busy(self) -> bool:
+        """前台负载较高时暂停预热（全市场主力排行的K线获取同样据此暂停）"""
+        if len(self._foreground) == self._foreground.maxlen and time.time() - self._foreground[0] < FOREGROUND_WINDOW:
+            return True
+        executors = get_executor_stats()
+        for name in ('kline', 'market'):
+            stats = executors.get(name)
+            if stats and (stats['queued'] > 0 or stats['running'] >= stats['max_workers']):
+                return True
+        return False
+
+    def _acquire(self) -> bool:
+        """从令牌桶取一个上游调用名额"""
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self._burst, self._tokens + (now - self._refilled_at) * self._rate)
+            self._refilled_at = now
+            if self._tokens < 1:
+                self._rate_limited += 1
+                return False
+            self._tokens -= 1
+            return True
+
+    def _record(self, target: str, reason: str, ok: bool, elapsed: float, detail: str = '') -> None:
+        with self._lock:
+            if ok:
+                self._refreshed += 1
+            else:
+                self._failed += 1
+            self._history.append({
+                'target': target,
+                'reason': reason,
+                'ok': ok,
+                'at': datetime.now().isoformat(timespec='seconds'),
+                'elapsed_ms': int(elapsed * 1000),
+                'detail': detail,
+            })
+
+    def _market_refresh_reason(self, market: str) -> Optional[str]:
+        """市场列表需要刷新的原因（cold / stale / expiring），不需要刷新时返回None"""
+        from .decorators import market_cache_expires_at
+
+        cache = get_cache()
+        get_entry = getattr(cache, 'get_entry', None)
+        entry = get_entry(market) if get_entry is not None else None
+        if not entry or not entry[0]:
+            return 'cold'
+        data, stale_seconds = entry
+        if stale_seconds > 0:
+            return 'stale'
+        expires_at = market_cache_expires_at(market, data.get('_cache_timestamp'))
+        if expires_at is None:
+            return None
+        return 'expiring' if expires_at - time.time() < MARKET_LEAD_SECONDS else None
+
+    def _warm_market(self, market: str, reason: str) -> bool:
+        try:
+            from service.stocks.stocks import get_stock_by_market
+        except ImportError as e:
+            logger.warning(f"[Warmer] ⚠️ 无法加载市场列表模块，跳过 {market}: {e}")
+            return False
+
+        t0 = time.time()
+        try:
+            result = get_stock_by_market(market, force=True)
+            ok = bool(result and result.get('stocks'))
+            detail = f"{result.get('count', 0)} 只股票" if ok else '数据源返回空结果'
+        except Exception as e:
+            ok, detail = False, f"{type(e).__name__}: {e}"
+        self._record(f"market:{market}", reason, ok, time.time() - t0, detail)
+        logger.info(f"[Warmer] {'🔥' if ok else '⚠️'} 市场列表 {market} 预热{'完成' if ok else '失败'}（{reason}）: {detail}")
+        return ok
+
+    @staticmethod
+    def _kline_sources_open(code: str) -> bool:
+        """股票所在市场的K线数据源是否全部熔断"""
+        try:
+            from service.kline.kline import DATA_SOURCES_CONFIG, get_market_type
+        except ImportError:
+            return False
+        sources = DATA_SOURCES_CONFIG.get(get_market_type(code.split('.')[0]), {}).get('sources') or []
+        registry = get_provider_registry()
+        return bool(sources) and all(registry.get(f"kline:{source}").state == STATE_OPEN for source in sources)
+
+    def _warm_kline(self, code: str, reason: str) -> bool:
+        try:
+            from service.kline.kline import get_kline_data
+        except ImportError as e:
+            logger.warning(f"[Warmer] ⚠️ 无法加载K线模块，跳过 {code}: {e}")
+            return False
+
+        t0 = time.time()
+        token = _warming.set(WARMER_LEAD_SECONDS)
+        try:
+            result = get_kline_data(code)
+            bars = len(result.get('data') or []) if isinstance(result, dict) else 0
+            ok = bars > 0 and not result.get('_stale')
+            detail = f"{bars} 条" if ok else (result.get('error') if isinstance(result, dict) else None) or '无有效数据'
+        except Exception as e:
+            ok, detail = False, f"{type(e).__name__}: {e}"
+        finally:
+            _warming.reset(token)
+        self._record(f"kline:{code}", reason, ok, time.time() - t0, detail)
+        logger.info(f"[Warmer] {'🔥' if ok else '⚠️'} {code.upper()} K线预热{'完成' if ok else '失败'}（{reason}）: {detail}")
+        return ok
+
+    def _restore(self) -> None:
+        """从 MongoDB 恢复上一次保存的热门股票"""
+        self._restored = True
+        get_documents = getattr(get_cache(), 'get_documents', None)
+        if get_documents is None:
+            return
+        doc = get_documents([HOT_SYMBOLS_KEY]).get(HOT_SYMBOLS_KEY) or {}
+        symbols = doc.get('symbols') or []
+        for code, score in symbols:
+            self.hot.add(code, count=score)
+        if symbols:
+            logger.info(f"[Warmer] 从 MongoDB 恢复 {len(symbols)} 只热门股票")
+
+    def _persist(self, hot: List[Tuple[str, float]]) -> None:
+        set_document = getattr(get_cache(), 'set_document', None)
+        if set_document is None or not hot:
+            return
+        set_document(HOT_SYMBOLS_KEY, {'symbols': [[code, round(score, 3)] for code, score in hot]}, ttl_days=7)
+        self._persisted_at = time.time()
+
+    def run_once(self) -> int:
+        """
+        执行一轮预热
+
+        Returns:
+            本轮成功刷新的项数
+        """
+        if not self._restored:
+            self._restore()
+        with self._lock:
+            self._cycles += 1
+            self._last_cycle_at = datetime.now().isoformat(timespec='seconds')
+
+        refreshed = 0
+        bar_store = get_bar_store()
+        hot = [(code, score) for code, score in self.hot.top(self.top_n) if score >= WARMER_MIN_SCORE]
+        targets: List[Tuple[str, str]] = [('market', market) for market in MARKETS]
+        targets += [('kline', code) for code, _score in hot]
+
+        for kind, name in targets:
+            if self._stop_event.is_set():
+                break
+            if self.foreground_busy():
+                with self._lock:
+                    self._paused += 1
+                logger.debug("[Warmer] 前台负载较高，本轮暂停")
+                break
+
+            if kind == 'market':
+                reason = self._market_refresh_reason(name)
+            else:
+                reason = bar_store.refresh_reason(name, ahead=WARMER_LEAD_SECONDS)
+                if reason and self._kline_sources_open(name):
+                    with self._lock:
+                        self._skipped_open += 1
+                    continue
+            if reason is None:
+                continue
+            if not self._acquire():
+                logger.debug("[Warmer] 令牌不足，本轮结束")
+                break
+            if (self._warm_market if kind == 'market' else self._warm_kline)(name, reason):
+                refreshed += 1
+
+        if hot and time.time() - self._persisted_at > PERSIST_INTERVAL:
+            self._persist(hot)
+        return refreshed
+
+    def _loop(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.warning(f"[Warmer] ⚠️ 预热异常: {type(e).__name__}: {e}")
+
+    def start(self) -> bool:
+        """启动后台预热线程（CACHE_WARMER_ENABLED=false 时不启动）"""
+        if not WARMER_ENABLED or self._thread is not None:
+            return False
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._loop, name="cache-warmer", daemon=True)
+            self._thread.start()
+        logger.info(f"[Warmer] 缓存预热已启动：每 {self.interval:.0f}s 一轮，热门股票前 {self.top_n} 只")
+        return True
+
+    def stop(self) -> None:
+        """停止后台预热线程"""
+        self._stop_event.set()
+        self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取预热统计：最近刷新的对象与时间、当前热门股票（用于监控）"""
+        hot = self.hot.top(10)
+        with self._lock:
+            return {
+                'enabled': WARMER_ENABLED,
+                'running': self._thread is not None,
+                'cycles': self._cycles,
+                'last_cycle_at': self._last_cycle_at,
+                'refreshed': self._refreshed,
+                'failed': self._failed,
+                'paused': self._paused,
+                'rate_limited': self._rate_limited,
+                'skipped_circuit_open': self._skipped_open,
+                'tracked_symbols': len(self.hot),
+                'hot_symbols': [{'code': code, 'score': round(score, 2)} for code, score in hot],
+                'history': list(reversed(self._history)),
+            }
+
+
+# 全局实例
+_warmer_instance: Optional[CacheWarmer] = None
+_instance_lock = threading.Lock()
+
+
+def get_cache_warmer() -> CacheWarmer:
+    """
+    获取全局缓存预热实例（单例模式）
+
+    Returns:
+        CacheWarmer实例
+    """
+    global _warmer_instance
+    if _warmer_instance is None:
+        with _instance_lock:
+            if _warmer_instance is None:
+                _warmer_instance = CacheWarmer()
+    return _warmer_instance
@@ -7,16 +7,38 @@
 
 import functools
 import logging
+import os
 import time
 import re
-from typing import Dict, Any, Callable, Optional
-from datetime import datetime
+from typing import Dict, Any, Callable, List, Optional
+from datetime import datetime, timezone
 
 from .mongodb_cache import get_cache
+from .bar_store import get_bar_store
+from .revalidator import get_revalidator
+from .cache_warmer import get_cache_warmer, warming_ahead
+from service.utils.single_flight import get_single_flight
+from service.utils.trading_calendar import get_trading_calendar
 
 # 设置日志
 logger = logging.getLogger(__name__)
 
+# 市场股票列表的缓存有效期（交易日数，按市场的交易日历计算；未知市场按自然日）
+MARKET_CACHE_TTL_DAYS = 5
+# 过期不超过该时长（秒）的列表直接返回并在后台刷新（stale-while-revalidate）
+MARKET_STALE_WHILE_REVALIDATE_SECONDS = float(os.getenv('MARKET_STALE_WHILE_REVALIDATE_SECONDS', '86400'))
+# 过期不超过该时长（秒）的列表在数据源全部失败时作为兜底返回（stale-if-error），受 MongoDB 保留期限制
+MARKET_STALE_IF_ERROR_SECONDS = float(os.getenv('MARKET_STALE_IF_ERROR_SECONDS', str(7 * 86400)))
+
+
+def _preferred_sources(code: str, adjust: Optional[str]) -> Optional[List[str]]:
+    """复权方式为 adjust 的数据源排在前面的数据源列表（见 kline.preferred_sources），adjust 为None时返回None"""
+    if adjust is None:
+        return None
+    # 延迟导入：kline 模块导入时会加载本模块
+    from service.kline.kline import preferred_sources
+    return preferred_sources(code, adjust)
+
 
 def _infer_market_from_code(code: str) -> str:
     """从股票代码推断市场类型
@@ -55,6 +77,54 @@ def _infer_market_from_code(code: str) -> str:
     return "unknown"
 
 
+def _market_expires_at(market: str, written_at: float) -> float:
+    """市场列表的过期时间：写入后第 MARKET_CACHE_TTL_DAYS 个交易日收盘确定时（周末、节假日不计入有效期）"""
+    calendar = get_trading_calendar(market)
+    if calendar is None:
+        return written_at + MARKET_CACHE_TTL_DAYS * 86400
+    return calendar.close_after(written_at, MARKET_CACHE_TTL_DAYS)
+
+
+def market_cache_expires_at(market: str, cache_timestamp: Optional[str]) -> Optional[float]:
+    """
+    由市场列表的写入时间计算过期时间戳
+
+    Args:
+        market: 市场代码（a / hk / us）
+        cache_timestamp: 写入时间（UTC ISO 格式，即 _cache_timestamp）
+
+    Returns:
+        过期时间戳；写入时间缺失或格式不符时返回None
+    """
+    if not cache_timestamp:
+        return None
+    try:
+        written_at = datetime.fromisoformat(cache_timestamp).replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
+    return _market_expires_at(market, written_at)
+
+
+def _index_market_list(market: str, data: Dict[str, Any]) -> None:
+    """把市场列表同步到股票搜索索引（列表写入时间未变时只做一次比较）"""
+    try:
+        from service.stocks.symbol_index import get_symbol_index
+        get_symbol_index().update(market, data)
+    except Exception as e:
+        logger.warning(f"[{market.upper()}] ⚠️ 更新股票搜索索引失败: {type(e).__name__}: {e}")
+
+
+def _resolve_cache_key(cache, code: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> str:
+    """解析缓存键（用作单飞合并键），模拟缓存没有 _generate_cache_key 时按相同规则拼接"""
+    generate = getattr(cache, '_generate_cache_key', None)
+    if generate is not None:
+        return generate(code, start_date, end_date)
+    if start_date or end_date:
+        return f"kline:{code.lower()}:{start_date or ''}:{end_date or ''}"
+    if code.lower() in ("a", "hk", "us"):
+        return f"market:{code.lower()}"
+    return f"kline:{code.lower()}:default:default"
+
 
 def cache_market_stocks(market_code_param: str = "market"):
     """
@@ -64,6 +134,9 @@ def cache_market_stocks(market_code_param: str = "market"):
         market_code_param: 函数参数中市场代码的参数名，默认为'market'
         force: 从 kwargs 中读取，force=True 时跳过缓存查询
 
+    过期不超过 MARKET_STALE_WHILE_REVALIDATE_SECONDS 的列表直接返回（_stale=True）并在后台刷新；
+    过期更久但不超过 MARKET_STALE_IF_ERROR_SECONDS 的列表先同步拉取，数据源失败时返回旧数据
+
     Returns:
         装饰器函数
     """
@@ -102,38 +175,89 @@ def cache_market_stocks(market_code_param: str = "market"):
 
             # 初始化缓存
             cache = get_cache()
+            log_prefix = f"[{market_code.upper()}]"
 
             # force=True 时跳过缓存查询
+            stale_data = None
             if not force:
-                cached_data = cache.get(market_code)
-                if cached_data:
-                    cached_data["_cached"] = True
-                    cached_data["_cache_timestamp"] = datetime.utcnow().isoformat()
-                    logger.info(f"[{market_code.upper()}] 缓存命中，共 {cached_data.get('count', 0)} 只股票")
-                    return cached_data
+                # 模拟缓存没有 get_entry 时只查询新鲜数据
+                get_entry = getattr(cache, 'get_entry', None)
+                if get_entry is not None:
+                    entry = get_entry(market_code)
+                else:
+                    cached = cache.get(market_code)
+                    entry = (cached, 0.0) if cached else None
+                if entry and entry[0]:
+                    cached_data, stale_seconds = entry
+                    if stale_seconds <= 0:
+                        cached_data["_cached"] = True
+                        # _cache_timestamp 保持写入时间（列表内容的版本，接口据此生成 ETag）
+                        cached_data.setdefault("_cache_timestamp", datetime.utcnow().isoformat())
+                        logger.info(f"{log_prefix} 缓存命中，共 {cached_data.get('count', 0)} 只股票")
+                        _index_market_list(market_code, cached_data)
+                        return cached_data
+                    if stale_seconds <= MARKET_STALE_IF_ERROR_SECONDS:
+                        # 旧数据的副本：MongoDB 中的文档不带 _stale 标记
+                        stale_data = dict(cached_data, _cached=True, _stale=True)
+                        stale_data.setdefault("_cache_timestamp", datetime.utcnow().isoformat())
+                        _index_market_list(market_code, stale_data)
 
             # 缓存未命中或 force=True，调用原函数
-            log_prefix = f"[{market_code.upper()}]"
             if force:
                 logger.info(f"{log_prefix} force=true，跳过缓存，直接获取数据...")
-            else:
+            elif stale_data is None:
                 logger.info(f"{log_prefix} 缓存未命中，正在获取数据...")
 
-            result = func(*args, **kwargs)
+            def fetch_and_store():
+                result = func(*args, **kwargs)
 
-            if result:
-                result["_cached"] = False
-                result["_cache_timestamp"] = datetime.utcnow().isoformat()
+                if result:
+                    result["_cached"] = False
+                    result["_cache_timestamp"] = datetime.utcnow().isoformat()
 
-                # 写入缓存
-                cache_success = cache.set(market_code, data=result, ttl_days=5)
+                    # 写入缓存：有效期到第 MARKET_CACHE_TTL_DAYS 个交易日收盘为止
+                    now = time.time()
+                    ttl_days = (_market_expires_at(market_code, now) - now) / 86400
+                    cache_success = cache.set(market_code, data=result, ttl_days=ttl_days)
 
-                if cache_success:
-                    logger.info(f"{log_prefix} 成功写入缓存，共 {result.get('count', 0)} 只股票")
+                    if cache_success:
+                        logger.info(f"{log_prefix} 成功写入缓存，共 {result.get('count', 0)} 只股票")
+                    else:
+                        logger.warning(f"{log_prefix} 缓存写入失败")
+                    _index_market_list(market_code, result)
                 else:
-                    logger.warning(f"{log_prefix} 缓存写入失败")
+                    logger.warning(f"{log_prefix} 原函数返回空结果，跳过缓存")
+
+                return result
+
+            # 同一市场的并发未命中只拉取一次上游
+            flight_key = _resolve_cache_key(cache, market_code)
+
+            if stale_data is not None and stale_seconds <= MARKET_STALE_WHILE_REVALIDATE_SECONDS:
+                # 过期不久：直接返回旧数据，后台刷新
+                get_revalidator().submit(flight_key, lambda: get_single_flight().do(flight_key, fetch_and_store)[0])
+                get_revalidator().record_stale('revalidate')
+                logger.info(
+                    f"{log_prefix} 缓存已过期 {stale_seconds / 3600:.1f} 小时，先返回旧数据"
+                    f"（共 {stale_data.get('count', 0)} 只股票），后台刷新中"
+                )
+                return stale_data
+
+            if stale_data is not None:
+                logger.info(f"{log_prefix} 缓存已过期 {stale_seconds / 3600:.1f} 小时，正在重新获取数据...")
+                try:
+                    result, shared = get_single_flight().do(flight_key, fetch_and_store)
+                except Exception as e:
+                    logger.warning(f"{log_prefix} ⚠️ 数据源获取异常，返回过期数据: {type(e).__name__}: {e}")
+                    result, shared = None, False
+                if not result:
+                    # 数据源全部失败：返回过期数据兜底（stale-if-error）
+                    get_revalidator().record_stale('error')
+                    return stale_data
             else:
-                logger.warning(f"{log_prefix} 原函数返回空结果，跳过缓存")
+                result, shared = get_single_flight().do(flight_key, fetch_and_store)
+            if shared and isinstance(result, dict):
+                result = dict(result)
 
             return result
 
@@ -215,196 +339,165 @@ def get_market_stocks(market_code: str) -> Dict[str, Any]:
     return {"market": market_code, "stocks": []}
 
 
+def _filter_invalid_points(items: list) -> tuple:
+    """过滤掉含 NaN/Inf 的K线条目，返回 (有效条目, 过滤掉的条数)"""
+    clean_data = []
+    nan_count = 0
+    for item in items:
+        has_nan = False
+        if isinstance(item, dict):
+            for k, v in item.items():
+                if isinstance(v, float):
+                    # v != v 是判断 NaN 的经典写法
+                    if v != v or v in (float('inf'), float('-inf')):
+                        has_nan = True
+                        break
+        if has_nan:
+            nan_count += 1
+        else:
+            clean_data.append(item)
+    return clean_data, nan_count
+
+
+def _log_range_result(log_prefix: str, result: Any, elapsed: float, range_start: str, range_end: str) -> Any:
+    """过滤一个缺失区间的拉取结果中的 NaN/Inf 数据并记录日志"""
+    if isinstance(result, dict) and isinstance(result.get('data'), list) and result['data']:
+        data_points = len(result['data'])
+        result['data'], nan_count = _filter_invalid_points(result['data'])
+        if nan_count > 0:
+            logger.warning(
+                f"{log_prefix} ⚠️  发现 {nan_count} 条含 NaN/Inf 的数据已被过滤 "
+                f"(从 {data_points} 条 → {len(result['data'])} 条)"
+            )
+        logger.info(
+            f"{log_prefix} 源数据获取完成 ({elapsed:.1f}s), "
+            f"区间 {range_start} ~ {range_end} 共 {len(result['data'])} 条, 合并入K线序列"
+        )
+    else:
+        # 无有效数据：不扩展序列覆盖区间（可能是数据源全部失败，或返回空数据）
+        error_detail = result.get('error', '') if isinstance(result, dict) else ''
+        if error_detail:
+            logger.warning(f"{log_prefix} ⚠️ 无有效数据 ({elapsed:.1f}s) - 错误信息: {error_detail}")
+        else:
+            logger.warning(f"{log_prefix} ⚠️ 无有效数据 ({elapsed:.1f}s) - 所有数据源返回空或失败")
+    return result
+
+
 def cache_kline_data():
     """
     缓存K线数据的装饰器
 
-    这个装饰器会缓存K线数据，缓存键由股票代码、开始日期和结束日期组成
+    K线数据按股票保存为一份日K线序列（见 bar_store.BarStore）：
+    区间请求从序列切片返回，只有缺失的头部/尾部区间才调用原函数从数据源获取。
+    盘中尾部过期不久时先返回已有K线（_stale=True），尾部在后台补拉。
+    被装饰的是协程函数时，返回的包装函数也是协程函数（走 BarStore.get_range_async）
     """
     def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            # 获取函数参数信息
-            import inspect
-            sig = inspect.signature(func)
-            params = list(sig.parameters.keys())
+        import inspect
+        sig = inspect.signature(func)
+        is_async = inspect.iscoroutinefunction(func)
 
+        def prepare(args, kwargs):
+            """解析参数，返回 (bound, code, start_date, end_date, force, refresh_ahead, log_prefix)；无法解析时返回None"""
             # 从参数中提取股票代码、开始日期、结束日期
-            # force: True 表示强制跳过缓存，直接从数据源获取
-            code = None
-            start_date = None
-            end_date = None
-            force = False
-
-            # 首先检查关键字参数
-            if 'code' in kwargs:
-                code = kwargs['code']
-            if 'start_date' in kwargs:
-                start_date = kwargs['start_date']
-            if 'end_date' in kwargs:
-                end_date = kwargs['end_date']
-            if 'force' in kwargs:
-                force = bool(kwargs['force'])
-
-            # 如果没有在关键字参数中找到，检查位置参数
-            if not code and 'code' in params:
-                param_index = params.index('code')
-                if param_index < len(args):
-                    code = args[param_index]
-
-            if not start_date and 'start_date' in params:
-                param_index = params.index('start_date')
-                if param_index < len(args):
-                    start_date = args[param_index]
-
-            if not end_date and 'end_date' in params:
-                param_index = params.index('end_date')
-                if param_index < len(args):
-                    end_date = args[param_index]
-
-            if not force and 'force' in params:
-                param_index = params.index('force')
-                if param_index < len(args):
-                    force = bool(args[param_index])
+            # force: True 表示忽略已有序列，整个区间重新从数据源获取
+            try:
+                bound = sig.bind(*args, **kwargs)
+            except TypeError:
+                return None
+            code = bound.arguments.get('code')
+            start_date = bound.arguments.get('start_date')
+            end_date = bound.arguments.get('end_date')
+            force = bool(bound.arguments.pop('force', False))
 
             if not code:
                 # 如果没有股票代码，直接调用原函数
                 logger.warning("无法获取股票代码，跳过缓存")
-                return func(*args, **kwargs)
+                return None
+
+            # 缓存预热发起的调用提前补拉将要过期的尾部，且不计入访问热度
+            refresh_ahead = warming_ahead()
+            if refresh_ahead is None:
+                get_cache_warmer().record_kline(code)
 
             # 从代码推断市场类型（用于日志展示）
             market_type = _infer_market_from_code(code)
             log_prefix = f"[{func.__name__}] [market={market_type}] {code.upper()}"
 
-            # 初始化 cache 实例（force=True 和正常路径都可能需要写缓存）
-            cache = get_cache()
-
-            # 如果 force=True，直接跳过缓存查询
             if force:
-                logger.info(f"{log_prefix} 🔄 强制刷新模式，跳过缓存，直接从数据源获取...")
-                t_start = time.time()
-                try:
-                    # 将 force 从 kwargs 中移除，避免传给底层函数（可能不支持此参数）
-                    func_kwargs = {k: v for k, v in kwargs.items() if k != 'force'}
-                    result = func(*args, **func_kwargs)
-                except Exception as e:
-                    elapsed = time.time() - t_start
-                    logger.error(f"{log_prefix} ❌ 原函数调用异常 ({elapsed:.1f}s): {e}")
-                    raise
-                elapsed = time.time() - t_start
+                logger.info(f"{log_prefix} 🔄 强制刷新模式，忽略已有K线序列，直接从数据源获取...")
             else:
-                # 正常流程：先尝试从缓存获取
-                logger.info(f"{log_prefix} 尝试从缓存获取K线数据 (日期: {start_date or 'auto'} ~ {end_date or 'auto'})")
+                logger.info(f"{log_prefix} 从K线序列获取数据 (日期: {start_date or 'auto'} ~ {end_date or 'auto'})")
+            return bound, code, start_date, end_date, force, refresh_ahead or 0.0, log_prefix
+
+        def log_hit(log_prefix: str, result: Dict[str, Any], t0: float) -> None:
+            elapsed_ms = int((time.time() - t0) * 1000)
+            if result.get('_stale'):
+                logger.info(f"{log_prefix} ⏳ 返回已有K线 ({elapsed_ms}ms), 共 {len(result.get('data') or [])} 条，尾部未更新")
+            elif result.get('_cached'):
+                logger.info(f"{log_prefix} ✅ K线序列命中 ({elapsed_ms}ms), 共 {len(result.get('data') or [])} 条")
+
+        if is_async:
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                prepared = prepare(args, kwargs)
+                if prepared is None:
+                    return await func(*args, **kwargs)
+                bound, code, start_date, end_date, force, refresh_ahead, log_prefix = prepared
+                # 调用方未指定数据源时，缺口优先从与序列复权方式相同的数据源拉取
+                prefer_sources = 'data_sources' in sig.parameters and bound.arguments.get('data_sources') is None
+
+                async def fetch_range(range_start: str, range_end: str, adjust: Optional[str] = None):
+                    """调用原函数获取一个缺失区间（未指定数据源时优先使用复权方式为 adjust 的数据源）"""
+                    arguments = dict(bound.arguments, start_date=range_start, end_date=range_end)
+                    if prefer_sources:
+                        arguments['data_sources'] = _preferred_sources(code, adjust)
+                    t_start = time.time()
+                    try:
+                        result = await func(**arguments)
+                    except Exception as e:
+                        logger.error(f"{log_prefix} ❌ 原函数调用异常 ({time.time() - t_start:.1f}s): {e}")
+                        raise
+                    return _log_range_result(log_prefix, result, time.time() - t_start, range_start, range_end)
 
                 t0 = time.time()
-                cached_data = cache.get(code, start_date, end_date)
-                cache_lookup_ms = int((time.time() - t0) * 1000)
-
-                if cached_data:
-                    # 添加缓存标记
-                    cached_data["_cached"] = True
-                    cached_data["_cache_timestamp"] = datetime.utcnow().isoformat()
-
-                    # --- 新增：缓存命中时也过滤 NaN/Inf（旧缓存可能含脏数据）---
-                    if isinstance(cached_data.get('data'), list):
-                        clean_data = []
-                        nan_count = 0
-                        for item in cached_data['data']:
-                            has_nan = False
-                            if isinstance(item, dict):
-                                for k, v in item.items():
-                                    if isinstance(v, float):
-                                        if v != v or v in (float('inf'), float('-inf')):
-                                            has_nan = True
-                                            break
-                            if has_nan:
-                                nan_count += 1
-                            else:
-                                clean_data.append(item)
-                        if nan_count > 0:
-                            logger.warning(
-                                f"{log_prefix} ⚠️  缓存中发现 {nan_count} 条含 NaN/Inf 的数据已被过滤 "
-                                f"(从 {len(cached_data['data'])} 条 → {len(clean_data)} 条)"
-                            )
-                            cached_data['data'] = clean_data
-                    # --- 新增结束 ---
-
-                    data_size = len(str(cached_data))
-                    logger.info(f"{log_prefix} ✅ 缓存命中 ({cache_lookup_ms}ms), 数据大小: {data_size//1024}KB, 返回缓存数据")
-                    return cached_data
-
-                # 缓存未命中，调用原函数，记录耗时
-                logger.info(f"{log_prefix} ⚠️ 缓存未命中，调用 {func.__name__}() 从数据源获取...")
+                result = await get_bar_store().get_range_async(
+                    code, start_date, end_date, fetch_range, force=force, refresh_ahead=refresh_ahead
+                )
+                log_hit(log_prefix, result, t0)
+                return result
 
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            prepared = prepare(args, kwargs)
+            if prepared is None:
+                return func(*args, **kwargs)
+            bound, code, start_date, end_date, force, refresh_ahead, log_prefix = prepared
+            # 调用方未指定数据源时，缺口优先从与序列复权方式相同的数据源拉取
+            prefer_sources = 'data_sources' in sig.parameters and bound.arguments.get('data_sources') is None
+
+            def fetch_range(range_start: str, range_end: str, adjust: Optional[str] = None):
+                """调用原函数获取一个缺失区间（未指定数据源时优先使用复权方式为 adjust 的数据源）"""
+                bound.arguments['start_date'] = range_start
+                bound.arguments['end_date'] = range_end
+                if prefer_sources:
+                    bound.arguments['data_sources'] = _preferred_sources(code, adjust)
                 t_start = time.time()
                 try:
-                    result = func(*args, **kwargs)
+                    result = func(*bound.args, **bound.kwargs)
                 except Exception as e:
                     elapsed = time.time() - t_start
                     logger.error(f"{log_prefix} ❌ 原函数调用异常 ({elapsed:.1f}s): {e}")
                     raise
-                elapsed = time.time() - t_start
-
-            # 检查是否有有效数据（不仅是非空 dict，还需要 data 字段有内容）
-            has_valid_data = False
-            data_points = 0
-            if isinstance(result, dict) and isinstance(result.get('data'), list):
-                data_points = len(result['data'])
-
-                # --- 新增：过滤掉含 NaN/Inf 的条目 ---
-                if data_points > 0:
-                    clean_data = []
-                    nan_count = 0
-                    for item in result['data']:
-                        has_nan = False
-                        if isinstance(item, dict):
-                            for k, v in item.items():
-                                if isinstance(v, float):
-                                    # v != v 是判断 NaN 的经典写法
-                                    if v != v or v in (float('inf'), float('-inf')):
-                                        has_nan = True
-                                        break
-                        if has_nan:
-                            nan_count += 1
-                        else:
-                            clean_data.append(item)
-                    if nan_count > 0:
-                        logger.warning(
-                            f"{log_prefix} ⚠️  发现 {nan_count} 条含 NaN/Inf 的数据已被过滤 "
-                            f"(从 {data_points} 条 → {len(clean_data)} 条)"
-                        )
-                    result['data'] = clean_data
-                    data_points = len(clean_data)
-                # --- 新增结束 ---
-
-                if data_points > 0:
-                    has_valid_data = True
-
-            if has_valid_data:
-                # 添加缓存标记
-                result["_cached"] = False
-                result["_cache_timestamp"] = datetime.utcnow().isoformat()
-
-                # 缓存结果
-                logger.info(f"{log_prefix} 源数据获取完成 ({elapsed:.1f}s), 共 {data_points} 条, 正在写入缓存...")
-
-                t_cache = time.time()
-                cache_success = cache.set(code, start_date, end_date, result, ttl_days=1)
-                cache_save_ms = int((time.time() - t_cache) * 1000)
-
-                if cache_success:
-                    data_size = len(str(result))
-                    logger.info(f"{log_prefix} ✅ 缓存写入成功 ({cache_save_ms}ms), 数据大小: {data_size//1024}KB")
-                else:
-                    logger.warning(f"{log_prefix} ❌ 缓存写入失败 ({cache_save_ms}ms)")
-            else:
-                # 无有效数据：跳过缓存（可能是数据源全部失败，或返回空数据）
-                error_detail = result.get('error', '') if isinstance(result, dict) else ''
-                if error_detail:
-                    logger.warning(f"{log_prefix} ⚠️ 无有效数据 ({elapsed:.1f}s), 跳过缓存 - 错误信息: {error_detail}")
-                else:
-                    logger.warning(f"{log_prefix} ⚠️ 无有效数据 ({elapsed:.1f}s), 跳过缓存 - 所有数据源返回空或失败")
+                return _log_range_result(log_prefix, result, time.time() - t_start, range_start, range_end)
 
+            t0 = time.time()
+            result = get_bar_store().get_range(
+                code, start_date, end_date, fetch_range, force=force, refresh_ahead=refresh_ahead
+            )
+            log_hit(log_prefix, result, t0)
             return result
 
         return wrapper
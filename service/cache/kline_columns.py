@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日K线的列式存储格式 - 缓存内部使用，只在返回结果时转换为按条字典
+
+核心原理：
+1. 一段K线保存为几列并行的 numpy 数组：日期为距 1970-01-01 的天数（int32），
+   开高低收为 float64（与接口返回的数值完全一致），成交量为 int64（-1 表示该条没有成交量）
+2. 持久化到 MongoDB 时每列打包为一段二进制，文档中不再为每根K线重复字段名，
+   解码时也只需解出几段二进制而不是上千个子文档
+3. 区间切片用二分查找，合并用数组拼接，都不需要逐条构造字典
+
+使用方法：
+    from service.cache.kline_columns import KlineColumns
+
+    columns = KlineColumns.from_bars(result['data'])
+    bars = columns.slice('2024-01-01', '2024-06-30').to_bars()   # 接口返回格式
+    doc = columns.to_document()                                  # 写入 MongoDB
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+
+FORMAT_VERSION = 'columnar-v1'
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close')
+
+# 成交量缺失标记（部分数据源没有成交量列）
+NO_VOLUME = -1
+
+# same_prices 比较同一天价格时允许的误差（数据源之间保留的小数位数不同）
+PRICE_RTOL = 1e-4
+PRICE_ATOL = 1e-3
+
+
+def _to_days(dates: List[str]) -> np.ndarray:
+    """"YYYY-MM-DD" 字符串 → 距 1970-01-01 的天数"""
+    return np.array(dates, dtype='datetime64[D]').astype(np.int32)
+
+
+def day_of(date_str: str) -> int:
+    """单个 "YYYY-MM-DD" → 距 1970-01-01 的天数"""
+    return int(np.datetime64(date_str[:10], 'D').astype(np.int32))
+
+
+class KlineColumns:
+    """按日期升序、日期唯一的一段日K线（列式）"""
+
+    __slots__ = ('days', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, days: np.ndarray, open_: np.ndarray, high: np.ndarray, low: np.ndarray,
+                 close: np.ndarray, volume: np.ndarray):
+        self.days = days
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    @classmethod
+    def empty(cls) -> 'KlineColumns':
+        f = np.empty(0, dtype=np.float64)
+        return cls(np.empty(0, dtype=np.int32), f, f, f, f, np.empty(0, dtype=np.int64))
+
+    @classmethod
+    def from_bars(cls, bars: List[Dict[str, Any]]) -> 'KlineColumns':
+        """
+        按条字典 → 列式（按日期排序，同一日期保留最后一条）
+
+        Args:
+            bars: [{'date', 'open', 'high', 'low', 'close', 'volume'?}, ...]
+
+        Returns:
+            KlineColumns
+        """
+        if not bars:
+            return cls.empty()
+        days = _to_days([bar['date'][:10] for bar in bars])
+        prices = [np.array([bar[field] for bar in bars], dtype=np.float64) for field in PRICE_FIELDS]
+        volume = np.array([bar.get('volume', NO_VOLUME) for bar in bars], dtype=np.int64)
+        return cls(days, *prices, volume)._normalized()
+
+    def _normalized(self) -> 'KlineColumns':
+        """按日期稳定排序并去重（同一日期保留最后出现的一条）"""
+        if len(self.days) < 2 or np.all(np.diff(self.days) > 0):
+            return self
+        # 稳定排序后同一日期保持原有先后，取每组最后一条
+        order = np.argsort(self.days, kind='stable')
+        sorted_days = self.days[order]
+        keep_last = np.append(sorted_days[1:] != sorted_days[:-1], True)
+        return self.take(order[keep_last])
+
+    def take(self, index) -> 'KlineColumns':
+        return KlineColumns(
+            self.days[index], self.open[index], self.high[index],
+            self.low[index], self.close[index], self.volume[index]
+        )
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def equals(self, other: 'KlineColumns') -> bool:
+        """两段K线的日期与数值是否完全相同"""
+        return len(self.days) == len(other.days) and all(
+            np.array_equal(getattr(self, field), getattr(other, field))
+            for field in self.__slots__
+        )
+
+    def date_at(self, index: int) -> str:
+        """第 index 根K线的日期（YYYY-MM-DD，支持负数下标）"""
+        return str(self.days[index].astype('datetime64[D]'))
+
+    def same_prices(self, other: 'KlineColumns', date_str: str) -> bool:
+        """
+        两段K线在 date_str 这一天的开高低收是否一致（允许数据源之间的舍入误差）
+
+        Returns:
+            一致时为 True；任一方没有该日K线时为 False
+        """
+        day = day_of(date_str)
+        i = int(np.searchsorted(self.days, day))
+        j = int(np.searchsorted(other.days, day))
+        if i >= len(self.days) or j >= len(other.days) or self.days[i] != day or other.days[j] != day:
+            return False
+        return all(
+            np.isclose(getattr(self, field)[i], getattr(other, field)[j], rtol=PRICE_RTOL, atol=PRICE_ATOL)
+            for field in PRICE_FIELDS
+        )
+
+    def slice(self, start: str, end: str) -> 'KlineColumns':
+        """[start, end] 区间切片（返回视图，不复制数据）"""
+        lo = int(np.searchsorted(self.days, day_of(start), side='left'))
+        hi = int(np.searchsorted(self.days, day_of(end), side='right'))
+        return self.take(slice(lo, hi))
+
+    def replace_range(self, start: str, end: str, other: 'KlineColumns') -> 'KlineColumns':
+        """
+        用 other 替换 [start, end] 区间内的K线，区间外的保留
+
+        Args:
+            start: 区间开始日期
+            end: 区间结束日期
+            other: 新的K线（应落在区间内）
+
+        Returns:
+            合并后的新 KlineColumns
+        """
+        lo = int(np.searchsorted(self.days, day_of(start), side='left'))
+        hi = int(np.searchsorted(self.days, day_of(end), side='right'))
+        parts = (self.take(slice(0, lo)), other, self.take(slice(hi, len(self.days))))
+        merged = KlineColumns(*(
+            np.concatenate([getattr(p, field) for p in parts])
+            for field in self.__slots__
+        ))
+        return merged._normalized()
+
+    def to_bars(self) -> List[Dict[str, Any]]:
+        """列式 → 接口返回的按条字典列表（Python 原生类型，可直接 JSON 序列化）"""
+        dates = np.datetime_as_string(self.days.astype('datetime64[D]')).tolist()
+        opens, highs, lows, closes = (getattr(self, field).tolist() for field in PRICE_FIELDS)
+        volumes = self.volume.tolist()
+        if len(volumes) and min(volumes) >= 0:
+            return [
+                {'date': d, 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v}
+                for d, o, h, l, c, v in zip(dates, opens, highs, lows, closes, volumes)
+            ]
+        bars = []
+        for d, o, h, l, c, v in zip(dates, opens, highs, lows, closes, volumes):
+            bar = {'date': d, 'open': o, 'high': h, 'low': l, 'close': c}
+            if v != NO_VOLUME:
+                bar['volume'] = v
+            bars.append(bar)
+        return bars
+
+    def to_document(self) -> Dict[str, Any]:
+        """列式 → MongoDB 文档字段（每列一段小端二进制）"""
+        doc: Dict[str, Any] = {'format': FORMAT_VERSION, 'count': len(self.days)}
+        doc['days'] = self.days.astype('<i4').tobytes()
+        for field in PRICE_FIELDS:
+            doc[field] = getattr(self, field).astype('<f8').tobytes()
+        doc['volume'] = self.volume.astype('<i8').tobytes()
+        return doc
+
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> 'KlineColumns':
+        """MongoDB 文档字段 → 列式；格式不符时返回空序列"""
+        if not doc or doc.get('format') != FORMAT_VERSION:
+            return cls.empty()
+        days = np.frombuffer(doc['days'], dtype='<i4').astype(np.int32)
+        prices = [np.frombuffer(doc[field], dtype='<f8').astype(np.float64) for field in PRICE_FIELDS]
+        volume = np.frombuffer(doc['volume'], dtype='<i8').astype(np.int64)
+        return cls(days, *prices, volume)
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内存缓存层 - 按字节数限制容量，TinyLFU 准入，防止一次性访问的键冲掉热点数据
+
+核心原理：
+1. 容量按条目的近似字节数计算（MEMORY_CACHE_MAX_MB），而不是条目数：
+   一份上万条的市场列表和一段K线占用的内存相差几个数量级
+2. 每次读取（命中或未命中）都在频率草图（Count-Min Sketch，4 行，计数上限 15）中计数，
+   累计计数达到草图宽度的 10 倍时所有计数减半，让频率随时间衰减
+3. 写入新键需要淘汰旧条目时，比较新键与待淘汰条目（按 LRU 从旧到新）的访问频率：
+   新键的频率高于所有待淘汰条目才准入，否则拒绝写入（数据仍在 MongoDB 中），
+   突发的一次性股票代码不会把热点市场列表挤出内存
+4. 已存在的键总是直接更新；单个条目超过总容量时不缓存
+5. 进程 RSS 超过 MEMORY_CACHE_RSS_LIMIT_MB 时（每秒最多检查一次），按 LRU 淘汰超出的字节数再加上限的
+   RSS_HEADROOM_RATIO 作为余量，而不是整体减半；释放的内存不一定立即归还操作系统，
+   所以两次收缩至少间隔 RSS_SHRINK_COOLDOWN 秒，且只有 RSS 比上次收缩时更高才再次收缩，
+   避免 RSS 降不下来时反复淘汰直到清空缓存
+6. 条目可以挂附属数据（如预序列化的响应体），计入条目大小，随条目一起失效
+
+使用方法：
+    from service.cache.memory_cache import MemoryLRUCache
+
+    cache = MemoryLRUCache(max_bytes=256 * 1024 * 1024, ttl_seconds=1800)
+    cache.set(key, value)
+    value = cache.get(key)
+    stats = cache.get_stats()
+
+配置（环境变量）：
+    MEMORY_CACHE_MAX_MB: 内存缓存容量（MB），默认 256
+    MEMORY_CACHE_RSS_LIMIT_MB: 进程 RSS 上限（MB），超过时收缩内存缓存；默认 0（不检查）
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+try:
+    import psutil  # 可选依赖：没有 /proc 的平台上读取 RSS
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+MAX_BYTES = int(float(os.getenv('MEMORY_CACHE_MAX_MB', '256')) * 1024 * 1024)
+RSS_LIMIT_BYTES = int(float(os.getenv('MEMORY_CACHE_RSS_LIMIT_MB', '0')) * 1024 * 1024)
+
+# 频率草图每行的计数器个数（2 的幂）
+SKETCH_WIDTH = 4096
+# 计数器上限（4 位计数）
+SKETCH_MAX_COUNT = 15
+
+RSS_CHECK_INTERVAL = 1.0
+# RSS 超限时在超出部分之外多淘汰的余量（占上限的比例）
+RSS_HEADROOM_RATIO = 0.05
+# 两次收缩之间的最短间隔（秒）
+RSS_SHRINK_COOLDOWN = 30.0
+
+# 估算容器大小时最多逐个计算的元素数，更多时按抽样外推
+SIZE_SAMPLE = 32
+
+_SCALAR_TYPES = (str, bytes, bytearray, int, float, bool, type(None))
+
+
+class FrequencySketch:
+    """Count-Min Sketch：近似统计各键的访问频率，计数周期性减半"""
+
+    _SEEDS = (0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D, 0x27D4EB2F)
+    # 每个计数器右移一位的转换表（bytearray.translate 一次处理整行）
+    _HALVE = bytes(i >> 1 for i in range(256))
+
+    def __init__(self, width: int = SKETCH_WIDTH):
+        self._mask = width - 1
+        self._rows = [bytearray(width) for _ in self._SEEDS]
+        self._additions = 0
+        self._sample_size = width * 10
+
+    def _indexes(self, key: str) -> List[int]:
+        h = hash(key)
+        return [(h * seed >> 16) & self._mask for seed in self._SEEDS]
+
+    def increment(self, key: str) -> None:
+        indexes = self._indexes(key)
+        counts = [row[i] for row, i in zip(self._rows, indexes)]
+        # 只增加最小的计数器（conservative update），减少哈希冲突带来的高估
+        lowest = min(counts)
+        if lowest >= SKETCH_MAX_COUNT:
+            return
+        for row, i, count in zip(self._rows, indexes, counts):
+            if count == lowest:
+                row[i] = count + 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._rows = [row.translate(self._HALVE) for row in self._rows]
+            self._additions //= 2
+
+    def frequency(self, key: str) -> int:
+        return min(row[i] for row, i in zip(self._rows, self._indexes(key)))
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """
+    估算对象占用的内存字节数（容器超过 SIZE_SAMPLE 个元素时抽样外推）
+
+    字典的字符串键通常在各条记录间共享（JSON / BSON 解码时复用），不重复计入
+
+    Args:
+        value: 任意对象
+
+    Returns:
+        近似字节数
+    """
+    if isinstance(value, _SCALAR_TYPES):
+        return sys.getsizeof(value)
+    # numpy 数组（列式K线）按数据缓冲区大小计算；按属性判断，不为此在启动时导入 numpy
+    if getattr(value, 'ndim', 0) and isinstance(getattr(value, 'nbytes', None), int):
+        return value.nbytes + 112
+    size = sys.getsizeof(value)
+    if _depth > 8:
+        return size
+
+    if isinstance(value, dict):
+        items = list(value.values())
+    elif isinstance(value, (list, tuple)):
+        items = value
+    elif isinstance(value, (set, frozenset)):
+        items = list(value)
+    elif hasattr(value, '__slots__'):
+        items = [getattr(value, name, None) for name in value.__slots__]
+    elif hasattr(value, '__dict__'):
+        return size + estimate_size(vars(value), _depth + 1)
+    else:
+        return size
+
+    count = len(items)
+    if not count:
+        return size
+    sample = items if count <= SIZE_SAMPLE else items[::count // SIZE_SAMPLE][:SIZE_SAMPLE]
+    total = 0
+    for item in sample:
+        total += sys.getsizeof(item) if isinstance(item, _SCALAR_TYPES) else estimate_size(item, _depth + 1)
+    return size + total * count // len(sample)
+
+
+def current_rss() -> Optional[int]:
+    """当前进程的 RSS（字节）；无法获取时返回None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return None
+
+
+class MemoryLRUCache:
+    """内存缓存，用于快速访问热点数据（按字节限制容量，LRU 淘汰，TinyLFU 准入，线程安全）"""
+
+    def __init__(self, max_bytes: int = MAX_BYTES, ttl_seconds: int = 3600, rss_limit_bytes: int = RSS_LIMIT_BYTES):
+        """
+        初始化内存缓存
+
+        Args:
+            max_bytes: 最大占用字节数（近似）
+            ttl_seconds: 默认的缓存有效期（秒），set 时可以为单个条目指定更短的有效期
+            rss_limit_bytes: 进程 RSS 上限，超过时收缩缓存；0 表示不检查
+        """
+        self.cache = OrderedDict()
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.rss_limit_bytes = rss_limit_bytes
+        # key → 过期时间戳
+        self.expires_at: Dict[str, float] = {}
+        # 附属数据（如预序列化的响应体）：key → {name: value}，随条目一起失效
+        self.attachments = {}
+        # key → 条目近似字节数（含附属数据）
+        self.sizes: Dict[str, int] = {}
+        self.total_bytes = 0
+        self._sketch = FrequencySketch()
+        self._lock = threading.RLock()
+        self._last_rss_check = 0.0
+        self._last_rss: Optional[int] = None
+        self._last_shrink_at = 0.0
+        # 上次收缩时的 RSS（RSS 回到上限以内时清空）
+        self._shrink_rss: Optional[int] = None
+
+        # 统计信息
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+        self._rejections = 0
+        self._rss_shrinks = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """从内存缓存获取数据"""
+        with self._lock:
+            self._sketch.increment(key)
+            if key not in self.cache:
+                self._misses += 1
+                return None
+
+            # 检查是否过期
+            if time.time() > self.expires_at.get(key, 0):
+                self._remove(key)
+                self._expired += 1
+                self._misses += 1
+                return None
+
+            # 移动到末尾表示最近使用
+            self.cache.move_to_end(key)
+            self._hits += 1
+            return self.cache[key]
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> bool:
+        """
+        设置内存缓存
+
+        Args:
+            key: 缓存键
+            value: 数据
+            ttl_seconds: 该条目的有效期（秒），不超过默认有效期；None 表示使用默认有效期
+
+        Returns:
+            是否写入（新键的访问频率不高于需要淘汰的条目时不准入）
+        """
+        size = estimate_size(value)
+        with self._lock:
+            if key in self.cache:
+                # 已有的键直接更新，旧数据的附属数据作废
+                self._remove(key)
+                if size > self.max_bytes:
+                    self._rejections += 1
+                    return False
+            elif not self._admit(key, size):
+                self._rejections += 1
+                return False
+            self._evict_to_fit(size)
+            self.cache[key] = value
+            ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+            self.expires_at[key] = time.time() + ttl
+            self.sizes[key] = size
+            self.total_bytes += size
+        self._check_rss()
+        return True
+
+    def _admit(self, key: str, size: int) -> bool:
+        """TinyLFU 准入：新键的频率需要高于腾出空间时要淘汰的每一个条目"""
+        if size > self.max_bytes:
+            return False
+        needed = self.total_bytes + size - self.max_bytes
+        if needed <= 0:
+            return True
+        candidate = self._sketch.frequency(key)
+        now = time.time()
+        for victim in self.cache:
+            if needed <= 0:
+                break
+            # 已过期的条目不参与比较
+            if now <= self.expires_at.get(victim, 0) and self._sketch.frequency(victim) >= candidate:
+                return False
+            needed -= self.sizes.get(victim, 0)
+        return True
+
+    def _evict_to_fit(self, size: int, keep: Optional[str] = None) -> None:
+        """按 LRU 淘汰，直到能放下 size 字节（keep 指定的键不淘汰）"""
+        for victim in list(self.cache):
+            if self.total_bytes + size <= self.max_bytes:
+                break
+            if victim != keep:
+                self._remove(victim)
+                self._evictions += 1
+
+    def _remove(self, key: str) -> None:
+        self.cache.pop(key, None)
+        self.expires_at.pop(key, None)
+        self.attachments.pop(key, None)
+        self.total_bytes -= self.sizes.pop(key, 0)
+
+    def _check_rss(self) -> None:
+        """进程 RSS 超过上限时，按 LRU 淘汰超出的字节数（加余量），带冷却时间"""
+        if not self.rss_limit_bytes:
+            return
+        now = time.time()
+        if now - self._last_rss_check < RSS_CHECK_INTERVAL:
+            return
+        self._last_rss_check = now
+        rss = current_rss()
+        self._last_rss = rss
+        if rss is None or rss <= self.rss_limit_bytes:
+            self._shrink_rss = None
+            return
+        # 上次收缩后 RSS 没有再升高：缓存复用了已释放的内存，再淘汰也降不下来
+        if now - self._last_shrink_at < RSS_SHRINK_COOLDOWN or (self._shrink_rss is not None and rss <= self._shrink_rss):
+            return
+
+        with self._lock:
+            before, count = self.total_bytes, len(self.cache)
+            excess = rss - self.rss_limit_bytes + int(self.rss_limit_bytes * RSS_HEADROOM_RATIO)
+            target = max(0, self.total_bytes - excess)
+            while self.cache and self.total_bytes > target:
+                self._remove(next(iter(self.cache)))
+                self._evictions += 1
+            self._rss_shrinks += 1
+            self._last_shrink_at = now
+            self._shrink_rss = rss
+        logger.warning(
+            f"[MemoryCache] ⚠️ 进程 RSS {rss / 1048576:.0f}MB 超过上限 {self.rss_limit_bytes / 1048576:.0f}MB，"
+            f"内存缓存从 {before / 1048576:.1f}MB 收缩到 {self.total_bytes / 1048576:.1f}MB"
+            f"（淘汰 {count - len(self.cache)} 个条目）"
+        )
+
+    def delete(self, key: str) -> None:
+        """删除内存缓存"""
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        """清空内存缓存"""
+        with self._lock:
+            self.cache.clear()
+            self.expires_at.clear()
+            self.attachments.clear()
+            self.sizes.clear()
+            self.total_bytes = 0
+
+    def get_attachment(self, key: str, name: str) -> Optional[Any]:
+        """
+        获取条目的附属数据（条目不存在、已过期或没有该附属数据时返回None）
+
+        取到附属数据时按一次命中计入频率草图与命中统计；取不到时不计数，调用方随后的 get 会计数，不会重复
+        """
+        with self._lock:
+            value = self.attachments.get(key, {}).get(name)
+            if value is None or key not in self.cache or time.time() > self.expires_at.get(key, 0):
+                return None
+            self._sketch.increment(key)
+            self.cache.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set_attachment(self, key: str, name: str, value: Any, source: Any) -> bool:
+        """
+        为条目设置附属数据
+
+        Args:
+            key: 缓存键
+            name: 附属数据名称
+            value: 附属数据
+            source: 生成附属数据时使用的缓存数据；条目已被替换时不写入
+
+        Returns:
+            是否写入
+        """
+        size = estimate_size(value)
+        with self._lock:
+            if self.cache.get(key) is not source:
+                return False
+            attachments = self.attachments.setdefault(key, {})
+            if name in attachments:
+                previous = estimate_size(attachments[name])
+                self.sizes[key] -= previous
+                self.total_bytes -= previous
+            attachments[name] = value
+            self.sizes[key] += size
+            self.total_bytes += size
+            self._evict_to_fit(0, keep=key)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取内存缓存统计（用于监控）"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            stats: Dict[str, Any] = {
+                'entries': len(self.cache),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0.0,
+                'expired': self._expired,
+                'evictions': self._evictions,
+                'admission_rejections': self._rejections,
+                'rss_shrinks': self._rss_shrinks,
+            }
+        if self.rss_limit_bytes:
+            stats['rss_limit_bytes'] = self.rss_limit_bytes
+            stats['last_rss_bytes'] = self._last_rss
+        return stats
@@ -2,15 +2,16 @@
 # -*- coding: utf-8 -*-
 """
 MongoDB缓存服务
-用于缓存股票市场列表查询结果，缓存有效期2天
-优化版本：添加内存LRU缓存层，大幅提升读取性能
+用于缓存股票市场列表查询结果，缓存有效期2天；过期后数据再保留 STALE_RETENTION_DAYS 天（新鲜期与保留期分开），
+调用方可以在此期间返回旧数据并在后台刷新（见 get_entry / revalidator.py）
+优化版本：添加内存缓存层（按字节限制容量、TinyLFU 准入，见 memory_cache.py），大幅提升读取性能
 """
 
 import os
 import logging
 import time
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, List, Optional, Tuple, Union
 from functools import lru_cache
 from collections import OrderedDict
 import json
@@ -23,65 +24,14 @@ load_dotenv()
 from pymongo import MongoClient, ASCENDING
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 
+from .memory_cache import MemoryLRUCache
+from .cache_metrics import record_lookup, record_write
+
 # 设置日志
 logger = logging.getLogger(__name__)
 
-
-class MemoryLRUCache:
-    """内存LRU缓存，用于快速访问热点数据"""
-    
-    def __init__(self, max_size: int = 100, ttl_seconds: int = 3600):
-        """
-        初始化内存LRU缓存
-        
-        Args:
-            max_size: 最大缓存条目数
-            ttl_seconds: 缓存有效期（秒）
-        """
-        self.cache = OrderedDict()
-        self.max_size = max_size
-        self.ttl_seconds = ttl_seconds
-        self.timestamps = {}
-    
-    def get(self, key: str) -> Optional[Any]:
-        """从内存缓存获取数据"""
-        if key not in self.cache:
-            return None
-        
-        # 检查是否过期
-        if time.time() - self.timestamps.get(key, 0) > self.ttl_seconds:
-            self.delete(key)
-            return None
-        
-        # 移动到末尾表示最近使用
-        self.cache.move_to_end(key)
-        return self.cache[key]
-    
-    def set(self, key: str, value: Any) -> None:
-        """设置内存缓存"""
-        # 如果已存在，先删除
-        if key in self.cache:
-            self.cache.move_to_end(key)
-        else:
-            # 如果超过最大大小，删除最旧的
-            if len(self.cache) >= self.max_size:
-                oldest_key = next(iter(self.cache))
-                self.delete(oldest_key)
-        
-        self.cache[key] = value
-        self.timestamps[key] = time.time()
-    
-    def delete(self, key: str) -> None:
-        """删除内存缓存"""
-        if key in self.cache:
-            del self.cache[key]
-        if key in self.timestamps:
-            del self.timestamps[key]
-    
-    def clear(self) -> None:
-        """清空内存缓存"""
-        self.cache.clear()
-        self.timestamps.clear()
+# 过了新鲜期（ttl_days）的数据在MongoDB中继续保留的天数（stale-while-revalidate / stale-if-error 的上限）
+STALE_RETENTION_DAYS = float(os.getenv('CACHE_STALE_RETENTION_DAYS', '7'))
 
 
 class MongoDBCache:
@@ -101,8 +51,8 @@ class MongoDBCache:
         self.db = None
         self.collection = None
 
-        # 初始化内存缓存 - 市场数据比较大，设置合理的TTL
-        self.memory_cache = MemoryLRUCache(max_size=20, ttl_seconds=1800)  # 30分钟
+        # 初始化内存缓存 - 按字节限制容量（MEMORY_CACHE_MAX_MB），市场数据比较大，设置合理的TTL
+        self.memory_cache = MemoryLRUCache(ttl_seconds=1800)  # 30分钟
 
         # 标记：是否已尝试连接（用于延迟连接）
         self._connection_attempted = False
@@ -248,6 +198,7 @@ class MongoDBCache:
     def get(self, code: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         从缓存获取数据 - 优化版本：优先从内存缓存读取，延迟连接MongoDB
+        只返回新鲜（未超过 ttl_days）的数据，过期但仍保留的数据见 get_entry
 
         Args:
             code: 股票代码
@@ -257,22 +208,43 @@ class MongoDBCache:
         Returns:
             缓存数据或None
         """
+        entry = self.get_entry(code, start_date, end_date)
+        if entry is None or entry[1] > 0:
+            return None
+        return entry[0]
+
+    def get_entry(self, code: str, start_date: Optional[str] = None,
+                  end_date: Optional[str] = None) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        从缓存获取数据及其过期时长 - 过了新鲜期（ttl_days）的数据在 MongoDB 中再保留 STALE_RETENTION_DAYS 天，
+        供调用方在 stale-while-revalidate / stale-if-error 窗口内返回
+
+        Args:
+            code: 股票代码
+            start_date: 开始日期 (YYYY-MM-DD格式)
+            end_date: 结束日期 (YYYY-MM-DD格式)
+
+        Returns:
+            (缓存数据, 已过期秒数；新鲜数据为0) 或 None
+        """
         cache_key = self._generate_cache_key(code, start_date, end_date)
+        t0 = time.perf_counter()
 
-        # 第一步：优先从内存缓存获取（微秒级响应）
+        # 第一步：优先从内存缓存获取（微秒级响应）；内存层的有效期不超过新鲜期，命中即为新鲜数据
         memory_data = self.memory_cache.get(cache_key)
         if memory_data is not None:
-            return memory_data
+            record_lookup(cache_key, 'memory_hit', time.perf_counter() - t0)
+            return memory_data, 0.0
 
         # 确保MongoDB已连接（延迟连接）
         self._ensure_connected()
 
         # 内存缓存未命中，检查MongoDB连接
         if not self.is_connected():
+            record_lookup(cache_key, 'miss', time.perf_counter() - t0)
             return None
 
         try:
-            from datetime import datetime
             now = datetime.utcnow()
 
             # 添加查询超时，优化查询 - 只返回需要的字段
@@ -281,25 +253,98 @@ class MongoDBCache:
                     'cache_key': cache_key,
                     'expires_at': {'$gt': now}
                 },
-                projection={'data': 1, '_id': 0},  # 只返回data字段，减少数据传输
+                projection={'data': 1, 'fresh_until': 1, '_id': 0},  # 只返回需要的字段，减少数据传输
                 max_time_ms=2000  # 查询超时2秒（更短）
             )
 
-            if cache_item and cache_item.get("data"):
-                logger.info(f"MongoDB缓存命中: {cache_key}")
-                
-                # 同步到内存缓存，加速下次访问
-                data = cache_item["data"]
-                self.memory_cache.set(cache_key, data)
-                
-                return data
-            else:
+            if not cache_item or not cache_item.get("data"):
+                record_lookup(cache_key, 'miss', time.perf_counter() - t0)
                 return None
 
+            data = cache_item["data"]
+            # 旧文档没有 fresh_until：expires_at 即新鲜期
+            fresh_until = cache_item.get("fresh_until")
+            stale_seconds = max(0.0, (now - fresh_until).total_seconds()) if fresh_until else 0.0
+            if stale_seconds > 0:
+                logger.info(f"MongoDB缓存命中（已过期 {stale_seconds / 3600:.1f} 小时）: {cache_key}")
+                record_lookup(cache_key, 'mongo_stale', time.perf_counter() - t0)
+                return data, stale_seconds
+
+            logger.info(f"MongoDB缓存命中: {cache_key}")
+            # 同步到内存缓存，加速下次访问（内存层有效期不超过剩余的新鲜期）
+            remaining = (fresh_until - now).total_seconds() if fresh_until else None
+            self.memory_cache.set(cache_key, data, ttl_seconds=remaining)
+            record_lookup(cache_key, 'mongo_hit', time.perf_counter() - t0)
+            return data, 0.0
+
         except Exception as e:
             logger.debug(f"MongoDB查询失败: {type(e).__name__}")
+            record_lookup(cache_key, 'miss', time.perf_counter() - t0)
             return None
 
+    def get_many(self, requests: List[Tuple[str, Optional[str], Optional[str]]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        批量从缓存获取数据 - 内存缓存逐个查询，剩余未命中的键合并为一次MongoDB查询
+
+        Args:
+            requests: [(股票代码, 开始日期, 结束日期), ...]
+
+        Returns:
+            与 requests 顺序一致的缓存数据列表，未命中的位置为None
+        """
+        keys = [self._generate_cache_key(code, start_date, end_date) for code, start_date, end_date in requests]
+        t0 = time.perf_counter()
+        results: List[Optional[Dict[str, Any]]] = [self.memory_cache.get(key) for key in keys]
+        memory_elapsed = (time.perf_counter() - t0) / max(1, len(keys))
+        for key, data in zip(keys, results):
+            if data is not None:
+                record_lookup(key, 'memory_hit', memory_elapsed)
+
+        missing_keys = list({key for key, data in zip(keys, results) if data is None})
+        if not missing_keys:
+            return results
+
+        self._ensure_connected()
+        if not self.is_connected():
+            self._record_batch_lookup(missing_keys, {}, t0)
+            return results
+
+        try:
+            now = datetime.utcnow()
+            found = {}
+            for cache_item in self.collection.find(
+                {
+                    'cache_key': {'$in': missing_keys},
+                    'expires_at': {'$gt': now}
+                },
+                projection={'cache_key': 1, 'data': 1, 'fresh_until': 1, '_id': 0},
+                max_time_ms=5000
+            ):
+                # 只返回新鲜数据（旧文档没有 fresh_until：expires_at 即新鲜期）
+                fresh_until = cache_item.get("fresh_until")
+                if cache_item.get("data") and (fresh_until is None or fresh_until > now):
+                    found[cache_item["cache_key"]] = cache_item["data"]
+                    remaining = (fresh_until - now).total_seconds() if fresh_until else None
+                    self.memory_cache.set(cache_item["cache_key"], cache_item["data"], ttl_seconds=remaining)
+
+            if found:
+                logger.info(f"MongoDB批量缓存命中: {len(found)}/{len(missing_keys)}")
+            self._record_batch_lookup(missing_keys, found, t0)
+
+            return [data if data is not None else found.get(key) for key, data in zip(keys, results)]
+
+        except Exception as e:
+            logger.debug(f"MongoDB批量查询失败: {type(e).__name__}")
+            self._record_batch_lookup(missing_keys, {}, t0)
+            return results
+
+    @staticmethod
+    def _record_batch_lookup(keys: List[str], found: Dict[str, Any], t0: float) -> None:
+        """记录一次批量 MongoDB 查询中各键的结果（耗时为整次查询的耗时）"""
+        elapsed = time.perf_counter() - t0
+        for key in keys:
+            record_lookup(key, 'mongo_hit' if key in found else 'miss', elapsed)
+
     def set(self, code: str, start_date: Optional[str] = None, end_date: Optional[str] = None, data: Dict[str, Any] = None, ttl_days: int = 2) -> bool:
         """
         设置K线数据缓存 - 优化版本：同时写入内存缓存，延迟连接MongoDB
@@ -309,7 +354,7 @@ class MongoDBCache:
             start_date: 开始日期 (YYYY-MM-DD格式)
             end_date: 结束日期 (YYYY-MM-DD格式)
             data: 要缓存的数据
-            ttl_days: 缓存有效期（天数），默认2天
+            ttl_days: 缓存新鲜期（天数），默认2天；过期后在MongoDB中再保留 STALE_RETENTION_DAYS 天
 
         Returns:
             是否成功
@@ -328,18 +373,24 @@ class MongoDBCache:
 
         # 统一使用_generate_cache_key生成缓存键
         cache_key = self._generate_cache_key(code, start_date, end_date)
+        t0 = time.perf_counter()
 
         # 第一步：优先写入内存缓存（微秒级）
-        self.memory_cache.set(cache_key, data)
+        self.memory_cache.set(cache_key, data, ttl_seconds=ttl_days * 86400)
 
         # 确保MongoDB已连接（延迟连接）
         self._ensure_connected()
 
         # 如果MongoDB未连接，只使用内存缓存
         if not self.is_connected():
+            record_write(cache_key, 'memory_only', time.perf_counter() - t0)
             return True
 
-        expires_at = datetime.utcnow() + timedelta(days=ttl_days)
+        # 新鲜期与保留期分开：fresh_until 之后数据仍保留 STALE_RETENTION_DAYS 天（TTL 索引按 expires_at 删除），
+        # 供 stale-while-revalidate / stale-if-error 使用
+        now = datetime.utcnow()
+        fresh_until = now + timedelta(days=ttl_days)
+        expires_at = fresh_until + timedelta(days=STALE_RETENTION_DAYS)
 
         try:
             # 使用upsert操作，如果存在则更新，不存在则插入
@@ -352,8 +403,9 @@ class MongoDBCache:
                         "start_date": start_date,
                         "end_date": end_date,
                         "data": data,
+                        "fresh_until": fresh_until,
                         "expires_at": expires_at,
-                        "cached_at": datetime.utcnow(),
+                        "cached_at": now,
                         "ttl_days": ttl_days
                     }
                 },
@@ -361,13 +413,96 @@ class MongoDBCache:
             )
 
             logger.info(f"MongoDB缓存已写入: {cache_key}")
+            record_write(cache_key, 'ok' if result.acknowledged else 'failed', time.perf_counter() - t0)
             return result.acknowledged
 
         except Exception as e:
             logger.debug(f"MongoDB写入失败: {type(e).__name__}")
+            record_write(cache_key, 'failed', time.perf_counter() - t0)
             # MongoDB失败没关系，内存缓存已经可以用了
             return True
 
+    def get_documents(self, cache_keys: List[str], record: bool = True) -> Dict[str, Dict[str, Any]]:
+        """
+        按缓存键批量读取自定义结构的文档（一次MongoDB $in 查询，不经过内存缓存）
+
+        Args:
+            cache_keys: 缓存键列表
+            record: 是否按键记录 mongo_hit / miss 指标；文档自带有效期、需由调用方判定是否命中时传 False
+
+        Returns:
+            {缓存键: 文档字段}，未命中或MongoDB不可用的键不出现在结果中
+        """
+        if not cache_keys:
+            return {}
+
+        t0 = time.perf_counter()
+        self._ensure_connected()
+        if not self.is_connected():
+            if record:
+                self._record_batch_lookup(cache_keys, {}, t0)
+            return {}
+
+        try:
+            now = datetime.utcnow()
+            documents = {
+                item.pop("cache_key"): item
+                for item in self.collection.find(
+                    {
+                        'cache_key': {'$in': list(cache_keys)},
+                        'expires_at': {'$gt': now}
+                    },
+                    projection={'_id': 0, 'expires_at': 0, 'fresh_until': 0, 'cached_at': 0, 'ttl_days': 0},
+                    max_time_ms=5000
+                )
+            }
+            if record:
+                self._record_batch_lookup(cache_keys, documents, t0)
+            return documents
+        except Exception as e:
+            logger.debug(f"MongoDB文档查询失败: {type(e).__name__}")
+            if record:
+                self._record_batch_lookup(cache_keys, {}, t0)
+            return {}
+
+    def set_document(self, cache_key: str, fields: Dict[str, Any], ttl_days: int = 2) -> bool:
+        """
+        按缓存键写入自定义结构的文档（整体覆盖，不写内存缓存）
+
+        Args:
+            cache_key: 缓存键
+            fields: 文档字段
+            ttl_days: 缓存有效期（天数）
+
+        Returns:
+            是否成功
+        """
+        t0 = time.perf_counter()
+        self._ensure_connected()
+        if not self.is_connected():
+            record_write(cache_key, 'memory_only', time.perf_counter() - t0)
+            return False
+
+        try:
+            now = datetime.utcnow()
+            result = self.collection.replace_one(
+                {"cache_key": cache_key},
+                {
+                    **fields,
+                    "cache_key": cache_key,
+                    "expires_at": now + timedelta(days=ttl_days),
+                    "cached_at": now,
+                    "ttl_days": ttl_days
+                },
+                upsert=True
+            )
+            record_write(cache_key, 'ok' if result.acknowledged else 'failed', time.perf_counter() - t0)
+            return result.acknowledged
+        except Exception as e:
+            logger.debug(f"MongoDB文档写入失败: {type(e).__name__}")
+            record_write(cache_key, 'failed', time.perf_counter() - t0)
+            return False
+
     def delete(self, code: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> bool:
         """
         删除K线数据缓存 - 优化版本：同时删除内存缓存
@@ -598,22 +733,35 @@ class MongoDBCache:
             logger.error(f"[Cache] ❌ 按市场 {market_code} 删除缓存失败: {e}")
             return result
 
+    def estimated_count(self) -> Optional[int]:
+        """
+        估算缓存集合的文档数（读取集合元数据，不扫描文档）
+
+        Returns:
+            文档数；MongoDB不可用时返回None
+        """
+        if not self.is_connected():
+            return None
+        try:
+            return self.collection.estimated_document_count(maxTimeMS=2000)
+        except Exception as e:
+            logger.debug(f"MongoDB估算文档数失败: {type(e).__name__}")
+            return None
+
     def get_stats(self) -> Dict[str, Any]:
-        """获取缓存统计信息"""
+        """
+        获取缓存统计信息
+
+        文档数为估算值（不扫描集合）；过期文档由 expires_at 上的 TTL 索引定期删除，不再单独统计
+        """
         if not self.is_connected():
             return {"connected": False}
 
         try:
-            total = self.collection.count_documents({})
-            now = datetime.utcnow()
-            valid = self.collection.count_documents({"expires_at": {"$gt": now}})
-            expired = total - valid
-
             return {
                 "connected": True,
-                "total_cache_items": total,
-                "valid_cache_items": valid,
-                "expired_cache_items": expired,
+                "total_cache_items": self.collection.estimated_document_count(maxTimeMS=2000),
+                "estimated": True,
                 "database": self.db.name,
                 "collection": self.collection.name
             }
@@ -654,6 +802,12 @@ def get_cache() -> MongoDBCache:
                     self.cache = {}
                 def get(self, code: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Optional[Dict[str, Any]]:
                     return None
+                def get_many(self, requests: List[Tuple[str, Optional[str], Optional[str]]]) -> List[Optional[Dict[str, Any]]]:
+                    return [None] * len(requests)
+                def get_documents(self, cache_keys: List[str], record: bool = True) -> Dict[str, Dict[str, Any]]:
+                    return {}
+                def set_document(self, cache_key: str, fields: Dict[str, Any], ttl_days: int = 2) -> bool:
+                    return False
                 def set(self, code: str, start_date: Optional[str] = None, end_date: Optional[str] = None, data: Dict[str, Any] = None, ttl_days: int = 2) -> bool:
                     return True
                 def delete(self, code: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> bool:
@@ -742,3 +896,9 @@ def delete_cached_kline_data(code: str, start_date: Optional[str] = None, end_da
     """
     cache = get_cache()
     return cache.delete(code, start_date, end_date)
+
+
+def get_memory_cache_stats() -> Dict[str, Any]:
+    """获取内存缓存层的统计（命中、未命中、淘汰、准入拒绝等，用于监控）"""
+    memory_cache = getattr(get_cache(), 'memory_cache', None)
+    return memory_cache.get_stats() if memory_cache is not None else {}
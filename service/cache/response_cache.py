@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预序列化响应缓存 - 缓存命中时直接返回已编码的响应体，不再重复序列化
+
+核心原理：
+1. 热点缓存条目第一次被返回时，把最终的接口响应按 FastAPI 相同的规则编码为 JSON 字节，
+   体积较大时同时生成 gzip（以及安装了 brotli 时的 br）压缩版本
+2. 编码结果挂在底层缓存条目旁边保存：
+   - 市场列表：MemoryLRUCache 的附属数据（条目被替换、删除、过期、清空时一并失效）
+   - K线：BarStore 中该股票的序列（序列合并新K线时一并失效）
+3. 命中时按请求的 Accept-Encoding 选择版本直接返回，省去 jsonable_encoder + json.dumps + 压缩
+4. 条件请求：ETag 由缓存条目的内容版本（写入时间）生成，If-None-Match 命中时返回 304；
+   Cache-Control 的 max-age 为条目剩余的有效期，CDN 可以在边缘缓存
+   （各压缩版本的 ETag 带有编码后缀，保证强 ETag 对应的字节完全一致）
+
+使用方法：
+    from service.cache.response_cache import encode_payload, get_attached_response, attach_response
+
+    encoded = get_attached_response(cache_key, variant)
+    if encoded is None:
+        encoded = encode_payload(payload)
+        attach_response(cache_key, variant, source=cached_data, encoded=encoded)
+    return encoded.to_response(request.headers.get('accept-encoding', ''),
+                               request.headers.get('if-none-match', ''))
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from .mongodb_cache import get_cache
+
+try:
+    import brotli  # 可选依赖：未安装时只提供 gzip 版本
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 响应体小于该大小时不生成压缩版本（压缩收益抵不过开销）
+MIN_COMPRESS_BYTES = int(os.getenv('RESPONSE_CACHE_MIN_COMPRESS_BYTES', '1024'))
+GZIP_LEVEL = int(os.getenv('RESPONSE_CACHE_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('RESPONSE_CACHE_BROTLI_QUALITY', '5'))
+# Cache-Control 中 max-age 的上限（秒），条目剩余有效期更长时按上限返回
+MAX_AGE_CAP = int(os.getenv('RESPONSE_CACHE_MAX_AGE_CAP', '86400'))
+
+ATTACHMENT_PREFIX = 'response:'
+
+
+class EncodedResponse:
+    """一份已编码的 JSON 响应（原始字节 + 压缩版本）"""
+
+    __slots__ = ('body', 'gzip', 'br', 'etag', 'expires_at')
+
+    def __init__(self, body: bytes, gzip_body: Optional[bytes] = None, br_body: Optional[bytes] = None,
+                 etag: Optional[str] = None, expires_at: Optional[float] = None):
+        self.body = body
+        self.gzip = gzip_body
+        self.br = br_body
+        self.etag = etag
+        self.expires_at = expires_at
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + len(self.gzip or b'') + len(self.br or b'')
+
+    def to_response(self, accept_encoding: str = '', if_none_match: str = '') -> Response:
+        """按客户端的 Accept-Encoding 选择版本，构造响应；If-None-Match 与 ETag 一致时返回 304"""
+        not_modified = not_modified_response(if_none_match, self.etag, self.expires_at)
+        if not_modified is not None:
+            return not_modified
+        encoding = _choose_encoding(accept_encoding, self)
+        headers = _validator_headers(self.etag, self.expires_at, encoding)
+        if encoding == 'br':
+            content = self.br
+        elif encoding == 'gzip':
+            content = self.gzip
+        else:
+            content = self.body
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        _stats.record_hit(encoding)
+        return Response(content=content, media_type='application/json', headers=headers)
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    由缓存条目的内容版本生成强 ETag
+
+    Args:
+        *parts: 确定响应内容的各部分（缓存键、响应形式、写入时间等）
+
+    Returns:
+        带引号的 ETag，如 "3f2a..."
+    """
+    digest = hashlib.blake2b('\x1f'.join(str(p) for p in parts).encode('utf-8'), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+
+def expires_from_timestamp(cache_timestamp: Optional[str], ttl_seconds: float) -> Optional[float]:
+    """
+    由条目的写入时间（UTC ISO 格式，即 _cache_timestamp）和有效期计算过期时间戳
+
+    Returns:
+        过期时间戳；写入时间缺失或格式不符时返回None
+    """
+    if not cache_timestamp:
+        return None
+    try:
+        written = datetime.fromisoformat(cache_timestamp).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    return written.timestamp() + ttl_seconds
+
+
+def _cache_control(expires_at: Optional[float]) -> str:
+    """按剩余有效期生成 Cache-Control（已过期或未知时要求每次重新验证）"""
+    if expires_at is None:
+        return 'no-cache'
+    max_age = min(MAX_AGE_CAP, int(expires_at - time.time()))
+    if max_age <= 0:
+        return 'no-cache'
+    return f'public, max-age={max_age}'
+
+
+def _validator_headers(etag: Optional[str], expires_at: Optional[float], encoding: Optional[str]) -> Dict[str, str]:
+    headers = {'Vary': 'Accept-Encoding'}
+    if etag:
+        # 不同压缩版本的字节不同，强 ETag 需要区分：在引号内追加编码后缀
+        headers['ETag'] = f'{etag[:-1]}-{encoding}"' if encoding else etag
+        headers['Cache-Control'] = _cache_control(expires_at)
+    return headers
+
+
+def _match_etag(if_none_match: str, etag: str) -> Optional[str]:
+    """
+    If-None-Match 的弱比较：忽略 W/ 前缀和编码后缀，内容版本一致即匹配
+
+    Returns:
+        匹配到的 ETag（客户端缓存的那个压缩版本），不匹配时返回None
+    """
+    if if_none_match.strip() == '*':
+        return etag
+    base = etag.strip('"')
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        tag = candidate.strip('"')
+        if tag == base or tag.rsplit('-', 1)[0] == base:
+            return f'"{tag}"'
+    return None
+
+
+def not_modified_response(if_none_match: str, etag: Optional[str], expires_at: Optional[float]) -> Optional[Response]:
+    """
+    处理条件请求
+
+    Args:
+        if_none_match: 请求的 If-None-Match 头
+        etag: 当前内容的 ETag（make_etag 生成）
+        expires_at: 当前内容的过期时间戳
+
+    Returns:
+        客户端缓存仍然有效时返回 304 响应，否则返回None
+    """
+    matched = _match_etag(if_none_match, etag) if etag and if_none_match else None
+    if matched is None:
+        return None
+    _stats.record_not_modified()
+    # 304 带回客户端缓存的那个版本的 ETag
+    headers = _validator_headers(matched, expires_at, None)
+    return Response(status_code=304, headers=headers)
+
+
+def _choose_encoding(accept_encoding: str, encoded: EncodedResponse) -> Optional[str]:
+    """解析 Accept-Encoding，优先 br，其次 gzip（q=0 表示不接受）"""
+    accepted = set()
+    for part in (accept_encoding or '').lower().split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    if encoded.br is not None and ('br' in accepted or '*' in accepted):
+        return 'br'
+    if encoded.gzip is not None and ('gzip' in accepted or '*' in accepted):
+        return 'gzip'
+    return None
+
+
+class _ResponseCacheStats:
+    """预序列化响应的统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.encoded = 0
+        self.encode_ms_total = 0.0
+        self.bytes_encoded = 0
+        self.served = 0
+        self.served_by_encoding: Dict[str, int] = {}
+        self.not_modified = 0
+
+    def record_encode(self, elapsed_ms: float, size: int) -> None:
+        with self._lock:
+            self.encoded += 1
+            self.encode_ms_total += elapsed_ms
+            self.bytes_encoded += size
+
+    def record_hit(self, encoding: Optional[str]) -> None:
+        with self._lock:
+            self.served += 1
+            name = encoding or 'identity'
+            self.served_by_encoding[name] = self.served_by_encoding.get(name, 0) + 1
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'encoded': self.encoded,
+                'encode_ms_avg': round(self.encode_ms_total / self.encoded, 2) if self.encoded else 0.0,
+                'bytes_encoded': self.bytes_encoded,
+                'served': self.served,
+                'served_by_encoding': dict(self.served_by_encoding),
+                'not_modified': self.not_modified,
+                'brotli_available': brotli is not None,
+            }
+
+
+_stats = _ResponseCacheStats()
+
+
+def encode_payload(payload: Any, etag: Optional[str] = None,
+                   expires_at: Optional[float] = None) -> Optional[EncodedResponse]:
+    """
+    把接口响应编码为 JSON 字节（与 FastAPI 默认的 JSONResponse 输出一致），并生成压缩版本
+
+    Args:
+        payload: 接口返回的对象
+        etag: 响应的 ETag（make_etag 生成，None 表示不支持条件请求）
+        expires_at: 响应的过期时间戳，用于 Cache-Control
+
+    Returns:
+        EncodedResponse；无法编码为标准 JSON（如含 NaN）时返回None，调用方按原方式返回
+    """
+    t0 = time.time()
+    try:
+        body = json.dumps(
+            jsonable_encoder(payload),
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":"),
+        ).encode("utf-8")
+    except (TypeError, ValueError) as e:
+        logger.warning(f"[ResponseCache] ⚠️ 响应无法预序列化，按原方式返回: {type(e).__name__}: {e}")
+        return None
+
+    gzip_body = br_body = None
+    if len(body) >= MIN_COMPRESS_BYTES:
+        # mtime=0：同一内容每次压缩得到相同的字节（强 ETag 要求）
+        gzip_body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        if brotli is not None:
+            br_body = brotli.compress(body, quality=BROTLI_QUALITY)
+
+    encoded = EncodedResponse(body, gzip_body, br_body, etag, expires_at)
+    _stats.record_encode((time.time() - t0) * 1000, encoded.size)
+    return encoded
+
+
+def get_attached_response(cache_key: str, variant: str) -> Optional[EncodedResponse]:
+    """
+    获取挂在内存缓存条目上的预序列化响应
+
+    Args:
+        cache_key: 底层缓存键（如 market:us）
+        variant: 同一条目的不同响应形式
+
+    Returns:
+        EncodedResponse，条目不在内存缓存中或尚未编码时返回None
+    """
+    memory_cache = getattr(get_cache(), 'memory_cache', None)
+    if memory_cache is None:
+        return None
+    return memory_cache.get_attachment(cache_key, ATTACHMENT_PREFIX + variant)
+
+
+def attach_response(cache_key: str, variant: str, source: Any, encoded: EncodedResponse) -> bool:
+    """
+    把预序列化响应挂到内存缓存条目上
+
+    Args:
+        cache_key: 底层缓存键
+        variant: 同一条目的不同响应形式
+        source: 生成响应时使用的缓存数据（条目已被替换时不挂载）
+        encoded: 预序列化响应
+
+    Returns:
+        是否挂载成功
+    """
+    memory_cache = getattr(get_cache(), 'memory_cache', None)
+    if memory_cache is None:
+        return False
+    return memory_cache.set_attachment(cache_key, ATTACHMENT_PREFIX + variant, encoded, source)
+
+
+def get_response_cache_stats() -> Dict[str, Any]:
+    """获取预序列化响应统计（用于监控）"""
+    return _stats.to_dict()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台刷新 - stale-while-revalidate：过期不久的缓存先返回，同时在后台刷新
+
+核心原理：
+1. 缓存条目过了新鲜期但仍在 stale-while-revalidate 窗口内时，调用方直接返回旧数据（标记 _stale），
+   并通过 submit / submit_async 提交一次后台刷新，用户不必等待完整的数据源链路
+2. 同一个键同时只有一次后台刷新，重复提交直接忽略
+3. 同步刷新在专用的小线程池中执行（REVALIDATE_WORKERS 个线程，排队超过 REVALIDATE_QUEUE 时放弃本次刷新，
+   下一次读到过期数据时会再次提交），协程刷新作为事件循环上的后台任务执行
+4. 刷新失败时旧数据保持不变；超出 stale-while-revalidate 窗口但仍在 stale-if-error 窗口内的数据，
+   在同步拉取失败时作为兜底返回（见 cache_market_stocks / BarStore）
+
+使用方法：
+    from service.cache.revalidator import get_revalidator
+
+    revalidator = get_revalidator()
+    revalidator.submit(cache_key, refresh)              # refresh() 返回是否刷新成功
+    revalidator.submit_async(cache_key, refresh_async)  # 在事件循环中调用
+    revalidator.record_stale('revalidate')              # 统计返回旧数据的次数
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+REVALIDATE_WORKERS = int(os.getenv('REVALIDATE_WORKERS', '4'))
+REVALIDATE_QUEUE = int(os.getenv('REVALIDATE_QUEUE', '64'))
+
+
+class Revalidator:
+    """后台刷新调度（同一键同时只有一次刷新）"""
+
+    def __init__(self, max_workers: int = REVALIDATE_WORKERS, max_queue: int = REVALIDATE_QUEUE):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='revalidate')
+        self._max_pending = max_workers + max_queue
+        self._in_progress: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self._submitted = 0
+        self._deduplicated = 0
+        self._dropped = 0
+        self._succeeded = 0
+        self._failed = 0
+        self._stale_served: Dict[str, int] = {}
+
+    def _claim(self, key: str) -> bool:
+        with self._lock:
+            if key in self._in_progress:
+                self._deduplicated += 1
+                return False
+            if len(self._in_progress) >= self._max_pending:
+                self._dropped += 1
+                return False
+            self._in_progress.add(key)
+            self._submitted += 1
+            return True
+
+    def _done(self, key: str, ok: bool) -> None:
+        with self._lock:
+            self._in_progress.discard(key)
+            if ok:
+                self._succeeded += 1
+            else:
+                self._failed += 1
+
+    def submit(self, key: str, refresh: Callable[[], Any]) -> bool:
+        """
+        提交一次同步的后台刷新
+
+        Args:
+            key: 刷新的缓存键（用于去重）
+            refresh: 无参函数，返回值为真表示刷新成功
+
+        Returns:
+            是否提交（同一键已在刷新中或排队已满时返回 False）
+        """
+        if not self._claim(key):
+            return False
+
+        def run():
+            ok = False
+            try:
+                ok = bool(refresh())
+            except Exception as e:
+                logger.warning(f"[Revalidate] ⚠️ {key} 后台刷新异常: {type(e).__name__}: {e}")
+            finally:
+                self._done(key, ok)
+            if ok:
+                logger.info(f"[Revalidate] 🔄 {key} 后台刷新完成")
+
+        try:
+            self._pool.submit(run)
+        except RuntimeError:
+            # 进程退出时线程池已关闭
+            self._done(key, False)
+            return False
+        return True
+
+    def submit_async(self, key: str, refresh: Callable[[], Awaitable[Any]]) -> bool:
+        """
+        在当前事件循环上提交一次后台刷新（须在协程中调用）
+
+        Args:
+            key: 刷新的缓存键（用于去重）
+            refresh: 协程函数，返回值为真表示刷新成功
+
+        Returns:
+            是否提交
+        """
+        if not self._claim(key):
+            return False
+
+        async def run():
+            ok = False
+            try:
+                ok = bool(await refresh())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[Revalidate] ⚠️ {key} 后台刷新异常: {type(e).__name__}: {e}")
+            finally:
+                self._done(key, ok)
+            if ok:
+                logger.info(f"[Revalidate] 🔄 {key} 后台刷新完成")
+
+        # 保留任务引用，避免任务在完成前被垃圾回收
+        task = asyncio.get_running_loop().create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    def record_stale(self, reason: str) -> None:
+        """
+        统计一次返回旧数据
+
+        Args:
+            reason: revalidate（窗口内，后台刷新中）/ error（数据源失败，兜底返回）
+        """
+        with self._lock:
+            self._stale_served[reason] = self._stale_served.get(reason, 0) + 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取后台刷新统计（用于监控）"""
+        with self._lock:
+            return {
+                'in_progress': len(self._in_progress),
+                'submitted': self._submitted,
+                'deduplicated': self._deduplicated,
+                'dropped': self._dropped,
+                'succeeded': self._succeeded,
+                'failed': self._failed,
+                'stale_served': dict(self._stale_served),
+            }
+
+
+# 全局实例
+_revalidator_instance: Optional[Revalidator] = None
+_instance_lock = threading.Lock()
+
+
+def get_revalidator() -> Revalidator:
+    """
+    获取全局后台刷新实例（单例模式）
+
+    Returns:
+        Revalidator实例
+    """
+    global _revalidator_instance
+    if _revalidator_instance is None:
+        with _instance_lock:
+            if _revalidator_instance is None:
+                _revalidator_instance = Revalidator()
+    return _revalidator_instance
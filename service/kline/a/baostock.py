@@ -30,6 +30,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 from ..utils import process_kline_data
+from service.utils.baostock_session import get_baostock_session
 
 
 def get_kline_data_from_baostock(
@@ -60,53 +61,11 @@ def get_kline_data_from_baostock(
         如果失败则返回None
     """
     try:
-        # 使用绝对导入避免本地文件冲突
-        import sys
-        import os
-
-        # 确保从系统包导入baostock，而不是本地文件
-        # 临时从sys.path中移除可能包含本地baostock文件的目录
-        original_path = sys.path.copy()
-
-        # 移除可能包含本地baostock文件的目录
-        paths_to_remove = []
-        for path in sys.path:
-            if os.path.exists(path) and os.path.isdir(path):
-                # 检查是否包含本地baostock.py文件
-                local_baostock_path = os.path.join(path, 'baostock.py')
-                if os.path.exists(local_baostock_path):
-                    paths_to_remove.append(path)
-                # 检查是否包含bs_stocks.py文件（可能被误导入）
-                local_bs_stocks_path = os.path.join(path, 'bs_stocks.py')
-                if os.path.exists(local_bs_stocks_path):
-                    paths_to_remove.append(path)
-
-        for path in paths_to_remove:
-            if path in sys.path:
-                sys.path.remove(path)
-
-        try:
-            import baostock as bs
-        finally:
-            # 恢复原始sys.path
-            sys.path = original_path
-
-        # 检查baostock是否可用
-        if not is_baostock_available():
+        session = get_baostock_session()
+        if not session.is_available():
             logger.warning("baostock 库不可用")
             return None
 
-        # 检查login属性是否存在
-        if not hasattr(bs, 'login'):
-            logger.warning('baostock模块没有login属性')
-            return None
-
-        # 登录Baostock
-        lg = bs.login()
-        if lg.error_code != '0':
-            logger.warning(f"baostock 登录失败: {lg.error_msg}")
-            return None
-
         # 根据市场类型确定股票代码
         if market_type == 'a':
             # Baostock使用格式：sz.000001 或 sh.600000
@@ -123,11 +82,9 @@ def get_kline_data_from_baostock(
                     bs_code = f"sz.{code}"
                 else:
                     logger.warning(f"baostock 无法确定市场: {code}")
-                    bs.logout()
                     return None
         else:
             logger.warning(f"baostock 不支持的市场类型: {market_type}")
-            bs.logout()
             return None
 
         # 确保日期格式为YYYY-MM-DD
@@ -161,9 +118,10 @@ def get_kline_data_from_baostock(
             logger.warning(f"baostock 日期格式处理错误: {e}")
             # 继续尝试使用原始日期
 
-        # 获取日线数据
+        # 获取日线数据（复用共享会话，无需每次登录/登出）
         fields = "date,open,high,low,close,volume"
-        rs = bs.query_history_k_data_plus(
+        rs = session.query(
+            'query_history_k_data_plus',
             bs_code,
             fields,
             start_date=start_date,
@@ -172,28 +130,19 @@ def get_kline_data_from_baostock(
             adjustflag="3"  # 复权类型：3=不复权
         )
 
-        if not rs or rs.error_code != '0':
-            logger.warning(f"baostock 查询失败: {rs.error_msg if rs else '结果为空'}, 股票: {bs_code}")
-            bs.logout()
+        if not rs.ok:
+            logger.warning(f"baostock 查询失败: {rs.error_msg}, 股票: {bs_code}")
             return None
 
-        # 转换为DataFrame
-        data_list = []
-        while (rs.error_code == '0') and rs.next():
-            data_list.append(rs.get_row_data())
-
+        data_list = rs.rows
         if not data_list:
             logger.warning(f"baostock 未找到数据: {bs_code}, 日期: {start_date} ~ {end_date}")
-            bs.logout()
             return None
 
         logger.info(f"baostock 获取到 {len(data_list)} 条数据: {bs_code}")
 
         df = pd.DataFrame(data_list, columns=fields.split(','))
 
-        # 登出
-        bs.logout()
-
         # 转换数据类型
         df['open'] = pd.to_numeric(df['open'])
         df['high'] = pd.to_numeric(df['high'])
@@ -223,51 +172,12 @@ def get_kline_data_from_baostock(
 
     except Exception as e:
         logger.warning(f"baostock 数据源失败: {type(e).__name__}: {e}")
-        # 确保登出
-        try:
-            import baostock as bs
-            bs.logout()
-        except:
-            pass
         return None
 
 
 def is_baostock_available() -> bool:
-    """检查baostock是否可用"""
-    try:
-        # 使用与主函数相同的导入逻辑避免本地文件冲突
-        import sys
-        import os
-
-        # 确保从系统包导入baostock，而不是本地文件
-        # 临时从sys.path中移除可能包含本地baostock文件的目录
-        original_path = sys.path.copy()
-
-        # 移除可能包含本地baostock文件的目录
-        paths_to_remove = []
-        for path in sys.path:
-            if os.path.exists(path) and os.path.isdir(path):
-                # 检查是否包含本地baostock.py文件
-                local_baostock_path = os.path.join(path, 'baostock.py')
-                if os.path.exists(local_baostock_path):
-                    paths_to_remove.append(path)
-                # 检查是否包含bs_stocks.py文件（可能被误导入）
-                local_bs_stocks_path = os.path.join(path, 'bs_stocks.py')
-                if os.path.exists(local_bs_stocks_path):
-                    paths_to_remove.append(path)
-
-        for path in paths_to_remove:
-            if path in sys.path:
-                sys.path.remove(path)
-
-        try:
-            import baostock as bs
-            return True
-        finally:
-            # 恢复原始sys.path
-            sys.path = original_path
-    except ImportError:
-        return False
+    """检查baostock是否可用（模块只解析一次，结果缓存在会话管理器中）"""
+    return get_baostock_session().is_available()
 
 
 if __name__ == "__main__":
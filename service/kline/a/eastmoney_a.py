@@ -18,6 +18,98 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils import process_kline_data
+from service.utils.http_client import http_get
+from service.utils.async_http_client import async_http_get
+
+# 东方财富K线API
+EASTMONEY_KLINE_URL = "http://push2his.eastmoney.com/api/qt/stock/kline/get"
+
+
+def _build_eastmoney_a_params(code: str, start_date: str, end_date: str) -> Optional[Dict]:
+    """构造东方财富A股K线请求参数，无法识别的代码返回None"""
+    # 确定市场后缀
+    if code.startswith(('60', '68', '900')):
+        secid = f"1.{code}"  # 上海
+    elif code.startswith(('00', '30', '200')):
+        secid = f"0.{code}"  # 深圳
+    else:
+        logger.warning(f"无法识别的A股代码格式: {code}")
+        return None
+
+    # 东方财富API参数
+    klt = 101  # 日K线
+    fqt = 1    # 前复权
+
+    # 转换日期格式 YYYY-MM-DD -> YYYYMMDD
+    beg = start_date.replace('-', '')
+    end = end_date.replace('-', '')
+
+    return {
+        "secid": f"{'1' if code.startswith('6') else '0'}.{code}",
+        "klt": klt,
+        "fqt": fqt,
+        "beg": beg,
+        "end": end,
+        "fields1": "f1,f2,f3,f4,f5,f6",
+        "fields2": "f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61",
+        "lmt": 10000  # 最大数据量
+    }
+
+
+def _parse_eastmoney_a_response(
+    code: str,
+    formatted_code: str,
+    market_type: str,
+    start_date: str,
+    end_date: str,
+    data: Dict
+) -> Optional[Dict]:
+    """解析东方财富A股K线响应（同步/异步请求共用），无有效数据时返回None"""
+    if data.get('data') is None or data['data'].get('klines') is None:
+        logger.warning(f"获取K线数据失败: API返回 data=None 或 klines=None, 原始响应: {data}")
+        return None
+
+    klines = data['data']['klines']
+
+    if not klines:
+        logger.warning(f"没有获取到K线数据: {code} 在 {start_date} ~ {end_date} 范围内无数据")
+        return None
+
+    logger.info(f"成功获取 {len(klines)} 条K线数据")
+
+    # 解析数据
+    records = []
+    for kline in klines:
+        parts = kline.split(',')
+        if len(parts) >= 11:
+            record = {
+                'date': parts[0],  # 日期
+                'open': float(parts[1]),  # 开盘
+                'close': float(parts[2]),  # 收盘
+                'high': float(parts[3]),  # 最高
+                'low': float(parts[4]),  # 最低
+                'volume': float(parts[5]),  # 成交量
+                'amount': float(parts[6]),  # 成交额
+                'amplitude': float(parts[7]),  # 振幅
+                'pct_change': float(parts[8]),  # 涨跌幅
+                'change': float(parts[9]),  # 涨跌额
+                'turnover': float(parts[10])  # 换手率
+            }
+            records.append(record)
+
+    df = pd.DataFrame(records)
+
+    # 处理数据
+    processed_data = process_kline_data(df, 'eastmoney_a')
+
+    return {
+        "code": code,
+        "formatted_code": formatted_code,
+        "market": market_type,
+        "data_source": "eastmoney_a",
+        "data": processed_data
+    }
+
 
 def get_kline_data_from_eastmoney_a(
     code: str,
@@ -43,84 +135,35 @@ def get_kline_data_from_eastmoney_a(
     try:
         logger.info(f"正在获取A股 {code} K线数据...")
 
-        # 确定市场后缀
-        if code.startswith(('60', '68', '900')):
-            secid = f"1.{code}"  # 上海
-        elif code.startswith(('00', '30', '200')):
-            secid = f"0.{code}"  # 深圳
-        else:
-            logger.warning(f"无法识别的A股代码格式: {code}")
+        params = _build_eastmoney_a_params(code, start_date, end_date)
+        if params is None:
             return None
 
-        # 东方财富K线API
-        url = "http://push2his.eastmoney.com/api/qt/stock/kline/get"
-
-        # 东方财富API参数
-        klt = 101  # 日K线
-        fqt = 1    # 前复权
-
-        # 转换日期格式 YYYY-MM-DD -> YYYYMMDD
-        beg = start_date.replace('-', '')
-        end = end_date.replace('-', '')
-
-        params = {
-            "secid": f"{'1' if code.startswith('6') else '0'}.{code}",
-            "klt": klt,
-            "fqt": fqt,
-            "beg": beg,
-            "end": end,
-            "fields1": "f1,f2,f3,f4,f5,f6",
-            "fields2": "f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61",
-            "lmt": 10000  # 最大数据量
-        }
-
-        response = requests.get(url, params=params, timeout=5)
-        data = response.json()
-
-        if data.get('data') is None or data['data'].get('klines') is None:
-            logger.warning(f"获取K线数据失败: API返回 data=None 或 klines=None, 原始响应: {data}")
-            return None
+        response = http_get(EASTMONEY_KLINE_URL, params=params)
+        return _parse_eastmoney_a_response(code, formatted_code, market_type, start_date, end_date, response.json())
 
-        klines = data['data']['klines']
+    except Exception as e:
+        logger.warning(f"获取K线数据时发生错误: {type(e).__name__}: {e}")
+        return None
 
-        if not klines:
-            logger.warning(f"没有获取到K线数据: {code} 在 {start_date} ~ {end_date} 范围内无数据")
+
+async def get_kline_data_from_eastmoney_a_async(
+    code: str,
+    formatted_code: str,
+    market_type: str,
+    start_date: str,
+    end_date: str
+) -> Optional[Dict]:
+    """
+    get_kline_data_from_eastmoney_a 的异步版本（参数与返回值相同），请求期间不占用线程
+    """
+    try:
+        params = _build_eastmoney_a_params(code, start_date, end_date)
+        if params is None:
             return None
 
-        logger.info(f"成功获取 {len(klines)} 条K线数据")
-
-        # 解析数据
-        records = []
-        for kline in klines:
-            parts = kline.split(',')
-            if len(parts) >= 11:
-                record = {
-                    'date': parts[0],  # 日期
-                    'open': float(parts[1]),  # 开盘
-                    'close': float(parts[2]),  # 收盘
-                    'high': float(parts[3]),  # 最高
-                    'low': float(parts[4]),  # 最低
-                    'volume': float(parts[5]),  # 成交量
-                    'amount': float(parts[6]),  # 成交额
-                    'amplitude': float(parts[7]),  # 振幅
-                    'pct_change': float(parts[8]),  # 涨跌幅
-                    'change': float(parts[9]),  # 涨跌额
-                    'turnover': float(parts[10])  # 换手率
-                }
-                records.append(record)
-
-        df = pd.DataFrame(records)
-
-        # 处理数据
-        processed_data = process_kline_data(df, 'eastmoney_a')
-
-        return {
-            "code": code,
-            "formatted_code": formatted_code,
-            "market": market_type,
-            "data_source": "eastmoney_a",
-            "data": processed_data
-        }
+        response = await async_http_get(EASTMONEY_KLINE_URL, params=params)
+        return _parse_eastmoney_a_response(code, formatted_code, market_type, start_date, end_date, response.json())
 
     except Exception as e:
         logger.warning(f"获取K线数据时发生错误: {type(e).__name__}: {e}")
@@ -26,12 +26,15 @@ API: https://vip.stock.finance.sina.com.cn/quotes_service/api/json_v2.php/CN_Mar
 
 from typing import Dict, List, Optional
 import logging
+import httpx
 import requests
 
+from service.utils.http_client import http_get
+from service.utils.async_http_client import async_http_get
+
 logger = logging.getLogger(__name__)
 
 SINA_API_URL = "https://vip.stock.finance.sina.com.cn/quotes_service/api/json_v2.php/CN_MarketData.getKLineData"
-DEFAULT_TIMEOUT = 10
 DEFAULT_DATALEN = 500  # 默认返回500条约2年数据
 MAX_DATALEN = 2000  # 测试过最大可返回2000条
 
@@ -68,6 +71,121 @@ def _format_sina_code(code: str) -> str:
         return f"sh{code}"  # 默认按沪市处理
 
 
+def _build_sina_params(code: str, start_date: str, end_date: str, datalen: int) -> Dict:
+    """构造新浪K线请求参数（按开始日期估算需要的条数）"""
+    # 新浪API按 datalen 返回截至今天的最近N条，不支持精确的起止日期
+    # 如果用户指定了日期范围，按开始日期到今天计算大概需要多少条（结束日期较早时也要取到开始日期）
+    actual_datalen = datalen
+    if start_date and end_date:
+        # 粗略估算: 一年约250个交易日
+        try:
+            from datetime import datetime
+            start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+            days_diff = (datetime.now() - start_dt).days
+            estimated_trade_days = max(20, int(days_diff / 7 * 5 * 1.2))  # 估算交易日，加20%余量
+            actual_datalen = min(MAX_DATALEN, max(datalen, estimated_trade_days))
+            logger.info(f"日期范围 {start_date} ~ {end_date}, 估算需 {actual_datalen} 条数据")
+        except (ValueError, ImportError):
+            pass
+
+    return {
+        "symbol": _format_sina_code(code),
+        "scale": 240,  # 日线（240分钟）
+        "ma": "no",
+        "datalen": actual_datalen
+    }
+
+
+def _parse_sina_response(
+    code: str,
+    formatted_code: str,
+    market_type: str,
+    start_date: str,
+    end_date: str,
+    datalen: int,
+    status_code: int,
+    text: str
+) -> Optional[Dict]:
+    """
+    解析新浪K线响应（同步/异步请求共用）
+
+    Returns:
+        K线结果；请求失败或响应异常时返回None。
+        上游可达但区间内没有K线（最近 datalen 条够不到开始日期，或日期过滤后为空）时返回 data 为空的结果，
+        不算作数据源故障（不触发熔断），由调用方换用其他数据源
+    """
+    if status_code != 200:
+        logger.warning(f"新浪API HTTP错误 {status_code}: {code}")
+        return None
+
+    text = text.strip()
+    if not text or text in ['null', '[]']:
+        logger.warning(f"新浪API返回空数据: {code}")
+        return None
+
+    import json
+    try:
+        raw_data = json.loads(text)
+    except json.JSONDecodeError:
+        logger.warning(f"新浪API返回数据格式异常: {code}, 响应: {text[:100]}")
+        return None
+
+    if not isinstance(raw_data, list) or len(raw_data) == 0:
+        logger.warning(f"新浪API返回空列表: {code}")
+        return None
+
+    empty_result = {
+        "code": code,
+        "formatted_code": formatted_code,
+        "market": market_type,
+        "data_source": "sina",
+        "data": []
+    }
+    earliest = min((item.get('day', '') for item in raw_data if isinstance(item, dict)), default='')
+    if start_date and len(raw_data) >= datalen and earliest > start_date:
+        # 只能取到最近 datalen 条：够不到开始日期时不返回残缺的区间
+        logger.info(f"新浪API最近 {datalen} 条K线始于 {earliest}，够不到开始日期 {start_date}: {code}")
+        return empty_result
+
+    # 转换为标准格式，同时按日期范围过滤
+    processed_data: List[Dict] = []
+    for item in raw_data:
+        if not isinstance(item, dict):
+            continue
+
+        day = item.get('day', '')
+
+        # 按日期范围过滤（如果指定了）
+        if start_date and day < start_date:
+            continue
+        if end_date and day > end_date:
+            continue
+
+        processed_data.append({
+            "date": day,
+            "open": float(item.get('open', '0')),
+            "high": float(item.get('high', '0')),
+            "low": float(item.get('low', '0')),
+            "close": float(item.get('close', '0')),
+            "volume": int(float(item.get('volume', '0')))
+        })
+
+    if not processed_data:
+        logger.info(f"新浪API返回数据经日期过滤后为空: {code}, 日期范围: {start_date} ~ {end_date}")
+        return empty_result
+
+    logger.info(f"新浪API成功获取 {code} K线数据: {len(processed_data)} 条 "
+                f"(日期范围: {processed_data[0]['date']} ~ {processed_data[-1]['date']})")
+
+    return {
+        "code": code,
+        "formatted_code": formatted_code,
+        "market": market_type,
+        "data_source": "sina",
+        "data": processed_data
+    }
+
+
 def get_kline_data_from_sina(
     code: str,
     formatted_code: str,
@@ -103,96 +221,19 @@ def get_kline_data_from_sina(
         return None
 
     try:
-        sina_code = _format_sina_code(code)
-        logger.info(f"使用新浪API获取A股 {code} ({sina_code}) K线数据...")
-
-        # 新浪API按 datalen 返回最近N条，不支持精确的起止日期
-        # 如果用户指定了日期范围，我们计算大概需要多少条
-        actual_datalen = datalen
-        if start_date and end_date:
-            # 粗略估算: 一年约250个交易日
-            try:
-                from datetime import datetime
-                start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-                end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-                days_diff = (end_dt - start_dt).days
-                estimated_trade_days = max(20, int(days_diff / 7 * 5 * 1.2))  # 估算交易日，加20%余量
-                actual_datalen = min(MAX_DATALEN, max(datalen, estimated_trade_days))
-                logger.info(f"日期范围 {start_date} ~ {end_date}, 估算需 {actual_datalen} 条数据")
-            except (ValueError, ImportError):
-                pass
-
-        params = {
-            "symbol": sina_code,
-            "scale": 240,  # 日线（240分钟）
-            "ma": "no",
-            "datalen": actual_datalen
-        }
+        logger.info(f"使用新浪API获取A股 {code} ({_format_sina_code(code)}) K线数据...")
+        params = _build_sina_params(code, start_date, end_date, datalen)
 
-        response = requests.get(
+        response = http_get(
             SINA_API_URL,
             params=params,
-            timeout=DEFAULT_TIMEOUT,
             headers=SINA_HEADERS
         )
 
-        if response.status_code != 200:
-            logger.warning(f"新浪API HTTP错误 {response.status_code}: {code}")
-            return None
-
-        text = response.text.strip()
-        if not text or text in ['null', '[]']:
-            logger.warning(f"新浪API返回空数据: {code}")
-            return None
-
-        import json
-        try:
-            raw_data = json.loads(text)
-        except json.JSONDecodeError:
-            logger.warning(f"新浪API返回数据格式异常: {code}, 响应: {text[:100]}")
-            return None
-
-        if not isinstance(raw_data, list) or len(raw_data) == 0:
-            logger.warning(f"新浪API返回空列表: {code}")
-            return None
-
-        # 转换为标准格式，同时按日期范围过滤
-        processed_data: List[Dict] = []
-        for item in raw_data:
-            if not isinstance(item, dict):
-                continue
-
-            day = item.get('day', '')
-
-            # 按日期范围过滤（如果指定了）
-            if start_date and day < start_date:
-                continue
-            if end_date and day > end_date:
-                continue
-
-            processed_data.append({
-                "date": day,
-                "open": float(item.get('open', '0')),
-                "high": float(item.get('high', '0')),
-                "low": float(item.get('low', '0')),
-                "close": float(item.get('close', '0')),
-                "volume": int(float(item.get('volume', '0')))
-            })
-
-        if not processed_data:
-            logger.warning(f"新浪API返回数据经日期过滤后为空: {code}, 日期范围: {start_date} ~ {end_date}")
-            return None
-
-        logger.info(f"新浪API成功获取 {code} K线数据: {len(processed_data)} 条 "
-                    f"(日期范围: {processed_data[0]['date']} ~ {processed_data[-1]['date']})")
-
-        return {
-            "code": code,
-            "formatted_code": formatted_code,
-            "market": market_type,
-            "data_source": "sina",
-            "data": processed_data
-        }
+        return _parse_sina_response(
+            code, formatted_code, market_type, start_date, end_date,
+            params["datalen"], response.status_code, response.text
+        )
 
     except requests.exceptions.Timeout:
         logger.warning(f"新浪API请求超时: {code}")
@@ -205,10 +246,54 @@ def get_kline_data_from_sina(
         return None
 
 
+async def get_kline_data_from_sina_async(
+    code: str,
+    formatted_code: str,
+    market_type: str,
+    start_date: str,
+    end_date: str,
+    datalen: int = DEFAULT_DATALEN
+) -> Optional[Dict]:
+    """
+    get_kline_data_from_sina 的异步版本（参数与返回值相同），请求期间不占用线程
+    """
+    if market_type != 'a':
+        logger.warning(f"新浪数据源仅支持A股，请求的市场类型为: {market_type}")
+        return None
+
+    try:
+        params = _build_sina_params(code, start_date, end_date, datalen)
+        response = await async_http_get(SINA_API_URL, params=params, headers=SINA_HEADERS)
+        return _parse_sina_response(
+            code, formatted_code, market_type, start_date, end_date,
+            params["datalen"], response.status_code, response.text
+        )
+
+    except httpx.TimeoutException:
+        logger.warning(f"新浪API请求超时: {code}")
+        return None
+    except httpx.TransportError as e:
+        logger.warning(f"新浪API连接失败: {code}: {e}")
+        return None
+    except Exception as e:
+        logger.warning(f"新浪数据源失败: {type(e).__name__}: {e}")
+        return None
+
+
 def is_sina_available() -> bool:
-    """检查新浪API是否可用（通过简单的网络探测）"""
+    """
+    检查新浪数据源是否可用
+
+    只做本地检查，不再每次请求前探测网络；
+    新浪API的实际健康状况由数据源熔断器（service.utils.provider_health）根据真实请求结果判断
+    """
+    return True
+
+
+def probe_sina() -> bool:
+    """探测新浪API是否可用（通过简单的网络请求，由熔断器后台低频调用）"""
     try:
-        response = requests.get(
+        response = http_get(
             SINA_API_URL,
             params={"symbol": "sh600519", "scale": 240, "ma": "no", "datalen": 5},
             timeout=5,
@@ -221,7 +306,7 @@ def is_sina_available() -> bool:
 
 if __name__ == "__main__":
     # 测试代码
-    print(f"新浪API可用性: {is_sina_available()}")
+    print(f"新浪API可用性: {probe_sina()}")
 
     # 测试获取贵州茅台
     result = get_kline_data_from_sina(
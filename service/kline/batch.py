@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量K线数据服务
+一次请求获取自选股列表（50~300只）的K线数据：
+1. 一次批量查询解析所有K线序列命中（内存 + 单次MongoDB $in 查询），无需补拉的立即返回
+2. 未命中的按市场分组并发获取，每个市场有独立的并发上限
+   （每个数据源的并发上限由 kline.PROVIDER_CONCURRENCY 在更底层统一控制）
+3. 每只股票获取完成后立即产出结果，单只失败不影响整批；
+   第一步解析缓存时执行器已满，则每只股票输出一行错误并输出汇总（流已开始，不能再返回 503）
+4. 数据源请求走 get_kline_data_async：有协程版本的数据源不为每只股票占用一个线程
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from service.cache.bar_store import get_bar_store
+from service.kline.kline import get_kline_data_async
+from service.utils.executors import run_blocking, ExecutorSaturatedError
+from utils_stock.stock import get_market_type
+
+logger = logging.getLogger(__name__)
+
+# 单次批量请求最多支持的股票数
+MAX_BATCH_SIZE = 300
+
+# 单次批量请求中各市场同时进行的数据源请求数上限
+BATCH_MARKET_CONCURRENCY = {
+    'a': 8,
+    'hk': 4,
+    'us': 4,
+}
+
+
+def _dedupe_codes(codes: List[str]) -> List[str]:
+    """去除空白和重复代码，保持原有顺序"""
+    seen = set()
+    unique_codes = []
+    for code in codes:
+        code = (code or '').strip()
+        if code and code not in seen:
+            seen.add(code)
+            unique_codes.append(code)
+    return unique_codes
+
+
+def _build_item(code: str, result: Optional[Dict[str, Any]], cached: bool) -> Dict[str, Any]:
+    """将 get_kline_data 的结果转换为批量接口的单只股票条目"""
+    if not result or not result.get('data'):
+        return {
+            "code": code,
+            "status": "error",
+            "error": (result or {}).get('error') or "所有数据源都失败",
+        }
+    return {
+        "code": code,
+        "status": "ok",
+        "cached": cached,
+        "market": result.get("market"),
+        "data_source": result.get("data_source"),
+        "data": result["data"],
+    }
+
+
+async def stream_kline_batch(
+    codes: List[str],
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    force: bool = False
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    批量获取K线数据，每只股票就绪后立即产出
+
+    Args:
+        codes: 股票代码列表
+        start_date: 开始日期（YYYY-MM-DD）
+        end_date: 结束日期（YYYY-MM-DD）
+        force: 强制跳过缓存
+
+    Yields:
+        每只股票一个条目 {"type": "result", "code", "status": "ok"/"error", ...}，
+        最后产出一个汇总条目 {"type": "summary", ...}
+    """
+    t_start = time.time()
+    codes = _dedupe_codes(codes)
+    succeeded = 0
+    failed = 0
+    cache_hits = 0
+
+    # 第一步：一次性解析缓存命中
+    pending = codes
+    if not force:
+        try:
+            cached_results = await run_blocking(
+                'kline', get_bar_store().peek_many, [(code, start_date, end_date) for code in codes]
+            )
+        except ExecutorSaturatedError as e:
+            # 响应已经开始（200），无法再返回 503：每只股票输出一行错误，再输出汇总
+            logger.warning(f"[KlineBatch] 执行器繁忙，整批 {len(codes)} 只返回错误: {e}")
+            for code in codes:
+                yield {"type": "result", "code": code, "status": "error", "error": str(e)}
+            yield {
+                "type": "summary",
+                "total": len(codes),
+                "succeeded": 0,
+                "failed": len(codes),
+                "cache_hits": 0,
+                "elapsed_ms": int((time.time() - t_start) * 1000),
+            }
+            return
+        pending = []
+        for code, cached_data in zip(codes, cached_results):
+            if cached_data and cached_data.get('data'):
+                cache_hits += 1
+                succeeded += 1
+                yield {"type": "result", **_build_item(code, cached_data, cached=True)}
+            else:
+                pending.append(code)
+
+    logger.info(f"[KlineBatch] 共 {len(codes)} 只，缓存命中 {cache_hits} 只，需从数据源获取 {len(pending)} 只")
+
+    # 第二步：未命中的按市场限流并发获取
+    market_semaphores = {
+        market: asyncio.Semaphore(limit) for market, limit in BATCH_MARKET_CONCURRENCY.items()
+    }
+
+    async def fetch_one(code: str) -> Dict[str, Any]:
+        clean_code = code.split('.')[0] if '.' in code else code
+        market_type = get_market_type(clean_code)
+        semaphore = market_semaphores.get(market_type) or market_semaphores['us']
+        async with semaphore:
+            try:
+                result = await get_kline_data_async(code, start_date, end_date, force=force)
+                return _build_item(code, result, cached=bool(result and result.get('_cached')))
+            except ExecutorSaturatedError as e:
+                return {"code": code, "status": "error", "error": str(e)}
+            except Exception as e:
+                logger.warning(f"[KlineBatch] {code} 获取失败: {type(e).__name__}: {e}")
+                return {"code": code, "status": "error", "error": f"{type(e).__name__}: {e}"}
+
+    tasks = [asyncio.ensure_future(fetch_one(code)) for code in pending]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            if item["status"] == "ok":
+                succeeded += 1
+            else:
+                failed += 1
+            yield {"type": "result", **item}
+    finally:
+        # 客户端中途断开时取消尚未开始的任务
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+    elapsed_ms = int((time.time() - t_start) * 1000)
+    logger.info(f"[KlineBatch] 完成: 成功 {succeeded} 只，失败 {failed} 只，耗时 {elapsed_ms}ms")
+    yield {
+        "type": "summary",
+        "total": len(codes),
+        "succeeded": succeeded,
+        "failed": failed,
+        "cache_hits": cache_hits,
+        "elapsed_ms": elapsed_ms,
+    }
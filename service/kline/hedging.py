@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线数据源对冲（hedged request）
+
+核心原理：
+1. 主数据源先发起请求
+2. 如果主数据源在其历史延迟的 P 分位数内仍未返回，则并行发起下一个数据源
+   （延迟分位数按数据源分别学习，样本不足时使用配置的最小延迟）
+3. 任何一个数据源失败时立即补发下一个数据源
+4. 第一个返回有效数据的数据源胜出，其余请求被取消
+   （尚未开始的直接取消；已在执行的同步请求无法中断，结果被丢弃）
+5. run_hedged_async 是协程版本：各数据源请求是同一事件循环上的任务，不占用线程；
+   胜出（或超时）后落败的任务立即取消，及时归还数据源并发名额和上游连接
+
+对冲节省的延迟：胜出者不是主数据源时，等主数据源最终结束后，
+记录 (主数据源实际耗时 - 胜出耗时) 作为节省量，汇总在 get_hedge_stats() 中
+（只有同步版本会等到主数据源结束；协程版本取消了主数据源，不记录节省量）
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+# 每个数据源保留的最近成功延迟样本数
+LATENCY_WINDOW = 200
+# 样本数少于该值时不使用学习到的分位数
+MIN_LATENCY_SAMPLES = 5
+# 对冲请求线程池大小（主请求之外的并行数据源请求在此执行）
+HEDGE_POOL_WORKERS = 32
+
+
+class LatencyTracker:
+    """按数据源记录最近的成功请求延迟，用于计算对冲触发延迟"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, source: str, latency: float) -> None:
+        """记录一次成功请求的耗时（秒）"""
+        with self._lock:
+            samples = self._samples.get(source)
+            if samples is None:
+                samples = self._samples[source] = deque(maxlen=self._window)
+            samples.append(latency)
+
+    def percentile(self, source: str, pct: float) -> Optional[float]:
+        """
+        获取数据源延迟的分位数
+
+        Args:
+            source: 数据源名称
+            pct: 分位数（0~100）
+
+        Returns:
+            延迟（秒），样本不足时返回None
+        """
+        with self._lock:
+            samples = list(self._samples.get(source, ()))
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        samples.sort()
+        idx = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[idx]
+
+    def hedge_delay(self, source: str, pct: float, min_delay: float, max_delay: float) -> float:
+        """计算该数据源的对冲触发延迟（限制在 [min_delay, max_delay] 范围内）"""
+        learned = self.percentile(source, pct)
+        if learned is None:
+            return min_delay
+        return max(min_delay, min(max_delay, learned))
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各数据源延迟统计（用于监控）"""
+        with self._lock:
+            snapshot = {source: list(samples) for source, samples in self._samples.items()}
+        stats = {}
+        for source, samples in snapshot.items():
+            samples.sort()
+            stats[source] = {
+                'samples': len(samples),
+                'p50_ms': round(samples[len(samples) // 2] * 1000, 1) if samples else None,
+                'p90_ms': round(samples[int(0.9 * (len(samples) - 1))] * 1000, 1) if samples else None,
+            }
+        return stats
+
+
+class HedgeStats:
+    """对冲模式的累计统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0          # 对冲模式下的请求数
+        self.hedged = 0            # 实际发起了并行请求的次数
+        self.hedge_wins = 0        # 胜出者不是主数据源的次数
+        self.saved_samples = 0     # 已得到主数据源最终耗时的样本数
+        self.saved_ms_total = 0.0  # 累计节省的延迟（毫秒）
+        self.wins_by_source: Dict[str, int] = {}
+
+    def record_request(self, hedged: bool, winner: Optional[str], primary: str) -> None:
+        with self._lock:
+            self.requests += 1
+            if hedged:
+                self.hedged += 1
+            if winner:
+                self.wins_by_source[winner] = self.wins_by_source.get(winner, 0) + 1
+                if winner != primary:
+                    self.hedge_wins += 1
+
+    def record_saving(self, saved_ms: float) -> None:
+        with self._lock:
+            self.saved_samples += 1
+            self.saved_ms_total += saved_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hedged': self.hedged,
+                'hedge_wins': self.hedge_wins,
+                'wins_by_source': dict(self.wins_by_source),
+                'saved_samples': self.saved_samples,
+                'saved_ms_total': round(self.saved_ms_total, 1),
+                'saved_ms_avg': round(self.saved_ms_total / self.saved_samples, 1) if self.saved_samples else 0.0,
+            }
+
+
+_latency_tracker = LatencyTracker()
+_hedge_stats = HedgeStats()
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+# 落败后正在取消的协程请求（保持引用直到取消完成，避免任务被回收）
+_background_tasks: Set['asyncio.Task'] = set()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """获取全局延迟统计实例"""
+    return _latency_tracker
+
+
+def get_hedge_stats() -> Dict[str, Any]:
+    """获取对冲统计与各数据源延迟分布（用于监控）"""
+    stats = _hedge_stats.to_dict()
+    stats['latency'] = _latency_tracker.get_stats()
+    return stats
+
+
+def _get_hedge_pool() -> ThreadPoolExecutor:
+    """延迟创建对冲线程池"""
+    global _hedge_pool
+    if _hedge_pool is None:
+        with _pool_lock:
+            if _hedge_pool is None:
+                _hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_POOL_WORKERS, thread_name_prefix="kline-hedge")
+    return _hedge_pool
+
+
+def _timed_attempt(attempt: Callable[[str], Any], source: str) -> Tuple[Any, float]:
+    """在线程中执行单个数据源请求，返回 (结果, 耗时秒)"""
+    t0 = time.time()
+    result = attempt(source)
+    return result, time.time() - t0
+
+
+def run_hedged(
+    sources: List[str],
+    attempt: Callable[[str], Any],
+    is_valid: Callable[[Any], bool],
+    percentile: float = 90,
+    min_delay: float = 0.5,
+    max_delay: float = 5.0,
+    timeout: float = 30.0,
+    skip_exceptions: Tuple[Type[BaseException], ...] = (),
+    log_prefix: str = ""
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    以对冲模式依次/并行尝试多个数据源，返回第一个有效结果
+
+    Args:
+        sources: 按优先级排列的数据源列表（第一个为主数据源）
+        attempt: 请求单个数据源的函数 attempt(source) -> result
+        is_valid: 判断结果是否有效
+        percentile: 触发对冲的延迟分位数（0~100）
+        min_delay: 对冲触发延迟下限（秒），也是样本不足时的默认值
+        max_delay: 对冲触发延迟上限（秒）
+        timeout: 总超时（秒）
+        skip_exceptions: 视为“跳过”而非失败的异常类型（仅影响日志级别）
+        log_prefix: 日志前缀
+
+    Returns:
+        (胜出结果或None, 对冲信息字典)
+        对冲信息: {"primary", "winner", "launched", "hedged", "elapsed_ms", "last_error"}
+    """
+    pool = _get_hedge_pool()
+    t_start = time.time()
+    deadline = t_start + timeout
+    primary = sources[0]
+
+    in_flight: Dict[Any, Tuple[str, float]] = {}  # future → (数据源, 发起时间)
+    launched: List[str] = []
+    next_idx = 0
+    winner: Optional[str] = None
+    winner_result: Any = None
+    winner_elapsed = 0.0
+    last_error: Optional[BaseException] = None
+    hedged = False  # 是否因超时触发过并行对冲（失败后的补发不算）
+
+    def launch(reason: str) -> None:
+        nonlocal next_idx
+        source = sources[next_idx]
+        next_idx += 1
+        launched.append(source)
+        future = pool.submit(_timed_attempt, attempt, source)
+        in_flight[future] = (source, time.time())
+        logger.info(f"{log_prefix} 🚀 发起数据源 {source} ({len(launched)}/{len(sources)}) [{reason}]")
+
+    launch("主数据源")
+
+    while in_flight:
+        now = time.time()
+        if now >= deadline:
+            logger.warning(f"{log_prefix} ⏱️ 对冲模式已耗时 {now - t_start:.1f}s，超过 {timeout}s 限制，停止等待")
+            break
+
+        wait_for = deadline - now
+        hedge_delay = None
+        if next_idx < len(sources):
+            # 以最近发起的数据源的学习延迟作为对冲触发时间
+            latest_source, latest_launched_at = list(in_flight.values())[-1]
+            hedge_delay = _latency_tracker.hedge_delay(latest_source, percentile, min_delay, max_delay)
+            wait_for = min(wait_for, max(0.0, latest_launched_at + hedge_delay - now))
+
+        done, _ = wait(list(in_flight), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+        failed_count = 0
+        for future in done:
+            source, _launched_at = in_flight.pop(future)
+            try:
+                result, elapsed = future.result()
+            except skip_exceptions as e:
+                logger.info(f"{log_prefix} ⏭️ 数据源 {source} {e}，跳过")
+                failed_count += 1
+                continue
+            except Exception as e:
+                last_error = e
+                logger.warning(f"{log_prefix} ❌ 数据源 {source} 异常: {type(e).__name__}: {e}")
+                failed_count += 1
+                continue
+
+            if is_valid(result):
+                _latency_tracker.record(source, elapsed)
+                if winner is None:
+                    winner, winner_result, winner_elapsed = source, result, time.time() - t_start
+            else:
+                logger.warning(f"{log_prefix} ❌ 数据源 {source} 返回空数据或失败, 耗时 {elapsed:.1f}s")
+                failed_count += 1
+
+        if winner is not None:
+            break
+
+        if next_idx >= len(sources):
+            continue
+        if failed_count:
+            # 有数据源失败，立即补发下一个
+            for _ in range(min(failed_count, len(sources) - next_idx)):
+                launch("前序数据源失败")
+        elif not done:
+            # 最近发起的数据源超过学习延迟仍未返回，并行发起下一个
+            hedged = True
+            launch(f"超过 P{percentile:g} 延迟 {hedge_delay:.2f}s 未返回，对冲")
+
+    # 取消/丢弃仍在进行中的请求
+    primary_future = None
+    for future, (source, launched_at) in in_flight.items():
+        if future.cancel():
+            logger.info(f"{log_prefix} 🛑 已取消未开始的数据源请求 {source}")
+            continue
+        if source == primary and winner is not None and winner != primary:
+            primary_future = future
+        # 已在执行的请求无法中断：结束后仅记录延迟样本，结果丢弃
+        future.add_done_callback(_make_late_result_recorder(source, is_valid))
+
+    if primary_future is not None:
+        primary_future.add_done_callback(_make_saving_recorder(winner_elapsed))
+
+    _hedge_stats.record_request(hedged, winner, primary)
+
+    info = {
+        "primary": primary,
+        "winner": winner,
+        "launched": launched,
+        "hedged": hedged,
+        "elapsed_ms": int((time.time() - t_start) * 1000),
+        "last_error": str(last_error) if last_error else None,
+    }
+    if winner is not None and winner != primary:
+        logger.info(
+            f"{log_prefix} 🏁 对冲胜出: {winner}（主数据源 {primary} 未及时返回），耗时 {winner_elapsed:.2f}s"
+        )
+    return winner_result, info
+
+
+def _make_late_result_recorder(source: str, is_valid: Callable[[Any], bool]) -> Callable:
+    """落败请求结束后，仍把其成功延迟计入学习样本"""
+    def on_done(future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        result, elapsed = future.result()
+        if is_valid(result):
+            _latency_tracker.record(source, elapsed)
+    return on_done
+
+
+def _make_saving_recorder(winner_elapsed: float) -> Callable:
+    """主数据源最终结束后，记录对冲节省的延迟"""
+    def on_done(future):
+        if future.cancelled():
+            return
+        if future.exception() is None:
+            _result, primary_elapsed = future.result()
+            _hedge_stats.record_saving(max(0.0, (primary_elapsed - winner_elapsed) * 1000))
+    return on_done
+
+
+async def _timed_attempt_async(attempt: Callable[[str], Awaitable[Any]], source: str) -> Tuple[Any, float]:
+    """执行单个数据源的协程请求，返回 (结果, 耗时秒)"""
+    t0 = time.time()
+    result = await attempt(source)
+    return result, time.time() - t0
+
+
+async def run_hedged_async(
+    sources: List[str],
+    attempt: Callable[[str], Awaitable[Any]],
+    is_valid: Callable[[Any], bool],
+    percentile: float = 90,
+    min_delay: float = 0.5,
+    max_delay: float = 5.0,
+    timeout: float = 30.0,
+    skip_exceptions: Tuple[Type[BaseException], ...] = (),
+    log_prefix: str = ""
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    run_hedged 的协程版本：各数据源请求作为事件循环上的任务并行执行
+
+    Args:
+        sources: 按优先级排列的数据源列表（第一个为主数据源）
+        attempt: 请求单个数据源的协程函数 attempt(source) -> result
+        is_valid: 判断结果是否有效
+        percentile: 触发对冲的延迟分位数（0~100）
+        min_delay: 对冲触发延迟下限（秒），也是样本不足时的默认值
+        max_delay: 对冲触发延迟上限（秒）
+        timeout: 总超时（秒）
+        skip_exceptions: 视为“跳过”而非失败的异常类型（仅影响日志级别）
+        log_prefix: 日志前缀
+
+    Returns:
+        (胜出结果或None, 对冲信息字典)，格式与 run_hedged 相同
+    """
+    t_start = time.time()
+    deadline = t_start + timeout
+    primary = sources[0]
+
+    in_flight: Dict[asyncio.Task, Tuple[str, float]] = {}  # 任务 → (数据源, 发起时间)
+    launched: List[str] = []
+    next_idx = 0
+    winner: Optional[str] = None
+    winner_result: Any = None
+    winner_elapsed = 0.0
+    last_error: Optional[BaseException] = None
+    hedged = False
+
+    def launch(reason: str) -> None:
+        nonlocal next_idx
+        source = sources[next_idx]
+        next_idx += 1
+        launched.append(source)
+        task = asyncio.ensure_future(_timed_attempt_async(attempt, source))
+        in_flight[task] = (source, time.time())
+        logger.info(f"{log_prefix} 🚀 发起数据源 {source} ({len(launched)}/{len(sources)}) [{reason}]")
+
+    launch("主数据源")
+
+    try:
+        while in_flight:
+            now = time.time()
+            if now >= deadline:
+                logger.warning(f"{log_prefix} ⏱️ 对冲模式已耗时 {now - t_start:.1f}s，超过 {timeout}s 限制，停止等待")
+                break
+
+            wait_for = deadline - now
+            hedge_delay = None
+            if next_idx < len(sources):
+                latest_source, latest_launched_at = list(in_flight.values())[-1]
+                hedge_delay = _latency_tracker.hedge_delay(latest_source, percentile, min_delay, max_delay)
+                wait_for = min(wait_for, max(0.0, latest_launched_at + hedge_delay - now))
+
+            done, _ = await asyncio.wait(list(in_flight), timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+
+            failed_count = 0
+            for task in done:
+                source, _launched_at = in_flight.pop(task)
+                try:
+                    result, elapsed = task.result()
+                except skip_exceptions as e:
+                    logger.info(f"{log_prefix} ⏭️ 数据源 {source} {e}，跳过")
+                    failed_count += 1
+                    continue
+                except Exception as e:
+                    last_error = e
+                    logger.warning(f"{log_prefix} ❌ 数据源 {source} 异常: {type(e).__name__}: {e}")
+                    failed_count += 1
+                    continue
+
+                if is_valid(result):
+                    _latency_tracker.record(source, elapsed)
+                    if winner is None:
+                        winner, winner_result, winner_elapsed = source, result, time.time() - t_start
+                else:
+                    logger.warning(f"{log_prefix} ❌ 数据源 {source} 返回空数据或失败, 耗时 {elapsed:.1f}s")
+                    failed_count += 1
+
+            if winner is not None:
+                break
+
+            if next_idx >= len(sources):
+                continue
+            if failed_count:
+                for _ in range(min(failed_count, len(sources) - next_idx)):
+                    launch("前序数据源失败")
+            elif not done:
+                hedged = True
+                launch(f"超过 P{percentile:g} 延迟 {hedge_delay:.2f}s 未返回，对冲")
+    except asyncio.CancelledError:
+        # 调用方被取消：进行中的请求一并取消
+        for task in in_flight:
+            task.cancel()
+        raise
+
+    # 落败（或超时）的请求立即取消，归还数据源并发名额和上游连接；
+    # 仍在进行中的请求没有完整耗时，不记录延迟样本和节省量。保留引用直到任务处理完取消
+    for task in in_flight:
+        task.cancel()
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    _hedge_stats.record_request(hedged, winner, primary)
+
+    info = {
+        "primary": primary,
+        "winner": winner,
+        "launched": launched,
+        "hedged": hedged,
+        "elapsed_ms": int((time.time() - t_start) * 1000),
+        "last_error": str(last_error) if last_error else None,
+    }
+    if winner is not None and winner != primary:
+        logger.info(
+            f"{log_prefix} 🏁 对冲胜出: {winner}（主数据源 {primary} 未及时返回），耗时 {winner_elapsed:.2f}s"
+        )
+    return winner_result, info
@@ -5,7 +5,8 @@ Eastmoney港股K线数据源模块
 用于从东方财富API获取港股K线数据
 """
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
+import httpx
 import pandas as pd
 import requests
 from datetime import datetime, timedelta
@@ -19,6 +20,136 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils import process_kline_data
+from service.utils.http_client import http_get
+from service.utils.async_http_client import async_http_get
+
+
+# 东方财富港股K线API
+EASTMONEY_HK_KLINE_URL = "https://push2his.eastmoney.com/api/qt/stock/kline/get"
+
+
+def _normalize_hk_dates(start_date: str, end_date: str) -> Tuple[str, str, str, str]:
+    """
+    处理日期格式，支持 YYYY-MM-DD 和 YYYYMMDD
+
+    Returns:
+        (start_date, end_date, beg, end)：前两项标准化为 YYYY-MM-DD，后两项为接口所需的 YYYYMMDD
+
+    Raises:
+        ValueError: 日期格式无法解析
+    """
+    if "-" in start_date:
+        datetime.strptime(start_date, '%Y-%m-%d')
+        beg_date = start_date.replace("-", "")
+    else:
+        start_dt = datetime.strptime(start_date, '%Y%m%d')
+        beg_date = start_date
+        start_date = start_dt.strftime('%Y-%m-%d')
+
+    if "-" in end_date:
+        datetime.strptime(end_date, '%Y-%m-%d')
+        end_date_formatted = end_date.replace("-", "")
+    else:
+        end_dt = datetime.strptime(end_date, '%Y%m%d')
+        end_date_formatted = end_date
+        end_date = end_dt.strftime('%Y-%m-%d')
+
+    return start_date, end_date, beg_date, end_date_formatted
+
+
+def _build_eastmoney_hk_params(code: str, beg_date: str, end_date_formatted: str) -> Dict[str, str]:
+    """构造东方财富港股K线请求参数"""
+    # 港股代码格式：116.HK -> 00116
+    # 需要将代码转换为东方财富格式
+    eastmoney_code = code.zfill(5)  # 港股代码补零到5位
+
+    return {
+        "secid": f"116.{eastmoney_code}",  # 港股市场代码116
+        "ut": "fa5fd1943c7b386f172d6893dbfba10b",
+        "fields1": "f1,f2,f3,f4,f5,f6",
+        "fields2": "f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61",
+        "klt": "101",  # 日K线
+        "fqt": "1",    # 前复权
+        "beg": beg_date,
+        "end": end_date_formatted,
+        "lmt": "10000",  # 最大数据量
+    }
+
+
+def _parse_eastmoney_hk_response(
+    code: str,
+    formatted_code: str,
+    market_type: str,
+    start_date: str,
+    end_date: str,
+    data: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """解析东方财富港股K线响应（同步/异步请求共用），无有效数据时返回None"""
+    if data.get("rc") != 0:
+        logger.warning(f"API返回错误: rc={data.get('rc')}, rt={data.get('rt', '未知错误')}")
+        return None
+
+    klines = data.get("data", {}).get("klines", [])
+
+    if not klines:
+        logger.warning(f"未获取到K线数据: {code}")
+        return None
+
+    # 解析K线数据
+    records = []
+    for kline in klines:
+        parts = kline.split(",")
+        if len(parts) >= 11:
+            record = {
+                "date": parts[0],  # 日期
+                "open": float(parts[1]),  # 开盘
+                "close": float(parts[2]),  # 收盘
+                "high": float(parts[3]),  # 最高
+                "low": float(parts[4]),  # 最低
+                "volume": float(parts[5]),  # 成交量
+                "amount": float(parts[6]),  # 成交额
+                "amplitude": float(parts[7]),  # 振幅
+                "pct_change": float(parts[8]),  # 涨跌幅
+                "change": float(parts[9]),  # 涨跌额
+                "turnover": float(parts[10])  # 换手率
+            }
+            records.append(record)
+
+    # 转换为DataFrame
+    df = pd.DataFrame(records)
+
+    # 确保日期格式正确
+    df["date"] = pd.to_datetime(df["date"])
+
+    # 按日期排序
+    df = df.sort_values("date")
+
+    # 添加时间过滤：确保数据在请求的时间范围内
+    start_dt = pd.to_datetime(start_date)
+    end_dt = pd.to_datetime(end_date)
+    df = df[(df["date"] >= start_dt) & (df["date"] <= end_dt)]
+
+    if df.empty:
+        logger.warning(f"在指定时间范围内未找到数据: {start_date} 到 {end_date}")
+        return None
+
+    # 处理数据
+    processed_data = process_kline_data(df, "eastmoney_hk")
+
+    if not processed_data:
+        logger.warning(f"数据处理失败: {code}")
+        return None
+
+    result = {
+        "code": code,
+        "formatted_code": formatted_code,
+        "market": market_type,
+        "data_source": "eastmoney_hk",
+        "data": processed_data
+    }
+
+    logger.info(f"成功获取 {len(processed_data)} 条K线数据: {code}")
+    return result
 
 
 def get_kline_data_from_eastmoney_hk(
@@ -57,47 +188,13 @@ def get_kline_data_from_eastmoney_hk(
     try:
         logger.info(f"正在获取港股 {code} K线数据...")
 
-        # 东方财富港股K线API
-        # 港股代码格式：116.HK -> 00116
-        # 需要将代码转换为东方财富格式
-        eastmoney_code = code.zfill(5)  # 港股代码补零到5位
-
-        # 构建API URL
-        url = f"https://push2his.eastmoney.com/api/qt/stock/kline/get"
-
-        # 处理日期格式，支持 YYYY-MM-DD 和 YYYYMMDD
         try:
-            if "-" in start_date:
-                start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-                beg_date = start_date.replace("-", "")
-            else:
-                start_dt = datetime.strptime(start_date, '%Y%m%d')
-                beg_date = start_date
-                start_date = start_dt.strftime('%Y-%m-%d') # 标准化为 YYYY-MM-DD 供后续使用
-
-            if "-" in end_date:
-                end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-                end_date_formatted = end_date.replace("-", "")
-            else:
-                end_dt = datetime.strptime(end_date, '%Y%m%d')
-                end_date_formatted = end_date
-                end_date = end_dt.strftime('%Y-%m-%d') # 标准化为 YYYY-MM-DD 供后续使用
+            start_date, end_date, beg_date, end_date_formatted = _normalize_hk_dates(start_date, end_date)
         except ValueError as e:
             logger.warning(f"日期格式解析错误: {e}")
             return None
 
-        # API参数
-        params = {
-            "secid": f"116.{eastmoney_code}",  # 港股市场代码116
-            "ut": "fa5fd1943c7b386f172d6893dbfba10b",
-            "fields1": "f1,f2,f3,f4,f5,f6",
-            "fields2": "f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61",
-            "klt": "101",  # 日K线
-            "fqt": "1",    # 前复权
-            "beg": beg_date,
-            "end": end_date_formatted,
-            "lmt": "10000",  # 最大数据量
-        }
+        params = _build_eastmoney_hk_params(code, beg_date, end_date_formatted)
 
         # 发送请求
         # 注意：由于本地SSL证书问题，这里禁用verify
@@ -105,77 +202,45 @@ def get_kline_data_from_eastmoney_hk(
         import urllib3
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-        response = requests.get(url, params=params, timeout=5, verify=False)
+        response = http_get(EASTMONEY_HK_KLINE_URL, params=params, verify=False)
         response.raise_for_status()
-        data = response.json()
-
-        if data.get("rc") != 0:
-            logger.warning(f"API返回错误: rc={data.get('rc')}, rt={data.get('rt', '未知错误')}")
-            return None
+        return _parse_eastmoney_hk_response(code, formatted_code, market_type, start_date, end_date, response.json())
 
-        klines = data.get("data", {}).get("klines", [])
-
-        if not klines:
-            logger.warning(f"未获取到K线数据: {code}")
-            return None
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"网络请求失败: {type(e).__name__}: {e}")
+        return None
+    except Exception as e:
+        logger.warning(f"获取K线数据时发生错误: {type(e).__name__}: {e}")
+        return None
 
-        # 解析K线数据
-        records = []
-        for kline in klines:
-            parts = kline.split(",")
-            if len(parts) >= 11:
-                record = {
-                    "date": parts[0],  # 日期
-                    "open": float(parts[1]),  # 开盘
-                    "close": float(parts[2]),  # 收盘
-                    "high": float(parts[3]),  # 最高
-                    "low": float(parts[4]),  # 最低
-                    "volume": float(parts[5]),  # 成交量
-                    "amount": float(parts[6]),  # 成交额
-                    "amplitude": float(parts[7]),  # 振幅
-                    "pct_change": float(parts[8]),  # 涨跌幅
-                    "change": float(parts[9]),  # 涨跌额
-                    "turnover": float(parts[10])  # 换手率
-                }
-                records.append(record)
-
-        # 转换为DataFrame
-        df = pd.DataFrame(records)
-
-        # 确保日期格式正确
-        df["date"] = pd.to_datetime(df["date"])
-
-        # 按日期排序
-        df = df.sort_values("date")
-
-        # 添加时间过滤：确保数据在请求的时间范围内
-        start_dt = pd.to_datetime(start_date)
-        end_dt = pd.to_datetime(end_date)
-        df = df[(df["date"] >= start_dt) & (df["date"] <= end_dt)]
-
-        if df.empty:
-            logger.warning(f"在指定时间范围内未找到数据: {start_date} 到 {end_date}")
-            return None
 
-        # 处理数据
-        processed_data = process_kline_data(df, "eastmoney_hk")
+async def get_kline_data_from_eastmoney_hk_async(
+    code: str,
+    formatted_code: str,
+    market_type: str,
+    start_date: str,
+    end_date: str
+) -> Optional[Dict[str, Any]]:
+    """
+    get_kline_data_from_eastmoney_hk 的异步版本（参数与返回值相同），请求期间不占用线程
+    """
+    if market_type != 'hk':
+        logger.warning(f"eastmoney_hk 仅支持港股(hk)市场，收到: {market_type}")
+        return None
 
-        if not processed_data:
-            logger.warning(f"数据处理失败: {code}")
+    try:
+        try:
+            start_date, end_date, beg_date, end_date_formatted = _normalize_hk_dates(start_date, end_date)
+        except ValueError as e:
+            logger.warning(f"日期格式解析错误: {e}")
             return None
 
-        result = {
-            "code": code,
-            "formatted_code": formatted_code,
-            "market": market_type,
-            "data_source": "eastmoney_hk",
-            "data": processed_data
-        }
-
-        logger.info(f"成功获取 {len(processed_data)} 条K线数据: {code}")
-        return result
+        params = _build_eastmoney_hk_params(code, beg_date, end_date_formatted)
+        response = await async_http_get(EASTMONEY_HK_KLINE_URL, params=params, verify=False)
+        response.raise_for_status()
+        return _parse_eastmoney_hk_response(code, formatted_code, market_type, start_date, end_date, response.json())
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.warning(f"网络请求失败: {type(e).__name__}: {e}")
         return None
     except Exception as e:
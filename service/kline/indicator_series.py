@@ -0,0 +1,375 @@
+"""
+技术指标序列 - 基于缓存中的K线，用 NumPy 向量化计算整段指标序列，按列返回给图表客户端
+
+核心原理：
+1. 支持的指标与参数（名称:参数1:参数2...，未写参数时使用默认值）：
+   ma:5:10:20:60:120、macd:12:26:9、boll:20:2、rsi:14、kdj:9:3:3、atr:14、obv
+   定义与 calculate_technical_indicators（主力动向）一致：MACD 柱为 (DIF - DEA) * 2，RSI / ATR 为 Wilder 平滑
+   （ewm(alpha=1/n, adjust=False)），KDJ 的 K / D 为 ewm(com=m-1, adjust=False)，BOLL 为样本标准差
+2. 计算全部向量化：滚动窗口用 sliding_window_view 一次得到所有窗口，ewm(adjust=False) 的递推按
+   EWM_BLOCK 根K线分块写成闭式（块内 cumsum，块间只传递一个状态），不在 Python 中逐根循环
+3. 请求区间之前多取 INDICATOR_WARMUP_DAYS 天K线作为预热（均线窗口、EWM 收敛），预热起点对齐到当年 1 月 1 日，
+   K线总是取到今天再截取请求区间：同一年内平移 / 缩放图表时取到的是同一段K线，计算结果可以复用
+4. 计算结果按 (代码, 指标, 参数, 首根K线日期, 最后一根K线) 缓存在内存 LRU 中（最多 INDICATOR_SERIES_CACHE_ENTRIES 项）；
+   最后一根K线的开高低收量都参与缓存键，盘中K线变化时重新计算，不会返回旧值
+5. 返回按列组织：dates 与各指标的每一列都是等长数组，NaN（窗口未满）为 null，数值保留 4 位小数
+
+使用方法：
+    from service.kline.indicator_series import parse_indicator_names, get_indicator_series
+
+    specs = parse_indicator_names('ma,macd,kdj:9:3:3')
+    result = get_indicator_series('600519', specs, '2026-01-01', '2026-10-16')
+    result['indicators']['macd']['columns']['hist']   # 与 result['dates'] 等长
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+INDICATOR_WARMUP_DAYS = int(os.getenv('INDICATOR_WARMUP_DAYS', '250'))
+INDICATOR_SERIES_CACHE_ENTRIES = int(os.getenv('INDICATOR_SERIES_CACHE_ENTRIES', '512'))
+
+DATE_FORMAT = '%Y-%m-%d'
+# 分块递推的块长：块内权重 (1-alpha)^-k 不超过 float64 的范围
+EWM_BLOCK = 128
+DECIMALS = 4
+
+# 指标 → (默认参数, 参数个数上下限)
+DEFAULT_PARAMS: Dict[str, Tuple[float, ...]] = {
+    'ma': (5, 10, 20, 60, 120),
+    'macd': (12, 26, 9),
+    'boll': (20, 2),
+    'rsi': (14,),
+    'kdj': (9, 3, 3),
+    'atr': (14,),
+    'obv': (),
+}
+PARAM_COUNTS: Dict[str, Tuple[int, int]] = {
+    'ma': (1, 8),
+    'macd': (3, 3),
+    'boll': (2, 2),
+    'rsi': (1, 1),
+    'kdj': (3, 3),
+    'atr': (1, 1),
+    'obv': (0, 0),
+}
+DEFAULT_NAMES = ('ma', 'macd', 'boll', 'rsi', 'kdj')
+
+
+def parse_indicator_names(names: Optional[str]) -> List[Tuple[str, Tuple[float, ...]]]:
+    """
+    解析指标列表
+
+    Args:
+        names: 逗号分隔的指标，如 'ma,macd,boll:20:2'；为空时使用 DEFAULT_NAMES
+
+    Returns:
+        [(指标名, 参数), ...]（去重，保持顺序）
+
+    Raises:
+        ValueError: 未知指标或参数不合法
+    """
+    specs: List[Tuple[str, Tuple[float, ...]]] = []
+    for token in (names or ','.join(DEFAULT_NAMES)).split(','):
+        token = token.strip().lower()
+        if not token:
+            continue
+        name, *raw_params = token.split(':')
+        if name not in DEFAULT_PARAMS:
+            raise ValueError(f"不支持的指标：{name}（可选 {' / '.join(DEFAULT_PARAMS)}）")
+        low, high = PARAM_COUNTS[name]
+        if raw_params and not low <= len(raw_params) <= high:
+            raise ValueError(f"指标 {name} 的参数个数应为 {low}~{high} 个，收到 {len(raw_params)} 个")
+        try:
+            params = tuple(float(p) for p in raw_params) or DEFAULT_PARAMS[name]
+        except ValueError:
+            raise ValueError(f"指标 {name} 的参数不是数字：{':'.join(raw_params)}")
+        # 窗口 / 周期为正整数；BOLL 的倍数可以是小数
+        integral = params if name != 'boll' else params[:1]
+        if any(p < 1 or p != int(p) for p in integral) or any(p <= 0 for p in params):
+            raise ValueError(f"指标 {name} 的参数应为正整数：{':'.join(raw_params)}")
+        params = tuple(int(p) if p == int(p) else p for p in params)
+        if (name, params) not in specs:
+            specs.append((name, params))
+    if not specs:
+        raise ValueError('至少需要一个指标')
+    return specs
+
+
+# ---------------------------------------------------------------------------
+# 向量化内核
+# ---------------------------------------------------------------------------
+
+def _rolling(x: np.ndarray, window: int, reducer: Callable[..., np.ndarray], **kwargs) -> np.ndarray:
+    """滚动窗口统计（前 window-1 项为 NaN）"""
+    out = np.full(x.shape, np.nan)
+    if window <= len(x):
+        out[window - 1:] = reducer(sliding_window_view(x, window), axis=1, **kwargs)
+    return out
+
+
+def _ewm(x: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    ewm(alpha, adjust=False).mean()：y[0] = x[0]，y[t] = (1 - alpha) * y[t-1] + alpha * x[t]
+
+    从第一个非 NaN 值开始递推（之前为 NaN）；每块内 y[k] = d^k * (d * carry + alpha * cumsum(x[j] * d^-j))，
+    d = 1 - alpha，块之间只传递 carry
+    """
+    out = np.full(x.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(x))
+    if not len(valid):
+        return out
+    first = valid[0]
+    decay = 1.0 - alpha
+    out[first] = carry = x[first]
+    if decay == 0.0:
+        out[first:] = x[first:]
+        return out
+
+    powers = decay ** np.arange(EWM_BLOCK)
+    inverse = 1.0 / powers
+    for start in range(first + 1, len(x), EWM_BLOCK):
+        block = x[start:start + EWM_BLOCK]
+        n = len(block)
+        y = powers[:n] * (decay * carry + alpha * np.cumsum(block * inverse[:n]))
+        out[start:start + n] = y
+        carry = y[-1]
+    return out
+
+
+def _divide(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return a / b
+
+
+def _ma(bars: Dict[str, np.ndarray], windows: Tuple[int, ...]) -> Dict[str, np.ndarray]:
+    return {f'ma{w}': _rolling(bars['close'], w, np.mean) for w in windows}
+
+
+def _macd(bars: Dict[str, np.ndarray], params: Tuple[int, ...]) -> Dict[str, np.ndarray]:
+    fast, slow, signal = params
+    close = bars['close']
+    dif = _ewm(close, 2.0 / (fast + 1)) - _ewm(close, 2.0 / (slow + 1))
+    dea = _ewm(dif, 2.0 / (signal + 1))
+    return {'dif': dif, 'dea': dea, 'hist': (dif - dea) * 2}
+
+
+def _boll(bars: Dict[str, np.ndarray], params: Tuple[float, ...]) -> Dict[str, np.ndarray]:
+    window, width = int(params[0]), params[1]
+    close = bars['close']
+    mid = _rolling(close, window, np.mean)
+    std = _rolling(close, window, np.std, ddof=1) if window > 1 else np.full(close.shape, np.nan)
+    return {'mid': mid, 'upper': mid + width * std, 'lower': mid - width * std}
+
+
+def _rsi(bars: Dict[str, np.ndarray], params: Tuple[int, ...]) -> Dict[str, np.ndarray]:
+    close = bars['close']
+    delta = np.diff(close, prepend=np.nan)
+    # 与 delta.where(delta > 0, 0) 相同：第一项（NaN）记为 0
+    gain = _ewm(np.where(delta > 0, delta, 0.0), 1.0 / params[0])
+    loss = _ewm(np.where(delta < 0, -delta, 0.0), 1.0 / params[0])
+    rs = _divide(gain, loss)
+    return {f'rsi{params[0]}': 100 - _divide(np.full(rs.shape, 100.0), 1 + rs)}
+
+
+def _kdj(bars: Dict[str, np.ndarray], params: Tuple[int, ...]) -> Dict[str, np.ndarray]:
+    window, k_period, d_period = params
+    low_min = _rolling(bars['low'], window, np.min)
+    high_max = _rolling(bars['high'], window, np.max)
+    rsv = _divide(100 * (bars['close'] - low_min), high_max - low_min + 1e-8)
+    k = _ewm(rsv, 1.0 / k_period)
+    d = _ewm(k, 1.0 / d_period)
+    return {'k': k, 'd': d, 'j': 3 * k - 2 * d}
+
+
+def _atr(bars: Dict[str, np.ndarray], params: Tuple[int, ...]) -> Dict[str, np.ndarray]:
+    high, low, close = bars['high'], bars['low'], bars['close']
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    # 第一根K线没有昨收，真实波幅为最高 - 最低
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return {f'atr{params[0]}': _ewm(true_range, 1.0 / params[0])}
+
+
+def _obv(bars: Dict[str, np.ndarray], params: Tuple[int, ...]) -> Dict[str, np.ndarray]:
+    close, volume = bars['close'], bars['volume']
+    direction = np.sign(np.diff(close, prepend=close[:1]))
+    return {'obv': np.cumsum(direction * volume)}
+
+
+KERNELS: Dict[str, Callable[[Dict[str, np.ndarray], Tuple], Dict[str, np.ndarray]]] = {
+    'ma': _ma,
+    'macd': _macd,
+    'boll': _boll,
+    'rsi': _rsi,
+    'kdj': _kdj,
+    'atr': _atr,
+    'obv': _obv,
+}
+
+
+# ---------------------------------------------------------------------------
+# 结果缓存
+# ---------------------------------------------------------------------------
+
+class IndicatorSeriesCache:
+    """指标序列的 LRU 缓存：键为 (代码, 指标, 参数, 首根K线日期, 最后一根K线)"""
+
+    def __init__(self, max_entries: int = INDICATOR_SERIES_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[tuple, Dict[str, np.ndarray]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: tuple) -> Optional[Dict[str, np.ndarray]]:
+        with self._lock:
+            columns = self._entries.get(key)
+            if columns is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return columns
+
+    def put(self, key: tuple, columns: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            self._entries[key] = columns
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计（用于监控）"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / total, 4) if total else 0.0,
+                'evictions': self._evictions,
+            }
+
+
+# 全局实例
+_series_cache: Optional[IndicatorSeriesCache] = None
+_instance_lock = threading.Lock()
+
+
+def get_indicator_series_cache() -> IndicatorSeriesCache:
+    """
+    获取全局指标序列缓存（单例模式）
+
+    Returns:
+        IndicatorSeriesCache实例
+    """
+    global _series_cache
+    if _series_cache is None:
+        with _instance_lock:
+            if _series_cache is None:
+                _series_cache = IndicatorSeriesCache()
+    return _series_cache
+
+
+# ---------------------------------------------------------------------------
+# 计算入口
+# ---------------------------------------------------------------------------
+
+def warmup_start(start_date: str) -> str:
+    """请求区间对应的K线起点：提前 INDICATOR_WARMUP_DAYS 天并对齐到当年 1 月 1 日"""
+    day = datetime.strptime(start_date, DATE_FORMAT) - timedelta(days=INDICATOR_WARMUP_DAYS)
+    return day.replace(month=1, day=1).strftime(DATE_FORMAT)
+
+
+def _columnar(values: np.ndarray) -> List[Optional[float]]:
+    """数组 → JSON 列（NaN / inf 为None）"""
+    rounded = np.round(values, DECIMALS)
+    finite = np.isfinite(rounded)
+    return [float(v) if ok else None for v, ok in zip(rounded.tolist(), finite.tolist())]
+
+
+def compute_indicator_series(code: str, specs: List[Tuple[str, Tuple]], bars: List[Dict[str, Any]],
+                             start_date: str, end_date: str) -> Dict[str, Any]:
+    """
+    计算指标序列并截取请求区间
+
+    Args:
+        code: 股票代码
+        specs: parse_indicator_names 的结果
+        bars: 含预热区间的K线（任意顺序，date / open / high / low / close / volume）
+        start_date: 请求区间开始日期（YYYY-MM-DD）
+        end_date: 请求区间结束日期（YYYY-MM-DD）
+
+    Returns:
+        {dates, indicators: {指标: {params, columns: {列名: [...]}}}, cached: [命中缓存的指标]}
+    """
+    bars = sorted(bars, key=lambda bar: bar['date'])
+    dates = np.array([str(bar['date'])[:10] for bar in bars])
+    arrays = {
+        field: np.array([float(bar.get(field) or 0.0) for bar in bars])
+        for field in ('open', 'high', 'low', 'close', 'volume')
+    }
+
+    last = bars[-1] if bars else {}
+    series_key = (
+        code.lower(), dates[0] if len(dates) else None,
+        tuple(last.get(field) for field in ('date', 'open', 'high', 'low', 'close', 'volume')),
+    )
+    lo = int(np.searchsorted(dates, start_date, side='left'))
+    hi = int(np.searchsorted(dates, end_date, side='right'))
+
+    cache = get_indicator_series_cache()
+    indicators, cached = {}, []
+    for name, params in specs:
+        key = (series_key, name, params)
+        columns = cache.get(key) if len(dates) else None
+        if columns is None:
+            columns = KERNELS[name](arrays, params) if len(dates) else {}
+            if len(dates):
+                cache.put(key, columns)
+        else:
+            cached.append(name)
+        indicators[name] = {
+            'params': list(params),
+            'columns': {column: _columnar(values[lo:hi]) for column, values in columns.items()},
+        }
+
+    return {'dates': dates[lo:hi].tolist(), 'indicators': indicators, 'cached': cached}
+
+
+def get_indicator_series(code: str, specs: List[Tuple[str, Tuple]], start_date: str,
+                         end_date: str) -> Dict[str, Any]:
+    """
+    获取K线（经 get_kline_data 的缓存，含预热区间）并计算指标序列（同步，在 kline 执行器中调用）
+
+    Returns:
+        compute_indicator_series 的结果，另含 market / data_source / took_ms；取不到K线时 dates 为空
+    """
+    from service.kline.kline import get_kline_data
+
+    # 结束日期不同的请求共用同一段K线（取到今天），只在截取时区分
+    fetch_end = max(end_date, datetime.now().strftime(DATE_FORMAT))
+    kline = get_kline_data(code, start_date=warmup_start(start_date), end_date=fetch_end)
+    bars = [bar for bar in (kline or {}).get('data') or [] if bar.get('date')]
+    t0 = time.perf_counter()
+    result = compute_indicator_series(code, specs, bars, start_date, end_date)
+    result['took_ms'] = round((time.perf_counter() - t0) * 1000, 3)
+    result['market'] = (kline or {}).get('market')
+    result['data_source'] = (kline or {}).get('data_source')
+    if (kline or {}).get('_stale'):
+        result['stale'] = True
+    return result
@@ -5,8 +5,11 @@
 """
 import os
 import sys
+import asyncio
 import logging
 import math
+import threading
+import weakref
 import numpy as np
 from typing import Dict, List, Optional, Tuple
 import pandas as pd
@@ -32,12 +35,20 @@ from service.kline.us.alpha_vantage import get_kline_data_from_alpha_vantage, is
 from service.kline.us.tiingo import get_kline_data_from_tiingo, is_tiingo_available
 from service.kline.us.finnhub import get_kline_data_from_finnhub, is_finnhub_available
 from service.kline.a.baostock import get_kline_data_from_baostock, is_baostock_available
-from service.kline.hk.eastmoney_hk import get_kline_data_from_eastmoney_hk, is_eastmoney_hk_available
-from service.kline.a.eastmoney_a import get_kline_data_from_eastmoney_a, is_eastmoney_a_available
-from service.kline.a.sina_a import get_kline_data_from_sina, is_sina_available
+from service.kline.hk.eastmoney_hk import (
+    get_kline_data_from_eastmoney_hk, get_kline_data_from_eastmoney_hk_async, is_eastmoney_hk_available
+)
+from service.kline.a.eastmoney_a import (
+    get_kline_data_from_eastmoney_a, get_kline_data_from_eastmoney_a_async, is_eastmoney_a_available
+)
+from service.kline.a.sina_a import get_kline_data_from_sina, get_kline_data_from_sina_async, is_sina_available, probe_sina
 
 # 导入缓存装饰器
 from service.cache.decorators import cache_kline_data
+from service.kline.hedging import run_hedged, run_hedged_async, get_latency_tracker
+from service.kline.utils import process_kline_data  # 兼容 from service.kline.kline import process_kline_data
+from service.utils.executors import run_blocking
+from service.utils.provider_health import get_provider_registry, STATE_OPEN
 
 # 导入工具函数
 # 使用绝对导入避免与本地utils.py冲突
@@ -53,10 +64,23 @@ except ImportError:
     format_stock_code = stock_module.format_stock_code
 
 # 数据源配置
+# sources: 按优先级排列的数据源
+# hedge: 对冲模式 —— 主数据源超过其历史延迟的 percentile 分位数仍未返回时，并行发起下一个数据源
+#   min_delay / max_delay: 对冲触发延迟的上下限（秒），样本不足时使用 min_delay
+#   美股数据源大多按API密钥限额计费，默认不开启对冲
 DATA_SOURCES_CONFIG = {
-    'a': ['sina', 'eastmoney_a', 'akshare', 'baostock'],
-    'hk': ['eastmoney_hk', 'akshare_hk'],
-    'us': ['yfinance', 'alpha_vantage', 'tiingo', 'finnhub']
+    'a': {
+        'sources': ['sina', 'eastmoney_a', 'akshare', 'baostock'],
+        'hedge': {'enabled': True, 'percentile': 90, 'min_delay': 1.0, 'max_delay': 5.0},
+    },
+    'hk': {
+        'sources': ['eastmoney_hk', 'akshare_hk'],
+        'hedge': {'enabled': True, 'percentile': 90, 'min_delay': 1.0, 'max_delay': 5.0},
+    },
+    'us': {
+        'sources': ['yfinance', 'alpha_vantage', 'tiingo', 'finnhub'],
+        'hedge': {'enabled': False, 'percentile': 90, 'min_delay': 2.0, 'max_delay': 8.0},
+    },
 }
 
 # API密钥配置
@@ -66,91 +90,257 @@ API_KEYS = {
     'finnhub': os.getenv('FINNHUB_API_KEY', ''),
 }
 
+# 数据源注册表: 数据源名称 → (获取函数, 可用性检查函数, 所需API密钥名)
+SOURCE_REGISTRY = {
+    'sina': (get_kline_data_from_sina, is_sina_available, None),
+    'eastmoney_a': (get_kline_data_from_eastmoney_a, is_eastmoney_a_available, None),
+    'akshare': (get_kline_data_from_akshare, is_akshare_available, None),
+    'baostock': (get_kline_data_from_baostock, is_baostock_available, None),
+    'eastmoney_hk': (get_kline_data_from_eastmoney_hk, is_eastmoney_hk_available, None),
+    'akshare_hk': (get_kline_data_from_akshare_hk, is_akshare_hk_available, None),
+    'yfinance': (get_kline_data_from_yfinance, is_yfinance_available, None),
+    'alpha_vantage': (get_kline_data_from_alpha_vantage, is_alpha_vantage_available, 'alpha_vantage'),
+    'tiingo': (get_kline_data_from_tiingo, is_tiingo_available, 'tiingo'),
+    'finnhub': (get_kline_data_from_finnhub, is_finnhub_available, 'finnhub'),
+}
+
+# 各数据源返回K线的复权方式：none=不复权，qfq=前复权，split=仅拆股调整
+# 同一股票的K线序列只拼接复权方式相同的结果（见 bar_store.BarStore），结果中的 adjust 字段即取自这里
+SOURCE_ADJUSTMENT = {
+    'sina': 'none',
+    'eastmoney_a': 'qfq',
+    'akshare': 'qfq',
+    'baostock': 'none',       # adjustflag=3
+    'eastmoney_hk': 'qfq',
+    'akshare_hk': 'qfq',
+    'yfinance': 'none',       # auto_adjust=False
+    'alpha_vantage': 'none',
+    'tiingo': 'none',
+    'finnhub': 'split',
+}
+
+# 有协程版本的数据源（直接 await，请求期间不占用线程）；其余数据源在 kline 执行器中运行同步版本
+ASYNC_SOURCE_REGISTRY = {
+    'sina': get_kline_data_from_sina_async,
+    'eastmoney_a': get_kline_data_from_eastmoney_a_async,
+    'eastmoney_hk': get_kline_data_from_eastmoney_hk_async,
+}
+
+# 各数据源的最大并发请求数（进程内所有请求共享，防止批量请求把单个上游打到限流）
+PROVIDER_CONCURRENCY = {
+    'sina': 8,
+    'eastmoney_a': 6,
+    'akshare': 4,
+    'baostock': 1,        # baostock 协议非线程安全，串行访问
+    'eastmoney_hk': 6,
+    'akshare_hk': 4,
+    'yfinance': 4,
+    'alpha_vantage': 2,   # 免费额度 5次/分钟
+    'tiingo': 2,
+    'finnhub': 2,
+}
+_provider_semaphores = {
+    name: threading.BoundedSemaphore(limit) for name, limit in PROVIDER_CONCURRENCY.items()
+}
+# 协程请求使用的并发名额（asyncio.Semaphore 与事件循环绑定，每个事件循环一组，上限相同）
+_async_provider_semaphores: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]' = \
+    weakref.WeakKeyDictionary()
+_async_semaphores_lock = threading.Lock()
+
+# 数据源后台健康探测（熔断器低频调用，替代每次请求前的可用性探测）
+SOURCE_PROBES = {
+    'sina': probe_sina,
+}
+for _source, _probe in SOURCE_PROBES.items():
+    get_provider_registry().register_probe(f"kline:{_source}", _probe)
+
+MAX_TOTAL_TIME = 30  # 单只股票最大总耗时（秒），超过则停止尝试
+
+
+class SourceSkipped(Exception):
+    """数据源被跳过（不可用、熔断中、缺少API密钥、并发排队超时），不计入网络错误"""
 
-def process_kline_data(data: pd.DataFrame, source: str) -> List[Dict]:
+
+def preferred_sources(code: str, adjust: Optional[str]) -> Optional[List[str]]:
     """
-    处理K线数据，统一格式
+    该股票所属市场的默认数据源，复权方式为 adjust 的排在前面（其余保留在后面兜底）
 
     Args:
-        data: 原始数据DataFrame
-        source: 数据源名称
+        code: 股票代码
+        adjust: 期望的复权方式（见 SOURCE_ADJUSTMENT）
 
     Returns:
-        处理后的数据列表
+        数据源列表；adjust 为None时返回None（使用默认顺序）
     """
-    if data.empty:
-        return []
-
-    # 确保有日期列
-    if 'date' not in data.columns and data.index.name == 'date':
-        data = data.reset_index()
-
-    # 统一列名映射
-    column_mapping = {
-        'open': ['open', 'Open', 'OPEN'],
-        'high': ['high', 'High', 'HIGH'],
-        'low': ['low', 'Low', 'LOW'],
-        'close': ['close', 'Close', 'CLOSE', 'last'],
-        'volume': ['volume', 'Volume', 'VOLUME', 'vol'],
-        'date': ['date', 'Date', 'DATE', 'datetime', 'time']
-    }
+    if adjust is None:
+        return None
+    sources = DATA_SOURCES_CONFIG.get(get_market_type(code.split('.')[0]), {}).get('sources', [])
+    return sorted(sources, key=lambda source: SOURCE_ADJUSTMENT.get(source) != adjust)
+
+
+def _tag_result(result: Dict) -> Dict:
+    """补全成功结果的 source 与 adjust 字段，并按日期从远到近排序"""
+    if 'data_source' in result and 'source' not in result:
+        result['source'] = result['data_source']
+    source = result.get('data_source')
+    result['adjust'] = SOURCE_ADJUSTMENT.get(source, source)
+    result['data'].sort(key=lambda x: x['date'])
+    return result
 
-    # 重命名列
-    for target_col, possible_cols in column_mapping.items():
-        for col in possible_cols:
-            if col in data.columns:
-                if col != target_col:
-                    data = data.rename(columns={col: target_col})
-                break
-
-    # 确保必要的列存在
-    required_cols = ['date', 'open', 'high', 'low', 'close']
-    for col in required_cols:
-        if col not in data.columns:
-            logger.debug(f"数据源 {source} 缺少 {col} 列")
-            return []
-
-    # 转换日期格式
-    data['date'] = pd.to_datetime(data['date'])
-
-    # 按日期升序排序
-    data = data.sort_values('date', ascending=True)
-
-    # 转换为字典列表（确保可 JSON 序列化）
-    result = []
-    for _, row in data.iterrows():
-        try:
-            o = float(row['open'])
-            h = float(row['high'])
-            l = float(row['low'])
-            c = float(row['close'])
-            if any(math.isnan(v) or math.isinf(v) for v in (o, h, l, c)):
-                continue
-        except (ValueError, TypeError):
-            continue
 
-        item = {
-            'date': row['date'].strftime('%Y-%m-%d'),
-            'open': o,
-            'high': h,
-            'low': l,
-            'close': c,
-        }
-
-        # 添加成交量（如果有）
-        if 'volume' in data.columns:
-            v = row['volume']
-            try:
-                if pd.notna(v) and not (isinstance(v, float) and (math.isnan(v) or math.isinf(v))):
-                    item['volume'] = int(v)
-                else:
-                    item['volume'] = 0
-            except (ValueError, TypeError):
-                item['volume'] = 0
+def fetch_from_source(
+    source: str,
+    code: str,
+    market_type: str,
+    formatted_code: str,
+    start_date: str,
+    end_date: str,
+    acquire_timeout: float = MAX_TOTAL_TIME
+) -> Optional[Dict]:
+    """
+    从单个数据源获取K线数据（受该数据源的并发上限约束）
+
+    Args:
+        source: 数据源名称
+        code: 股票代码
+        market_type: 市场类型
+        formatted_code: 格式化后的股票代码
+        start_date: 开始日期
+        end_date: 结束日期
+        acquire_timeout: 等待该数据源并发名额的最长时间（秒）
 
-        result.append(item)
+    Returns:
+        数据源返回的结果字典，失败时为None
 
-    return result
+    Raises:
+        SourceSkipped: 数据源不可用、熔断中、缺少API密钥或排队超时
+    """
+    fetch_func, is_available, api_key_name = SOURCE_REGISTRY[source]
+
+    breaker = get_provider_registry().get(f"kline:{source}")
+    if breaker.state == STATE_OPEN:
+        raise SourceSkipped(f"熔断中（{breaker.retry_in():.0f}s 后重试）")
+
+    if not is_available():
+        raise SourceSkipped("不可用")
+
+    kwargs = dict(
+        code=code,
+        market_type=market_type,
+        formatted_code=formatted_code,
+        start_date=start_date,
+        end_date=end_date
+    )
+    if api_key_name:
+        api_key = API_KEYS.get(api_key_name, '')
+        if not api_key:
+            raise SourceSkipped("需要API密钥")
+        kwargs['api_key'] = api_key
+
+    semaphore = _provider_semaphores.get(source)
+    if semaphore is not None and not semaphore.acquire(timeout=max(0.0, acquire_timeout)):
+        raise SourceSkipped(f"并发已满（上限 {PROVIDER_CONCURRENCY[source]}），排队超时")
+    try:
+        # 排队期间状态可能变化；半开状态下只有一个试探请求能通过
+        if not breaker.allow_request():
+            raise SourceSkipped(f"熔断中（{breaker.retry_in():.0f}s 后重试）")
+        t0 = time.time()
+        try:
+            result = fetch_func(**kwargs)
+        except Exception as e:
+            breaker.record_failure(f"{type(e).__name__}: {e}")
+            raise
+        # 返回None表示网络错误/API不可用；返回字典（即使数据为空）说明上游可达
+        if result is None:
+            breaker.record_failure("返回None")
+        else:
+            breaker.record_success(time.time() - t0)
+        return result
+    finally:
+        if semaphore is not None:
+            semaphore.release()
+
+
+
+def _get_async_semaphore(source: str) -> Optional[asyncio.Semaphore]:
+    """获取当前事件循环上该数据源的并发名额"""
+    limit = PROVIDER_CONCURRENCY.get(source)
+    if limit is None:
+        return None
+    loop = asyncio.get_running_loop()
+    with _async_semaphores_lock:
+        semaphores = _async_provider_semaphores.get(loop)
+        if semaphores is None:
+            semaphores = _async_provider_semaphores[loop] = {}
+        semaphore = semaphores.get(source)
+        if semaphore is None:
+            semaphore = semaphores[source] = asyncio.Semaphore(limit)
+        return semaphore
+
+
+async def fetch_from_source_async(
+    source: str,
+    code: str,
+    market_type: str,
+    formatted_code: str,
+    start_date: str,
+    end_date: str,
+    acquire_timeout: float = MAX_TOTAL_TIME
+) -> Optional[Dict]:
+    """
+    fetch_from_source 的协程版本：有协程版本的数据源直接 await，其余在 kline 执行器中运行
+
+    参数、返回值与异常同 fetch_from_source
+    """
+    fetch_async = ASYNC_SOURCE_REGISTRY.get(source)
+    if fetch_async is None:
+        return await run_blocking(
+            'kline', fetch_from_source, source, code, market_type, formatted_code,
+            start_date, end_date, acquire_timeout
+        )
+
+    _fetch_func, is_available, _api_key_name = SOURCE_REGISTRY[source]
+    breaker = get_provider_registry().get(f"kline:{source}")
+    if breaker.state == STATE_OPEN:
+        raise SourceSkipped(f"熔断中（{breaker.retry_in():.0f}s 后重试）")
+
+    if not is_available():
+        raise SourceSkipped("不可用")
+
+    semaphore = _get_async_semaphore(source)
+    if semaphore is not None:
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=max(0.0, acquire_timeout))
+        except asyncio.TimeoutError:
+            raise SourceSkipped(f"并发已满（上限 {PROVIDER_CONCURRENCY[source]}），排队超时")
+    try:
+        # 排队期间状态可能变化；半开状态下只有一个试探请求能通过
+        if not breaker.allow_request():
+            raise SourceSkipped(f"熔断中（{breaker.retry_in():.0f}s 后重试）")
+        t0 = time.time()
+        try:
+            result = await fetch_async(
+                code=code,
+                market_type=market_type,
+                formatted_code=formatted_code,
+                start_date=start_date,
+                end_date=end_date
+            )
+        except asyncio.CancelledError:
+            # 被取消（对冲落败或客户端断开）不代表上游有问题，只归还半开试探名额
+            breaker.release()
+            raise
+        except Exception as e:
+            breaker.record_failure(f"{type(e).__name__}: {e}")
+            raise
+        if result is None:
+            breaker.record_failure("返回None")
+        else:
+            breaker.record_success(time.time() - t0)
+        return result
+    finally:
+        if semaphore is not None:
+            semaphore.release()
 
 
 @cache_kline_data()
@@ -190,14 +380,22 @@ def get_kline_data(
         start_date = (datetime.now() - timedelta(days=90)).strftime('%Y-%m-%d')
 
     # 确定使用的数据源
+    market_config = DATA_SOURCES_CONFIG.get(market_type, {})
     if data_sources is None:
-        data_sources = DATA_SOURCES_CONFIG.get(market_type, [])
+        data_sources = market_config.get('sources', [])
 
     last_error = None
     log_prefix = f"[{code.upper()}] [market={market_type}]"
+
+    # 对冲模式：多个数据源并行竞速，第一个有效结果胜出
+    hedge_config = market_config.get('hedge') or {}
+    if hedge_config.get('enabled') and len(data_sources) > 1:
+        return _get_kline_data_hedged(
+            code, market_type, formatted_code, start_date, end_date,
+            data_sources, hedge_config, log_prefix
+        )
     consecutive_network_errors = 0  # 连续网络错误计数
     total_start_time = time.time()
-    MAX_TOTAL_TIME = 30  # 单只股票最大总耗时（秒），超过则停止尝试
 
     # 按优先级尝试各个数据源
     for idx, source in enumerate(data_sources, 1):
@@ -216,211 +414,39 @@ def get_kline_data(
             )
             break
 
+        if source not in SOURCE_REGISTRY:
+            logger.warning(f"{log_prefix} 未知数据源: {source} ({idx}/{len(data_sources)}), 跳过")
+            continue
+
         try:
             result = None
             elapsed = 0.0
             loop_t0 = time.time()
             logger.info(f"{log_prefix} 🔄 开始尝试数据源 {source} ({idx}/{len(data_sources)})...")
 
-            if source == 'yfinance':
-                if not is_yfinance_available():
-                    logger.info(f"{log_prefix} ⏭️ 数据源 {source} ({idx}/{len(data_sources)}) 不可用，跳过")
-                    continue
-
-                t0 = time.time()
-                result = get_kline_data_from_yfinance(
-                    code=code,
-                    market_type=market_type,
-                    formatted_code=formatted_code,
-                    start_date=start_date,
-                    end_date=end_date
-                )
-                elapsed = time.time() - t0
-
-            elif source == 'akshare_hk':
-                if not is_akshare_hk_available():
-                    logger.info(f"{log_prefix} ⏭️ 数据源 {source} ({idx}/{len(data_sources)}) 不可用，跳过")
-                    continue
-
-                t0 = time.time()
-                result = get_kline_data_from_akshare_hk(
-                    code=code,
-                    market_type=market_type,
-                    formatted_code=formatted_code,
-                    start_date=start_date,
-                    end_date=end_date
-                )
-                elapsed = time.time() - t0
-
-            elif source == 'akshare':
-                if not is_akshare_available():
-                    logger.info(f"{log_prefix} ⏭️ 数据源 {source} ({idx}/{len(data_sources)}) 不可用，跳过")
-                    continue
-
-                t0 = time.time()
-                result = get_kline_data_from_akshare(
-                    code=code,
-                    market_type=market_type,
-                    formatted_code=formatted_code,
-                    start_date=start_date,
-                    end_date=end_date
-                )
-                elapsed = time.time() - t0
-
-            elif source == 'eastmoney_hk':
-                if not is_eastmoney_hk_available():
-                    logger.info(f"{log_prefix} ⏭️ 数据源 {source} ({idx}/{len(data_sources)}) 不可用，跳过")
-                    continue
-
-                t0 = time.time()
-                result = get_kline_data_from_eastmoney_hk(
-                    code=code,
-                    market_type=market_type,
-                    formatted_code=formatted_code,
-                    start_date=start_date,
-                    end_date=end_date
-                )
-                elapsed = time.time() - t0
-
-            elif source == 'sina':
-                if not is_sina_available():
-                    logger.info(f"{log_prefix} ⏭️ 数据源 {source} ({idx}/{len(data_sources)}) 网络不可用，跳过")
-                    continue
-
-                t0 = time.time()
-                result = get_kline_data_from_sina(
-                    code=code,
-                    market_type=market_type,
-                    formatted_code=formatted_code,
-                    start_date=start_date,
-                    end_date=end_date
-                )
-                elapsed = time.time() - t0
-
-            elif source == 'eastmoney_a':
-                if not is_eastmoney_a_available():
-                    logger.info(f"{log_prefix} ⏭️ 数据源 {source} ({idx}/{len(data_sources)}) 不可用，跳过")
-                    continue
-
-                t0 = time.time()
-                result = get_kline_data_from_eastmoney_a(
-                    code=code,
-                    market_type=market_type,
-                    formatted_code=formatted_code,
-                    start_date=start_date,
-                    end_date=end_date
-                )
-                elapsed = time.time() - t0
-
-            elif source == 'alpha_vantage':
-                if not is_alpha_vantage_available():
-                    logger.info(f"{log_prefix} ⏭️ 数据源 {source} ({idx}/{len(data_sources)}) 不可用，跳过")
-                    continue
-
-                api_key = API_KEYS.get('alpha_vantage', '')
-                if not api_key:
-                    logger.info(f"{log_prefix} ⏭️ 数据源 {source} ({idx}/{len(data_sources)}) 需要API密钥，跳过")
-                    continue
-
-                t0 = time.time()
-                result = get_kline_data_from_alpha_vantage(
-                    code=code,
-                    market_type=market_type,
-                    formatted_code=formatted_code,
-                    start_date=start_date,
-                    end_date=end_date,
-                    api_key=api_key
-                )
-                elapsed = time.time() - t0
-
-            elif source == 'tiingo':
-                if not is_tiingo_available():
-                    logger.info(f"{log_prefix} ⏭️ 数据源 {source} ({idx}/{len(data_sources)}) 不可用，跳过")
-                    continue
-
-                api_key = API_KEYS.get('tiingo', '')
-                if not api_key:
-                    logger.info(f"{log_prefix} ⏭️ 数据源 {source} ({idx}/{len(data_sources)}) 需要API密钥，跳过")
-                    continue
-
-                t0 = time.time()
-                result = get_kline_data_from_tiingo(
-                    code=code,
-                    market_type=market_type,
-                    formatted_code=formatted_code,
-                    start_date=start_date,
-                    end_date=end_date,
-                    api_key=api_key
-                )
-                elapsed = time.time() - t0
-
-            elif source == 'finnhub':
-                if not is_finnhub_available():
-                    logger.info(f"{log_prefix} ⏭️ 数据源 {source} ({idx}/{len(data_sources)}) 不可用，跳过")
-                    continue
-
-                api_key = API_KEYS.get('finnhub', '')
-                if not api_key:
-                    logger.info(f"{log_prefix} ⏭️ 数据源 {source} ({idx}/{len(data_sources)}) 需要API密钥，跳过")
-                    continue
-
+            try:
                 t0 = time.time()
-                result = get_kline_data_from_finnhub(
+                result = fetch_from_source(
+                    source,
                     code=code,
                     market_type=market_type,
                     formatted_code=formatted_code,
                     start_date=start_date,
                     end_date=end_date,
-                    api_key=api_key
-                )
-                elapsed = time.time() - t0
-
-            elif source == 'baostock':
-                if not is_baostock_available():
-                    logger.info(f"{log_prefix} ⏭️ 数据源 {source} ({idx}/{len(data_sources)}) 不可用，跳过")
-                    continue
-
-                t0 = time.time()
-                result = get_kline_data_from_baostock(
-                    code=code,
-                    market_type=market_type,
-                    formatted_code=formatted_code,
-                    start_date=start_date,
-                    end_date=end_date
+                    acquire_timeout=MAX_TOTAL_TIME - elapsed_total
                 )
                 elapsed = time.time() - t0
-
-            elif source == 'google_finance':
-                if not is_google_finance_available():
-                    logger.info(f"{log_prefix} ⏭️ 数据源 {source} ({idx}/{len(data_sources)}) 不可用，跳过")
-                    continue
-
-                t0 = time.time()
-                result = get_kline_data_from_google_finance(
-                    code=code,
-                    market_type=market_type,
-                    formatted_code=formatted_code,
-                    start_date=start_date,
-                    end_date=end_date
-                )
-                elapsed = time.time() - t0
-
-            else:
-                logger.warning(f"{log_prefix} 未知数据源: {source} ({idx}/{len(data_sources)}), 跳过")
+            except SourceSkipped as skip:
+                logger.info(f"{log_prefix} ⏭️ 数据源 {source} ({idx}/{len(data_sources)}) {skip}，跳过")
                 continue
 
             # 如果成功获取数据，返回结果
             if result and result.get('data'):
+                get_latency_tracker().record(source, elapsed)
                 data_count = len(result['data'])
                 logger.info(f"{log_prefix} ✅ 数据源 {source} ({idx}/{len(data_sources)}) 获取成功: {data_count} 条数据, 耗时 {elapsed:.1f}s")
-                # 确保返回的字典包含source字段
-                if 'data_source' in result and 'source' not in result:
-                    result['source'] = result['data_source']
-
-                # 按照日期从远到近排序
-                result['data'].sort(key=lambda x: x['date'])
-
-                return result
+                # 确保返回的字典包含 source / adjust 字段，并按照日期从远到近排序
+                return _tag_result(result)
             elif result is None:
                 # 数据源函数返回None（网络错误、API不可用等）
                 # 将其视为网络错误，用于短路判断
@@ -470,6 +496,150 @@ def get_kline_data(
     }
 
 
+def _get_kline_data_hedged(
+    code: str,
+    market_type: str,
+    formatted_code: str,
+    start_date: str,
+    end_date: str,
+    data_sources: List[str],
+    hedge_config: Dict,
+    log_prefix: str
+) -> Dict:
+    """
+    对冲模式获取K线数据：主数据源超过学习延迟仍未返回时并行发起下一个数据源
+
+    Returns:
+        包含K线数据的字典，额外带 _hedge 字段记录胜出数据源与对冲情况
+    """
+    unknown = [source for source in data_sources if source not in SOURCE_REGISTRY]
+    for source in unknown:
+        logger.warning(f"{log_prefix} 未知数据源: {source}, 跳过")
+    sources = [source for source in data_sources if source in SOURCE_REGISTRY]
+
+    def attempt(source: str) -> Optional[Dict]:
+        return fetch_from_source(
+            source,
+            code=code,
+            market_type=market_type,
+            formatted_code=formatted_code,
+            start_date=start_date,
+            end_date=end_date
+        )
+
+    result, hedge_info = (None, {"winner": None, "launched": [], "last_error": None})
+    if sources:
+        result, hedge_info = run_hedged(
+            sources,
+            attempt,
+            is_valid=lambda r: bool(r and r.get('data')),
+            percentile=hedge_config.get('percentile', 90),
+            min_delay=hedge_config.get('min_delay', 1.0),
+            max_delay=hedge_config.get('max_delay', 5.0),
+            timeout=MAX_TOTAL_TIME,
+            skip_exceptions=(SourceSkipped,),
+            log_prefix=log_prefix
+        )
+
+    return _finalize_hedged_result(code, formatted_code, market_type, result, hedge_info, log_prefix)
+
+
+def _finalize_hedged_result(
+    code: str,
+    formatted_code: str,
+    market_type: str,
+    result: Optional[Dict],
+    hedge_info: Dict,
+    log_prefix: str
+) -> Dict:
+    """整理对冲模式的胜出结果；没有胜出者时返回错误结果"""
+    if result is not None:
+        logger.info(
+            f"{log_prefix} ✅ 对冲模式: 数据源 {hedge_info['winner']} 胜出，{len(result['data'])} 条数据, "
+            f"已发起 {hedge_info['launched']}, 耗时 {hedge_info['elapsed_ms']}ms"
+        )
+        _tag_result(result)
+        result['_hedge'] = hedge_info
+        return result
+
+    last_error = hedge_info.get('last_error')
+    error_msg = f"所有数据源都失败，最后错误: {last_error}" if last_error else "所有数据源都失败"
+    logger.error(f"{log_prefix} ❌ {error_msg}. 已尝试的数据源: {hedge_info['launched']}")
+
+    return {
+        "code": code,
+        "formatted_code": formatted_code,
+        "market": market_type,
+        "data_source": "none",
+        "data": [],
+        "error": error_msg
+    }
+
+
+
+@cache_kline_data()
+async def get_kline_data_async(
+    code: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    data_sources: Optional[List[str]] = None,
+    force: bool = False
+) -> Dict:
+    """
+    get_kline_data 的协程版本（参数与返回值相同），可在事件循环中直接 await
+
+    对冲模式下各数据源请求是事件循环上的任务：有协程版本的数据源（sina / eastmoney_a / eastmoney_hk）
+    请求期间不占用线程，其余数据源在 kline 执行器中运行；未开启对冲的市场在执行器中走同步的顺序尝试
+    """
+    clean_code = code.split('.')[0] if '.' in code else code
+    market_type = get_market_type(clean_code)
+    market_config = DATA_SOURCES_CONFIG.get(market_type, {})
+    hedge_config = market_config.get('hedge') or {}
+    sources = data_sources if data_sources is not None else market_config.get('sources', [])
+
+    if not (hedge_config.get('enabled') and len(sources) > 1):
+        # 顺序尝试（含连续网络错误短路）沿用同步实现；get_kline_data.__wrapped__ 为未经缓存装饰的原函数
+        return await run_blocking('kline', get_kline_data.__wrapped__, code, start_date, end_date, data_sources)
+
+    logger.info(f"[{code.upper()}] 市场类型: {market_type.upper()}, 请求日期范围: {start_date or 'auto'} ~ {end_date or 'auto'}")
+    formatted_code = format_stock_code(code)
+    if end_date is None:
+        end_date = datetime.now().strftime('%Y-%m-%d')
+    if start_date is None:
+        start_date = (datetime.now() - timedelta(days=90)).strftime('%Y-%m-%d')
+    log_prefix = f"[{code.upper()}] [market={market_type}]"
+
+    unknown = [source for source in sources if source not in SOURCE_REGISTRY]
+    for source in unknown:
+        logger.warning(f"{log_prefix} 未知数据源: {source}, 跳过")
+    sources = [source for source in sources if source in SOURCE_REGISTRY]
+
+    async def attempt(source: str) -> Optional[Dict]:
+        return await fetch_from_source_async(
+            source,
+            code=code,
+            market_type=market_type,
+            formatted_code=formatted_code,
+            start_date=start_date,
+            end_date=end_date
+        )
+
+    result, hedge_info = (None, {"winner": None, "launched": [], "last_error": None})
+    if sources:
+        result, hedge_info = await run_hedged_async(
+            sources,
+            attempt,
+            is_valid=lambda r: bool(r and r.get('data')),
+            percentile=hedge_config.get('percentile', 90),
+            min_delay=hedge_config.get('min_delay', 1.0),
+            max_delay=hedge_config.get('max_delay', 5.0),
+            timeout=MAX_TOTAL_TIME,
+            skip_exceptions=(SourceSkipped,),
+            log_prefix=log_prefix
+        )
+    return _finalize_hedged_result(code, formatted_code, market_type, result, hedge_info, log_prefix)
+
+
 def set_api_credentials(source: str, api_key: str):
     """
     设置数据源的API密钥
@@ -29,88 +29,7 @@ import numpy as np
 
 logger = logging.getLogger(__name__)
 
-
-def process_kline_data(data: pd.DataFrame, source: str) -> List[Dict]:
-    """
-    处理K线数据，统一格式
-
-    Args:
-        data: 原始数据DataFrame
-        source: 数据源名称
-
-    Returns:
-        处理后的数据列表
-    """
-    if data.empty:
-        return []
-
-    # 确保有日期列
-    if 'date' not in data.columns and data.index.name == 'date':
-        data = data.reset_index()
-
-    # 统一列名映射
-    column_mapping = {
-        'open': ['open', 'Open', 'OPEN', 'o'],
-        'high': ['high', 'High', 'HIGH', 'h'],
-        'low': ['low', 'Low', 'LOW', 'l'],
-        'close': ['close', 'Close', 'CLOSE', 'c'],
-        'volume': ['volume', 'Volume', 'VOLUME', 'v'],
-        'date': ['date', 'Date', 'DATE', 'datetime', 'time', 't']
-    }
-
-    # 重命名列
-    for target_col, possible_cols in column_mapping.items():
-        for col in possible_cols:
-            if col in data.columns:
-                if col != target_col:
-                    data = data.rename(columns={col: target_col})
-                break
-
-    # 确保必要的列存在
-    required_cols = ['date', 'open', 'high', 'low', 'close']
-    for col in required_cols:
-        if col not in data.columns:
-            logger.warning(f"警告: {source} 数据源缺少 {col} 列")
-            return []
-
-    # 转换日期格式
-    data['date'] = pd.to_datetime(data['date'])
-
-    # 转换为字典列表（确保可 JSON 序列化）
-    result = []
-    for _, row in data.iterrows():
-        try:
-            o = float(row['open'])
-            h = float(row['high'])
-            l = float(row['low'])
-            c = float(row['close'])
-            if any(math.isnan(v) or math.isinf(v) for v in (o, h, l, c)):
-                continue
-        except (ValueError, TypeError):
-            continue
-
-        item = {
-            'date': row['date'].strftime('%Y-%m-%d'),
-            'open': o,
-            'high': h,
-            'low': l,
-            'close': c,
-        }
-
-        # 添加成交量（如果有）
-        if 'volume' in data.columns:
-            v = row['volume']
-            try:
-                if pd.notna(v) and not (isinstance(v, float) and (math.isnan(v) or math.isinf(v))):
-                    item['volume'] = int(v)
-                else:
-                    item['volume'] = 0
-            except (ValueError, TypeError):
-                item['volume'] = 0
-
-        result.append(item)
-
-    return result
+from ..utils import process_kline_data
 
 
 def get_kline_data_from_finnhub(
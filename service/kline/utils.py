@@ -9,7 +9,7 @@ import logging
 import math
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Any
+from typing import Any, Dict, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -72,10 +72,89 @@ def _to_json_value(val: Any, field_name: str = '') -> Any:
         return None
 
 
+# 统一列名映射（按顺序匹配，第一个存在的列胜出）
+KLINE_COLUMN_MAPPING = {
+    'open': ['open', 'Open', 'OPEN', '开盘', 'o'],
+    'high': ['high', 'High', 'HIGH', '最高', 'h'],
+    'low': ['low', 'Low', 'LOW', '最低', 'l'],
+    'close': ['close', 'Close', 'CLOSE', 'last', '收盘', 'c'],
+    'volume': ['volume', 'Volume', 'VOLUME', 'vol', '成交量', 'v'],
+    'date': ['date', 'Date', 'DATE', 'datetime', 'time', '日期', 't']
+}
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+
+
+def _format_date_value(val: Any) -> Optional[str]:
+    """单个日期值 → "YYYY-MM-DD"，无法解析返回 None（逐元素兜底路径）"""
+    try:
+        if isinstance(val, (pd.Timestamp, np.datetime64)):
+            return pd.Timestamp(val).strftime('%Y-%m-%d')
+        if hasattr(val, 'strftime'):
+            return val.strftime('%Y-%m-%d')
+        parsed = pd.to_datetime(str(val), errors='coerce')
+        if pd.isna(parsed):
+            return None
+        return parsed.strftime('%Y-%m-%d')
+    except Exception:
+        return None
+
+
+def _format_date_column(col: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    整列日期 → ("YYYY-MM-DD" 字符串数组, 是否解析成功的布尔数组)
+
+    datetime 列直接整列格式化；其他列转字符串后整列解析，
+    整列解析出错（如混合时区）时退回逐元素解析
+    """
+    if pd.api.types.is_datetime64_any_dtype(col):
+        formatted = col.dt.strftime('%Y-%m-%d')
+    else:
+        try:
+            strings = col.astype(str)
+            # 各数据源基本都是 ISO 格式日期，先按 ISO8601 整列快速解析
+            parsed = pd.to_datetime(strings, errors='coerce', format='ISO8601')
+            unparsed = parsed.isna()
+            if unparsed.any():
+                # 非 ISO 格式的行按单个元素重新解析（与逐行 pd.to_datetime 语义一致）
+                parsed[unparsed] = pd.to_datetime(strings[unparsed], errors='coerce', format='mixed')
+            formatted = parsed.dt.strftime('%Y-%m-%d')
+        except (TypeError, ValueError, AttributeError):
+            values = np.array([_format_date_value(v) for v in col.tolist()], dtype=object)
+            return values, np.array([v is not None for v in values], dtype=bool)
+
+    return formatted.to_numpy(dtype=object), formatted.notna().to_numpy(copy=True)
+
+
+def _to_volume_value(v: Any) -> int:
+    """单个成交量值 → int，NaN/Inf/无法转换为 0（逐元素兜底路径）"""
+    try:
+        if pd.notna(v) and not (isinstance(v, float) and (math.isnan(v) or math.isinf(v))):
+            return int(v)
+    except (ValueError, TypeError):
+        pass
+    return 0
+
+
+def _volume_column(col: pd.Series) -> np.ndarray:
+    """整列成交量 → int64 数组（NaN/Inf 为 0，小数向零取整）"""
+    if pd.api.types.is_integer_dtype(col) or pd.api.types.is_bool_dtype(col):
+        return col.to_numpy(dtype=np.int64)
+    if pd.api.types.is_float_dtype(col):
+        values = col.to_numpy(dtype=np.float64, copy=True)
+        values[~np.isfinite(values)] = 0
+        return values.astype(np.int64)
+    # 字符串等非数值列保持原有逐元素语义（如 "12.5" 无法 int() 转换 → 0）
+    return np.array([_to_volume_value(v) for v in col.tolist()], dtype=np.int64)
+
+
 def process_kline_data(data: pd.DataFrame, source: str) -> List[Dict]:
     """
     处理K线数据，统一格式，并确保所有值是可 JSON 序列化的 Python 原生类型
 
+    所有数据源共用这一个实现，列名映射、NaN/Inf 过滤、日期格式化、
+    成交量转换均为整列运算，只在最后组装字典时遍历一次
+
     Args:
         data: 原始数据DataFrame
         source: 数据源名称
@@ -96,18 +175,8 @@ def process_kline_data(data: pd.DataFrame, source: str) -> List[Dict]:
         if 'index' in data.columns:
             data = data.rename(columns={'index': 'date'})
 
-    # 统一列名映射
-    column_mapping = {
-        'open': ['open', 'Open', 'OPEN', '开盘'],
-        'high': ['high', 'High', 'HIGH', '最高'],
-        'low': ['low', 'Low', 'LOW', '最低'],
-        'close': ['close', 'Close', 'CLOSE', 'last', '收盘'],
-        'volume': ['volume', 'Volume', 'VOLUME', 'vol', '成交量'],
-        'date': ['date', 'Date', 'DATE', 'datetime', 'time', '日期']
-    }
-
     # 重命名列
-    for target_col, possible_cols in column_mapping.items():
+    for target_col, possible_cols in KLINE_COLUMN_MAPPING.items():
         for col in possible_cols:
             if col in data.columns:
                 if col != target_col:
@@ -121,55 +190,28 @@ def process_kline_data(data: pd.DataFrame, source: str) -> List[Dict]:
             logger.warning(f"{source} 数据源缺少 {col} 列，可用列: {list(data.columns)}")
             return []
 
-    # 转换为字典列表（严格确保每个值都是 Python 原生类型）
-    result = []
-    for _, row in data.iterrows():
-        # 日期：转为 "YYYY-MM-DD" 字符串
-        date_val = row['date']
-        try:
-            if isinstance(date_val, (pd.Timestamp, np.datetime64)):
-                date_str = pd.Timestamp(date_val).strftime('%Y-%m-%d')
-            elif hasattr(date_val, 'strftime'):
-                date_str = date_val.strftime('%Y-%m-%d')
-            else:
-                # 可能是字符串，直接使用
-                parsed = pd.to_datetime(str(date_val), errors='coerce')
-                if pd.isna(parsed):
-                    continue  # 无法解析日期，跳过这一行
-                date_str = parsed.strftime('%Y-%m-%d')
-        except Exception:
-            continue
-
-        # 数值：确保是 float，并过滤 NaN
-        try:
-            o = float(row['open'])
-            h = float(row['high'])
-            l = float(row['low'])
-            c = float(row['close'])
-            if any(math.isnan(v) or math.isinf(v) for v in (o, h, l, c)):
-                continue
-        except (ValueError, TypeError):
-            continue
-
-        item = {
-            'date': date_str,
-            'open': o,
-            'high': h,
-            'low': l,
-            'close': c,
-        }
-
-        # 成交量：确保是 int，NaN 转 0
-        if 'volume' in data.columns:
-            try:
-                v = row['volume']
-                if pd.notna(v) and not (isinstance(v, float) and (math.isnan(v) or math.isinf(v))):
-                    item['volume'] = int(v)
-                else:
-                    item['volume'] = 0
-            except (ValueError, TypeError):
-                item['volume'] = 0
-
-        result.append(item)
-
-    return result
+    # 日期：整列转为 "YYYY-MM-DD"，无法解析的行丢弃
+    dates, keep = _format_date_column(data['date'])
+
+    # 价格：整列转 float，NaN/Inf/无法转换的行丢弃
+    prices = []
+    for col in PRICE_COLUMNS:
+        values = pd.to_numeric(data[col], errors='coerce').to_numpy(dtype=np.float64)
+        keep &= np.isfinite(values)
+        prices.append(values)
+
+    dates = dates[keep].tolist()
+    opens, highs, lows, closes = (values[keep].tolist() for values in prices)
+
+    if 'volume' not in data.columns:
+        return [
+            {'date': d, 'open': o, 'high': h, 'low': l, 'close': c}
+            for d, o, h, l, c in zip(dates, opens, highs, lows, closes)
+        ]
+
+    # 成交量：整列转 int，NaN 转 0
+    volumes = _volume_column(data['volume'])[keep].tolist()
+    return [
+        {'date': d, 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v}
+        for d, o, h, l, c, v in zip(dates, opens, highs, lows, closes, volumes)
+    ]
@@ -0,0 +1,320 @@
+"""
+主力动向数据集缓存 - 个股资金流向与股东户数按各自的更新周期缓存，不再每次请求都重新下载
+
+核心原理：
+1. 两类数据集在 MongoDB 中各有独立的缓存键空间（与K线缓存共用集合，/metrics 中按键类型单独统计）：
+   - fund_flow:{code}：ak.stock_individual_fund_flow 的近 FUND_FLOW_ROWS 日资金流向；
+     按A股交易日历缓存：休市期间（夜间、周末、节假日）有效到下一次开盘，
+     交易时段内当日数据仍在变化，只缓存 FUND_FLOW_LIVE_TTL 秒
+   - shareholders:{code}：ak.stock_zh_a_gdhs_detail_em 的最新一期股东户数（本次 / 上次），
+     按季度披露，缓存 SHAREHOLDER_TTL_DAYS 天
+   - shareholders:all：全市场最新一期股东户数表（ak.stock_zh_a_gdhs(symbol='最新') 一次拉取），按代码索引
+2. 读取顺序为 内存（按 LRU 最多保留 DATASET_MAX_ENTRIES 项）→ MongoDB → 上游；
+   同一键的并发未命中经 single-flight 合并为一次上游调用，上游调用经熔断器（provider_health）
+3. 股东户数先查单只股票的缓存，再查全市场表，都没有时才单独拉取该股票；
+   全市场表不在请求路径上下载：首次使用或过期时提交后台刷新（见 revalidator.py），
+   刷新完成前继续使用旧表（股东户数按季度变化，旧表仍然可用），刷新失败后 TABLE_RETRY_SECONDS 秒内不再重试
+
+使用方法：
+    from service.main_force.datasets import get_main_force_datasets
+
+    datasets = get_main_force_datasets()
+    flow_df = datasets.get_fund_flow('600519')          # DataFrame，取不到时为None
+    households = datasets.get_shareholders('600519')    # (本次户数, 上次户数)，取不到时为None
+    datasets.refresh_shareholder_table()                # 同步刷新全市场股东户数表
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from service.cache.cache_metrics import record_lookup
+from service.cache.mongodb_cache import get_cache
+from service.cache.revalidator import get_revalidator
+from service.utils.single_flight import get_single_flight
+from service.utils.trading_calendar import get_trading_calendar
+
+logger = logging.getLogger(__name__)
+
+# 交易时段内资金流向的缓存时长（秒）
+FUND_FLOW_LIVE_TTL = float(os.getenv('FUND_FLOW_LIVE_TTL', '300'))
+# 股东户数（单只股票与全市场表）的缓存天数
+SHAREHOLDER_TTL_DAYS = float(os.getenv('SHAREHOLDER_TTL_DAYS', '7'))
+# 内存中最多保留的数据集条目数（资金流向与单只股票的股东户数合计）
+DATASET_MAX_ENTRIES = int(os.getenv('MAIN_FORCE_DATASET_MAX_ENTRIES', '2000'))
+# 全市场股东户数表刷新失败后的重试间隔（秒）
+TABLE_RETRY_SECONDS = 600.0
+
+# 资金流向保留的最近交易日数与列（get_main_force_analysis 只用到近10日）
+FUND_FLOW_ROWS = 30
+FUND_FLOW_COLUMNS = ('日期', '主力净流入-净额', '超大单净流入-净额', '大单净流入-净额', '中单净流入-净额', '小单净流入-净额')
+
+SHAREHOLDER_TABLE_KEY = 'shareholders:all'
+
+
+def _fund_flow_key(code: str) -> str:
+    return f"fund_flow:{code}"
+
+
+def _shareholders_key(code: str) -> str:
+    return f"shareholders:{code}"
+
+
+def _fund_flow_expires(now: float) -> float:
+    """资金流向的过期时间：休市期间到下一次开盘，交易时段内（含收盘后的确定窗口）FUND_FLOW_LIVE_TTL 秒"""
+    calendar = get_trading_calendar('a')
+    if calendar is None:
+        return now + FUND_FLOW_LIVE_TTL
+    opens_at = calendar.next_open(now)
+    return opens_at if opens_at > now else now + FUND_FLOW_LIVE_TTL
+
+
+def _households(current: Any, previous: Any) -> Optional[Tuple[int, int]]:
+    """(本次户数, 上次户数)，缺失时返回None"""
+    if pd.isna(current) or pd.isna(previous):
+        return None
+    return int(current), int(previous)
+
+
+class MainForceDatasets:
+    """个股资金流向与股东户数的两级缓存（内存 + MongoDB）"""
+
+    def __init__(self, max_entries: int = DATASET_MAX_ENTRIES):
+        self.max_entries = max_entries
+        # 缓存键 -> (过期时间戳, 值)
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._table: Optional[Dict[str, Tuple[int, int]]] = None
+        self._table_as_of: Optional[str] = None
+        self._table_expires = 0.0
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._mongo_hits = 0
+        self._misses = 0
+        self._table_hits = 0
+        self._table_refreshes = 0
+
+    def _get(self, key: str) -> Tuple[bool, Any]:
+        """内存 → MongoDB 查找，返回 (是否命中, 值)"""
+        t0 = time.perf_counter()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                record_lookup(key, 'memory_hit', time.perf_counter() - t0)
+                return True, entry[1]
+
+        # 文档的有效期以 expires_ts 为准，命中与否在这里判定并记录，不让 get_documents 按是否存在重复记录
+        get_documents = getattr(get_cache(), 'get_documents', None)
+        doc = get_documents([key], record=False).get(key) if get_documents is not None else None
+        if doc and doc.get('expires_ts', 0) > now:
+            self._remember(key, doc['expires_ts'], doc['value'])
+            with self._lock:
+                self._mongo_hits += 1
+            record_lookup(key, 'mongo_hit', time.perf_counter() - t0)
+            return True, doc['value']
+
+        with self._lock:
+            self._misses += 1
+        record_lookup(key, 'miss', time.perf_counter() - t0)
+        return False, None
+
+    def _remember(self, key: str, expires_ts: float, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (expires_ts, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _put(self, key: str, expires_ts: float, value: Any) -> None:
+        """写入内存并持久化到 MongoDB（MongoDB 中的文档在同一时间过期）"""
+        self._remember(key, expires_ts, value)
+        set_document = getattr(get_cache(), 'set_document', None)
+        if set_document is not None:
+            ttl_days = max(expires_ts - time.time(), 1.0) / 86400
+            set_document(key, {'value': value, 'expires_ts': expires_ts}, ttl_days=ttl_days)
+
+    def get_fund_flow(self, code: str) -> Optional[pd.DataFrame]:
+        """
+        A股个股近 FUND_FLOW_ROWS 日资金流向
+
+        Args:
+            code: 6位股票代码
+
+        Returns:
+            按日期升序的 DataFrame（列见 FUND_FLOW_COLUMNS）；上游没有数据时返回None
+
+        Raises:
+            上游调用失败时透传异常（由调用方降级）
+        """
+        key = _fund_flow_key(code)
+        found, records = self._get(key)
+        if not found:
+            records, _shared = get_single_flight().do(key, self._fetch_fund_flow, code)
+        return pd.DataFrame(records) if records else None
+
+    def _fetch_fund_flow(self, code: str) -> List[Dict[str, Any]]:
+        import akshare as ak
+        from service.utils.provider_health import call_with_breaker
+
+        flow_df = call_with_breaker(
+            'main_force:fund_flow', ak.stock_individual_fund_flow,
+            stock=code, market="sh" if code.startswith('6') else "sz", is_success=lambda df: df is not None
+        )
+        columns = [column for column in FUND_FLOW_COLUMNS if column in flow_df.columns]
+        records = flow_df.tail(FUND_FLOW_ROWS)[columns].to_dict('records')
+        for record in records:
+            if '日期' in record:
+                record['日期'] = str(record['日期'])
+        self._put(_fund_flow_key(code), _fund_flow_expires(time.time()), records)
+        return records
+
+    def get_shareholders(self, code: str) -> Optional[Tuple[int, int]]:
+        """
+        A股个股最新一期股东户数：单只股票缓存 → 全市场表 → 单独拉取
+
+        Args:
+            code: 6位股票代码
+
+        Returns:
+            (本次户数, 上次户数)；取不到时返回None
+
+        Raises:
+            单独拉取失败时透传异常（由调用方降级）
+        """
+        key = _shareholders_key(code)
+        found, households = self._get(key)
+        if found:
+            return tuple(households) if households else None
+
+        table = self.get_shareholder_table()
+        if table is not None and code in table:
+            with self._lock:
+                self._table_hits += 1
+            return table[code]
+
+        households, _shared = get_single_flight().do(key, self._fetch_shareholders, code)
+        return households
+
+    def _fetch_shareholders(self, code: str) -> Optional[Tuple[int, int]]:
+        import akshare as ak
+        from service.utils.provider_health import call_with_breaker
+
+        gdhs_df = call_with_breaker(
+            'main_force:shareholders', ak.stock_zh_a_gdhs_detail_em,
+            symbol=code, is_success=lambda df: df is not None
+        )
+        households = None
+        if not gdhs_df.empty:
+            households = _households(gdhs_df.iloc[0]['股东户数-本次'], gdhs_df.iloc[0]['股东户数-上次'])
+        self._put(_shareholders_key(code), time.time() + SHAREHOLDER_TTL_DAYS * 86400,
+                  list(households) if households else None)
+        return households
+
+    def get_shareholder_table(self) -> Optional[Dict[str, Tuple[int, int]]]:
+        """
+        全市场最新一期股东户数表（不阻塞）：不存在或已过期时提交后台刷新，刷新完成前返回旧表
+
+        Returns:
+            {6位代码: (本次户数, 上次户数)}；还没有加载过时返回None
+        """
+        now = time.time()
+        with self._lock:
+            table, expired = self._table, self._table_expires <= now
+            if expired:
+                # 刷新成功时会覆盖；失败时 TABLE_RETRY_SECONDS 秒内不再重试
+                self._table_expires = now + TABLE_RETRY_SECONDS
+        if expired:
+            get_revalidator().submit(SHAREHOLDER_TABLE_KEY, self._load_shareholder_table)
+        return table
+
+    def _load_shareholder_table(self) -> bool:
+        """先从 MongoDB 恢复全市场表，MongoDB 中没有或已过期时从上游下载"""
+        get_documents = getattr(get_cache(), 'get_documents', None)
+        doc = get_documents([SHAREHOLDER_TABLE_KEY]).get(SHAREHOLDER_TABLE_KEY) if get_documents is not None else None
+        if doc and doc.get('expires_ts', 0) > time.time():
+            self._install_table({code: tuple(value) for code, value in doc['rows'].items()},
+                                doc.get('as_of'), doc['expires_ts'])
+            return True
+        return self.refresh_shareholder_table() > 0
+
+    def refresh_shareholder_table(self) -> int:
+        """
+        一次拉取全市场最新一期股东户数并按代码索引，写入内存和 MongoDB
+
+        Returns:
+            表中的股票数
+        """
+        import akshare as ak
+        from service.utils.provider_health import call_with_breaker
+
+        t0 = time.time()
+        df = call_with_breaker(
+            'main_force:shareholders_all', ak.stock_zh_a_gdhs,
+            symbol='最新', is_success=lambda frame: frame is not None and not frame.empty
+        )
+        table = {}
+        for code, current, previous in zip(df['代码'], df['股东户数-本次'], df['股东户数-上次']):
+            households = _households(current, previous)
+            if households is not None:
+                table[str(code).zfill(6)] = households
+
+        as_of = datetime.now().strftime('%Y-%m-%d')
+        expires_ts = time.time() + SHAREHOLDER_TTL_DAYS * 86400
+        self._install_table(table, as_of, expires_ts)
+        with self._lock:
+            self._table_refreshes += 1
+        set_document = getattr(get_cache(), 'set_document', None)
+        if set_document is not None and table:
+            set_document(SHAREHOLDER_TABLE_KEY, {
+                'rows': {code: list(value) for code, value in table.items()},
+                'as_of': as_of,
+                'expires_ts': expires_ts,
+            }, ttl_days=SHAREHOLDER_TTL_DAYS)
+        logger.info(f"[MainForceData] ✅ 全市场股东户数表已刷新: {len(table)} 只，耗时 {time.time() - t0:.1f}s")
+        return len(table)
+
+    def _install_table(self, table: Dict[str, Tuple[int, int]], as_of: Optional[str], expires_ts: float) -> None:
+        with self._lock:
+            self._table = table
+            self._table_as_of = as_of
+            self._table_expires = expires_ts
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'memory_hits': self._hits,
+                'mongo_hits': self._mongo_hits,
+                'misses': self._misses,
+                'shareholder_table': {
+                    'symbols': len(self._table) if self._table is not None else 0,
+                    'as_of': self._table_as_of,
+                    'hits': self._table_hits,
+                    'refreshes': self._table_refreshes,
+                },
+            }
+
+
+_datasets: Optional[MainForceDatasets] = None
+_datasets_lock = threading.Lock()
+
+
+def get_main_force_datasets() -> MainForceDatasets:
+    """获取全局数据集缓存（单例）"""
+    global _datasets
+    if _datasets is None:
+        with _datasets_lock:
+            if _datasets is None:
+                _datasets = MainForceDatasets()
+    return _datasets
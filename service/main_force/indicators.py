@@ -0,0 +1,470 @@
+"""
+增量技术指标 - 按股票保存滚动窗口与 EWM 的中间状态，新K线到来时 O(1) 推进，不再每次重算整个序列
+
+核心原理：
+1. 指标与 calculate_technical_indicators（pandas 版本）相同：MA5~MA120、MACD、BOLL、RSI(14)、KDJ(9,3,3)；
+   各滚动 / EWM 计算逐步复现 pandas 的实现（rolling mean 的 Kahan 求和、rolling std 的 Welford 算法、
+   ewm(adjust=False) 的递推与归一化），对同一段K线的输出与 pandas 版本逐位一致
+2. 每只股票的状态记录锚点（第一根K线的日期）与已确认的最后一根K线；再次计算时只追加其后的新K线，
+   最后一根K线可能是盘中数据，只在副本上推进，不写入状态
+3. 锚点不同、已确认的K线不在本次序列中或位置不符（缺口）、该K线的价格变化（复权调整）时整段重算
+4. 状态按 LRU 最多保留 INDICATOR_CACHE_SYMBOLS 只股票；调用方按 anchor_start 取K线即可保持增量
+5. EWM 类指标（MACD、KDJ、RSI）的值取决于序列的起点：anchor_start 把起点对齐到 end_date 前
+   至少 INDICATOR_MIN_DAYS 天的最近一个半年起点（1 月 1 日或 7 月 1 日），起点只由日期决定，
+   各副本、重启前后以及全市场排行（service.main_force.ranking）对同一天算出的指标一致；
+   半年内起点不变，状态一直增量推进，起点换到下一个半年时整段重算一次
+
+使用方法：
+    from service.main_force.indicators import get_indicator_engine, anchor_start
+
+    engine = get_indicator_engine()
+    start_date = anchor_start(end_date)  # 起点只由日期决定，K线按该起点取到 end_date
+    rows = engine.compute(code, bars)   # 最后两根K线的指标 [{'ma5': ..., 'macd_hist': ...}, {...}]
+"""
+
+import copy
+import math
+import os
+import threading
+from collections import OrderedDict, deque
+from datetime import date, datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional
+
+INDICATOR_CACHE_SYMBOLS = int(os.getenv('INDICATOR_CACHE_SYMBOLS', '2000'))
+# 指标计算至少使用的K线区间（天）
+INDICATOR_MIN_DAYS = int(os.getenv('INDICATOR_MIN_DAYS', '200'))
+
+NAN = float('nan')
+MA_WINDOWS = (5, 10, 20, 60, 120)
+
+
+def anchor_start(end_date: str, min_days: int = INDICATOR_MIN_DAYS) -> str:
+    """
+    指标计算的K线起点：不晚于 end_date 前 min_days 天的最近一个半年起点（1 月 1 日或 7 月 1 日）
+
+    Args:
+        end_date: 结束日期（YYYY-MM-DD）
+        min_days: 至少覆盖的天数
+
+    Returns:
+        起点日期（YYYY-MM-DD），区间长度在 min_days 到 min_days + 183 天之间
+    """
+    latest = datetime.strptime(end_date, '%Y-%m-%d').date() - timedelta(days=min_days)
+    return date(latest.year, 7 if latest.month >= 7 else 1, 1).strftime('%Y-%m-%d')
+
+
+def _round2(value: float) -> float:
+    """与 Series.round(2) 相同的舍入（numpy：乘 100、rint（四舍六入五成双）、除 100）"""
+    if value != value or math.isinf(value):
+        return value
+    y = value * 100.0
+    rounded = float(round(y))
+    if rounded == 0.0:
+        rounded = math.copysign(0.0, y)
+    return rounded / 100.0
+
+
+def _divide(a: float, b: float) -> float:
+    """与 numpy 浮点除法相同的结果（除数为0时返回 ±inf / nan，不抛异常）"""
+    if b != 0.0:
+        return a / b
+    if a != a or a == 0.0:
+        return NAN
+    return math.copysign(math.inf, a) * math.copysign(1.0, b)
+
+
+class _RollingMean:
+    """复现 pandas rolling(window).mean()：Kahan 补偿求和，加入与移出各用一个补偿量"""
+
+    __slots__ = ('window', 'values', 'nobs', 'sum_x', 'neg_ct', 'comp_add', 'comp_remove', 'same_count', 'prev_value')
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values: Deque[float] = deque()
+        self.nobs = 0
+        self.sum_x = 0.0
+        self.neg_ct = 0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.same_count = 0
+        self.prev_value: Optional[float] = None
+
+    def push(self, value: float) -> float:
+        if self.prev_value is None:
+            self.prev_value = value
+        self.values.append(value)
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if old == old:
+                self.nobs -= 1
+                y = -old - self.comp_remove
+                t = self.sum_x + y
+                self.comp_remove = t - self.sum_x - y
+                self.sum_x = t
+                if math.copysign(1.0, old) < 0:
+                    self.neg_ct -= 1
+        if value == value:
+            self.nobs += 1
+            y = value - self.comp_add
+            t = self.sum_x + y
+            self.comp_add = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, value) < 0:
+                self.neg_ct += 1
+            if value == self.prev_value:
+                self.same_count += 1
+            else:
+                self.same_count = 1
+            self.prev_value = value
+
+        if self.nobs < self.window or self.nobs == 0:
+            return NAN
+        result = self.sum_x / self.nobs
+        if self.same_count >= self.nobs:
+            return self.prev_value
+        if self.neg_ct == 0 and result < 0:
+            return 0.0
+        if self.neg_ct == self.nobs and result > 0:
+            return 0.0
+        return result
+
+
+class _RollingStd:
+    """复现 pandas rolling(window).std()（ddof=1）：带 Kahan 补偿的 Welford 在线方差"""
+
+    __slots__ = ('window', 'values', 'nobs', 'mean_x', 'ssqdm_x', 'comp_add', 'comp_remove', 'same_count', 'prev_value')
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values: Deque[float] = deque()
+        self.nobs = 0
+        self.mean_x = 0.0
+        self.ssqdm_x = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.same_count = 0
+        self.prev_value: Optional[float] = None
+
+    def push(self, value: float) -> float:
+        if self.prev_value is None:
+            self.prev_value = value
+        self.values.append(value)
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if old == old:
+                self.nobs -= 1
+                if self.nobs:
+                    prev_mean = self.mean_x - self.comp_remove
+                    y = old - self.comp_remove
+                    t = y - self.mean_x
+                    self.comp_remove = t + self.mean_x - y
+                    self.mean_x = self.mean_x - t / self.nobs
+                    self.ssqdm_x = self.ssqdm_x - (old - prev_mean) * (old - self.mean_x)
+                else:
+                    self.mean_x = 0.0
+                    self.ssqdm_x = 0.0
+        if value == value:
+            self.nobs += 1
+            if value == self.prev_value:
+                self.same_count += 1
+            else:
+                self.same_count = 1
+            self.prev_value = value
+            prev_mean = self.mean_x - self.comp_add
+            y = value - self.comp_add
+            t = y - self.mean_x
+            self.comp_add = t + self.mean_x - y
+            self.mean_x = self.mean_x + t / self.nobs
+            self.ssqdm_x = self.ssqdm_x + (value - prev_mean) * (value - self.mean_x)
+
+        if self.nobs < self.window or self.nobs <= 1:
+            return NAN
+        if self.same_count >= self.nobs:
+            return 0.0
+        variance = self.ssqdm_x / (self.nobs - 1)
+        return math.sqrt(variance) if variance > 0 else 0.0
+
+
+class _RollingExtreme:
+    """rolling(window).min() / max()：单调队列，均摊 O(1)"""
+
+    __slots__ = ('window', 'is_max', 'queue', 'missing', 'index')
+
+    def __init__(self, window: int, is_max: bool):
+        self.window = window
+        self.is_max = is_max
+        self.queue: Deque[tuple] = deque()
+        self.missing: Deque[int] = deque()
+        self.index = 0
+
+    def push(self, value: float) -> float:
+        i = self.index
+        self.index += 1
+        if value == value:
+            if self.is_max:
+                while self.queue and self.queue[-1][1] <= value:
+                    self.queue.pop()
+            else:
+                while self.queue and self.queue[-1][1] >= value:
+                    self.queue.pop()
+            self.queue.append((i, value))
+        else:
+            self.missing.append(i)
+        while self.queue and self.queue[0][0] <= i - self.window:
+            self.queue.popleft()
+        while self.missing and self.missing[0] <= i - self.window:
+            self.missing.popleft()
+        # 窗口未满或窗口内有缺失值时与 pandas（min_periods=window）一样返回 NaN
+        if self.index < self.window or self.missing:
+            return NAN
+        return self.queue[0][1]
+
+
+class _Ewm:
+    """复现 pandas ewm(adjust=False).mean()：alpha = 1 / (1 + com)，每步按权重归一化"""
+
+    __slots__ = ('alpha', 'old_wt_factor', 'weighted')
+
+    def __init__(self, com: float):
+        self.alpha = 1.0 / (1.0 + com)
+        self.old_wt_factor = 1.0 - self.alpha
+        self.weighted = NAN
+
+    def push(self, value: float) -> float:
+        if self.weighted == self.weighted:
+            if value == value:
+                old_wt = self.old_wt_factor
+                if self.weighted != value:
+                    self.weighted = (old_wt * self.weighted + self.alpha * value) / (old_wt + self.alpha)
+        elif value == value:
+            self.weighted = value
+        return self.weighted
+
+
+def _clone(rolling):
+    """滚动状态的副本（窗口队列单独复制）"""
+    twin = copy.copy(rolling)
+    for name in rolling.__slots__:
+        value = getattr(rolling, name)
+        if isinstance(value, deque):
+            setattr(twin, name, deque(value))
+    return twin
+
+
+def _com_from_span(span: float) -> float:
+    return (span - 1) / 2
+
+
+def _com_from_alpha(alpha: float) -> float:
+    return 1 / alpha - 1
+
+
+class IndicatorState:
+    """单只股票的指标中间状态（锚点之后逐根K线推进）"""
+
+    def __init__(self, anchor: str):
+        self.anchor = anchor
+        self.last_date: Optional[str] = None
+        self.last_fingerprint: Optional[tuple] = None
+        self.count = 0
+        self.recent: Deque[Dict[str, float]] = deque(maxlen=2)
+        self.prev_close = NAN
+
+        self.ma = {window: _RollingMean(window) for window in MA_WINDOWS}
+        self.ema12 = _Ewm(_com_from_span(12))
+        self.ema26 = _Ewm(_com_from_span(26))
+        self.macd_signal = _Ewm(_com_from_span(9))
+        self.boll_std = _RollingStd(20)
+        self.gain = _Ewm(_com_from_alpha(1 / 14))
+        self.loss = _Ewm(_com_from_alpha(1 / 14))
+        self.low_min = _RollingExtreme(9, is_max=False)
+        self.high_max = _RollingExtreme(9, is_max=True)
+        self.k = _Ewm(2)
+        self.d = _Ewm(2)
+        self.lock = threading.Lock()
+
+    def push(self, bar: Dict[str, Any]) -> Dict[str, float]:
+        """推进一根K线，返回该K线的指标（与 calculate_technical_indicators 的对应列一致）"""
+        close = float(bar['close'])
+        high = float(bar['high'])
+        low = float(bar['low'])
+
+        row: Dict[str, float] = {}
+        means = {window: rolling.push(close) for window, rolling in self.ma.items()}
+        for window, mean in means.items():
+            row[f'ma{window}'] = _round2(mean)
+
+        macd_line = self.ema12.push(close) - self.ema26.push(close)
+        macd_signal = self.macd_signal.push(macd_line)
+        row['macd_line'] = macd_line
+        row['macd_signal'] = macd_signal
+        row['macd_hist'] = (macd_line - macd_signal) * 2
+
+        boll_mid = means[20]
+        boll_std = self.boll_std.push(close)
+        row['boll_mid'] = boll_mid
+        row['boll_std'] = boll_std
+        row['boll_up'] = boll_mid + 2 * boll_std
+        row['boll_low'] = boll_mid - 2 * boll_std
+
+        # diff 的第一项为 NaN，where 把它和非正 / 非负项一起置为 0
+        delta = close - self.prev_close
+        gain = self.gain.push(delta if delta > 0 else 0.0)
+        loss = self.loss.push(-(delta if delta < 0 else 0.0))
+        rs = _divide(gain, loss)
+        row['rsi'] = _round2(100 - _divide(100, 1 + rs))
+        self.prev_close = close
+
+        low_min = self.low_min.push(low)
+        high_max = self.high_max.push(high)
+        rsv = _divide(100 * (close - low_min), high_max - low_min + 1e-8)
+        k = self.k.push(rsv)
+        d = self.d.push(k)
+        row['rsv'] = rsv
+        row['k'] = k
+        row['d'] = d
+        row['j'] = 3 * k - 2 * d
+        return row
+
+    def clone(self) -> 'IndicatorState':
+        """状态副本（用于在不改变状态的前提下推进盘中K线）"""
+        twin = IndicatorState.__new__(IndicatorState)
+        for name, value in self.__dict__.items():
+            if name == 'ma':
+                value = {window: _clone(rolling) for window, rolling in value.items()}
+            elif name == 'recent':
+                value = deque(value, maxlen=value.maxlen)
+            elif hasattr(value, '__slots__'):
+                value = _clone(value)
+            setattr(twin, name, value)
+        return twin
+
+    def commit(self, bar: Dict[str, Any]) -> Dict[str, float]:
+        row = self.push(bar)
+        self.count += 1
+        self.last_date = str(bar['date'])
+        self.last_fingerprint = _fingerprint(bar)
+        self.recent.append(row)
+        return row
+
+
+def _fingerprint(bar: Dict[str, Any]) -> tuple:
+    return float(bar['open']), float(bar['close']), float(bar['high']), float(bar['low'])
+
+
+class IndicatorEngine:
+    """各股票指标状态的 LRU 缓存"""
+
+    def __init__(self, max_symbols: int = INDICATOR_CACHE_SYMBOLS):
+        self._states: 'OrderedDict[str, IndicatorState]' = OrderedDict()
+        self._max_symbols = max_symbols
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self._incremental = 0
+        self._full = 0
+        self._bars_pushed = 0
+
+    def anchor_date(self, code: str) -> Optional[str]:
+        """已有状态的锚点日期（按该日期起取K线可增量计算），没有状态时返回None"""
+        state = self._states.get(code)
+        return state.anchor if state is not None else None
+
+    def _rebuild(self, code: str, bars: List[Dict[str, Any]]) -> IndicatorState:
+        state = IndicatorState(str(bars[0]['date']))
+        for bar in bars[:-1]:
+            state.commit(bar)
+        with self._lock:
+            self._states[code] = state
+            self._states.move_to_end(code)
+            while len(self._states) > self._max_symbols:
+                self._states.popitem(last=False)
+            self._full += 1
+            self._bars_pushed += len(bars) - 1
+        return state
+
+    def _resume_position(self, state: IndicatorState, bars: List[Dict[str, Any]]) -> Optional[int]:
+        """已确认的最后一根K线在本次序列中的位置；缺口或复权调整时返回None"""
+        if state.last_date is None or str(bars[0]['date']) != state.anchor:
+            return None
+        position = state.count - 1
+        if position >= len(bars):
+            return None
+        bar = bars[position]
+        if str(bar['date']) != state.last_date or _fingerprint(bar) != state.last_fingerprint:
+            return None
+        return position
+
+    def compute(self, code: str, bars: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+        """
+        计算按日期升序排列的K线中最后两根的指标
+
+        Args:
+            code: 股票代码（状态的键）
+            bars: K线列表 [{'date', 'open', 'close', 'high', 'low', ...}]，与 calculate_technical_indicators 的输入相同
+
+        Returns:
+            最后两根K线的指标（K线不足两根时只有一项）；与对同一序列调用 calculate_technical_indicators 的结果一致
+        """
+        if not bars:
+            return []
+
+        with self._lock:
+            state = self._states.get(code)
+            if state is not None:
+                self._states.move_to_end(code)
+
+        position = None
+        if state is not None:
+            with state.lock:
+                position = self._resume_position(state, bars)
+                if position is not None:
+                    # 已确认部分之后的新K线（最后一根除外）写入状态
+                    for bar in bars[position + 1:-1]:
+                        state.commit(bar)
+                    with self._lock:
+                        self._incremental += 1
+                        self._bars_pushed += max(0, len(bars) - position - 2)
+                    return self._tail(state, bars)
+
+        state = self._rebuild(code, bars)
+        with state.lock:
+            return self._tail(state, bars)
+
+    @staticmethod
+    def _tail(state: IndicatorState, bars: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+        """最后一根K线在状态副本上推进（盘中K线可能还会变化）"""
+        if state.count == len(bars):
+            return list(state.recent)
+        last = state.clone().push(bars[-1])
+        return list(state.recent)[-1:] + [last]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取指标状态统计（用于监控）"""
+        with self._lock:
+            return {
+                'symbols': len(self._states),
+                'incremental': self._incremental,
+                'full_recomputes': self._full,
+                'bars_pushed': self._bars_pushed,
+            }
+
+
+# 全局实例
+_engine_instance: Optional[IndicatorEngine] = None
+_instance_lock = threading.Lock()
+
+
+def get_indicator_engine() -> IndicatorEngine:
+    """
+    获取全局指标引擎（单例模式）
+
+    Returns:
+        IndicatorEngine实例
+    """
+    global _engine_instance
+    if _engine_instance is None:
+        with _instance_lock:
+            if _engine_instance is None:
+                _engine_instance = IndicatorEngine()
+    return _engine_instance
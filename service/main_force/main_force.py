@@ -1,22 +1,25 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-import akshare as ak
+from datetime import datetime
 import traceback
 import math
+import os
+import time
 
 from service.kline.kline import get_kline_data
+from service.main_force.datasets import get_main_force_datasets
+from service.main_force.indicators import get_indicator_engine, anchor_start
+from service.main_force.scoring import MIN_BARS, derive_signals, estimate_net_flow, format_money
+from service.utils.fanout import fan_out
 from utils_stock.stock import get_market_type
 
-# 辅助函数：格式化金额（万元）
-def format_money(val_in_yuan):
-    if pd.isna(val_in_yuan) or val_in_yuan is None:
-        return 0.0
-    return round(float(val_in_yuan) / 10000.0, 2)
+# 一次主力动向分析中各上游调用（K线、资金流向、股东户数）共用的截止时间（秒）
+MAIN_FORCE_DEADLINE = float(os.getenv('MAIN_FORCE_DEADLINE_SECONDS', '10'))
 
 def calculate_technical_indicators(df: pd.DataFrame):
     """
-    基于K线计算技术指标
+    基于K线计算技术指标（整段重算的参考实现；get_main_force_analysis 使用增量版本 service.main_force.indicators，
+    两者对同一段K线的结果一致）
     """
     df = df.copy()
     df['date'] = pd.to_datetime(df['date'])
@@ -59,12 +62,55 @@ def calculate_technical_indicators(df: pd.DataFrame):
 
     return df
 
+def _load_kline(query_code: str, start_date: str, end_date: str):
+    """K线（没有数据时返回None）"""
+    kline_res = get_kline_data(query_code, start_date=start_date, end_date=end_date)
+    if not kline_res or not kline_res.get('data'):
+        return None
+    return kline_res
+
+def _load_fund_flow(pure_code: str):
+    """A股近10日资金流向 → 各周期主力净流入与当日各类订单净流入（万元），没有数据时返回None（数据集按交易日历缓存）"""
+    flow_df = get_main_force_datasets().get_fund_flow(pure_code)
+    if flow_df is None or flow_df.empty:
+        return None
+    recent_flow = flow_df.tail(10)
+    return {
+        "today": format_money(recent_flow.iloc[-1]['主力净流入-净额']),
+        "days_3": format_money(recent_flow.tail(3)['主力净流入-净额'].sum()),
+        "days_5": format_money(recent_flow.tail(5)['主力净流入-净额'].sum()),
+        "days_10": format_money(recent_flow['主力净流入-净额'].sum()),
+        "super_large": format_money(recent_flow.iloc[-1]['超大单净流入-净额']),
+        "large": format_money(recent_flow.iloc[-1]['大单净流入-净额']),
+        "medium": format_money(recent_flow.iloc[-1]['中单净流入-净额']),
+        "small": format_money(recent_flow.iloc[-1]['小单净流入-净额']),
+    }
+
+def _load_shareholders(pure_code: str):
+    """A股股东户数 → (本次户数, 变化趋势)，没有数据时返回None（单只股票缓存 / 全市场表，见 service.main_force.datasets）"""
+    households = get_main_force_datasets().get_shareholders(pure_code)
+    if households is None:
+        return None
+    total_households, prev_households = households
+    if total_households > prev_households * 1.05:
+        change_desc = "分散"
+    elif total_households < prev_households * 0.95:
+        change_desc = "集中"
+    else:
+        change_desc = "平稳"
+    return total_households, change_desc
+
 def get_main_force_analysis(code: str) -> dict:
     """
     获取指定股票的主力动向分析数据，所有数据均为实时获取与计算
+
+    K线、资金流向、股东户数互不依赖，同时发起并共用 MAIN_FORCE_DEADLINE 秒的截止时间（见 service.utils.fanout）：
+    资金流向 / 股东户数未按时返回或出错时按缺失处理（与取不到数据相同），K线未按时返回时无法分析；
+    各子调用的状态与耗时在返回值的 timings 中
     :param code: 股票代码，如 sz000001, hk00700, usAAPL
     :return: 包含主力动向各项指标和分析结论的字典
     """
+    t0 = time.perf_counter()
     import re
 
     # 更健壮的市场判断
@@ -85,20 +131,31 @@ def get_main_force_analysis(code: str) -> dict:
     elif market == 'hk' and len(query_code) != 5:
         query_code = code # 退回原代码
 
-    # 1. 获取K线数据（过去200天）
+    # 1. 获取K线数据（至少过去200天，起点对齐到半年起点：同一天各进程算出的指标一致，指标状态可增量推进新K线）
+    engine = get_indicator_engine()
     end_date = datetime.now().strftime('%Y-%m-%d')
-    start_date = (datetime.now() - timedelta(days=200)).strftime('%Y-%m-%d')
-
-    kline_res = get_kline_data(query_code, start_date=start_date, end_date=end_date)
-    if not kline_res or not kline_res.get('data'):
+    start_date = anchor_start(end_date)
+
+    calls = {'kline': lambda: _load_kline(query_code, start_date, end_date)}
+    # A股资金流向、股东户数与K线同时获取
+    flow_code = pure_code[-6:]
+    if market == 'a' and len(pure_code) >= 6:
+        calls['fund_flow'] = lambda: _load_fund_flow(flow_code)
+        calls['shareholders'] = lambda: _load_shareholders(flow_code)
+    upstream, timings = fan_out('main_force', calls, timeout=MAIN_FORCE_DEADLINE)
+
+    kline_res = upstream.get('kline')
+    if not kline_res:
+        print(f"获取K线失败或超时: {timings['kline']}")
         return None
 
-    df_kline = pd.DataFrame(kline_res['data'])
-    if len(df_kline) < 20:
+    bars = sorted(kline_res['data'], key=lambda bar: bar['date'])
+    if len(bars) < MIN_BARS:
         return None # 数据不足无法分析
 
-    df_ta = calculate_technical_indicators(df_kline)
-    last_row = df_ta.iloc[-1]
+    df_ta = pd.DataFrame(bars)
+    indicator_rows = engine.compute(query_code, bars)
+    last_row = {**bars[-1], **indicator_rows[-1]}
 
     # 获取最近几天的价格和量
     recent_5_days = df_ta.tail(5)
@@ -112,33 +169,6 @@ def get_main_force_analysis(code: str) -> dict:
     recent_high = round(float(df_ta.tail(60)['high'].max()), 2)
     recent_low = round(float(df_ta.tail(60)['low'].min()), 2)
 
-    # MACD 状态
-    macd_val = float(last_row['macd_hist'])
-    prev_macd_val = float(df_ta.iloc[-2]['macd_hist'])
-    if macd_val > 0 and prev_macd_val <= 0: macd_status = "金叉"
-    elif macd_val < 0 and prev_macd_val >= 0: macd_status = "死叉"
-    elif macd_val > 0: macd_status = "零轴上"
-    else: macd_status = "零轴下"
-
-    # RSI 状态
-    rsi_val = float(last_row['rsi'])
-    if rsi_val > 80: kdj_status = "超买"
-    elif rsi_val < 20: kdj_status = "超卖"
-    else: kdj_status = "中性"
-
-    # BOLL 状态
-    if current_price > last_row['boll_up']: boll_status = "突破上轨"
-    elif current_price < last_row['boll_low']: boll_status = "跌破下轨"
-    else: boll_status = "中轨震荡"
-
-    # 量价关系推导
-    price_trend = current_price - df_ta.iloc[-5]['close']
-    vol_trend = last_row['volume'] - df_ta.iloc[-5]['volume']
-    if price_trend > 0 and vol_trend > 0: vp_relation = "价涨量增"
-    elif price_trend > 0 and vol_trend <= 0: vp_relation = "价涨量缩"
-    elif price_trend <= 0 and vol_trend > 0: vp_relation = "价跌量增"
-    else: vp_relation = "价跌量缩"
-
     # --- 资本流向等需要调用API的字段 ---
     net_flow_today = 0.0
     net_flow_3d = 0.0
@@ -154,63 +184,26 @@ def get_main_force_analysis(code: str) -> dict:
     avg_holding = 0
     change_desc = "未知"
 
-    # A股实时数据获取
-    if market == 'a':
-        import re
-        pure_code = ''.join(re.findall(r'\d+', code))
-        if len(pure_code) >= 6:
-            pure_code = pure_code[-6:]
-
-            try:
-                # 资金流向
-                flow_df = ak.stock_individual_fund_flow(stock=pure_code, market="sh" if pure_code.startswith('6') else "sz")
-                if not flow_df.empty:
-                    recent_flow = flow_df.tail(10)
-                    net_flow_today = format_money(recent_flow.iloc[-1]['主力净流入-净额'])
-                    net_flow_3d = format_money(recent_flow.tail(3)['主力净流入-净额'].sum())
-                    net_flow_5d = format_money(recent_flow.tail(5)['主力净流入-净额'].sum())
-                    net_flow_10d = format_money(recent_flow['主力净流入-净额'].sum())
-
-                    super_large_amt = format_money(recent_flow.iloc[-1]['超大单净流入-净额'])
-                    large_amt = format_money(recent_flow.iloc[-1]['大单净流入-净额'])
-                    medium_amt = format_money(recent_flow.iloc[-1]['中单净流入-净额'])
-                    small_amt = format_money(recent_flow.iloc[-1]['小单净流入-净额'])
-            except Exception as e:
-                print(f"获取资金流向失败: {e}")
-
-            try:
-                # 股东户数
-                gdhs_df = ak.stock_zh_a_gdhs_detail_em(symbol=pure_code)
-                if not gdhs_df.empty:
-                    total_households = int(gdhs_df.iloc[0]['股东户数-本次'])
-                    prev_households = int(gdhs_df.iloc[0]['股东户数-上次'])
-                    if total_households > prev_households * 1.05:
-                        change_desc = "分散"
-                    elif total_households < prev_households * 0.95:
-                        change_desc = "集中"
-                    else:
-                        change_desc = "平稳"
-            except Exception:
-                try:
-                    gdhs_df2 = ak.stock_zh_a_gdhs(symbol=pure_code)
-                    if not gdhs_df2.empty:
-                        total_households = int(gdhs_df2.iloc[0]['股东户数-本次'])
-                        prev_households = int(gdhs_df2.iloc[0]['股东户数-上次'])
-                        if total_households > prev_households * 1.05:
-                            change_desc = "分散"
-                        elif total_households < prev_households * 0.95:
-                            change_desc = "集中"
-                        else:
-                            change_desc = "平稳"
-                except Exception as e:
-                    print(f"获取股东户数失败: {e}")
+    # A股资金流向与股东户数（未按时返回或出错时保持默认值，原因已由 fan_out 记录在 timings 中）
+    flow = upstream.get('fund_flow')
+    if flow is not None:
+        net_flow_today = flow['today']
+        net_flow_3d = flow['days_3']
+        net_flow_5d = flow['days_5']
+        net_flow_10d = flow['days_10']
+
+        super_large_amt = flow['super_large']
+        large_amt = flow['large']
+        medium_amt = flow['medium']
+        small_amt = flow['small']
+
+    shareholders = upstream.get('shareholders')
+    if shareholders is not None:
+        total_households, change_desc = shareholders
 
     # 如果是港美股，用 K 线实体结合成交额推算近似净流入作为分析基础，但不再生成完全虚假的持仓比例等
     if net_flow_today == 0.0 and market != 'a':
-        avg_price = (last_row['high'] + last_row['low'] + last_row['close']) / 3
-        entity_ratio = (last_row['close'] - last_row['open']) / (last_row['high'] - last_row['low'] + 1e-8)
-        turnover = last_row['volume'] * avg_price
-        net_flow_today = round(turnover * entity_ratio / 10000, 2)
+        net_flow_today = estimate_net_flow(last_row)
         net_flow_3d = round(net_flow_today * 3, 2)
         net_flow_5d = round(net_flow_today * 5, 2)
         net_flow_10d = round(net_flow_today * 10, 2)
@@ -220,6 +213,15 @@ def get_main_force_analysis(code: str) -> dict:
         medium_amt = round(net_flow_today * 0.2, 2)
         small_amt = round(net_flow_today * 0.1, 2)
 
+    # 技术状态、主力行为与综合评分（与全市场排行共用同一套规则，见 service.main_force.scoring）
+    signals = derive_signals(df_ta, last_row, float(indicator_rows[-2]['macd_hist']), net_flow_today, net_flow_5d)
+    vp_relation = signals['vp_relation']
+    rsi_val = signals['rsi']
+    short_trend = signals['short_trend']
+    mid_trend = signals['mid_trend']
+    main_action = signals['main_action']
+    score = signals['score']
+
     # 计算总流入比例
     total_flow_amt = abs(super_large_amt) + abs(large_amt) + abs(medium_amt) + abs(small_amt) + 1e-8
 
@@ -284,9 +286,9 @@ def get_main_force_analysis(code: str) -> dict:
         },
         "volume_price": vp_relation,
         "indicators": {
-            "macd": macd_status,
-            "kdj": kdj_status,
-            "boll": boll_status,
+            "macd": signals['macd_status'],
+            "kdj": signals['kdj_status'],
+            "boll": signals['boll_status'],
             "rsi": rsi_val
         },
         "levels": {
@@ -297,54 +299,12 @@ def get_main_force_analysis(code: str) -> dict:
         }
     }
 
-    # --- 分析结论逻辑推断 ---
-
-    # 1. 趋势
-    if current_price > last_row['ma20'] and last_row['ma5'] > last_row['ma10']:
-        short_trend = "强势上涨"
-    elif current_price < last_row['ma20'] and last_row['ma5'] < last_row['ma10']:
-        short_trend = "弱势下跌"
-    else:
-        short_trend = "震荡整理"
-
-    mid_trend = "上升通道" if last_row['ma20'] > last_row['ma60'] else ("下降通道" if last_row['ma20'] < last_row['ma60'] else "横盘筑底")
-
-    # 2. 主力行为推断
-    if short_trend == "弱势下跌" and net_flow_today > 0:
-        main_action = "吸筹"
-    elif short_trend == "震荡整理" and vp_relation == "价跌量缩":
-        main_action = "洗盘"
-    elif short_trend == "强势上涨" and vp_relation == "价涨量增":
-        main_action = "拉升"
-    elif short_trend == "强势上涨" and vp_relation == "价跌量增":
-        main_action = "派发"
-    else:
-        main_action = "观望"
-
-    funds_attitude = "持续流入" if net_flow_5d > 0 and net_flow_today > 0 else ("流出" if net_flow_5d < 0 and net_flow_today < 0 else "阶段性流入" if net_flow_today > 0 else "震荡出货")
-
-    control_degree = "中度控盘" if rsi_val > 50 else "轻度控盘"
-
-    # 综合评分 (1-10)
-    score = 5
-    if main_action == "拉升": score += 3
-    elif main_action == "吸筹": score += 2
-    elif main_action == "派发": score -= 3
-    if net_flow_5d > 0: score += 1
-    if short_trend == "强势上涨": score += 1
-    score = max(1, min(10, score))
-
-    if score >= 8: rating = "强烈关注"
-    elif score >= 6: rating = "关注"
-    elif score >= 4: rating = "中性"
-    elif score >= 3: rating = "谨慎"
-    else: rating = "回避"
-
+    # --- 分析结论 ---
     analysis_conclusion = {
         "qualitative": {
             "status": main_action,
-            "funds_attitude": funds_attitude,
-            "control_degree": control_degree,
+            "funds_attitude": signals['funds_attitude'],
+            "control_degree": signals['control_degree'],
             "chips_structure": "底部集中" if current_price < (recent_high+recent_low)/2 else "高位松动"
         },
         "trend_strength": {
@@ -365,7 +325,7 @@ def get_main_force_analysis(code: str) -> dict:
             "main_force_strength": int(score),
             "funds_health": int(8 if net_flow_5d > 0 else 4),
             "chips_stability": int(7 if mid_trend == "上升通道" else 4),
-            "comprehensive_rating": rating
+            "comprehensive_rating": signals['rating']
         }
     }
 
@@ -373,6 +333,7 @@ def get_main_force_analysis(code: str) -> dict:
         "code": code,
         "market": market,
         "timestamp": datetime.now().isoformat(),
+        "timings": {**timings, "total_ms": round((time.perf_counter() - t0) * 1000, 1)},
         "data": {
             "capital_flow": capital_flow,
             "chips_holding": chips_holding,
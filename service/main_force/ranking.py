@@ -0,0 +1,517 @@
+"""
+全市场主力排行 - 对整个市场列表批量计算主力动向评分，按日保存排行表
+
+核心原理：
+1. 数据获取与计算分开：
+   - 市场列表来自 get_stock_by_market 的缓存；A股的主力净流入（当日 / 近5日）用全市场资金流向排行
+     （ak.stock_individual_fund_flow_rank）各一次调用取得，不再逐只调用 stock_individual_fund_flow；
+     港美股没有资金流向数据，与单只股票的分析一样按K线推算
+   - K线经 get_kline_data（BarStore 缓存，只补拉缺口）在 MAIN_FORCE_RANK_FETCH_WORKERS 个线程中获取，
+     不计入缓存预热的访问热度
+   - 需要访问数据源的K线（序列不在内存中或区间内有缺口）先经过排行自己的令牌桶
+     （每分钟 MAIN_FORCE_RANK_RATE_PER_MINUTE 次），与前台请求共用数据源熔断器，不能把数据源打满；
+     前台负载较高时（与缓存预热相同的判断，见 CacheWarmer.foreground_busy）暂停获取
+   - 每凑满 MAIN_FORCE_RANK_CHUNK 只股票提交给进程池（spawn，MAIN_FORCE_RANK_PROCESSES 个进程，
+     默认 CPU 核数减一、最多 4 个）计算指标与评分
+     （service.main_force.scoring.score_chunk，规则与 get_main_force_analysis 相同），K线获取与计算流水线并行
+2. 排行按综合评分、近5日主力净流入降序；整张表写入 MongoDB（main_force_rank:{market}:{日期} 与
+   main_force_rank:{market}:latest，保留 MAIN_FORCE_RANK_RETENTION_DAYS 天），内存中保留各市场最新一张
+3. 排行表的日期为开始计算时已收盘确定的最后一个交易日（见 service.utils.trading_calendar），K线只取到这一天；
+   全市场资金流向排行只有"今日 / 5日"的实时口径，当天尚未收盘确定时（盘中计算）其中含有当天的数据，
+   这时不用资金流向，与港美股一样按K线推算主力净流入（flows_available 为 False）；读取时发现有更新的交易日已收盘确定，在后台重新计算（同一市场同时只有一次计算），计算期间继续返回旧表
+4. MAIN_FORCE_RANK_PROCESSES=0（单核机器的默认值）时在后台线程内计算，不创建进程池；
+   进程池不可用时同样退回线程内计算。进程池只在计算期间存在，计算结束即关闭
+
+使用方法：
+    from service.main_force.ranking import get_main_force_ranker
+
+    ranker = get_main_force_ranker()
+    table = ranker.get_table('a')          # 最新排行表（没有时返回None），过期时在后台重新计算
+    ranker.start_run('a', force=True)      # 立即在后台重新计算（接口只在 MAIN_FORCE_RANK_FORCE_REFRESH=true 时强制）
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from service.main_force.indicators import anchor_start
+from service.utils.trading_calendar import get_trading_calendar
+
+logger = logging.getLogger(__name__)
+
+# 默认留一个核给 Web 进程（单核机器上为 0，即在后台线程内计算）
+RANK_PROCESSES = int(os.getenv('MAIN_FORCE_RANK_PROCESSES', str(max(0, min(4, (os.cpu_count() or 1) - 1)))))
+RANK_FETCH_WORKERS = int(os.getenv('MAIN_FORCE_RANK_FETCH_WORKERS', '8'))
+RANK_CHUNK = int(os.getenv('MAIN_FORCE_RANK_CHUNK', '200'))
+RANK_RETENTION_DAYS = float(os.getenv('MAIN_FORCE_RANK_RETENTION_DAYS', '30'))
+RANK_RATE_PER_MINUTE = float(os.getenv('MAIN_FORCE_RANK_RATE_PER_MINUTE', '120'))
+RANK_BURST = int(os.getenv('MAIN_FORCE_RANK_BURST', '10'))
+# 接口的 refresh=true 是否可以强制重新计算当前已是最新的排行表（一次全市场计算数十分钟，默认只在过期时计算）
+RANK_FORCE_REFRESH = os.getenv('MAIN_FORCE_RANK_FORCE_REFRESH', 'false').lower() in ('1', 'true', 'yes')
+
+RANK_MAX_LIMIT = 1000
+
+RANK_MARKETS = ('a', 'hk', 'us')
+# 传给工作进程的K线字段
+BAR_FIELDS = ('date', 'open', 'high', 'low', 'close', 'volume')
+HISTORY_SIZE = 20
+# 前台负载较高时每次暂停的秒数
+BUSY_PAUSE_SECONDS = 2.0
+
+# 全市场资金流向排行：(akshare indicator, 列名前缀)
+FLOW_PERIODS = (('今日', '今日'), ('5日', '5日'))
+
+
+def _cache_key(market: str, day: str) -> str:
+    return f"main_force_rank:{market}:{day}"
+
+
+def _load_fund_flows() -> Dict[str, Tuple[float, float]]:
+    """
+    A股全市场主力净流入（当日 / 近5日，万元）
+
+    Returns:
+        {6位代码: (当日, 近5日)}；只取到当日数据时近5日记为当日，都取不到时抛出异常
+    """
+    import akshare as ak
+    from service.main_force.scoring import format_money
+    from service.utils.provider_health import call_with_breaker
+
+    columns: Dict[str, Dict[str, float]] = {}
+    for indicator, prefix in FLOW_PERIODS:
+        try:
+            df = call_with_breaker(
+                f'main_force:fund_flow_rank:{indicator}', ak.stock_individual_fund_flow_rank,
+                indicator=indicator, is_success=lambda frame: frame is not None and not frame.empty
+            )
+            column = f'{prefix}主力净流入-净额'
+            columns[indicator] = {
+                str(code).zfill(6): format_money(value) for code, value in zip(df['代码'], df[column])
+            }
+        except Exception as e:
+            logger.warning(f"[MainForceRank] ⚠️ 全市场资金流向（{indicator}）获取失败: {type(e).__name__}: {e}")
+
+    today = columns.get('今日')
+    if today is None:
+        raise RuntimeError('全市场资金流向不可用')
+    days_5 = columns.get('5日', today)
+    return {code: (value, days_5.get(code, value)) for code, value in today.items()}
+
+
+def _flows_settled(market: str, as_of: str) -> bool:
+    """
+    全市场资金流向排行（今日 / 5日）是否与 as_of 对应：as_of 是最后一个已收盘确定的交易日，
+    且今天是该交易日（已收盘确定）或休市日（排行仍是该交易日的数据）；交易日开盘前到收盘确定前都不对应
+    """
+    calendar = get_trading_calendar(market)
+    if calendar is None:
+        return as_of == datetime.now().strftime('%Y-%m-%d')
+    now = time.time()
+    today = calendar.local_date(now)
+    if as_of != calendar.last_settled_trading_day(now):
+        return False
+    return as_of == today.strftime('%Y-%m-%d') or not calendar.is_trading_day(today)
+
+
+class _FetchThrottle:
+    """排行K线获取的限流：令牌桶 + 前台负载较高时暂停（各获取线程共用）"""
+
+    def __init__(self, rate_per_minute: float = RANK_RATE_PER_MINUTE, burst: int = RANK_BURST):
+        self._rate = max(rate_per_minute, 1e-3) / 60.0
+        self._burst = max(1, burst)
+        self._tokens = float(self._burst)
+        self._refilled_at = time.time()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """取一个令牌：取到时返回0，否则返回还需等待的秒数"""
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self._burst, self._tokens + (now - self._refilled_at) * self._rate)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self._rate
+
+    def wait(self, stop_event: threading.Event, run: '_Run') -> bool:
+        """
+        等到前台负载不高且取到令牌
+
+        Returns:
+            是否可以访问数据源（stop_event 被设置时返回 False）
+        """
+        from service.cache.cache_warmer import get_cache_warmer
+
+        warmer = get_cache_warmer()
+        while not stop_event.is_set():
+            if warmer.foreground_busy():
+                with self._lock:
+                    run.paused += 1
+                stop_event.wait(BUSY_PAUSE_SECONDS)
+                continue
+            delay = self._take()
+            if delay <= 0:
+                return True
+            with self._lock:
+                run.throttled += 1
+            stop_event.wait(delay)
+        return False
+
+
+def _fetch_bars(code: str, start_date: str, end_date: str, throttle: _FetchThrottle,
+                stop_event: threading.Event, run: '_Run') -> Optional[List[Dict[str, Any]]]:
+    """获取一只股票的K线（按日期升序，只保留计算需要的字段），取不到或已停止时返回None"""
+    from service.kline.kline import get_kline_data
+    from service.cache.bar_store import get_bar_store
+    from service.cache.cache_warmer import background_fetch
+
+    # 只有需要访问数据源时才限流（序列已在内存中且覆盖区间时直接读取）
+    if get_bar_store().refresh_reason(code, start_date, end_date) is not None:
+        if not throttle.wait(stop_event, run):
+            return None
+    with background_fetch():
+        result = get_kline_data(code, start_date=start_date, end_date=end_date)
+    data = result.get('data') if isinstance(result, dict) else None
+    if not data:
+        return None
+    return [{field: bar[field] for field in BAR_FIELDS} for bar in sorted(data, key=lambda bar: bar['date'])]
+
+
+class _Run:
+    """一次全市场计算的进度"""
+
+    def __init__(self, market: str, as_of: str):
+        self.market = market
+        self.as_of = as_of
+        self.started_at = time.time()
+        self.total = 0
+        self.fetched = 0
+        self.fetch_failed = 0
+        self.scored = 0
+        self.skipped = 0
+        self.errors = 0
+        self.throttled = 0
+        self.paused = 0
+
+    def progress(self) -> Dict[str, Any]:
+        return {
+            'market': self.market,
+            'as_of': self.as_of,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'elapsed_seconds': round(time.time() - self.started_at, 1),
+            'total': self.total,
+            'fetched': self.fetched,
+            'fetch_failed': self.fetch_failed,
+            'scored': self.scored,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'throttled': self.throttled,
+            'paused': self.paused,
+        }
+
+
+class MainForceRanker:
+    """全市场主力排行（后台计算，同一市场同时只有一次计算）"""
+
+    def __init__(self, processes: int = RANK_PROCESSES, fetch_workers: int = RANK_FETCH_WORKERS,
+                 chunk_size: int = RANK_CHUNK):
+        """
+        Args:
+            processes: 计算进程数（0 表示在后台线程内计算）
+            fetch_workers: 获取K线的线程数
+            chunk_size: 每次提交给工作进程的股票数
+        """
+        self.processes = processes
+        self.fetch_workers = max(1, fetch_workers)
+        self.chunk_size = max(1, chunk_size)
+        self._tables: Dict[str, Dict[str, Any]] = {}
+        self._runs: Dict[str, _Run] = {}
+        self._restored: Dict[str, bool] = {}
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self._completed = 0
+        self._failed = 0
+        self._history: List[Dict[str, Any]] = []
+
+    @staticmethod
+    def current_as_of(market: str) -> str:
+        """当前已收盘确定的最后一个交易日（排行表应对应的日期；周末、节假日不产生新的日期）"""
+        calendar = get_trading_calendar(market)
+        if calendar is None:
+            day = datetime.now() - timedelta(days=1)
+            while day.weekday() >= 5:
+                day -= timedelta(days=1)
+            return day.strftime('%Y-%m-%d')
+        return calendar.last_settled_trading_day(time.time())
+
+    def _restore(self, market: str) -> Optional[Dict[str, Any]]:
+        """内存中没有排行表时，从 MongoDB 读取该市场最新的一张"""
+        from service.cache.mongodb_cache import get_cache
+
+        self._restored[market] = True
+        get_documents = getattr(get_cache(), 'get_documents', None)
+        if get_documents is None:
+            return None
+        key = _cache_key(market, 'latest')
+        table = get_documents([key]).get(key)
+        if table and table.get('rows') is not None:
+            with self._lock:
+                self._tables.setdefault(market, table)
+            logger.info(f"[MainForceRank] 从 MongoDB 恢复 {market} 排行表（{table.get('as_of')}，{len(table['rows'])} 只）")
+        return self._tables.get(market)
+
+    def get_table(self, market: str, day: Optional[str] = None, refresh: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        获取排行表
+
+        Args:
+            market: 市场代码（a / hk / us）
+            day: 指定日期（YYYY-MM-DD）的排行表，默认最新一张
+            refresh: 最新排行表缺失或已过期时是否在后台重新计算
+
+        Returns:
+            {market, as_of, generated_at, elapsed_seconds, count, flows_available, rows}；没有时返回None
+        """
+        market = market.lower()
+        if day:
+            from service.cache.mongodb_cache import get_cache
+            latest = self._tables.get(market)
+            if latest is not None and latest.get('as_of') == day:
+                return latest
+            get_documents = getattr(get_cache(), 'get_documents', None)
+            return get_documents([_cache_key(market, day)]).get(_cache_key(market, day)) if get_documents else None
+
+        table = self._tables.get(market)
+        if table is None and not self._restored.get(market):
+            table = self._restore(market)
+        if refresh and (table is None or table.get('as_of', '') < self.current_as_of(market)):
+            self.start_run(market)
+        return table
+
+    def start_run(self, market: str, force: bool = False) -> bool:
+        """
+        在后台线程中计算一次全市场排行
+
+        Args:
+            market: 市场代码（a / hk / us）
+            force: 最新排行表已是当前交易日时是否仍重新计算
+
+        Returns:
+            是否启动了新的计算（该市场已有计算进行中时返回 False）
+        """
+        market = market.lower()
+        as_of = self.current_as_of(market)
+        with self._lock:
+            if market in self._runs:
+                return False
+            table = self._tables.get(market)
+            if not force and table is not None and table.get('as_of', '') >= as_of:
+                return False
+            self._runs[market] = run = _Run(market, as_of)
+        threading.Thread(target=self._run, args=(run,), name=f"main-force-rank-{market}", daemon=True).start()
+        return True
+
+    def _run(self, run: _Run) -> None:
+        try:
+            table = self.compute(run)
+        except Exception as e:
+            table = None
+            logger.warning(f"[MainForceRank] ⚠️ {run.market} 排行计算失败: {type(e).__name__}: {e}")
+        with self._lock:
+            self._runs.pop(run.market, None)
+            if table is None:
+                self._failed += 1
+            else:
+                self._completed += 1
+                self._tables[run.market] = table
+            self._history.append({**run.progress(), 'ok': table is not None})
+            del self._history[:-HISTORY_SIZE]
+        if table is not None:
+            self._persist(table)
+
+    def _persist(self, table: Dict[str, Any]) -> None:
+        from service.cache.mongodb_cache import get_cache
+
+        set_document = getattr(get_cache(), 'set_document', None)
+        if set_document is None:
+            return
+        for day in (table['as_of'], 'latest'):
+            set_document(_cache_key(table['market'], day), table, ttl_days=RANK_RETENTION_DAYS)
+
+    def _make_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.processes <= 0:
+            return None
+        try:
+            return ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context('spawn'))
+        except Exception as e:
+            logger.warning(f"[MainForceRank] ⚠️ 无法创建进程池，改为在线程内计算: {type(e).__name__}: {e}")
+            return None
+
+    def compute(self, run: _Run) -> Optional[Dict[str, Any]]:
+        """
+        同步计算一次全市场排行（在后台线程中调用）
+
+        Returns:
+            排行表；市场列表不可用或中途停止时返回None
+        """
+        from service.stocks.stocks import get_stock_by_market
+        from service.main_force.scoring import score_chunk
+
+        market = run.market
+        listing = get_stock_by_market(market)
+        stocks = [(str(s.get('code') or '').strip(), str(s.get('name') or '')) for s in (listing or {}).get('stocks') or []]
+        stocks = [(code, name) for code, name in stocks if code]
+        if not stocks:
+            raise RuntimeError('市场列表为空')
+        run.total = len(stocks)
+
+        flows: Optional[Dict[str, Tuple[float, float]]] = None
+        if market == 'a' and not _flows_settled(market, run.as_of):
+            logger.info(f"[MainForceRank] ⏭️ {run.as_of} 之后的交易日尚未收盘确定，不用资金流向排行，主力净流入按K线推算")
+        elif market == 'a':
+            try:
+                flows = _load_fund_flows()
+            except Exception as e:
+                # 与单只股票的分析一致：资金流向取不到时主力净流入记为 0
+                logger.warning(f"[MainForceRank] ⚠️ 资金流向不可用，主力净流入记为 0: {e}")
+                flows = {}
+
+        # K线只取到排行表的日期，不含尚未收盘确定的当天；起点与 get_main_force_analysis 相同（对齐到半年起点），指标一致
+        end_date = run.as_of
+        start_date = anchor_start(run.as_of)
+        logger.info(f"[MainForceRank] 🚀 开始计算 {market} 排行：{len(stocks)} 只股票，{self.processes} 个计算进程")
+
+        pool = self._make_pool()
+        rows: List[Dict[str, Any]] = []
+        futures = []
+        chunk: List[tuple] = []
+
+        def collect(result: Tuple[List[Dict[str, Any]], int, List[str]]) -> None:
+            chunk_rows, skipped, errors = result
+            rows.extend(chunk_rows)
+            run.scored += len(chunk_rows)
+            run.skipped += skipped
+            run.errors += len(errors)
+            for error in errors[:3]:
+                logger.debug(f"[MainForceRank] 计算出错 {error}")
+
+        def submit(items: List[tuple]) -> None:
+            nonlocal pool
+            if pool is not None:
+                try:
+                    futures.append(pool.submit(score_chunk, items))
+                    return
+                except Exception as e:
+                    logger.warning(f"[MainForceRank] ⚠️ 进程池不可用，改为在线程内计算: {type(e).__name__}: {e}")
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = None
+            collect(score_chunk(items))
+
+        throttle = _FetchThrottle()
+        try:
+            with ThreadPoolExecutor(max_workers=self.fetch_workers, thread_name_prefix='main-force-rank-fetch') as fetcher:
+                pending = {
+                    fetcher.submit(_fetch_bars, code, start_date, end_date, throttle, self._stop_event, run): (code, name)
+                    for code, name in stocks
+                }
+                for future in as_completed(pending):
+                    if self._stop_event.is_set():
+                        fetcher.shutdown(wait=False, cancel_futures=True)
+                        return None
+                    code, name = pending[future]
+                    try:
+                        bars = future.result()
+                    except Exception:
+                        bars = None
+                    if not bars:
+                        run.fetch_failed += 1
+                        continue
+                    run.fetched += 1
+                    chunk.append((code, name, bars, None if flows is None else flows.get(code[-6:], (0.0, 0.0))))
+                    if len(chunk) >= self.chunk_size:
+                        submit(chunk)
+                        chunk = []
+            if chunk:
+                submit(chunk)
+
+            for future in futures:
+                try:
+                    collect(future.result())
+                except Exception as e:
+                    # 工作进程异常退出时该批股票整体缺失
+                    run.errors += 1
+                    logger.warning(f"[MainForceRank] ⚠️ 一批股票计算失败: {type(e).__name__}: {e}")
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+        rows.sort(key=lambda row: (-row['score'], -row['net_flow_5d'], row['code']))
+        for rank, row in enumerate(rows, start=1):
+            row['rank'] = rank
+        elapsed = time.time() - run.started_at
+        logger.info(
+            f"[MainForceRank] ✅ {market} 排行计算完成：{len(rows)}/{run.total} 只 "
+            f"（K线失败 {run.fetch_failed}，K线不足 {run.skipped}，出错 {run.errors}），耗时 {elapsed:.1f}s"
+        )
+        return {
+            'market': market,
+            'as_of': run.as_of,
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'elapsed_seconds': round(elapsed, 1),
+            'count': len(rows),
+            'flows_available': bool(flows) if market == 'a' else False,
+            'rows': rows,
+        }
+
+    def get_progress(self, market: str) -> Optional[Dict[str, Any]]:
+        """该市场进行中的计算进度，没有计算时返回None"""
+        with self._lock:
+            run = self._runs.get(market.lower())
+            return run.progress() if run is not None else None
+
+    def stop(self) -> None:
+        """停止进行中的计算（应用退出时）"""
+        self._stop_event.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取排行统计：各市场最新排行表、进行中的计算（用于监控）"""
+        with self._lock:
+            return {
+                'processes': self.processes,
+                'tables': {
+                    market: {'as_of': table.get('as_of'), 'generated_at': table.get('generated_at'), 'count': table.get('count')}
+                    for market, table in self._tables.items()
+                },
+                'running': [run.progress() for run in self._runs.values()],
+                'completed': self._completed,
+                'failed': self._failed,
+                'history': list(reversed(self._history)),
+            }
+
+
+# 全局实例
+_ranker_instance: Optional[MainForceRanker] = None
+_instance_lock = threading.Lock()
+
+
+def get_main_force_ranker() -> MainForceRanker:
+    """
+    获取全局主力排行实例（单例模式）
+
+    Returns:
+        MainForceRanker实例
+    """
+    global _ranker_instance
+    if _ranker_instance is None:
+        with _instance_lock:
+            if _ranker_instance is None:
+                _ranker_instance = MainForceRanker()
+    return _ranker_instance
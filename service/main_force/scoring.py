@@ -0,0 +1,227 @@
+"""
+主力动向评分 - 由K线、技术指标和主力净流入推断主力行为与综合评分（纯计算，不访问数据源）
+
+核心原理：
+1. get_main_force_analysis（单只股票）与全市场排行（service.main_force.ranking）共用同一套规则：
+   MACD / RSI / BOLL 状态、量价关系、短中期趋势 → 主力行为、资金态度、控盘程度、综合评分（1-10）与评级
+2. 本模块只依赖 pandas 与 service.main_force.indicators，不导入 akshare 和K线模块，
+   全市场排行的工作进程（spawn）只需加载本模块
+3. score_chunk 是工作进程的入口：对一批股票逐只计算指标和评分，返回排行表的行
+
+使用方法：
+    from service.main_force.scoring import derive_signals, score_chunk
+
+    signals = derive_signals(df_ta, last_row, prev_macd_hist, net_flow_today, net_flow_5d)
+    rows = score_chunk([(code, name, bars, flows), ...])
+"""
+
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from service.main_force.indicators import IndicatorState
+
+# 计算指标所需的最少K线数
+MIN_BARS = 20
+
+
+# 辅助函数：格式化金额（万元）
+def format_money(val_in_yuan):
+    if pd.isna(val_in_yuan) or val_in_yuan is None:
+        return 0.0
+    return round(float(val_in_yuan) / 10000.0, 2)
+
+
+def estimate_net_flow(last_row: Dict[str, Any]) -> float:
+    """港美股没有资金流向数据：用 K 线实体结合成交额推算当日近似净流入（万元）"""
+    avg_price = (last_row['high'] + last_row['low'] + last_row['close']) / 3
+    entity_ratio = (last_row['close'] - last_row['open']) / (last_row['high'] - last_row['low'] + 1e-8)
+    turnover = last_row['volume'] * avg_price
+    return round(turnover * entity_ratio / 10000, 2)
+
+
+def derive_signals(df_ta: pd.DataFrame, last_row: Dict[str, Any], prev_macd_val: float,
+                   net_flow_today: float, net_flow_5d: float) -> Dict[str, Any]:
+    """
+    由最后一根K线的指标和主力净流入推断技术状态、主力行为与综合评分
+
+    Args:
+        df_ta: 按日期升序的K线（至少含 close / volume 列）
+        last_row: 最后一根K线及其指标（ma5..ma120 / macd_hist / boll_up / boll_low / rsi）
+        prev_macd_val: 前一根K线的 macd_hist
+        net_flow_today: 当日主力净流入（万元）
+        net_flow_5d: 近5日主力净流入（万元）
+
+    Returns:
+        {macd_status, kdj_status, boll_status, vp_relation, rsi, short_trend, mid_trend,
+         main_action, funds_attitude, control_degree, score, rating}
+    """
+    current_price = float(last_row['close'])
+
+    # MACD 状态
+    macd_val = float(last_row['macd_hist'])
+    if macd_val > 0 and prev_macd_val <= 0: macd_status = "金叉"
+    elif macd_val < 0 and prev_macd_val >= 0: macd_status = "死叉"
+    elif macd_val > 0: macd_status = "零轴上"
+    else: macd_status = "零轴下"
+
+    # RSI 状态
+    rsi_val = float(last_row['rsi'])
+    if rsi_val > 80: kdj_status = "超买"
+    elif rsi_val < 20: kdj_status = "超卖"
+    else: kdj_status = "中性"
+
+    # BOLL 状态
+    if current_price > last_row['boll_up']: boll_status = "突破上轨"
+    elif current_price < last_row['boll_low']: boll_status = "跌破下轨"
+    else: boll_status = "中轨震荡"
+
+    # 量价关系推导
+    price_trend = current_price - df_ta.iloc[-5]['close']
+    vol_trend = last_row['volume'] - df_ta.iloc[-5]['volume']
+    if price_trend > 0 and vol_trend > 0: vp_relation = "价涨量增"
+    elif price_trend > 0 and vol_trend <= 0: vp_relation = "价涨量缩"
+    elif price_trend <= 0 and vol_trend > 0: vp_relation = "价跌量增"
+    else: vp_relation = "价跌量缩"
+
+    # 1. 趋势
+    if current_price > last_row['ma20'] and last_row['ma5'] > last_row['ma10']:
+        short_trend = "强势上涨"
+    elif current_price < last_row['ma20'] and last_row['ma5'] < last_row['ma10']:
+        short_trend = "弱势下跌"
+    else:
+        short_trend = "震荡整理"
+
+    mid_trend = "上升通道" if last_row['ma20'] > last_row['ma60'] else ("下降通道" if last_row['ma20'] < last_row['ma60'] else "横盘筑底")
+
+    # 2. 主力行为推断
+    if short_trend == "弱势下跌" and net_flow_today > 0:
+        main_action = "吸筹"
+    elif short_trend == "震荡整理" and vp_relation == "价跌量缩":
+        main_action = "洗盘"
+    elif short_trend == "强势上涨" and vp_relation == "价涨量增":
+        main_action = "拉升"
+    elif short_trend == "强势上涨" and vp_relation == "价跌量增":
+        main_action = "派发"
+    else:
+        main_action = "观望"
+
+    funds_attitude = "持续流入" if net_flow_5d > 0 and net_flow_today > 0 else ("流出" if net_flow_5d < 0 and net_flow_today < 0 else "阶段性流入" if net_flow_today > 0 else "震荡出货")
+
+    control_degree = "中度控盘" if rsi_val > 50 else "轻度控盘"
+
+    # 综合评分 (1-10)
+    score = 5
+    if main_action == "拉升": score += 3
+    elif main_action == "吸筹": score += 2
+    elif main_action == "派发": score -= 3
+    if net_flow_5d > 0: score += 1
+    if short_trend == "强势上涨": score += 1
+    score = max(1, min(10, score))
+
+    if score >= 8: rating = "强烈关注"
+    elif score >= 6: rating = "关注"
+    elif score >= 4: rating = "中性"
+    elif score >= 3: rating = "谨慎"
+    else: rating = "回避"
+
+    return {
+        "macd_status": macd_status,
+        "kdj_status": kdj_status,
+        "boll_status": boll_status,
+        "vp_relation": vp_relation,
+        "rsi": rsi_val,
+        "short_trend": short_trend,
+        "mid_trend": mid_trend,
+        "main_action": main_action,
+        "funds_attitude": funds_attitude,
+        "control_degree": control_degree,
+        "score": score,
+        "rating": rating,
+    }
+
+
+def _finite(value: Any) -> Optional[float]:
+    """NaN / inf 转为None（排行表需要可 JSON 序列化）"""
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def score_symbol(code: str, name: str, bars: List[Dict[str, Any]],
+                 flows: Optional[Tuple[float, float]]) -> Optional[Dict[str, Any]]:
+    """
+    计算单只股票的排行行
+
+    Args:
+        code: 股票代码
+        name: 股票名称
+        bars: 按日期升序的K线（date / open / high / low / close / volume）
+        flows: (当日, 近5日) 主力净流入（万元）；None 表示没有资金流向数据，按K线推算
+
+    Returns:
+        排行表的一行；K线不足 MIN_BARS 条时返回None
+    """
+    if len(bars) < MIN_BARS:
+        return None
+
+    state = IndicatorState(bars[0]['date'])
+    for bar in bars[:-2]:
+        state.push(bar)
+    prev_row = state.push(bars[-2])
+    last_row = {**bars[-1], **state.push(bars[-1])}
+
+    if flows is None:
+        net_flow_today = estimate_net_flow(last_row)
+        net_flow_5d = round(net_flow_today * 5, 2)
+    else:
+        net_flow_today, net_flow_5d = flows
+
+    df_ta = pd.DataFrame(bars[-5:])
+    signals = derive_signals(df_ta, last_row, float(prev_row['macd_hist']), net_flow_today, net_flow_5d)
+    prev_close = float(bars[-2]['close'])
+    close = float(last_row['close'])
+    return {
+        "code": code,
+        "name": name,
+        "date": str(last_row['date']),
+        "close": round(close, 3),
+        "change_percent": round((close - prev_close) / prev_close * 100, 2) if prev_close else None,
+        "score": int(signals['score']),
+        "rating": signals['rating'],
+        "main_action": signals['main_action'],
+        "funds_attitude": signals['funds_attitude'],
+        "control_degree": signals['control_degree'],
+        "short_term": signals['short_trend'],
+        "mid_term": signals['mid_trend'],
+        "volume_price_relation": signals['vp_relation'],
+        "macd": signals['macd_status'],
+        "rsi": _finite(signals['rsi']),
+        "net_flow_today": net_flow_today,
+        "net_flow_5d": net_flow_5d,
+        "flow_estimated": flows is None,
+    }
+
+
+def score_chunk(items: List[Tuple[str, str, List[Dict[str, Any]], Optional[Tuple[float, float]]]]) -> Tuple[List[Dict[str, Any]], int, List[str]]:
+    """
+    工作进程入口：逐只计算一批股票的排行行，单只股票出错不影响其余股票
+
+    Args:
+        items: [(代码, 名称, K线, 资金流向), ...]，参数含义见 score_symbol
+
+    Returns:
+        (排行行列表, K线不足而跳过的股票数, 出错信息列表)
+    """
+    rows, skipped, errors = [], 0, []
+    for code, name, bars, flows in items:
+        try:
+            row = score_symbol(code, name, bars, flows)
+        except Exception as e:
+            errors.append(f"{code}: {type(e).__name__}: {e}")
+            continue
+        if row is None:
+            skipped += 1
+        else:
+            rows.append(row)
+    return rows, skipped, errors
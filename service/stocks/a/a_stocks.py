@@ -12,6 +12,8 @@ import os
 # 添加当前目录到Python路径，以便导入数据源模块
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from service.utils.provider_health import get_provider_registry, call_with_breaker, STATE_OPEN
+
 # 数据源列表（按优先级顺序）
 DATA_SOURCES = [
     'bs_stocks',         # baostock数据源（现在可用，数据完整）
@@ -30,6 +32,10 @@ def get_a_stocks() -> Optional[Dict[str, Any]]:
     """
     # 先尝试真实的数据源
     for source_name in DATA_SOURCES:
+        breaker_name = f"stocks:a:{source_name}"
+        if get_provider_registry().get(breaker_name).state == STATE_OPEN:
+            print(f"[a_stocks] 数据源 '{source_name}' 熔断中，跳过")
+            continue
         try:
             if source_name == 'ak_stocks':
                 import sys
@@ -40,7 +46,7 @@ def get_a_stocks() -> Optional[Dict[str, Any]]:
                     spec = importlib.util.spec_from_file_location('ak_stocks', module_path)
                     module = importlib.util.module_from_spec(spec)
                     spec.loader.exec_module(module)
-                    result = module.get_a_stocks_by_ak()
+                    result = call_with_breaker(breaker_name, module.get_a_stocks_by_ak)
                 else:
                     continue
             elif source_name == 'eastmoney_stocks':
@@ -52,7 +58,7 @@ def get_a_stocks() -> Optional[Dict[str, Any]]:
                     spec = importlib.util.spec_from_file_location('eastmoney_stocks', module_path)
                     module = importlib.util.module_from_spec(spec)
                     spec.loader.exec_module(module)
-                    result = module.get_a_stocks_by_eastmoney()
+                    result = call_with_breaker(breaker_name, module.get_a_stocks_by_eastmoney)
                 else:
                     continue
             elif source_name == 'bs_stocks':
@@ -64,7 +70,7 @@ def get_a_stocks() -> Optional[Dict[str, Any]]:
                     spec = importlib.util.spec_from_file_location('bs_stocks', module_path)
                     module = importlib.util.module_from_spec(spec)
                     spec.loader.exec_module(module)
-                    result = module.get_a_stocks_by_baostock()
+                    result = call_with_breaker(breaker_name, module.get_a_stocks_by_baostock)
                 else:
                     continue
             else:
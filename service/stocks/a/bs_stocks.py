@@ -10,6 +10,8 @@ import pandas as pd
 from datetime import datetime, timedelta
 import os
 
+from service.utils.baostock_session import get_baostock_session
+
 
 def get_a_stocks_by_baostock() -> Optional[Dict[str, Any]]:
     """
@@ -19,29 +21,21 @@ def get_a_stocks_by_baostock() -> Optional[Dict[str, Any]]:
         包含A股股票列表的字典
     """
     try:
-        import baostock as bs
+        session = get_baostock_session()
+        if not session.is_available():
+            raise ImportError("baostock")
 
-        # 登录Baostock
-        lg = bs.login()
-        if lg.error_code != '0':
-            print(f"[baostock] 登录失败: {lg.error_msg}")
-            return None
-        # 获取所有股票列表
+        # 获取所有股票列表（复用共享会话，无需每次登录/登出）
         # query_all_stock()返回指定日期的所有股票列表
         # 使用当前日期作为查询日期，如果当前日期没有数据，尝试前一个交易日
         # 先尝试不指定日期（或者使用最新可用日期）
         print("[baostock] 尝试不指定日期查询...")
-        rs = bs.query_all_stock()
-        if rs.error_code == '0':
-            data_list = []
-            while (rs.error_code == '0') and rs.next():
-                data_list.append(rs.get_row_data())
-            if len(data_list) > 0:
-                print(f"[baostock] 不指定日期查询成功，获取到 {len(data_list)} 条数据")
-            else:
-                print("[baostock] 不指定日期查询为空，尝试指定日期")
-        else:
-            data_list = []
+        rs = session.query('query_all_stock')
+        data_list = rs.rows if rs.ok else []
+        if data_list:
+            print(f"[baostock] 不指定日期查询成功，获取到 {len(data_list)} 条数据")
+        elif rs.ok:
+            print("[baostock] 不指定日期查询为空，尝试指定日期")
 
         if not data_list:
             # 如果不指定日期没获取到，再尝试日期策略
@@ -61,26 +55,19 @@ def get_a_stocks_by_baostock() -> Optional[Dict[str, Any]]:
             for test_date in test_dates:
                 try:
                     print(f"[baostock] 尝试日期: {test_date}")
-                    rs = bs.query_all_stock(test_date)
-                    if rs.error_code == '0':
-                        data_list = []
-                        while (rs.error_code == '0') and rs.next():
-                            data_list.append(rs.get_row_data())
-                        if data_list:
-                            print(f"[baostock] 成功使用 {test_date} 获取到 {len(data_list)} 条数据")
-                            break
+                    rs = session.query('query_all_stock', test_date)
+                    if rs.ok and rs.rows:
+                        data_list = rs.rows
+                        print(f"[baostock] 成功使用 {test_date} 获取到 {len(data_list)} 条数据")
+                        break
                 except Exception as e:
                     print(f"[baostock] 日期 {test_date} 查询异常: {e}")
                     continue
 
         if not data_list:
             print("[baostock] 所有日期均无数据")
-            bs.logout()
             return None
 
-        # 登出
-        bs.logout()
-
         # 转换为DataFrame
         # baostock返回列顺序是 [code, tradeStatus, code_name]
         df = pd.DataFrame(data_list, columns=['code', 'tradeStatus', 'code_name'])
@@ -137,22 +124,12 @@ def get_a_stocks_by_baostock() -> Optional[Dict[str, Any]]:
         return None
     except Exception as e:
         print(f"[baostock] 获取A股股票列表时发生错误: {e}")
-        # 确保登出
-        try:
-            import baostock as bs
-            bs.logout()
-        except:
-            pass
         return None
 
 
 def is_baostock_available() -> bool:
     """检查baostock是否可用"""
-    try:
-        import baostock as bs
-        return True
-    except ImportError:
-        return False
+    return get_baostock_session().is_available()
 
 
 if __name__ == "__main__":
@@ -11,6 +11,8 @@ from datetime import datetime
 import time
 import urllib3
 
+from service.utils.http_client import http_get
+
 # 禁用SSL警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -96,7 +98,7 @@ def get_a_stocks_by_eastmoney() -> Optional[Dict[str, Any]]:
 
             for url in endpoints:
                 try:
-                    response = requests.get(url, params=params, headers=headers, timeout=10, verify=False)
+                    response = http_get(url, params=params, headers=headers, timeout=10, verify=False)
                     if response.status_code == 200:
                         data = response.json()
                         diffs = data.get("data", {}).get("diff", [])
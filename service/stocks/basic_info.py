@@ -1,6 +1,211 @@
-import requests
+import json
+import re
 import time
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, Tuple
+
+import httpx
+
+from service.utils.single_flight import single_flight, get_single_flight
+from service.utils.provider_health import get_provider_registry, call_with_breaker, CircuitOpenError
+from service.utils.http_client import http_get
+from service.utils.async_http_client import async_http_get
+from service.stocks.spot_snapshot import get_spot_snapshots
+
+# 东方财富行情节点（按顺序尝试，单个节点熔断时跳过）
+QUOTE_NODES = ["82.152.17.133", "push2", "72.push2", "84.push2", "18.push2"]
+
+QUOTE_FIELDS = "f8,f9,f20,f23,f43,f44,f45,f46,f47,f48,f57,f58,f59,f60,f107,f111,f112,f113,f114,f115,f116,f117,f118,f119,f120,f121,f122,f123,f124,f125,f126,f127,f128,f129,f130,f131,f132,f133,f134,f135,f136,f137,f138,f139,f140,f141,f142,f143,f144,f145,f146,f147,f148,f149,f150,f8,f9,f20,f23"
+US_QUOTE_FIELDS = "f43,f44,f45,f46,f47,f48,f49,f50,f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61,f116,f162,f167,f168,f169,f170"
+
+
+def _node_responded(response) -> bool:
+    """行情节点是否正常响应：5xx 说明节点故障，计入熔断器失败（4xx 等仍算节点可达）"""
+    return response is not None and response.status_code < 500
+
+
+def _request_quote_node(node: str, url: str, params: Dict[str, Any], headers: Dict[str, str]):
+    """
+    经熔断器请求东方财富行情节点（网络异常和 5xx 响应计为失败）
+
+    Returns:
+        requests.Response，节点熔断中返回None（调用方应直接换下一个节点）
+    """
+    try:
+        return call_with_breaker(
+            f"quote:eastmoney:{node}", http_get, url, params=params, headers=headers, is_success=_node_responded
+        )
+    except CircuitOpenError:
+        return None
+
+
+async def _request_quote_node_async(node: str, url: str, params: Dict[str, Any], headers: Dict[str, str]):
+    """
+    _request_quote_node 的异步版本（网络异常和 5xx 响应计为失败）
+
+    Returns:
+        httpx.Response，节点熔断中返回None（调用方应直接换下一个节点）
+    """
+    breaker = get_provider_registry().get(f"quote:eastmoney:{node}")
+    if not breaker.allow_request():
+        return None
+    t0 = time.time()
+    try:
+        response = await async_http_get(url, params=params, headers=headers)
+    except httpx.HTTPError as e:
+        breaker.record_failure(f"{type(e).__name__}: {e}")
+        raise
+    except BaseException:
+        # 被取消等非网络原因：只归还半开试探名额
+        breaker.release()
+        raise
+    if _node_responded(response):
+        breaker.record_success(time.time() - t0)
+    else:
+        breaker.record_failure(f"HTTP {response.status_code}")
+    return response
+
+
+def _quote_node_url(node: str) -> Tuple[str, Dict[str, str]]:
+    """行情节点的请求地址，以及直连 IP 时需要补充的 Host 头"""
+    if node.replace('.', '').isdigit():
+        return f"http://{node}/api/qt/stock/get", {'Host': "push2.eastmoney.com"}
+    return f"http://{node}.eastmoney.com/api/qt/stock/get", {}
+
+
+def _build_quote_request(node: str, m: str, code: str) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+    """A股/港股行情请求 (url, params, headers)"""
+    url, extra_headers = _quote_node_url(node)
+    params = {
+        "secid": f"{m}.{code}",
+        "fields": QUOTE_FIELDS
+    }
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+        'Referer': 'http://quote.eastmoney.com/'
+    }
+    headers.update(extra_headers)
+    return url, params, headers
+
+
+def _build_us_quote_request(node: str, m: str, code: str) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+    """美股行情请求 (url, params, headers)，接口以 JSONP 形式返回"""
+    url, extra_headers = _quote_node_url(node)
+    params = {
+        "secid": f"{m}.{code}",
+        "fields": US_QUOTE_FIELDS,
+        "fltt": "2",
+        "invt": "2",
+        "ut": "b2884a393a59ad64002292a3e90d46a5",
+        "cb": f"jQuery112406132355515699313_{int(time.time()*1000)}",
+        "_": int(time.time()*1000)
+    }
+    headers = {
+        'Referer': 'http://quote.eastmoney.com/',
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    }
+    headers.update(extra_headers)
+    return url, params, headers
+
+
+def _quote_price_fields(stock_data: Dict[str, Any]) -> Tuple[Any, Any, Any, Any, int, float]:
+    """从行情字段中解析 (现价, 昨收, 涨跌额, 涨跌幅, 成交量, 成交额)"""
+    current_price = stock_data.get('f43') or 0
+    previous_close = stock_data.get('f60') or 0
+
+    if current_price == "-":
+        current_price = 0
+    if previous_close == "-":
+        previous_close = 0
+
+    change = stock_data.get('f169') or (current_price - previous_close if isinstance(current_price, (int, float)) and isinstance(previous_close, (int, float)) else 0)
+    change_percent = stock_data.get('f170') or ((change / previous_close * 100) if previous_close and isinstance(previous_close, (int, float)) else 0)
+
+    volume_str = stock_data.get('f47')
+    volume = int(volume_str) if volume_str and str(volume_str).isdigit() else 0
+
+    amount_str = stock_data.get('f48')
+    try:
+        amount = float(amount_str) if amount_str else 0
+    except ValueError:
+        amount = 0
+    return current_price, previous_close, change, change_percent, volume, amount
+
+
+def _parse_quote_data(code: str, data: Any) -> Optional[Dict[str, Any]]:
+    """解析A股/港股行情响应，没有真实价格时返回None"""
+    if not (data and data.get('rc') == 0 and data.get('data')):
+        return None
+    stock_data = data['data']
+    current_price, previous_close, change, change_percent, volume, amount = _quote_price_fields(stock_data)
+
+    # 判断如果获取到了真实价格数据，就直接返回
+    if not current_price or current_price == "-":
+        return None
+
+    # 东财接口经常对不同市场的数据做扩大处理 (比如把 12.34 扩大为 1234 或者 12340)
+    # 根据 f59 (价格小数点位数) 来进行转换
+    decimal_places = stock_data.get('f59', 0)
+    if decimal_places > 0:
+        divisor = 10 ** decimal_places
+        current_price = current_price / divisor
+        previous_close = previous_close / divisor
+        change = change / divisor
+
+    return {
+        "code": code,
+        "name": stock_data.get('f58') or f"股票{code}",
+        "currentPrice": current_price,
+        "change": change,
+        "changePercent": change_percent,
+        "volume": volume,
+        "amount": amount,
+        "marketCap": stock_data.get('f116') or stock_data.get('f51') or 0,
+        "peRatio": stock_data.get('f162') or 0,
+        "pbRatio": stock_data.get('f167') or 0,
+        "turnoverRate": stock_data.get('f168') or 0,
+        "high": (stock_data.get('f44') or 0) / (10 ** decimal_places) if decimal_places > 0 and stock_data.get('f44') else (stock_data.get('f44') or 0),
+        "low": (stock_data.get('f45') or 0) / (10 ** decimal_places) if decimal_places > 0 and stock_data.get('f45') else (stock_data.get('f45') or 0),
+        "open": (stock_data.get('f46') or 0) / (10 ** decimal_places) if decimal_places > 0 and stock_data.get('f46') else (stock_data.get('f46') or 0),
+        "prevClose": previous_close or 0,
+        "timestamp": int(time.time()*1000)
+    }
+
+
+def _parse_us_quote_text(code: str, text: str) -> Optional[Dict[str, Any]]:
+    """解析美股 JSONP 行情响应，没有真实价格时返回None"""
+    match = re.search(r'jQuery\d+_\d+\((.*)\)', text)
+    if not match:
+        return None
+
+    data = json.loads(match.group(1))
+    if data.get('rc') != 0 or not data.get('data'):
+        return None
+
+    stock_data = data['data']
+    current_price, previous_close, change, change_percent, volume, amount = _quote_price_fields(stock_data)
+
+    # 判断如果获取到了真实价格数据，就直接返回
+    if not current_price or current_price == "-":
+        return None
+    return {
+        "code": code,
+        "name": stock_data.get('f58') or f"股票{code}",
+        "currentPrice": current_price,
+        "change": change,
+        "changePercent": change_percent,
+        "volume": volume,
+        "amount": amount,
+        "marketCap": stock_data.get('f116') or stock_data.get('f51') or 0,
+        "peRatio": stock_data.get('f162') or 0,
+        "pbRatio": stock_data.get('f167') or 0,
+        "turnoverRate": stock_data.get('f168') or 0,
+        "high": stock_data.get('f44') or 0,
+        "low": stock_data.get('f45') or 0,
+        "open": stock_data.get('f46') or 0,
+        "prevClose": previous_close or 0,
+        "timestamp": int(time.time()*1000)
+    }
+
 
 def get_market_info(code: str) -> Dict[str, str]:
     """
@@ -32,147 +237,58 @@ def get_us_market(code: str) -> str:
 
 def fetch_stock_basic_data_from_eastmoney(market: str, code: str) -> Optional[Dict[str, Any]]:
     """
-    从东方财富API获取A股/港股基本信息
+    从东方财富API获取A股/港股基本信息（优先使用全市场行情快照，快照不可用时请求单只股票的行情节点）
     """
     try:
         markets_to_try = ['116', '128', '131'] if market == '116' else ['1', '0'] # 兼容 A股/港股
-        try:
-            import akshare as ak
-            if market == 'a':
-                a_spot = ak.stock_zh_a_spot_em()
-                target = a_spot[a_spot['代码'] == code]
-                if not target.empty:
-                    record = target.iloc[0]
-                    current_price = float(record.get('最新价', 0) or 0)
-                    change = float(record.get('涨跌额', 0) or 0)
-                    prev_close = current_price - change
-                    return {
-                        "code": code,
-                        "name": str(record.get('名称', '')),
-                        "currentPrice": current_price,
-                        "change": change,
-                        "changePercent": float(record.get('涨跌幅', 0) or 0),
-                        "volume": int(record.get('成交量', 0) or 0),
-                        "amount": float(record.get('成交额', 0) or 0),
-                        "marketCap": float(record.get('总市值', 0) or 0),
-                        "peRatio": float(record.get('市盈率-动态', 0) or 0),
-                        "pbRatio": float(record.get('市净率', 0) or 0),
-                        "turnoverRate": float(record.get('换手率', 0) or 0),
-                        "high": float(record.get('最高', 0) or 0),
-                        "low": float(record.get('最低', 0) or 0),
-                        "open": float(record.get('今开', 0) or 0),
-                        "prevClose": float(record.get('昨收', 0) or prev_close),
-                        "timestamp": int(time.time()*1000)
-                    }
-            elif market == 'hk':
-                hk_spot = ak.stock_hk_spot_em()
-                target = hk_spot[hk_spot['代码'] == code]
-                if not target.empty:
-                    record = target.iloc[0]
-                    current_price = float(record.get('最新价', 0) or 0)
-                    change = float(record.get('涨跌额', 0) or 0)
-                    prev_close = current_price - change
-                    return {
-                        "code": code,
-                        "name": str(record.get('名称', '')),
-                        "currentPrice": current_price,
-                        "change": change,
-                        "changePercent": float(record.get('涨跌幅', 0) or 0),
-                        "volume": int(record.get('成交量', 0) or 0),
-                        "amount": float(record.get('成交额', 0) or 0),
-                        "marketCap": 0,
-                        "peRatio": 0,
-                        "pbRatio": 0,
-                        "turnoverRate": 0,
-                        "high": float(record.get('最高价', 0) or 0),
-                        "low": float(record.get('最低价', 0) or 0),
-                        "open": float(record.get('开盘价', 0) or 0),
-                        "prevClose": prev_close,
-                        "timestamp": int(time.time()*1000)
-                    }
-        except Exception as e:
-            print(f"akshare fetch_stock_basic_data error: {e}")
-            
-        nodes = ["82.152.17.133", "push2", "72.push2", "84.push2", "18.push2"]
-        
-        for node in nodes:
+        spot = get_spot_snapshots().get_quote('hk' if market == '116' else 'a', code)
+        if spot:
+            return spot
+
+        for node in QUOTE_NODES:
             for m in markets_to_try:
                 try:
-                    secid = f"{m}.{code}"
-                    url = f"http://{node}.eastmoney.com/api/qt/stock/get"
-                    if node.replace('.','').isdigit():
-                        url = f"http://{node}/api/qt/stock/get"
-                    params = {
-                        "secid": secid,
-                        "fields": "f8,f9,f20,f23,f43,f44,f45,f46,f47,f48,f57,f58,f59,f60,f107,f111,f112,f113,f114,f115,f116,f117,f118,f119,f120,f121,f122,f123,f124,f125,f126,f127,f128,f129,f130,f131,f132,f133,f134,f135,f136,f137,f138,f139,f140,f141,f142,f143,f144,f145,f146,f147,f148,f149,f150,f8,f9,f20,f23"
-                    }
-                    headers = {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                        'Referer': 'http://quote.eastmoney.com/'
-                    }
-                    if node.replace('.','').isdigit():
-                        headers['Host'] = "push2.eastmoney.com"
-                        
-                    response = requests.get(url, params=params, headers=headers, timeout=5)
-                    data = response.json()
-                    
-                    if data and data.get('rc') == 0 and data.get('data'):
-                        stock_data = data['data']
-                        
-                        current_price = stock_data.get('f43') or 0
-                        previous_close = stock_data.get('f60') or 0
-                        
-                        if current_price == "-":
-                            current_price = 0
-                        if previous_close == "-":
-                            previous_close = 0
-                            
-                        change = stock_data.get('f169') or (current_price - previous_close if isinstance(current_price, (int, float)) and isinstance(previous_close, (int, float)) else 0)
-                        change_percent = stock_data.get('f170') or ((change / previous_close * 100) if previous_close and isinstance(previous_close, (int, float)) else 0)
-                        
-                        volume_str = stock_data.get('f47')
-                        volume = int(volume_str) if volume_str and str(volume_str).isdigit() else 0
-                        
-                        amount_str = stock_data.get('f48')
-                        try:
-                            amount = float(amount_str) if amount_str else 0
-                        except ValueError:
-                            amount = 0
-                            
-                        # 判断如果获取到了真实价格数据，就直接返回
-                        if current_price and current_price != "-":
-                            
-                            # 东财接口经常对不同市场的数据做扩大处理 (比如把 12.34 扩大为 1234 或者 12340)
-                            # 根据 f59 (价格小数点位数) 来进行转换
-                            decimal_places = stock_data.get('f59', 0)
-                            if decimal_places > 0:
-                                divisor = 10 ** decimal_places
-                                current_price = current_price / divisor
-                                previous_close = previous_close / divisor
-                                change = change / divisor
-                                
-                            return {
-                                "code": code,
-                                "name": stock_data.get('f58') or f"股票{code}",
-                                "currentPrice": current_price,
-                                "change": change,
-                                "changePercent": change_percent,
-                                "volume": volume,
-                                "amount": amount,
-                                "marketCap": stock_data.get('f116') or stock_data.get('f51') or 0,
-                                "peRatio": stock_data.get('f162') or 0,
-                                "pbRatio": stock_data.get('f167') or 0,
-                                "turnoverRate": stock_data.get('f168') or 0,
-                                "high": (stock_data.get('f44') or 0) / (10 ** decimal_places) if decimal_places > 0 and stock_data.get('f44') else (stock_data.get('f44') or 0),
-                                "low": (stock_data.get('f45') or 0) / (10 ** decimal_places) if decimal_places > 0 and stock_data.get('f45') else (stock_data.get('f45') or 0),
-                                "open": (stock_data.get('f46') or 0) / (10 ** decimal_places) if decimal_places > 0 and stock_data.get('f46') else (stock_data.get('f46') or 0),
-                                "prevClose": previous_close or 0,
-                                "timestamp": int(time.time()*1000)
-                            }
+                    url, params, headers = _build_quote_request(node, m, code)
+                    response = _request_quote_node(node, url, params, headers)
+                    if response is None:
+                        break  # 节点熔断中，换下一个节点
+                    quote = _parse_quote_data(code, response.json())
+                    if quote:
+                        return quote
                 except Exception as e:
                     print(f"eastmoney fetch_stock_basic_data error: {e}")
                     continue
-                
+
+        return None
+    except Exception as e:
+        print(f"fetch_stock_basic_data_from_eastmoney error: {e}")
+        return None
+
+
+async def fetch_stock_basic_data_from_eastmoney_async(market: str, code: str) -> Optional[Dict[str, Any]]:
+    """
+    fetch_stock_basic_data_from_eastmoney 的异步版本：行情快照只读内存，行情节点请求直接 await
+    """
+    try:
+        markets_to_try = ['116', '128', '131'] if market == '116' else ['1', '0'] # 兼容 A股/港股
+        spot = get_spot_snapshots().get_quote('hk' if market == '116' else 'a', code)
+        if spot:
+            return spot
+
+        for node in QUOTE_NODES:
+            for m in markets_to_try:
+                try:
+                    url, params, headers = _build_quote_request(node, m, code)
+                    response = await _request_quote_node_async(node, url, params, headers)
+                    if response is None:
+                        break  # 节点熔断中，换下一个节点
+                    quote = _parse_quote_data(code, response.json())
+                    if quote:
+                        return quote
+                except Exception as e:
+                    print(f"eastmoney fetch_stock_basic_data error: {e}")
+                    continue
+
         return None
     except Exception as e:
         print(f"fetch_stock_basic_data_from_eastmoney error: {e}")
@@ -186,129 +302,84 @@ def fetch_us_stock_basic_data(code: str) -> Optional[Dict[str, Any]]:
     """
     try:
         markets_to_try = ['105', '106', '107']
-        
-        # 对于美股，优先使用 akshare 作为兜底行情数据源
-        import akshare as ak
-        try:
-            us_spot = ak.stock_us_spot_em()
-            # 从 us_spot 中过滤
-            target = us_spot[us_spot['代码'] == str(code)]
-            if not target.empty:
-                record = target.iloc[0]
-                current_price = float(record.get('最新价', 0) or 0)
-                change = float(record.get('涨跌额', 0) or 0)
-                prev_close = current_price - change
-                return {
-                    "code": code,
-                    "name": str(record.get('名称', '')),
-                    "currentPrice": current_price,
-                    "change": change,
-                    "changePercent": float(record.get('涨跌幅', 0) or 0),
-                    "volume": int(record.get('成交量', 0) or 0),
-                    "amount": float(record.get('成交额', 0) or 0),
-                    "marketCap": float(record.get('总市值', 0) or 0),
-                    "peRatio": float(record.get('市盈率', 0) or 0),
-                    "pbRatio": 0,
-                    "turnoverRate": 0,
-                    "high": float(record.get('最高价', 0) or 0),
-                    "low": float(record.get('最低价', 0) or 0),
-                    "open": float(record.get('开盘价', 0) or 0),
-                    "prevClose": prev_close,
-                    "timestamp": int(time.time()*1000)
-                }
-        except Exception as e:
-            print(f"akshare fetch_us_stock_basic_data error: {e}")
-            
-        nodes = ["82.152.17.133", "push2", "72.push2", "84.push2", "18.push2"]
-        
-        for node in nodes:
+
+        # 优先使用 akshare 全市场行情快照，快照不可用时请求单只股票的行情节点
+        spot = get_spot_snapshots().get_quote('us', code)
+        if spot:
+            return spot
+
+        for node in QUOTE_NODES:
+            for m in markets_to_try:
+                try:
+                    url, params, headers = _build_us_quote_request(node, m, code)
+                    response = _request_quote_node(node, url, params, headers)
+                    if response is None:
+                        break  # 节点熔断中，换下一个节点
+                    quote = _parse_us_quote_text(code, response.text)
+                    if quote:
+                        return quote
+                except Exception as e:
+                    print(f"eastmoney fetch_us_stock_basic_data error: {e}")
+                    continue
+
+        return None
+    except Exception as e:
+        print(f"fetch_us_stock_basic_data error: {e}")
+        return None
+
+
+async def fetch_us_stock_basic_data_async(code: str) -> Optional[Dict[str, Any]]:
+    """
+    fetch_us_stock_basic_data 的异步版本：行情快照只读内存，行情节点请求直接 await
+    """
+    try:
+        markets_to_try = ['105', '106', '107']
+
+        spot = get_spot_snapshots().get_quote('us', code)
+        if spot:
+            return spot
+
+        for node in QUOTE_NODES:
             for m in markets_to_try:
                 try:
-                    secid = f"{m}.{code}"
-                    url = f"http://{node}.eastmoney.com/api/qt/stock/get"
-                    if node.replace('.','').isdigit():
-                        url = f"http://{node}/api/qt/stock/get"
-                    params = {
-                        "secid": secid,
-                        "fields": "f43,f44,f45,f46,f47,f48,f49,f50,f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61,f116,f162,f167,f168,f169,f170",
-                        "fltt": "2",
-                        "invt": "2",
-                        "ut": "b2884a393a59ad64002292a3e90d46a5",
-                        "cb": f"jQuery112406132355515699313_{int(time.time()*1000)}",
-                        "_": int(time.time()*1000)
-                    }
-                    headers = {
-                        'Referer': 'http://quote.eastmoney.com/',
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                    }
-                    if node.replace('.','').isdigit():
-                        headers['Host'] = "push2.eastmoney.com"
-                        
-                    response = requests.get(url, params=params, headers=headers, timeout=5)
-                    text = response.text
-                    
-                    import re
-                    import json
-                    match = re.search(r'jQuery\d+_\d+\((.*)\)', text)
-                    if not match:
-                        continue
-                        
-                    data = json.loads(match.group(1))
-                    
-                    if data.get('rc') != 0 or not data.get('data'):
-                        continue
-                        
-                    stock_data = data['data']
-                    
-                    current_price = stock_data.get('f43') or 0
-                    previous_close = stock_data.get('f60') or 0
-                    
-                    if current_price == "-":
-                        current_price = 0
-                    if previous_close == "-":
-                        previous_close = 0
-                        
-                    change = stock_data.get('f169') or (current_price - previous_close if isinstance(current_price, (int, float)) and isinstance(previous_close, (int, float)) else 0)
-                    change_percent = stock_data.get('f170') or ((change / previous_close * 100) if previous_close and isinstance(previous_close, (int, float)) else 0)
-                    
-                    volume_str = stock_data.get('f47')
-                    volume = int(volume_str) if volume_str and str(volume_str).isdigit() else 0
-                    
-                    amount_str = stock_data.get('f48')
-                    try:
-                        amount = float(amount_str) if amount_str else 0
-                    except ValueError:
-                        amount = 0
-                        
-                    # 判断如果获取到了真实价格数据，就直接返回
-                    if current_price and current_price != "-":
-                        return {
-                            "code": code,
-                            "name": stock_data.get('f58') or f"股票{code}",
-                            "currentPrice": current_price,
-                            "change": change,
-                            "changePercent": change_percent,
-                            "volume": volume,
-                            "amount": amount,
-                            "marketCap": stock_data.get('f116') or stock_data.get('f51') or 0,
-                            "peRatio": stock_data.get('f162') or 0,
-                            "pbRatio": stock_data.get('f167') or 0,
-                            "turnoverRate": stock_data.get('f168') or 0,
-                            "high": stock_data.get('f44') or 0,
-                            "low": stock_data.get('f45') or 0,
-                            "open": stock_data.get('f46') or 0,
-                            "prevClose": previous_close or 0,
-                            "timestamp": int(time.time()*1000)
-                        }
+                    url, params, headers = _build_us_quote_request(node, m, code)
+                    response = await _request_quote_node_async(node, url, params, headers)
+                    if response is None:
+                        break  # 节点熔断中，换下一个节点
+                    quote = _parse_us_quote_text(code, response.text)
+                    if quote:
+                        return quote
                 except Exception as e:
                     print(f"eastmoney fetch_us_stock_basic_data error: {e}")
                     continue
-                
+
         return None
     except Exception as e:
         print(f"fetch_us_stock_basic_data error: {e}")
         return None
 
+def _empty_basic_info(code: str) -> Dict[str, Any]:
+    """行情获取失败时的默认结构，以免 profile_data 合并时出错"""
+    return {
+        "code": code,
+        "name": "",
+        "currentPrice": 0,
+        "change": 0,
+        "changePercent": 0,
+        "volume": 0,
+        "amount": 0,
+        "marketCap": 0,
+        "peRatio": 0,
+        "pbRatio": 0,
+        "turnoverRate": 0,
+        "high": 0,
+        "low": 0,
+        "open": 0,
+        "prevClose": 0
+    }
+
+
+@single_flight(lambda code: f"basic_info:{code.lower()}")
 def get_stock_basic_info(code: str) -> Optional[Dict[str, Any]]:
     market_info = get_market_info(code)
     market_type = market_info['type']
@@ -320,23 +391,27 @@ def get_stock_basic_info(code: str) -> Optional[Dict[str, Any]]:
         basic_info = fetch_us_stock_basic_data(code)
         
     # 如果 basic_info 获取失败，尝试构建一个默认结构，以免 profile_data 合并时出错
-    if not basic_info:
-        basic_info = {
-            "code": code,
-            "name": "",
-            "currentPrice": 0,
-            "change": 0,
-            "changePercent": 0,
-            "volume": 0,
-            "amount": 0,
-            "marketCap": 0,
-            "peRatio": 0,
-            "pbRatio": 0,
-            "turnoverRate": 0,
-            "high": 0,
-            "low": 0,
-            "open": 0,
-            "prevClose": 0
-        }
-        
-    return basic_info
+    return basic_info or _empty_basic_info(code)
+
+
+async def _fetch_stock_basic_info_async(code: str) -> Optional[Dict[str, Any]]:
+    market_info = get_market_info(code)
+    market_type = market_info['type']
+
+    basic_info = None
+    if market_type in ['a', 'hk']:
+        basic_info = await fetch_stock_basic_data_from_eastmoney_async(market_info['market'], code)
+    elif market_type == 'us':
+        basic_info = await fetch_us_stock_basic_data_async(code)
+    return basic_info or _empty_basic_info(code)
+
+
+async def get_stock_basic_info_async(code: str) -> Optional[Dict[str, Any]]:
+    """get_stock_basic_info 的异步版本，同一事件循环内同一股票的并发请求合并为一次"""
+    result, shared = await get_single_flight().do_async(
+        f"basic_info:{code.lower()}", _fetch_stock_basic_info_async, code
+    )
+    # 与同步版本的 single_flight 装饰器一致：共享结果做浅拷贝，避免调用方之间互相修改
+    if shared and isinstance(result, dict):
+        return dict(result)
+    return result
@@ -11,6 +11,8 @@ import akshare as ak
 import requests
 import urllib3
 
+from service.utils.http_client import http_get
+
 # 禁用 SSL 警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -59,7 +61,7 @@ def get_hk_stocks_by_ak() -> Optional[Dict[str, Any]]:
                     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
                     "Referer": "http://quote.eastmoney.com/",
                 }
-                response = requests.get(url, params=params, headers=headers, timeout=30, verify=False)
+                response = http_get(url, params=params, headers=headers, timeout=30, verify=False)
                 if response.status_code == 200:
                     data = response.json()
                     diffs = data.get("data", {}).get("diff", [])
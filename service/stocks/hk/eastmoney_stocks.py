@@ -11,6 +11,8 @@ from datetime import datetime
 import time
 import urllib3
 
+from service.utils.http_client import http_get
+
 # 禁用SSL警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -49,7 +51,7 @@ def get_hk_stocks_by_eastmoney() -> Optional[Dict[str, Any]]:
         for url in endpoints:
             try:
                 print(f"[eastmoney] 尝试 {url}...")
-                response = requests.get(url, params=params, headers=headers, timeout=30, verify=False)
+                response = http_get(url, params=params, headers=headers, timeout=30, verify=False)
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -13,6 +13,8 @@ import importlib.util
 # 添加当前目录到Python路径，以便导入数据源模块
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from service.utils.provider_health import get_provider_registry, call_with_breaker, STATE_OPEN
+
 # 数据源列表（按优先级顺序 - 能获取真实股票名称的优先）
 DATA_SOURCES = [
     'ak_stocks',           # akshare数据源（从东方财富获取真实名称）
@@ -38,6 +40,11 @@ def _load_module(filename):
         return None
 
 
+def _has_stocks(result) -> bool:
+    """数据源返回了非空股票列表"""
+    return bool(result and result.get('stocks'))
+
+
 def get_hk_stocks() -> Optional[Dict[str, Any]]:
     """
     获取港股市场所有股票列表（组合真实数据 + 兜底数据去重）
@@ -49,29 +56,33 @@ def get_hk_stocks() -> Optional[Dict[str, Any]]:
     real_stocks = []
     real_source = ''
     for source_name in DATA_SOURCES:
+        breaker_name = f"stocks:hk:{source_name}"
+        if get_provider_registry().get(breaker_name).state == STATE_OPEN:
+            print(f"[hk_stocks] 数据源 '{source_name}' 熔断中，跳过")
+            continue
         try:
             module = None
             result = None
             if source_name == 'extended_hk_stocks':
                 module = _load_module('extended_hk_stocks.py')
                 if module and hasattr(module, 'get_hk_stocks_by_extended'):
-                    result = module.get_hk_stocks_by_extended()
+                    result = call_with_breaker(breaker_name, module.get_hk_stocks_by_extended, is_success=_has_stocks)
             elif source_name == 'finnhub_stocks':
                 module = _load_module('finnhub_stocks.py')
                 if module and hasattr(module, 'get_hk_stocks_by_finnhub'):
-                    result = module.get_hk_stocks_by_finnhub()
+                    result = call_with_breaker(breaker_name, module.get_hk_stocks_by_finnhub, is_success=_has_stocks)
             elif source_name == 'openbb_stocks':
                 module = _load_module('openbb_stocks.py')
                 if module and hasattr(module, 'get_hk_stocks_by_openbb'):
-                    result = module.get_hk_stocks_by_openbb()
+                    result = call_with_breaker(breaker_name, module.get_hk_stocks_by_openbb, is_success=_has_stocks)
             elif source_name == 'ak_stocks':
                 module = _load_module('ak_stocks.py')
                 if module and hasattr(module, 'get_hk_stocks_by_ak'):
-                    result = module.get_hk_stocks_by_ak()
+                    result = call_with_breaker(breaker_name, module.get_hk_stocks_by_ak, is_success=_has_stocks)
             elif source_name == 'eastmoney_stocks':
                 module = _load_module('eastmoney_stocks.py')
                 if module and hasattr(module, 'get_hk_stocks_by_eastmoney'):
-                    result = module.get_hk_stocks_by_eastmoney()
+                    result = call_with_breaker(breaker_name, module.get_hk_stocks_by_eastmoney, is_success=_has_stocks)
 
             if result and result.get('stocks'):
                 real_stocks = result['stocks']
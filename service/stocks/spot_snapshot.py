@@ -0,0 +1,298 @@
+"""
+行情快照 - A股 / 港股 / 美股全市场实时行情表，单只股票的行情查询直接在内存中按代码查找
+
+核心原理：
+1. akshare 的全市场行情接口（stock_zh_a_spot_em / stock_hk_spot_em / stock_us_spot_em）一次返回数千行，
+   每个市场只保留一份快照，按代码建立字典索引，单只股票的查询为 O(1)
+2. 交易时段内快照每 SPOT_SNAPSHOT_TTL 秒过期；收盘后（含午休、周末、节假日）行情不再变化，
+   快照到下一次开盘才过期（见 service.utils.trading_calendar）
+3. 快照过期或尚未加载时不阻塞查询：在后台提交一次刷新（同一市场同时只有一次，所有请求共享），
+   过期不超过 SPOT_SNAPSHOT_MAX_AGE 秒的快照继续使用，否则返回None，由调用方改用单只股票的行情节点
+4. 刷新失败时保留旧快照，SPOT_SNAPSHOT_RETRY_SECONDS 秒内不再重试；返回的行情带 snapshotAge（快照年龄，秒）
+
+使用方法：
+    from service.stocks.spot_snapshot import get_spot_snapshots
+
+    quote = get_spot_snapshots().get_quote('a', '600519')   # 快照不可用时返回None
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from service.utils.provider_health import call_with_breaker
+from service.utils.trading_calendar import get_trading_calendar
+
+logger = logging.getLogger(__name__)
+
+SPOT_SNAPSHOT_TTL = float(os.getenv('SPOT_SNAPSHOT_TTL', '30'))
+SPOT_SNAPSHOT_MAX_AGE = float(os.getenv('SPOT_SNAPSHOT_MAX_AGE', '300'))
+SPOT_SNAPSHOT_RETRY_SECONDS = float(os.getenv('SPOT_SNAPSHOT_RETRY_SECONDS', '60'))
+
+
+def _number(record: Dict[str, Any], column: str) -> float:
+    """行情表中的数值（空值、NaN、'-' 都视为0）"""
+    try:
+        value = float(record.get(column) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    return value if value == value else 0.0
+
+
+def _a_quote(code: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    current_price = _number(record, '最新价')
+    change = _number(record, '涨跌额')
+    return {
+        "code": code,
+        "name": str(record.get('名称', '')),
+        "currentPrice": current_price,
+        "change": change,
+        "changePercent": _number(record, '涨跌幅'),
+        "volume": int(_number(record, '成交量')),
+        "amount": _number(record, '成交额'),
+        "marketCap": _number(record, '总市值'),
+        "peRatio": _number(record, '市盈率-动态'),
+        "pbRatio": _number(record, '市净率'),
+        "turnoverRate": _number(record, '换手率'),
+        "high": _number(record, '最高'),
+        "low": _number(record, '最低'),
+        "open": _number(record, '今开'),
+        "prevClose": _number(record, '昨收') or current_price - change,
+    }
+
+
+def _hk_quote(code: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    current_price = _number(record, '最新价')
+    change = _number(record, '涨跌额')
+    return {
+        "code": code,
+        "name": str(record.get('名称', '')),
+        "currentPrice": current_price,
+        "change": change,
+        "changePercent": _number(record, '涨跌幅'),
+        "volume": int(_number(record, '成交量')),
+        "amount": _number(record, '成交额'),
+        "marketCap": 0,
+        "peRatio": 0,
+        "pbRatio": 0,
+        "turnoverRate": 0,
+        "high": _number(record, '最高价'),
+        "low": _number(record, '最低价'),
+        "open": _number(record, '开盘价'),
+        "prevClose": current_price - change,
+    }
+
+
+def _us_quote(code: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    current_price = _number(record, '最新价')
+    change = _number(record, '涨跌额')
+    return {
+        "code": code,
+        "name": str(record.get('名称', '')),
+        "currentPrice": current_price,
+        "change": change,
+        "changePercent": _number(record, '涨跌幅'),
+        "volume": int(_number(record, '成交量')),
+        "amount": _number(record, '成交额'),
+        "marketCap": _number(record, '总市值'),
+        "peRatio": _number(record, '市盈率'),
+        "pbRatio": 0,
+        "turnoverRate": 0,
+        "high": _number(record, '最高价'),
+        "low": _number(record, '最低价'),
+        "open": _number(record, '开盘价'),
+        "prevClose": current_price - change,
+    }
+
+
+def _loader(name: str) -> Callable[[], Any]:
+    def load():
+        import akshare as ak
+        return getattr(ak, name)()
+    return load
+
+
+def _has_rows(df) -> bool:
+    """akshare 行情快照返回了非空 DataFrame"""
+    return df is not None and not df.empty
+
+
+# 市场 → (akshare 接口, 行 → 行情)
+SPOT_SOURCES: Dict[str, tuple] = {
+    'a': (_loader('stock_zh_a_spot_em'), _a_quote),
+    'hk': (_loader('stock_hk_spot_em'), _hk_quote),
+    'us': (_loader('stock_us_spot_em'), _us_quote),
+}
+
+
+def _index_key(market: str, code: str) -> str:
+    """快照索引的键：美股代码不区分大小写"""
+    code = str(code).strip()
+    return code.upper() if market == 'us' else code
+
+
+class _Snapshot:
+    """单个市场的行情快照"""
+
+    __slots__ = ('quotes', 'fetched_at', 'failed_at', 'last_error')
+
+    def __init__(self):
+        self.quotes: Dict[str, Dict[str, Any]] = {}
+        self.fetched_at = 0.0
+        # 最近一次刷新失败的时间（刷新成功后清零；只有失败后才按 SPOT_SNAPSHOT_RETRY_SECONDS 退避）
+        self.failed_at = 0.0
+        self.last_error: Optional[str] = None
+
+    def expires_at(self, market: str) -> float:
+        """交易时段内 SPOT_SNAPSHOT_TTL 秒后过期，休市期间到下一次开盘才过期"""
+        if not self.fetched_at:
+            return 0.0
+        calendar = get_trading_calendar(market)
+        if calendar is None or calendar.live_until(self.fetched_at) is not None:
+            return self.fetched_at + SPOT_SNAPSHOT_TTL
+        return calendar.next_open(self.fetched_at)
+
+
+class SpotSnapshotTable:
+    """各市场的行情快照（后台刷新，同一市场同时只有一次刷新）"""
+
+    def __init__(self):
+        self._snapshots: Dict[str, _Snapshot] = {market: _Snapshot() for market in SPOT_SOURCES}
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._refreshes = 0
+        self._refresh_failures = 0
+
+    def refresh(self, market: str) -> bool:
+        """
+        同步拉取一次全市场行情并替换快照
+
+        Args:
+            market: 市场代码（a / hk / us）
+
+        Returns:
+            是否刷新成功（失败时保留旧快照）
+        """
+        load, to_quote = SPOT_SOURCES[market]
+        snapshot = self._snapshots[market]
+        t0 = time.time()
+        try:
+            df = call_with_breaker(f'quote:akshare_spot:{market}', load, is_success=_has_rows)
+            if not _has_rows(df):
+                raise ValueError('行情表为空')
+            quotes = {}
+            for record in df.to_dict('records'):
+                code = str(record.get('代码') or '').strip()
+                if not code:
+                    continue
+                quote = to_quote(code, record)
+                quotes[_index_key(market, code)] = quote
+                if market == 'us' and '.' in code:
+                    # 美股代码形如 105.AAPL，同时按不带市场前缀的代码索引
+                    quotes.setdefault(_index_key(market, code.split('.', 1)[1]), quote)
+        except Exception as e:
+            with self._lock:
+                snapshot.failed_at = time.time()
+                snapshot.last_error = f"{type(e).__name__}: {e}"
+                self._refresh_failures += 1
+            logger.warning(f"[Spot] ⚠️ {market} 行情快照刷新失败，保留旧快照: {type(e).__name__}: {e}")
+            return False
+
+        now = time.time()
+        with self._lock:
+            snapshot.quotes = quotes
+            snapshot.fetched_at = now
+            snapshot.failed_at = 0.0
+            snapshot.last_error = None
+            self._refreshes += 1
+        logger.info(f"[Spot] 🔄 {market} 行情快照已刷新，共 {len(quotes)} 只股票 ({now - t0:.1f}s)")
+        return True
+
+    def _schedule_refresh(self, market: str) -> None:
+        from service.cache.revalidator import get_revalidator
+        get_revalidator().submit(f"spot:{market}", lambda: self.refresh(market))
+
+    def get_quote(self, market: str, code: str) -> Optional[Dict[str, Any]]:
+        """
+        从快照中查找单只股票的行情（只读内存，不等待上游）
+
+        Args:
+            market: 市场代码（a / hk / us）
+            code: 股票代码（美股可带 105. 等市场前缀）
+
+        Returns:
+            行情字典的副本（timestamp 为快照时间，snapshotAge 为快照年龄，秒）；
+            快照不可用（未加载 / 过期太久）或快照中没有该股票时返回None
+        """
+        snapshot = self._snapshots.get(market)
+        if snapshot is None:
+            return None
+
+        now = time.time()
+        with self._lock:
+            quotes, fetched_at, failed_at = snapshot.quotes, snapshot.fetched_at, snapshot.failed_at
+            expires_at = snapshot.expires_at(market)
+        expired = now >= expires_at
+        if expired and now - failed_at >= SPOT_SNAPSHOT_RETRY_SECONDS:
+            self._schedule_refresh(market)
+
+        usable = fetched_at and now - expires_at <= SPOT_SNAPSHOT_MAX_AGE
+        quote = quotes.get(_index_key(market, code)) if usable else None
+        if quote is None and market == 'us' and usable and '.' in code:
+            quote = quotes.get(_index_key(market, code.split('.', 1)[1]))
+        with self._lock:
+            if quote is None:
+                self._misses += 1
+            elif expired:
+                self._stale_hits += 1
+            else:
+                self._hits += 1
+        if quote is None:
+            return None
+        return dict(quote, timestamp=int(fetched_at * 1000), snapshotAge=round(now - fetched_at, 1))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取行情快照统计（用于监控）"""
+        now = time.time()
+        with self._lock:
+            return {
+                'markets': {
+                    market: {
+                        'symbols': len(snapshot.quotes),
+                        'age_seconds': round(now - snapshot.fetched_at, 1) if snapshot.fetched_at else None,
+                        'last_error': snapshot.last_error,
+                    }
+                    for market, snapshot in self._snapshots.items()
+                },
+                'hits': self._hits,
+                'stale_hits': self._stale_hits,
+                'misses': self._misses,
+                'refreshes': self._refreshes,
+                'refresh_failures': self._refresh_failures,
+            }
+
+
+# 全局实例
+_snapshot_table: Optional[SpotSnapshotTable] = None
+_instance_lock = threading.Lock()
+
+
+def get_spot_snapshots() -> SpotSnapshotTable:
+    """
+    获取全局行情快照表（单例模式）
+
+    Returns:
+        SpotSnapshotTable实例
+    """
+    global _snapshot_table
+    if _snapshot_table is None:
+        with _instance_lock:
+            if _snapshot_table is None:
+                _snapshot_table = SpotSnapshotTable()
+    return _snapshot_table
@@ -0,0 +1,371 @@
+"""
+股票搜索索引 - 由 A股 / 港股 / 美股的市场列表在内存中建立代码前缀、名称子串、拼音首字母索引
+
+核心原理：
+1. 每个市场一份不可变的索引（_MarketIndex）：代码、名称、拼音首字母各一个有序数组（前缀查询用二分查找），
+   名称另建字符 / 二元组倒排表（子串查询只校验最短倒排表中的候选），查询不加锁，只读当前索引的引用
+2. 市场列表写入或读取缓存时（cache_market_stocks）调用 update：列表的写入时间（_cache_timestamp）没变时直接返回；
+   变了只重建该市场的索引，代码、名称未变的股票复用已有条目（不重新计算拼音）
+3. 拼音首字母优先使用 pypinyin（可选依赖，能处理多音字词组）；未安装时按 GB2312 一级汉字的拼音顺序推算，
+   二级汉字没有首字母
+4. 排序：代码完全匹配 > 代码前缀 > 名称前缀 > 拼音首字母前缀 > 名称子串；同一档按市场（a / hk / us）和代码排序，
+   每档最多取 limit 条，查询耗时与市场列表大小基本无关
+
+使用方法：
+    from service.stocks.symbol_index import get_symbol_index
+
+    index = get_symbol_index()
+    index.update('a', market_list)       # 市场列表（get_stock_by_market 的返回值）
+    index.search('gzmt', limit=10)       # [{'code': '600519', 'name': '贵州茅台', 'market': 'a', ...}]
+"""
+
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:
+    lazy_pinyin = None
+    logger.info("[Search] pypinyin 未安装，拼音首字母按 GB2312 一级汉字推算")
+
+SEARCH_MARKETS = ('a', 'hk', 'us')
+SEARCH_DEFAULT_LIMIT = int(os.getenv('SEARCH_DEFAULT_LIMIT', '10'))
+SEARCH_MAX_LIMIT = int(os.getenv('SEARCH_MAX_LIMIT', '50'))
+# 市场列表加载失败后，多少秒内搜索不再触发加载
+SEARCH_LOAD_RETRY_SECONDS = float(os.getenv('SEARCH_LOAD_RETRY_SECONDS', '60'))
+
+# 匹配档位（数值越小越靠前）
+TIER_CODE_EXACT, TIER_CODE_PREFIX, TIER_NAME_PREFIX, TIER_INITIALS_PREFIX, TIER_NAME_SUBSTRING = range(5)
+TIER_NAMES = ('code', 'code_prefix', 'name_prefix', 'pinyin', 'name')
+
+# GB2312 一级汉字（按拼音排序）中各声母首字母的起始区位码
+_GB2312_INITIALS = (
+    (0xB0A1, 'a'), (0xB0C5, 'b'), (0xB2C1, 'c'), (0xB4EE, 'd'), (0xB6EA, 'e'), (0xB7A2, 'f'),
+    (0xB8C1, 'g'), (0xB9FE, 'h'), (0xBBF7, 'j'), (0xBFA6, 'k'), (0xC0AC, 'l'), (0xC2E8, 'm'),
+    (0xC4C3, 'n'), (0xC5B6, 'o'), (0xC5BE, 'p'), (0xC6DA, 'q'), (0xC8BB, 'r'), (0xC8F6, 's'),
+    (0xCBFA, 't'), (0xCDDA, 'w'), (0xCEF4, 'x'), (0xD1B9, 'y'), (0xD4D1, 'z'),
+)
+_GB2312_STARTS = [start for start, _ in _GB2312_INITIALS]
+_GB2312_LEVEL1_END = 0xD7F9
+
+# GB2312 按常用读音排序，股票名称中常见的多音字词组单独指定（仅在未安装 pypinyin 时使用）
+_PHRASE_INITIALS = {'银行': 'yh', '重庆': 'cq', '厦门': 'xm', '长沙': 'cs', '长春': 'cc', '长江': 'cj', '长城': 'cc'}
+
+_CJK = re.compile(r'[\u4e00-\u9fff]')
+_NOT_INITIAL = re.compile(r'[^a-z0-9]')
+
+
+def _gb2312_initial(char: str) -> str:
+    """GB2312 一级汉字的拼音首字母，其他字符返回空串"""
+    try:
+        encoded = char.encode('gb2312')
+    except UnicodeEncodeError:
+        return ''
+    if len(encoded) != 2:
+        return ''
+    code = (encoded[0] << 8) | encoded[1]
+    if code < _GB2312_STARTS[0] or code > _GB2312_LEVEL1_END:
+        return ''
+    return _GB2312_INITIALS[bisect.bisect_right(_GB2312_STARTS, code) - 1][1]
+
+
+def pinyin_initials(name: str) -> str:
+    """
+    中文名称的拼音首字母（小写，保留名称中的英文字母和数字）
+
+    Args:
+        name: 股票名称，如 '贵州茅台'、'TCL科技'
+
+    Returns:
+        'gzmt'、'tclkj'；名称中没有汉字时返回空串
+    """
+    if not name or not _CJK.search(name):
+        return ''
+    if lazy_pinyin is not None:
+        letters = ''.join(lazy_pinyin(name, style=Style.FIRST_LETTER))
+    else:
+        for phrase, initials in _PHRASE_INITIALS.items():
+            name = name.replace(phrase, initials)
+        letters = ''.join(char if char.isascii() else _gb2312_initial(char) for char in name)
+    return _NOT_INITIAL.sub('', letters.lower())
+
+
+class _Entry:
+    """索引中的一只股票"""
+
+    __slots__ = ('code', 'name', 'market', 'full_code', 'code_key', 'name_key', 'initials')
+
+    def __init__(self, code: str, name: str, market: str, full_code: str):
+        self.code = code
+        self.name = name
+        self.market = market
+        self.full_code = full_code
+        self.code_key = code.lower()
+        self.name_key = name.lower()
+        self.initials = pinyin_initials(name)
+
+    def to_dict(self, tier: int) -> Dict[str, Any]:
+        return {
+            'code': self.code,
+            'name': self.name,
+            'market': self.market,
+            'full_code': self.full_code,
+            'match': TIER_NAMES[tier],
+        }
+
+
+def _sorted_keys(entries: List[_Entry], attr: str) -> Tuple[List[str], List[int]]:
+    """按某个键排序的 (键数组, 条目下标数组)，空键不入索引"""
+    pairs = sorted((getattr(entry, attr), i) for i, entry in enumerate(entries) if getattr(entry, attr))
+    return [key for key, _ in pairs], [i for _, i in pairs]
+
+
+def _prefix_range(keys: List[str], ids: List[int], prefix: str, limit: int) -> Iterable[Tuple[str, int]]:
+    """有序数组中以 prefix 开头的前 limit 个 (键, 条目下标)"""
+    start = bisect.bisect_left(keys, prefix)
+    for pos in range(start, min(start + limit, len(keys))):
+        if not keys[pos].startswith(prefix):
+            break
+        yield keys[pos], ids[pos]
+
+
+class _MarketIndex:
+    """单个市场的索引（建立后不再修改）"""
+
+    def __init__(self, market: str, version: Any, entries: List[_Entry]):
+        self.market = market
+        self.version = version
+        # 条目按代码排序，子串匹配按倒排表顺序截断时也是代码靠前的优先
+        self.entries = sorted(entries, key=lambda e: (len(e.code), e.code))
+        self.by_code = {entry.code: entry for entry in self.entries}
+        self.codes, self.code_ids = _sorted_keys(self.entries, 'code_key')
+        self.names, self.name_ids = _sorted_keys(self.entries, 'name_key')
+        self.initials, self.initial_ids = _sorted_keys(self.entries, 'initials')
+
+        # 名称的字符 / 二元组倒排表（条目下标递增）
+        postings: Dict[str, List[int]] = {}
+        for i, entry in enumerate(self.entries):
+            key = entry.name_key
+            grams = set(key) | {key[j:j + 2] for j in range(len(key) - 1)}
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self.postings = postings
+
+    def _substring_candidates(self, query: str) -> List[int]:
+        grams = [query] if len(query) == 1 else [query[j:j + 2] for j in range(len(query) - 1)]
+        shortest = None
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                return []
+            if shortest is None or len(posting) < len(shortest):
+                shortest = posting
+        return shortest or []
+
+    def search(self, query: str, limit: int) -> Dict[int, int]:
+        """
+        查询本市场的匹配
+
+        Returns:
+            {条目下标: 匹配档位}，每档最多 limit 条
+        """
+        matches: Dict[int, int] = {}
+
+        def add(i: int, tier: int) -> None:
+            if tier < matches.get(i, len(TIER_NAMES)):
+                matches[i] = tier
+
+        for key, i in _prefix_range(self.codes, self.code_ids, query, limit):
+            add(i, TIER_CODE_EXACT if key == query else TIER_CODE_PREFIX)
+        for _key, i in _prefix_range(self.names, self.name_ids, query, limit):
+            add(i, TIER_NAME_PREFIX)
+        if query.isascii() and query.isalnum():
+            for _key, i in _prefix_range(self.initials, self.initial_ids, query, limit):
+                add(i, TIER_INITIALS_PREFIX)
+
+        found = 0
+        for i in self._substring_candidates(query):
+            if query in self.entries[i].name_key:
+                add(i, TIER_NAME_SUBSTRING)
+                found += 1
+                if found >= limit:
+                    break
+        return matches
+
+
+class SymbolIndex:
+    """各市场股票的搜索索引"""
+
+    def __init__(self):
+        self._markets: Dict[str, _MarketIndex] = {}
+        self._load_failed_at: Dict[str, float] = {}
+        # 重建索引与统计各用一把锁，重建期间查询照常读取旧索引
+        self._build_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self._searches = 0
+        self._rebuilds = 0
+        self._entries_reused = 0
+        self._entries_built = 0
+
+    def update(self, market: str, listing: Optional[Dict[str, Any]]) -> bool:
+        """
+        用市场列表更新该市场的索引
+
+        Args:
+            market: 市场代码（a / hk / us）
+            listing: get_stock_by_market 的返回值（含 stocks 和写入时间 _cache_timestamp）
+
+        Returns:
+            是否重建了索引（列表未变、为空或市场不支持时返回 False）
+        """
+        market = (market or '').lower()
+        if market not in SEARCH_MARKETS or not listing or not listing.get('stocks'):
+            return False
+        version = listing.get('_cache_timestamp') or listing.get('timestamp')
+        current = self._markets.get(market)
+        if current is not None and version is not None and current.version == version:
+            return False
+
+        with self._build_lock:
+            # 同一版本的并发更新只重建一次
+            current = self._markets.get(market)
+            if current is not None and version is not None and current.version == version:
+                return False
+
+            t0 = time.time()
+            previous = current.by_code if current is not None else {}
+            entries, reused = [], 0
+            for stock in listing['stocks']:
+                code = str(stock.get('code') or '').strip()
+                if not code:
+                    continue
+                name = str(stock.get('name') or '').strip()
+                full_code = str(stock.get('full_code') or code)
+                entry = previous.get(code)
+                if entry is not None and entry.name == name and entry.full_code == full_code:
+                    reused += 1
+                else:
+                    entry = _Entry(code, name, market, full_code)
+                entries.append(entry)
+
+            self._markets[market] = _MarketIndex(market, version, entries)
+        with self._lock:
+            self._rebuilds += 1
+            self._entries_reused += reused
+            self._entries_built += len(entries) - reused
+
+        logger.info(
+            f"[Search] 🔎 {market} 索引已更新：{len(entries)} 只股票"
+            f"（复用 {reused}，新建 {len(entries) - reused}，{(time.time() - t0) * 1000:.0f}ms）"
+        )
+        return True
+
+    def missing_markets(self, markets: Iterable[str]) -> List[str]:
+        """尚未建立索引的市场"""
+        return [market for market in markets if market not in self._markets]
+
+    def markets_to_load(self, markets: Iterable[str]) -> List[str]:
+        """尚未建立索引、且最近 SEARCH_LOAD_RETRY_SECONDS 秒内没有加载失败的市场"""
+        now = time.time()
+        return [
+            market for market in self.missing_markets(markets)
+            if now - self._load_failed_at.get(market, 0.0) >= SEARCH_LOAD_RETRY_SECONDS
+        ]
+
+    def record_load_failure(self, market: str) -> None:
+        self._load_failed_at[market] = time.time()
+
+    def search(self, query: str, market: Optional[str] = None,
+               limit: int = SEARCH_DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        """
+        搜索股票
+
+        Args:
+            query: 代码前缀、名称片段或拼音首字母（不区分大小写）
+            market: 只搜索某个市场（a / hk / us），None 表示全部市场
+            limit: 返回条数上限（不超过 SEARCH_MAX_LIMIT）
+
+        Returns:
+            [{'code', 'name', 'market', 'full_code', 'match'}, ...]，match 为匹配方式
+        """
+        query = (query or '').strip().lower()
+        limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+        with self._lock:
+            self._searches += 1
+        if not query:
+            return []
+
+        markets = [market.lower()] if market else SEARCH_MARKETS
+        ranked = []
+        for order, name in enumerate(markets):
+            index = self._markets.get(name)
+            if index is None:
+                continue
+            for i, tier in index.search(query, limit).items():
+                entry = index.entries[i]
+                ranked.append((tier, order, len(entry.code), entry.code, entry))
+        ranked.sort(key=lambda item: item[:4])
+        return [entry.to_dict(tier) for tier, _order, _length, _code, entry in ranked[:limit]]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取索引统计（用于监控）"""
+        markets = dict(self._markets)
+        with self._lock:
+            return {
+                'markets': {
+                    market: {'symbols': len(index.entries), 'version': index.version}
+                    for market, index in markets.items()
+                },
+                'pinyin': 'pypinyin' if lazy_pinyin is not None else 'gb2312',
+                'searches': self._searches,
+                'rebuilds': self._rebuilds,
+                'entries_reused': self._entries_reused,
+                'entries_built': self._entries_built,
+            }
+
+
+# 全局实例
+_symbol_index: Optional[SymbolIndex] = None
+_instance_lock = threading.Lock()
+
+
+def get_symbol_index() -> SymbolIndex:
+    """
+    获取全局股票搜索索引（单例模式）
+
+    Returns:
+        SymbolIndex实例
+    """
+    global _symbol_index
+    if _symbol_index is None:
+        with _instance_lock:
+            if _symbol_index is None:
+                _symbol_index = SymbolIndex()
+    return _symbol_index
+
+
+def load_market_index(market: str) -> bool:
+    """
+    加载市场列表（经 get_stock_by_market 的缓存）并建立该市场的索引，用于某个市场第一次被搜索时
+
+    Returns:
+        该市场是否已有索引（获取失败时记录失败时间，SEARCH_LOAD_RETRY_SECONDS 秒内不再加载）
+    """
+    from service.stocks.stocks import get_stock_by_market
+
+    index = get_symbol_index()
+    try:
+        index.update(market, get_stock_by_market(market))
+    finally:
+        if index.missing_markets([market]):
+            index.record_load_failure(market)
+    return not index.missing_markets([market])
@@ -14,6 +14,7 @@ from openbb import obb
 # 导入各个数据源模块
 from .sec_stocks import get_sec_stocks_all
 from .finnhub_stocks import get_finnhub_stocks_all
+from service.utils.provider_health import get_provider_registry, call_with_breaker, CircuitOpenError, STATE_OPEN
 
 # 数据源配置（参考 kline.py 的 DATA_SOURCES_CONFIG 结构）
 US_DATA_SOURCES_CONFIG = {
@@ -96,6 +97,11 @@ def _filter_us_stocks(stocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return filtered
 
 
+def _has_stocks(result) -> bool:
+    """数据源返回了非空股票列表"""
+    return bool(result and result.get('stocks'))
+
+
 def get_us_stocks(data_source: str = None) -> Optional[Dict[str, Any]]:
     """
     获取美股列表（只包含普通股，排除基金/ETF/REIT/信托/优先股等）
@@ -125,13 +131,21 @@ def get_us_stocks(data_source: str = None) -> Optional[Dict[str, Any]]:
 
         # 按优先级尝试各个数据源
         for source in US_DATA_SOURCES_CONFIG['default']:
+            breaker_name = f"stocks:us:{source}"
+            if get_provider_registry().get(breaker_name).state == STATE_OPEN:
+                print(f"{source} 数据源熔断中，跳过")
+                continue
             print(f"尝试使用 {source} 数据源...")
 
-            if source == 'sec':
-                result = get_sec_stocks_all()
-            elif source == 'finnhub':
-                result = get_finnhub_stocks_all()
-            else:
+            try:
+                if source == 'sec':
+                    result = call_with_breaker(breaker_name, get_sec_stocks_all, is_success=_has_stocks)
+                elif source == 'finnhub':
+                    result = call_with_breaker(breaker_name, get_finnhub_stocks_all, is_success=_has_stocks)
+                else:
+                    continue
+            except CircuitOpenError as e:
+                print(f"{e}，跳过")
                 continue
 
             if result and result['stocks']:
@@ -203,16 +217,24 @@ def get_us_stocks_by_exchange(exchange: str = "N", data_source: str = None) -> O
 
         # 按优先级尝试各个数据源
         for source in US_DATA_SOURCES_CONFIG['default']:
+            breaker_name = f"stocks:us:{source}"
+            if get_provider_registry().get(breaker_name).state == STATE_OPEN:
+                print(f"{source} 数据源熔断中，跳过")
+                continue
             print(f"尝试使用 {source} 数据源...")
 
-            if source == 'sec':
-                from .sec_stocks import get_sec_stocks
-                result = get_sec_stocks(exchange)
-            elif source == 'finnhub':
-                from .finnhub_stocks import get_finnhub_stocks
-                # Finnhub使用统一的US交易所代码
-                result = get_finnhub_stocks("US")
-            else:
+            try:
+                if source == 'sec':
+                    from .sec_stocks import get_sec_stocks
+                    result = call_with_breaker(breaker_name, get_sec_stocks, exchange, is_success=_has_stocks)
+                elif source == 'finnhub':
+                    from .finnhub_stocks import get_finnhub_stocks
+                    # Finnhub使用统一的US交易所代码
+                    result = call_with_breaker(breaker_name, get_finnhub_stocks, "US", is_success=_has_stocks)
+                else:
+                    continue
+            except CircuitOpenError as e:
+                print(f"{e}，跳过")
                 continue
 
             if result and result['stocks']:
@@ -0,0 +1,254 @@
+"""
+共享异步 HTTP 传输层 - 可在事件循环中直接 await 的数据源请求
+
+与 http_client.HttpTransport 对应的异步版本（基于 httpx.AsyncClient）：
+1. 每个事件循环共享一个 AsyncClient（连接池与事件循环绑定），大量并发请求只占用
+   socket，不占用线程；ASYNC_HTTP_MAX_CONNECTIONS 限制同时打开的连接总数
+2. 超时、重试次数、退避沿用 http_client.HOST_POLICIES 中的主机策略；
+   同样只对“连接失败”和可重试状态码（429/502/503/504）重试，读取超时不重试
+3. verify=False 的请求走单独的 AsyncClient（httpx 的证书校验是客户端级配置）
+4. 连接池分为 ASYNC_HTTP_POOL_SHARDS 个分片轮流使用：httpcore 每次分配连接都要扫描整个池，
+   单个池有数百个连接时这部分开销随并发数平方增长，分片后每个池只有几十个连接
+5. 按主机统计请求数、错误数、重试数、平均耗时、当前并发数
+
+使用方法：
+    from service.utils.async_http_client import async_http_get
+
+    response = await async_http_get(url, params=params, headers=headers)
+    data = response.json()
+
+返回 httpx.Response（status_code / text / json() 与 requests.Response 用法一致），
+请求失败抛出 httpx.HTTPError 的子类
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+import weakref
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from service.utils.http_client import RETRY_STATUS_CODES, MAX_RETRY_AFTER, _resolve_policy
+
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS', '512'))
+MAX_KEEPALIVE = int(os.getenv('ASYNC_HTTP_MAX_KEEPALIVE', '64'))
+POOL_SHARDS = max(1, int(os.getenv('ASYNC_HTTP_POOL_SHARDS', '8')))
+
+
+class _HostStats:
+    """单个主机的异步请求统计"""
+
+    __slots__ = ('requests', 'errors', 'retries', 'total_ms', 'in_flight', 'peak_in_flight')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_ms = 0.0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+
+def _to_timeout(timeout: Any) -> httpx.Timeout:
+    """requests 风格的 timeout（秒 / (连接, 读取)）→ httpx.Timeout"""
+    if isinstance(timeout, httpx.Timeout):
+        return timeout
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+
+class AsyncHttpTransport:
+    """共享异步 HTTP 传输（每个事件循环一组 AsyncClient）"""
+
+    def __init__(self, max_connections: int = MAX_CONNECTIONS, max_keepalive: int = MAX_KEEPALIVE,
+                 shards: int = POOL_SHARDS):
+        self._shards = shards
+        self._limits = httpx.Limits(
+            max_connections=max(1, max_connections // shards),
+            max_keepalive_connections=max(1, max_keepalive // shards),
+        )
+        # 事件循环 → {verify: [AsyncClient 分片]}；事件循环结束后自动释放
+        self._clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[bool, List[httpx.AsyncClient]]]' = \
+            weakref.WeakKeyDictionary()
+        self._next_shard = itertools.count()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _HostStats] = {}
+
+    def _get_client(self, verify: bool) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._clients.get(loop)
+            if clients is None:
+                clients = self._clients[loop] = {}
+            shards = clients.get(verify)
+            if shards is None:
+                shards = clients[verify] = [
+                    httpx.AsyncClient(
+                        limits=self._limits,
+                        verify=verify,
+                        follow_redirects=True,
+                        # 数据源请求互不相关，不在请求之间携带 Cookie
+                        cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+                    )
+                    for _ in range(self._shards)
+                ]
+            return shards[next(self._next_shard) % len(shards)]
+
+    def _host_stats(self, host: str) -> _HostStats:
+        stats = self._stats.get(host)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(host, _HostStats())
+        return stats
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        发送异步请求
+
+        Args:
+            method: HTTP 方法
+            url: 请求地址
+            **kwargs: params / headers / timeout / verify 等；未指定 timeout 时使用主机策略
+
+        Returns:
+            httpx.Response
+
+        Raises:
+            httpx.HTTPError: 重试耗尽后的最后一次异常
+        """
+        host = (urlsplit(url).hostname or '').lower()
+        policy = _resolve_policy(host)
+        client = self._get_client(bool(kwargs.pop('verify', True)))
+        kwargs['timeout'] = _to_timeout(kwargs.get('timeout', policy.timeout))
+        stats = self._host_stats(host)
+
+        with self._lock:
+            stats.in_flight += 1
+            stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        attempt = 0
+        t0 = time.time()
+        try:
+            while True:
+                wait = None
+                try:
+                    response = await client.request(method, url, **kwargs)
+                except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                    # ReadTimeout 不重试：慢数据源交给上层的对冲请求和熔断器处理
+                    if attempt >= policy.retries:
+                        self._record(stats, t0, error=True)
+                        raise
+                    logger.debug(f"[AsyncHTTP] {host} 连接失败，重试 ({attempt + 1}/{policy.retries}): {type(e).__name__}")
+                except httpx.HTTPError:
+                    self._record(stats, t0, error=True)
+                    raise
+                else:
+                    if response.status_code not in RETRY_STATUS_CODES or attempt >= policy.retries:
+                        self._record(stats, t0, error=response.status_code >= 500)
+                        return response
+                    wait = self._retry_after(response)
+                    await response.aclose()
+                    logger.debug(f"[AsyncHTTP] {host} 返回 {response.status_code}，重试 ({attempt + 1}/{policy.retries})")
+
+                attempt += 1
+                with self._lock:
+                    stats.retries += 1
+                await asyncio.sleep(wait if wait is not None else policy.backoff * (2 ** (attempt - 1)))
+        finally:
+            with self._lock:
+                stats.in_flight -= 1
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        """解析 Retry-After 头（仅支持秒数）"""
+        value = response.headers.get('Retry-After')
+        if value and value.strip().isdigit():
+            return min(MAX_RETRY_AFTER, float(value))
+        return None
+
+    def _record(self, stats: _HostStats, t0: float, error: bool) -> None:
+        with self._lock:
+            stats.requests += 1
+            stats.total_ms += (time.time() - t0) * 1000
+            if error:
+                stats.errors += 1
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """发送异步 GET 请求"""
+        return await self.request('GET', url, **kwargs)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各主机的异步传输统计（用于监控）"""
+        with self._lock:
+            snapshot: Dict[str, Tuple[int, int, int, float, int, int]] = {
+                host: (s.requests, s.errors, s.retries, s.total_ms, s.in_flight, s.peak_in_flight)
+                for host, s in self._stats.items()
+            }
+        return {
+            host: {
+                'requests': count,
+                'errors': errors,
+                'retries': retries,
+                'avg_ms': round(total_ms / count, 1) if count else 0.0,
+                'in_flight': in_flight,
+                'peak_in_flight': peak,
+            }
+            for host, (count, errors, retries, total_ms, in_flight, peak) in sorted(snapshot.items())
+        }
+
+    async def aclose(self) -> None:
+        """关闭当前事件循环上的所有连接"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._clients.pop(loop, {})
+        for shards in clients.values():
+            for client in shards:
+                await client.aclose()
+
+
+# 全局传输实例
+_transport_instance: Optional[AsyncHttpTransport] = None
+_instance_lock = threading.Lock()
+
+
+def get_async_http_transport() -> AsyncHttpTransport:
+    """
+    获取全局异步 HTTP 传输实例（单例模式）
+
+    Returns:
+        AsyncHttpTransport实例
+    """
+    global _transport_instance
+    if _transport_instance is None:
+        with _instance_lock:
+            if _transport_instance is None:
+                _transport_instance = AsyncHttpTransport()
+    return _transport_instance
+
+
+async def async_http_get(url: str, **kwargs) -> httpx.Response:
+    """
+    通过共享异步传输发送 GET 请求
+
+    Args:
+        url: 请求地址
+        **kwargs: params / headers / timeout / verify 等，与 http_get 一致
+
+    Returns:
+        httpx.Response
+    """
+    return await get_async_http_transport().get(url, **kwargs)
+
+
+def get_async_http_stats() -> Dict[str, Dict[str, Any]]:
+    """获取各主机的异步 HTTP 传输统计（用于监控）"""
+    return get_async_http_transport().get_stats()
@@ -0,0 +1,232 @@
+"""
+Baostock 会话管理器 - 进程内共享一个已登录的 Baostock 会话
+
+核心原理：
+1. baostock 模块只解析一次：导入时临时避开项目内同名的 baostock.py / bs_stocks.py，
+   结果（包括“未安装”）缓存下来，之后不再扫描 sys.path
+2. 首次查询时登录，之后一直复用同一个会话；会话失效（未登录/网络错误/连接异常）时
+   自动重新登录并重试一次
+3. baostock 协议基于单条 socket 连接，非线程安全：所有查询（包括翻页读取结果）
+   都在同一把锁内串行执行
+4. 空闲超过 BAOSTOCK_IDLE_TIMEOUT 秒后由后台线程自动登出，释放服务端会话
+
+使用方法：
+    from service.utils.baostock_session import get_baostock_session
+
+    session = get_baostock_session()
+    if session.is_available():
+        result = session.query('query_history_k_data_plus', 'sh.600519', 'date,close',
+                               start_date='2024-01-01', end_date='2024-01-31')
+        if result.ok:
+            rows = result.rows
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+IDLE_TIMEOUT = float(os.getenv('BAOSTOCK_IDLE_TIMEOUT', '300'))
+
+# 与项目内文件同名、可能遮蔽 baostock 包的模块文件
+_SHADOWING_FILES = ('baostock.py', 'bs_stocks.py')
+
+# 需要重新登录的错误码：10001xxx 为用户/登录类错误，10002xxx 为网络类错误
+_RELOGIN_ERROR_PREFIXES = ('10001', '10002')
+
+
+class BaostockResult(NamedTuple):
+    """一次 Baostock 查询的完整结果（已读取全部分页）"""
+    error_code: str
+    error_msg: str
+    fields: List[str]
+    rows: List[List[str]]
+
+    @property
+    def ok(self) -> bool:
+        return self.error_code == '0'
+
+    def to_dataframe(self):
+        """转换为 DataFrame（列名为查询字段）"""
+        import pandas as pd
+        return pd.DataFrame(self.rows, columns=self.fields or None)
+
+
+def _import_baostock():
+    """导入 baostock 包，临时移除包含同名本地文件的目录，避免导入到项目内的模块"""
+    original_path = sys.path.copy()
+    sys.path[:] = [
+        path for path in sys.path
+        if not any(os.path.isfile(os.path.join(path or '.', name)) for name in _SHADOWING_FILES)
+    ]
+    try:
+        import baostock
+        return baostock
+    finally:
+        sys.path[:] = original_path
+
+
+class BaostockSession:
+    """进程内共享的 Baostock 会话（线程安全，查询串行执行）"""
+
+    _UNRESOLVED = object()
+
+    def __init__(self, idle_timeout: float = IDLE_TIMEOUT):
+        self._idle_timeout = idle_timeout
+        self._lock = threading.RLock()
+        self._module: Any = self._UNRESOLVED
+        self._logged_in = False
+        self._last_used = 0.0
+        self._idle_thread: Optional[threading.Thread] = None
+
+        # 统计信息
+        self._logins = 0
+        self._queries = 0
+        self._relogins = 0
+
+    def _get_module(self):
+        """解析 baostock 模块（只解析一次），未安装时返回None"""
+        if self._module is self._UNRESOLVED:
+            with self._lock:
+                if self._module is self._UNRESOLVED:
+                    try:
+                        module = _import_baostock()
+                        self._module = module if hasattr(module, 'login') else None
+                    except ImportError:
+                        self._module = None
+                    if self._module is None:
+                        logger.warning("[Baostock] baostock 库不可用，请安装: pip install baostock")
+        return self._module
+
+    def is_available(self) -> bool:
+        """baostock 库是否可用（不发起网络请求）"""
+        return self._get_module() is not None
+
+    def _login(self, bs) -> None:
+        lg = bs.login()
+        if lg.error_code != '0':
+            raise ConnectionError(f"baostock 登录失败: {lg.error_msg}")
+        self._logged_in = True
+        self._logins += 1
+        logger.info("[Baostock] 🔑 已登录，会话将被复用")
+        self._ensure_idle_thread()
+
+    def _logout(self, bs) -> None:
+        self._logged_in = False
+        try:
+            bs.logout()
+        except Exception as e:
+            logger.debug(f"[Baostock] 登出异常（忽略）: {type(e).__name__}: {e}")
+
+    def _execute(self, bs, method: str, args, kwargs) -> BaostockResult:
+        rs = getattr(bs, method)(*args, **kwargs)
+        if rs is None:
+            return BaostockResult('-1', '结果为空', [], [])
+        rows = []
+        while rs.error_code == '0' and rs.next():
+            rows.append(rs.get_row_data())
+        return BaostockResult(rs.error_code, rs.error_msg, list(getattr(rs, 'fields', None) or []), rows)
+
+    def query(self, method: str, *args, **kwargs) -> BaostockResult:
+        """
+        在共享会话上执行一次 baostock 查询，并读取全部结果
+
+        Args:
+            method: baostock 查询函数名（如 'query_history_k_data_plus'）
+            *args, **kwargs: 透传给查询函数的参数
+
+        Returns:
+            BaostockResult
+
+        Raises:
+            ImportError: baostock 库不可用
+            ConnectionError: 登录失败
+        """
+        bs = self._get_module()
+        if bs is None:
+            raise ImportError("baostock 库不可用")
+
+        with self._lock:
+            for attempt in range(2):
+                if not self._logged_in:
+                    self._login(bs)
+                self._last_used = time.time()
+                try:
+                    result = self._execute(bs, method, args, kwargs)
+                except Exception as e:
+                    # 连接已断开：丢弃会话，重新登录后重试一次
+                    self._logout(bs)
+                    if attempt:
+                        raise
+                    logger.info(f"[Baostock] 会话异常（{type(e).__name__}: {e}），重新登录后重试")
+                    self._relogins += 1
+                    continue
+
+                self._queries += 1
+                if not result.ok and result.error_code.startswith(_RELOGIN_ERROR_PREFIXES) and not attempt:
+                    logger.info(f"[Baostock] 会话失效（{result.error_code}: {result.error_msg}），重新登录后重试")
+                    self._logout(bs)
+                    self._relogins += 1
+                    continue
+                return result
+        return result
+
+    def _ensure_idle_thread(self) -> None:
+        if self._idle_timeout <= 0 or (self._idle_thread is not None and self._idle_thread.is_alive()):
+            return
+        self._idle_thread = threading.Thread(target=self._idle_loop, name="baostock-idle", daemon=True)
+        self._idle_thread.start()
+
+    def _idle_loop(self) -> None:
+        """空闲超时后自动登出；登出后线程退出，下次登录时重新启动"""
+        interval = max(1.0, min(30.0, self._idle_timeout / 2))
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                if not self._logged_in:
+                    return
+                if time.time() - self._last_used >= self._idle_timeout:
+                    logger.info(f"[Baostock] 会话空闲超过 {self._idle_timeout:.0f}s，登出")
+                    self._logout(self._module)
+                    return
+
+    def close(self) -> None:
+        """登出当前会话"""
+        with self._lock:
+            if self._logged_in and self._module not in (None, self._UNRESOLVED):
+                self._logout(self._module)
+
+    def get_stats(self) -> dict:
+        """获取会话统计信息（用于监控）"""
+        return {
+            'available': self._module not in (None, self._UNRESOLVED),
+            'logged_in': self._logged_in,
+            'logins': self._logins,
+            'relogins': self._relogins,
+            'queries': self._queries,
+            'idle_s': round(time.time() - self._last_used, 1) if self._last_used else None,
+        }
+
+
+# 全局会话实例
+_session_instance: Optional[BaostockSession] = None
+_instance_lock = threading.Lock()
+
+
+def get_baostock_session() -> BaostockSession:
+    """
+    获取全局 Baostock 会话（单例模式）
+
+    Returns:
+        BaostockSession实例
+    """
+    global _session_instance
+    if _session_instance is None:
+        with _instance_lock:
+            if _session_instance is None:
+                _session_instance = BaostockSession()
+    return _session_instance
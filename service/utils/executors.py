@@ -0,0 +1,257 @@
+"""
+有界执行器 - 将阻塞型数据源调用移出事件循环
+
+核心原理：
+1. 所有路由都是 async def，但底层 get_kline_data / get_stock_by_market 等都是同步阻塞调用
+   （requests / akshare / baostock），直接在协程里调用会冻结整个 hypercorn worker
+2. 按工作负载类型（K线、市场列表、档案、主力动向）划分独立线程池，互不抢占
+3. 每个线程池有并发上限（线程数）和排队上限，超过排队上限直接拒绝（503），
+   避免慢数据源把请求无限堆积在内存里
+
+使用方法：
+    from service.utils.executors import run_blocking
+    result = await run_blocking('kline', get_kline_data, code, start, end)
+
+配置（环境变量，未设置时使用默认值）：
+    EXECUTOR_KLINE_WORKERS / EXECUTOR_KLINE_QUEUE
+    EXECUTOR_MARKET_WORKERS / EXECUTOR_MARKET_QUEUE
+    EXECUTOR_PROFILE_WORKERS / EXECUTOR_PROFILE_QUEUE
+    EXECUTOR_MAIN_FORCE_WORKERS / EXECUTOR_MAIN_FORCE_QUEUE
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# 各工作负载的默认配置: (最大并发线程数, 最大排队数)
+DEFAULT_EXECUTOR_CONFIG = {
+    'kline': (16, 64),       # K线：请求量最大，单次耗时 0.2~10s
+    'market': (2, 8),        # 市场列表：单次拉取上万条，重且慢，但请求少
+    'profile': (8, 32),      # 档案/行情：akshare 全市场快照，较重
+    'main_force': (4, 16),   # 主力动向：K线 + 资金流 + 股东户数，最重
+}
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """执行器排队已满，拒绝新任务（路由层应返回 503）"""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        super().__init__(f"执行器 '{name}' 已满载（并发+排队上限 {limit}），请稍后重试")
+
+
+class BoundedExecutor:
+    """
+    有界线程池执行器
+
+    在 ThreadPoolExecutor 之上增加排队上限：
+    正在执行 + 排队中的任务数超过 max_workers + max_queue 时直接抛出 ExecutorSaturatedError
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        """
+        Args:
+            name: 工作负载名称（用于日志和线程名）
+            max_workers: 最大并发线程数
+            max_queue: 最大排队任务数（不含正在执行的任务）
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self._pending = 0      # 正在执行 + 排队中
+        self._running = 0      # 正在执行
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_wait_time = 0.0
+        self._total_run_time = 0.0
+
+    @property
+    def capacity(self) -> int:
+        """并发 + 排队的总容量"""
+        return self.max_workers + self.max_queue
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """延迟创建线程池（首次提交任务时才创建线程）"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=f"{self.name}-worker"
+                    )
+        return self._executor
+
+    def _invoke(self, ctx: contextvars.Context, func: Callable[..., T], args: tuple,
+                kwargs: dict, enqueued_at: float) -> T:
+        """在工作线程中执行任务并记录耗时"""
+        started_at = time.time()
+        with self._lock:
+            self._running += 1
+            self._total_wait_time += started_at - enqueued_at
+        try:
+            return ctx.run(func, *args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._total_run_time += time.time() - started_at
+
+    def _on_done(self, future) -> None:
+        """任务结束（完成/失败/取消）时释放名额"""
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        在线程池中执行阻塞函数，并在事件循环中等待结果
+
+        Args:
+            func: 阻塞函数
+            *args, **kwargs: 透传给 func 的参数
+
+        Returns:
+            func 的返回值
+
+        Raises:
+            ExecutorSaturatedError: 并发 + 排队已满
+        """
+        with self._lock:
+            if self._pending >= self.capacity:
+                self._rejected += 1
+                logger.warning(
+                    f"[Executor:{self.name}] 🚫 已满载 (执行中 {self._running}, 排队 {self._pending - self._running})，拒绝新任务"
+                )
+                raise ExecutorSaturatedError(self.name, self.capacity)
+            self._pending += 1
+            self._submitted += 1
+
+        ctx = contextvars.copy_context()
+        try:
+            future = self._get_executor().submit(self._invoke, ctx, func, args, kwargs, time.time())
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        # 通过 done_callback 释放名额：即使等待方被取消（客户端断开），
+        # 名额也要等线程里的任务真正结束后才释放，保证上限准确
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取执行器统计信息（用于监控）"""
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'running': self._running,
+                'queued': max(0, self._pending - self._running),
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+                'rejected': self._rejected,
+                'avg_wait_ms': round(self._total_wait_time / finished * 1000, 2) if finished else 0.0,
+                'avg_run_ms': round(self._total_run_time / finished * 1000, 2) if finished else 0.0,
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        """关闭线程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+# 全局执行器注册表
+_executors: Dict[str, BoundedExecutor] = {}
+_registry_lock = threading.Lock()
+
+
+def _read_int_env(name: str, default: int) -> int:
+    """读取整型环境变量，非法值回退到默认值"""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return max(1, int(value))
+    except ValueError:
+        logger.warning(f"环境变量 {name}={value} 不是合法整数，使用默认值 {default}")
+        return default
+
+
+def get_executor(name: str) -> BoundedExecutor:
+    """
+    获取指定工作负载的执行器（单例，首次访问时创建）
+
+    Args:
+        name: 工作负载名称 ('kline', 'market', 'profile', 'main_force')
+
+    Returns:
+        BoundedExecutor实例
+    """
+    executor = _executors.get(name)
+    if executor is not None:
+        return executor
+
+    with _registry_lock:
+        if name not in _executors:
+            if name not in DEFAULT_EXECUTOR_CONFIG:
+                raise ValueError(f"未知的工作负载类型: {name}")
+            default_workers, default_queue = DEFAULT_EXECUTOR_CONFIG[name]
+            env_prefix = f"EXECUTOR_{name.upper()}"
+            max_workers = _read_int_env(f"{env_prefix}_WORKERS", default_workers)
+            max_queue = _read_int_env(f"{env_prefix}_QUEUE", default_queue)
+            _executors[name] = BoundedExecutor(name, max_workers, max_queue)
+            logger.info(f"[Executor:{name}] 已创建，并发上限 {max_workers}，排队上限 {max_queue}")
+        return _executors[name]
+
+
+async def run_blocking(workload: str, func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    在指定工作负载的执行器中运行阻塞函数（便捷函数）
+
+    Args:
+        workload: 工作负载名称
+        func: 阻塞函数
+        *args, **kwargs: 透传给 func 的参数
+
+    Returns:
+        func 的返回值
+    """
+    return await get_executor(workload).run(func, *args, **kwargs)
+
+
+def get_executor_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    获取所有已创建执行器的统计信息（用于监控）
+
+    Returns:
+        {工作负载名称: 统计信息}
+    """
+    return {name: executor.get_stats() for name, executor in list(_executors.items())}
+
+
+def shutdown_executors(wait: bool = False) -> None:
+    """关闭所有执行器（进程退出时调用）"""
+    for executor in list(_executors.values()):
+        executor.shutdown(wait=wait)
+    _executors.clear()
@@ -0,0 +1,113 @@
+"""
+并发扇出 - 同时发起一组互不依赖的阻塞调用，在共同的截止时间内收集结果
+
+核心原理：
+1. 一个请求内互不依赖的上游调用（如主力动向的K线、资金流向、股东户数）不再依次执行，
+   而是同时提交到共享的扇出线程池（FANOUT_WORKERS 个线程），总耗时取决于最慢的一个而不是各项之和
+2. 所有调用共用一个截止时间：到期时已完成的结果照常使用，未完成的记为 timeout、由调用方降级处理；
+   尚未开始执行的调用直接取消，已在执行的调用在后台跑完后丢弃结果
+3. 每个调用的状态（ok / empty / error / timeout）与耗时记录在返回的 timings 中，
+   并计入 /metrics 的 stock_fanout_call_seconds 直方图（按调用方、子调用、状态细分），便于定位拖慢接口的上游
+4. 子调用在提交时的 contextvars 上下文中执行（与 run_blocking 一致）
+
+使用方法：
+    from service.utils.fanout import fan_out
+
+    results, timings = fan_out('main_force', {
+        'kline': lambda: get_kline_data(code),
+        'fund_flow': lambda: load_fund_flow(code),
+    }, timeout=10)
+    results.get('fund_flow')   # 超时 / 出错 / 返回None 时不在 results 中
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from service.utils.metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+FANOUT_WORKERS = int(os.getenv('FANOUT_WORKERS', '16'))
+
+CALL_SECONDS = get_metrics_registry().histogram(
+    'stock_fanout_call_seconds',
+    '扇出子调用耗时（秒；status: ok / empty / error / timeout）',
+    ('caller', 'call', 'status'),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    """延迟创建扇出线程池"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix='fanout-worker')
+    return _pool
+
+
+def _timed(ctx: contextvars.Context, func: Callable[[], Any]) -> Tuple[bool, Any, float]:
+    """在工作线程中执行子调用：(是否成功, 返回值或异常, 耗时)"""
+    t0 = time.perf_counter()
+    try:
+        return True, ctx.run(func), time.perf_counter() - t0
+    except Exception as e:
+        return False, e, time.perf_counter() - t0
+
+
+def fan_out(caller: str, calls: Dict[str, Callable[[], Any]],
+            timeout: float) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """
+    并发执行一组子调用，最多等待 timeout 秒
+
+    Args:
+        caller: 调用方名称（用于日志和指标）
+        calls: {子调用名称: 无参函数}
+        timeout: 截止时间（秒，从提交时算起）
+
+    Returns:
+        (results, timings)：
+        results 为 {名称: 返回值}，只包含按时完成且返回值不为None的子调用；
+        timings 为 {名称: {'status': ok / empty / error / timeout, 'ms': 耗时, 'error': 错误信息（出错时）}}
+    """
+    pool = _get_pool()
+    futures = {}
+    for name, func in calls.items():
+        futures[pool.submit(_timed, contextvars.copy_context(), func)] = name
+
+    done, _pending = wait(futures, timeout=max(0.0, timeout))
+
+    results: Dict[str, Any] = {}
+    timings: Dict[str, Dict[str, Any]] = {}
+    for future, name in futures.items():
+        if future not in done:
+            # 未开始的直接取消；已在执行的无法中断，结果在完成后丢弃
+            future.cancel()
+            timing = {'status': 'timeout', 'ms': round(timeout * 1000, 1)}
+            elapsed = timeout
+        else:
+            ok, value, elapsed = future.result()
+            timing = {'ms': round(elapsed * 1000, 1)}
+            if not ok:
+                timing.update(status='error', error=f"{type(value).__name__}: {value}")
+            elif value is None:
+                timing['status'] = 'empty'
+            else:
+                timing['status'] = 'ok'
+                results[name] = value
+        timings[name] = timing
+        CALL_SECONDS.observe(elapsed, caller, name, timing['status'])
+
+    degraded = {name: timing['status'] for name, timing in timings.items() if timing['status'] != 'ok'}
+    if degraded:
+        logger.info(f"[FanOut:{caller}] ⚠️ 部分子调用未取得结果: {degraded}")
+    return results, timings
@@ -0,0 +1,252 @@
+"""
+共享 HTTP 传输层 - 所有基于 requests 的数据源统一走这里
+
+核心原理：
+1. 进程内共享一个 requests.Session，每个主机一个独立的 keep-alive 连接池
+   （首次访问该主机时按策略创建），连接复用省去每次请求的 TCP/TLS 握手和 DNS 解析
+2. 按主机配置策略：连接/读取超时、连接池上限、重试次数
+3. 只对“连接失败”和可重试状态码（429/502/503/504）做指数退避重试；
+   读取超时不重试 —— 慢数据源交给上层的对冲请求和熔断器处理
+4. 按主机统计请求数、错误数、重试数、平均耗时、新建连接数（连接复用率）
+
+使用方法：
+    from service.utils.http_client import http_get
+
+    response = http_get(url, params=params, headers=headers)   # 超时按主机策略
+    response = http_get(url, params=params, timeout=30, verify=False)
+
+返回值和抛出的异常与 requests.get 完全一致
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from http.cookiejar import DefaultCookiePolicy
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class HostPolicy:
+    """单个主机的传输策略"""
+    timeout: Tuple[float, float] = (5.0, 10.0)  # (连接超时, 读取超时) 秒
+    max_connections: int = 4                     # 该主机的 keep-alive 连接池上限
+    retries: int = 1                             # 连接失败/可重试状态码的最大重试次数
+    backoff: float = 0.2                         # 退避基数（秒），第 n 次重试等待 backoff * 2^(n-1)
+
+
+DEFAULT_POLICY = HostPolicy()
+
+# 按主机后缀匹配（最长匹配优先），未匹配的主机使用 DEFAULT_POLICY
+HOST_POLICIES: Dict[str, HostPolicy] = {
+    'vip.stock.finance.sina.com.cn': HostPolicy(timeout=(3.0, 10.0), max_connections=8),
+    'push2his.eastmoney.com': HostPolicy(timeout=(3.0, 5.0), max_connections=8),
+    'push2.eastmoney.com': HostPolicy(timeout=(3.0, 5.0), max_connections=8),
+    'emweb.securities.eastmoney.com': HostPolicy(timeout=(3.0, 5.0), max_connections=4),
+    'finnhub.io': HostPolicy(timeout=(5.0, 10.0), max_connections=2),
+}
+
+RETRY_STATUS_CODES = frozenset({429, 502, 503, 504})
+MAX_RETRY_AFTER = 5.0  # Retry-After 头最多等待的秒数
+
+
+def _resolve_policy(host: str) -> HostPolicy:
+    """按主机后缀查找传输策略"""
+    best = None
+    for suffix in HOST_POLICIES:
+        if (host == suffix or host.endswith('.' + suffix)) and (best is None or len(suffix) > len(best)):
+            best = suffix
+    return HOST_POLICIES[best] if best else DEFAULT_POLICY
+
+
+class _HostStats:
+    """单个主机的请求统计"""
+
+    __slots__ = ('requests', 'errors', 'retries', 'total_ms')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_ms = 0.0
+
+
+class HttpTransport:
+    """共享 HTTP 传输（线程安全）"""
+
+    def __init__(self):
+        self._session = requests.Session()
+        # 数据源请求互不相关，不在请求之间携带 Cookie
+        self._session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self._lock = threading.Lock()
+        self._adapters: Dict[str, HTTPAdapter] = {}
+        self._stats: Dict[str, _HostStats] = {}
+
+    def _ensure_adapter(self, scheme: str, netloc: str, host: str) -> HostPolicy:
+        """首次访问某主机时为其挂载独立连接池，返回该主机的策略"""
+        policy = _resolve_policy(host)
+        prefix = f"{scheme}://{netloc}/"
+        if prefix not in self._adapters:
+            with self._lock:
+                if prefix not in self._adapters:
+                    adapter = HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=policy.max_connections,
+                        max_retries=0,
+                    )
+                    self._session.mount(prefix, adapter)
+                    self._adapters[prefix] = adapter
+                    self._stats.setdefault(host, _HostStats())
+        return policy
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        发送请求（参数与 requests.request 一致）
+
+        Args:
+            method: HTTP 方法
+            url: 请求地址
+            **kwargs: 透传给 requests 的参数；未指定 timeout 时使用主机策略
+
+        Returns:
+            requests.Response
+
+        Raises:
+            requests.RequestException: 重试耗尽后的最后一次异常
+        """
+        parts = urlsplit(url)
+        host = (parts.hostname or '').lower()
+        policy = self._ensure_adapter(parts.scheme.lower(), parts.netloc.lower(), host)
+        kwargs.setdefault('timeout', policy.timeout)
+        stats = self._stats[host]
+
+        attempt = 0
+        t0 = time.time()
+        while True:
+            wait = None
+            try:
+                response = self._session.request(method, url, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                # ReadTimeout 不是 ConnectionError 子类；ConnectTimeout 是，可以安全重试
+                if attempt >= policy.retries:
+                    self._record(stats, t0, error=True)
+                    raise
+                logger.debug(f"[HTTP] {host} 连接失败，重试 ({attempt + 1}/{policy.retries}): {type(e).__name__}")
+            except requests.RequestException:
+                self._record(stats, t0, error=True)
+                raise
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= policy.retries:
+                    self._record(stats, t0, error=response.status_code >= 500)
+                    return response
+                wait = self._retry_after(response)
+                response.close()
+                logger.debug(f"[HTTP] {host} 返回 {response.status_code}，重试 ({attempt + 1}/{policy.retries})")
+
+            attempt += 1
+            with self._lock:
+                stats.retries += 1
+            time.sleep(wait if wait is not None else policy.backoff * (2 ** (attempt - 1)))
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        """解析 Retry-After 头（仅支持秒数）"""
+        value = response.headers.get('Retry-After')
+        if value and value.strip().isdigit():
+            return min(MAX_RETRY_AFTER, float(value))
+        return None
+
+    def _record(self, stats: _HostStats, t0: float, error: bool) -> None:
+        with self._lock:
+            stats.requests += 1
+            stats.total_ms += (time.time() - t0) * 1000
+            if error:
+                stats.errors += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """发送 GET 请求"""
+        return self.request('GET', url, **kwargs)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各主机的传输统计（用于监控）
+
+        new_connections 为连接池累计新建的连接数，
+        connection_reuse = 1 - new_connections / requests
+        """
+        with self._lock:
+            adapters = list(self._adapters.items())
+            snapshot = {
+                host: (s.requests, s.errors, s.retries, s.total_ms) for host, s in self._stats.items()
+            }
+
+        new_connections: Dict[str, int] = {}
+        for prefix, adapter in adapters:
+            host = urlsplit(prefix).hostname or ''
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    new_connections[host] = new_connections.get(host, 0) + pool.num_connections
+
+        result = {}
+        for host, (count, errors, retries, total_ms) in sorted(snapshot.items()):
+            created = new_connections.get(host, 0)
+            result[host] = {
+                'requests': count,
+                'errors': errors,
+                'retries': retries,
+                'avg_ms': round(total_ms / count, 1) if count else 0.0,
+                'new_connections': created,
+                'connection_reuse': round(max(0.0, 1 - created / count), 3) if count else 0.0,
+            }
+        return result
+
+    def close(self) -> None:
+        """关闭所有连接"""
+        self._session.close()
+
+
+# 全局传输实例
+_transport_instance: Optional[HttpTransport] = None
+_instance_lock = threading.Lock()
+
+
+def get_http_transport() -> HttpTransport:
+    """
+    获取全局 HTTP 传输实例（单例模式）
+
+    Returns:
+        HttpTransport实例
+    """
+    global _transport_instance
+    if _transport_instance is None:
+        with _instance_lock:
+            if _transport_instance is None:
+                _transport_instance = HttpTransport()
+    return _transport_instance
+
+
+def http_get(url: str, **kwargs) -> requests.Response:
+    """
+    通过共享传输发送 GET 请求（requests.get 的替代品）
+
+    Args:
+        url: 请求地址
+        **kwargs: params / headers / timeout / verify 等，与 requests.get 一致
+
+    Returns:
+        requests.Response
+    """
+    return get_http_transport().get(url, **kwargs)
+
+
+def get_http_stats() -> Dict[str, Dict[str, Any]]:
+    """获取各主机的 HTTP 传输统计（用于监控）"""
+    return get_http_transport().get_stats()
@@ -0,0 +1,194 @@
+"""
+进程内指标 - 计数器与延迟直方图，按 Prometheus 文本格式输出
+
+核心原理：
+1. 计数器 / 直方图按标签值分组保存在内存中，记录时只做一次字典查找和加法（线程安全）
+2. 直方图使用固定分桶（累计计数），输出 _bucket / _sum / _count 三组样本
+3. 其他模块已有的统计（如内存缓存占用、淘汰次数）通过 collector 在输出时读取，
+   不需要在记录路径上维护
+
+使用方法：
+    from service.utils.metrics import get_metrics_registry
+
+    registry = get_metrics_registry()
+    lookups = registry.counter('stock_cache_lookups_total', '缓存查询次数', ('key_type', 'result'))
+    lookups.inc('kline', 'memory_hit')
+
+    latency = registry.histogram('stock_cache_lookup_seconds', '缓存查询耗时', ('key_type',))
+    latency.observe(0.002, 'kline')
+
+    text = registry.render()   # /metrics 接口返回的内容
+"""
+
+import bisect
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 默认延迟分桶（秒）：覆盖内存命中（亚毫秒）到 MongoDB 慢查询（秒级）
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# collector 返回的一组指标：(指标名, 类型 gauge/counter, 说明, [(标签字典, 值), ...])
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], Optional[float]]]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """带标签的计数器"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labelvalues, value in values:
+            labels = dict(zip(self.labelnames, labelvalues))
+            lines.append(f'{self.name}{_format_labels(labels)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    """带标签的直方图（固定分桶）"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 → [各分桶计数（非累计）..., +Inf 计数, 总和]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        # 第一个 >= value 的分桶（Prometheus 的 le 语义），超过所有分桶时落在 +Inf
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labelvalues)
+            if counts is None:
+                counts = self._values[labelvalues] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((labelvalues, list(counts)) for labelvalues, counts in self._values.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labelvalues, counts in values:
+            labels = dict(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts[:-1]):
+                cumulative += count
+                bucket_labels = _format_labels({**labels, 'le': _format_value(bound)})
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(counts[-1])}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, factory: Callable[[], object]):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """获取或创建计数器（同名只创建一次）"""
+        return self._get_or_create(name, lambda: Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """获取或创建直方图（同名只创建一次）"""
+        return self._get_or_create(name, lambda: Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        """
+        注册输出时读取的指标
+
+        Args:
+            collector: 无参函数，返回 [(指标名, 类型, 说明, [(标签字典, 值), ...]), ...]，值为 None 的样本不输出
+        """
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def render(self) -> str:
+        """按 Prometheus 文本格式（0.0.4）输出所有指标"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.warning(f"[Metrics] ⚠️ collector {getattr(collector, '__name__', collector)} 失败: {e}")
+                continue
+            for name, metric_type, documentation, samples in families:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    if value is not None:
+                        lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# 全局注册表实例
+_registry_instance: Optional[MetricsRegistry] = None
+_instance_lock = threading.Lock()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """
+    获取全局指标注册表（单例模式）
+
+    Returns:
+        MetricsRegistry实例
+    """
+    global _registry_instance
+    if _registry_instance is None:
+        with _instance_lock:
+            if _registry_instance is None:
+                _registry_instance = MetricsRegistry()
+    return _registry_instance
@@ -0,0 +1,314 @@
+"""
+数据源健康注册表 - 熔断器（closed / open / half-open）
+
+核心原理：
+1. 每个上游数据源（K线、股票列表、行情）一个熔断器，由真实请求的结果驱动：
+   - closed（闭合）：正常放行；连续失败达到阈值 → open
+   - open（断开）：直接拒绝，调用方立即跳过该数据源；冷却时间到 → half-open
+   - half-open（半开）：只放行一个试探请求，成功 → closed，失败 → open（冷却时间翻倍）
+2. 低频后台探测：对注册了探测函数的数据源，仅在“最近一个周期内没有真实流量”
+   或“处于断开状态且冷却时间已到”时探测一次，避免每次请求前都额外探测一次上游
+
+使用方法：
+    from service.utils.provider_health import get_provider_registry, call_with_breaker
+
+    breaker = get_provider_registry().get('kline:sina')
+    if breaker.allow_request():
+        ...
+        breaker.record_success(latency) / breaker.record_failure(error)
+
+    # 或
+    result = call_with_breaker('stocks:a:ak_stocks', fetch_func, is_success=bool)
+
+配置（环境变量）：
+    PROVIDER_FAILURE_THRESHOLD  连续失败多少次后断开（默认 3）
+    PROVIDER_OPEN_SECONDS       首次断开的冷却时间（默认 30 秒，重复失败翻倍，最长 300 秒）
+    PROVIDER_PROBE_INTERVAL     后台探测周期（默认 60 秒，0 表示关闭后台探测）
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+FAILURE_THRESHOLD = int(os.getenv('PROVIDER_FAILURE_THRESHOLD', '3'))
+OPEN_SECONDS = float(os.getenv('PROVIDER_OPEN_SECONDS', '30'))
+MAX_OPEN_SECONDS = 300.0
+PROBE_INTERVAL = float(os.getenv('PROVIDER_PROBE_INTERVAL', '60'))
+
+
+class CircuitOpenError(RuntimeError):
+    """数据源熔断中，请求被直接拒绝"""
+
+    def __init__(self, name: str, retry_in: float):
+        self.name = name
+        self.retry_in = retry_in
+        super().__init__(f"数据源 {name} 熔断中，{retry_in:.0f}s 后重试")
+
+
+class CircuitBreaker:
+    """单个数据源的熔断器（线程安全）"""
+
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD, open_seconds: float = OPEN_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_open_seconds = open_seconds
+        self._lock = threading.Lock()
+
+        self._state = STATE_CLOSED
+        self._consecutive_failures = 0
+        self._open_seconds = open_seconds
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+        # 统计信息
+        self._successes = 0
+        self._failures = 0
+        self._rejected = 0
+        self._last_activity = 0.0
+        self._last_error: Optional[str] = None
+        self._last_latency: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        """当前状态（open 冷却到期时视为 half_open）"""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == STATE_OPEN and time.time() - self._opened_at >= self._open_seconds:
+            return STATE_HALF_OPEN
+        return self._state
+
+    def retry_in(self) -> float:
+        """距离下一次允许试探还有多少秒"""
+        with self._lock:
+            if self._state != STATE_OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self._open_seconds - time.time())
+
+    def allow_request(self) -> bool:
+        """
+        是否放行本次请求
+
+        half-open 状态下只放行一个试探请求，放行后调用方必须调用
+        record_success / record_failure / release 之一
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == STATE_CLOSED:
+                return True
+            if state == STATE_HALF_OPEN and not self._trial_in_flight:
+                self._state = STATE_HALF_OPEN
+                self._trial_in_flight = True
+                logger.info(f"[Provider:{self.name}] 🟡 半开，放行一个试探请求")
+                return True
+            self._rejected += 1
+            return False
+
+    def release(self) -> None:
+        """放行后未真正发起请求（如排队超时）时释放试探名额"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self, latency: Optional[float] = None) -> None:
+        """记录一次成功"""
+        with self._lock:
+            self._successes += 1
+            self._last_activity = time.time()
+            self._last_latency = latency
+            self._consecutive_failures = 0
+            self._trial_in_flight = False
+            if self._state != STATE_CLOSED:
+                logger.info(f"[Provider:{self.name}] 🟢 恢复正常，熔断器闭合")
+                self._state = STATE_CLOSED
+                self._open_seconds = self.base_open_seconds
+
+    def record_failure(self, error: Any = None) -> None:
+        """记录一次失败"""
+        with self._lock:
+            self._failures += 1
+            self._last_activity = time.time()
+            self._last_error = str(error) if error is not None else None
+            self._consecutive_failures += 1
+            self._trial_in_flight = False
+
+            state = self._current_state()
+            if state == STATE_HALF_OPEN:
+                # 试探失败：重新断开，冷却时间翻倍
+                self._open_seconds = min(MAX_OPEN_SECONDS, self._open_seconds * 2)
+                self._trip()
+            elif state == STATE_CLOSED and self._consecutive_failures >= self.failure_threshold:
+                self._trip()
+
+    def _trip(self) -> None:
+        self._state = STATE_OPEN
+        self._opened_at = time.time()
+        logger.warning(
+            f"[Provider:{self.name}] 🔴 连续失败 {self._consecutive_failures} 次，熔断 {self._open_seconds:.0f}s"
+            f"（最后错误: {self._last_error}）"
+        )
+
+    def idle_for(self) -> float:
+        """距离最近一次真实请求结果已过去多少秒"""
+        with self._lock:
+            return time.time() - self._last_activity if self._last_activity else float('inf')
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取熔断器统计信息（用于监控）"""
+        with self._lock:
+            state = self._current_state()
+            return {
+                'state': state,
+                'consecutive_failures': self._consecutive_failures,
+                'successes': self._successes,
+                'failures': self._failures,
+                'rejected': self._rejected,
+                'retry_in_s': round(max(0.0, self._opened_at + self._open_seconds - time.time()), 1) if state == STATE_OPEN else 0.0,
+                'last_latency_ms': round(self._last_latency * 1000, 1) if self._last_latency is not None else None,
+                'last_error': self._last_error,
+            }
+
+
+class ProviderHealthRegistry:
+    """全局数据源健康注册表"""
+
+    def __init__(self, probe_interval: float = PROBE_INTERVAL):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._probes: Dict[str, Callable[[], bool]] = {}
+        self._lock = threading.Lock()
+        self._probe_interval = probe_interval
+        self._probe_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def get(self, name: str) -> CircuitBreaker:
+        """获取（不存在则创建）指定数据源的熔断器"""
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(name)
+                if breaker is None:
+                    breaker = self._breakers[name] = CircuitBreaker(name)
+        return breaker
+
+    def register_probe(self, name: str, probe: Callable[[], bool]) -> None:
+        """
+        注册后台探测函数（低频执行，返回 True 表示数据源可用）
+
+        Args:
+            name: 数据源名称（与熔断器名称一致）
+            probe: 探测函数
+        """
+        self.get(name)
+        with self._lock:
+            self._probes[name] = probe
+        self._ensure_probe_thread()
+
+    def _ensure_probe_thread(self) -> None:
+        if self._probe_interval <= 0 or self._probe_thread is not None:
+            return
+        with self._lock:
+            if self._probe_thread is None:
+                self._probe_thread = threading.Thread(
+                    target=self._probe_loop, name="provider-health-probe", daemon=True
+                )
+                self._probe_thread.start()
+
+    def _probe_loop(self) -> None:
+        while not self._stop_event.wait(self._probe_interval):
+            self.run_probes()
+
+    def run_probes(self) -> None:
+        """执行一轮后台探测（只探测空闲或冷却到期的数据源）"""
+        with self._lock:
+            probes = list(self._probes.items())
+
+        for name, probe in probes:
+            breaker = self.get(name)
+            state = breaker.state
+            if state == STATE_CLOSED and breaker.idle_for() < self._probe_interval:
+                continue  # 最近有真实流量，无需探测
+            if state == STATE_OPEN:
+                continue  # 冷却中
+            if state == STATE_HALF_OPEN and not breaker.allow_request():
+                continue  # 已有试探请求在进行
+            t0 = time.time()
+            try:
+                ok = bool(probe())
+            except Exception as e:
+                ok = False
+                logger.debug(f"[Provider:{name}] 探测异常: {type(e).__name__}: {e}")
+            if ok:
+                breaker.record_success(time.time() - t0)
+            else:
+                breaker.record_failure("后台探测失败")
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取所有数据源的健康状态（用于监控）"""
+        return {name: breaker.get_stats() for name, breaker in sorted(self._breakers.items())}
+
+    def stop(self) -> None:
+        """停止后台探测线程"""
+        self._stop_event.set()
+
+
+# 全局注册表实例
+_registry_instance: Optional[ProviderHealthRegistry] = None
+_instance_lock = threading.Lock()
+
+
+def get_provider_registry() -> ProviderHealthRegistry:
+    """
+    获取全局数据源健康注册表（单例模式）
+
+    Returns:
+        ProviderHealthRegistry实例
+    """
+    global _registry_instance
+    if _registry_instance is None:
+        with _instance_lock:
+            if _registry_instance is None:
+                _registry_instance = ProviderHealthRegistry()
+    return _registry_instance
+
+
+def call_with_breaker(name: str, func: Callable[..., Any], *args,
+                      is_success: Callable[[Any], bool] = bool, **kwargs) -> Any:
+    """
+    经熔断器调用数据源函数（便捷函数）
+
+    Args:
+        name: 数据源名称（如 'stocks:a:ak_stocks'）
+        func: 数据源函数
+        is_success: 判断返回值是否代表成功，默认按真值判断
+        *args, **kwargs: 透传给 func 的参数
+
+    Returns:
+        func 的返回值
+
+    Raises:
+        CircuitOpenError: 数据源熔断中
+    """
+    breaker = get_provider_registry().get(name)
+    if not breaker.allow_request():
+        raise CircuitOpenError(name, breaker.retry_in())
+
+    t0 = time.time()
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        breaker.record_failure(f"{type(e).__name__}: {e}")
+        raise
+
+    if is_success(result):
+        breaker.record_success(time.time() - t0)
+    else:
+        breaker.record_failure("返回空结果")
+    return result
@@ -0,0 +1,205 @@
+"""
+单飞（single-flight）请求合并
+
+核心原理：
+1. 热门股票缓存过期的瞬间，大量并发请求同时未命中缓存，
+   每个请求都会独立走一遍完整的数据源链路（缓存击穿 / 惊群）
+2. 按缓存键合并：同一时刻同一个键只允许一个“领头”调用真正访问上游，
+   其余并发调用阻塞等待并共享领头调用的结果（或异常）
+3. 领头调用结束后立即移除该键，后续请求重新走缓存查询
+4. 协程版本 do_async 在同一事件循环内按键合并：上游调用作为独立任务运行，
+   领头协程被取消也不会中断其他等待者共享的那次调用
+
+使用方法：
+    from service.utils.single_flight import get_single_flight
+    result, shared = get_single_flight().do("kline:600519::", fetch_func, arg1, arg2)
+
+    协程中：
+    result, shared = await get_single_flight().do_async("bars:600519:...", fetch_coro_func, arg1)
+
+    或使用装饰器：
+    @single_flight(lambda code: f"basic_info:{code}")
+    def get_stock_basic_info(code): ...
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """一次进行中的上游调用"""
+
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按键合并并发调用（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        # (事件循环id, 键) → [进行中的任务, 等待者数]
+        self._async_calls: Dict[Tuple[int, str], list] = {}
+
+        # 统计信息
+        self._leaders = 0
+        self._coalesced = 0
+
+    def do(self, key: str, func: Callable[..., Any], *args, **kwargs) -> Tuple[Any, bool]:
+        """
+        执行 func，若同一键已有调用在进行中则等待并共享其结果
+
+        Args:
+            key: 合并键（通常为缓存键）
+            func: 实际执行的函数
+            *args, **kwargs: 透传给 func 的参数
+
+        Returns:
+            (结果, 是否为共享结果)
+            共享结果与领头调用返回的是同一个对象，调用方如需修改请先复制
+
+        Raises:
+            领头调用抛出的异常会原样抛给所有等待者
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._coalesced += 1
+                is_leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._leaders += 1
+                is_leader = True
+
+        if not is_leader:
+            logger.info(f"[SingleFlight] 🔗 {key} 已有请求在获取数据，等待共享结果...")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+            if call.waiters:
+                logger.info(f"[SingleFlight] ✅ {key} 合并了 {call.waiters} 个并发请求")
+
+        return call.result, call.waiters > 0
+
+    async def do_async(self, key: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Tuple[Any, bool]:
+        """
+        do 的协程版本：执行协程函数 func，同一事件循环内同一键已有调用时等待并共享其结果
+
+        Args:
+            key: 合并键
+            func: 协程函数
+            *args, **kwargs: 透传给 func 的参数
+
+        Returns:
+            (结果, 是否为共享结果)
+        """
+        loop = asyncio.get_running_loop()
+        call_key = (id(loop), key)
+        with self._lock:
+            call = self._async_calls.get(call_key)
+            if call is not None:
+                call[1] += 1
+                self._coalesced += 1
+                is_leader = False
+            else:
+                call = [loop.create_task(func(*args, **kwargs)), 0]
+                self._async_calls[call_key] = call
+                self._leaders += 1
+                is_leader = True
+                call[0].add_done_callback(lambda _task: self._finish_async(call_key, call))
+
+        if not is_leader:
+            logger.info(f"[SingleFlight] 🔗 {key} 已有请求在获取数据，等待共享结果...")
+        # shield：某个等待者被取消不影响共享的上游调用
+        result = await asyncio.shield(call[0])
+        return result, (not is_leader) or call[1] > 0
+
+    def _finish_async(self, call_key: Tuple[int, str], call: list) -> None:
+        with self._lock:
+            if self._async_calls.get(call_key) is call:
+                del self._async_calls[call_key]
+        if call[1]:
+            logger.info(f"[SingleFlight] ✅ {call_key[1]} 合并了 {call[1]} 个并发请求")
+
+    def in_flight(self) -> int:
+        """当前进行中的调用数"""
+        with self._lock:
+            return len(self._calls) + len(self._async_calls)
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取统计信息（用于监控）"""
+        with self._lock:
+            return {
+                'in_flight': len(self._calls) + len(self._async_calls),
+                'leaders': self._leaders,
+                'coalesced': self._coalesced,
+            }
+
+
+# 全局实例
+_single_flight_instance: Optional[SingleFlight] = None
+_instance_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """
+    获取全局单飞实例（单例模式）
+
+    Returns:
+        SingleFlight实例
+    """
+    global _single_flight_instance
+    if _single_flight_instance is None:
+        with _instance_lock:
+            if _single_flight_instance is None:
+                _single_flight_instance = SingleFlight()
+    return _single_flight_instance
+
+
+def single_flight(key_func: Callable[..., str]):
+    """
+    单飞装饰器：根据 key_func 生成的键合并并发调用
+
+    Args:
+        key_func: 生成合并键的函数，接收原函数的参数，返回键字符串
+
+    Returns:
+        装饰器函数
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = key_func(*args, **kwargs)
+            result, shared = get_single_flight().do(key, func, *args, **kwargs)
+            # 共享结果做浅拷贝，避免调用方之间互相修改
+            if shared and isinstance(result, dict):
+                return dict(result)
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,247 @@
+"""
+交易日历 - A股 / 港股 / 美股的交易日与交易时段，用于按市场计算缓存的有效期
+
+核心原理：
+1. 交易日 = 非周末且不在休市日列表中；内置近两年的休市日（HOLIDAYS），可通过环境变量
+   TRADING_HOLIDAYS_A / TRADING_HOLIDAYS_HK / TRADING_HOLIDAYS_US 追加（逗号分隔的 YYYY-MM-DD），
+   内置列表未覆盖的年份只按周末判断
+2. 交易时段按市场当地时间定义（A股、港股含午间休市）；当天最后一个时段收盘后再过
+   TRADING_SETTLE_MINUTES 分钟，视为当天的K线已确定（数据源的收盘数据落地需要时间）
+3. 缓存据此计算有效期：
+   - settled_through(ts)：截至 ts 已确定的最后日期，此前的K线不会再变化，可以长期缓存
+   - last_settled_trading_day(ts)：截至 ts 已收盘确定的最后一个交易日（休市日回退到之前的交易日）
+   - live_until(ts)：ts 处于交易时段（含收盘后的确定窗口）时返回该时段的结束时间，否则为None
+   - next_open(ts)：ts 之后下一个交易时段的开始时间（午休、夜间、周末、节假日都直接跳到下一次开盘）
+   - close_after(ts, n)：ts 之后第 n 个交易日收盘确定的时间
+   - trim(start, end)：去掉日期区间两端的休市日，区间内没有交易日时返回None
+
+使用方法：
+    from service.utils.trading_calendar import get_trading_calendar
+
+    calendar = get_trading_calendar('a')
+    calendar.is_trading_day(date(2026, 10, 1))    # False（国庆）
+    calendar.settled_through(time.time())          # 如 '2026-10-16'：此前（含）的K线已确定
+    calendar.last_settled_trading_day(time.time()) # 周末 / 节假日时为之前最后一个交易日
+"""
+
+import logging
+import os
+import threading
+from datetime import date, datetime, time as dtime, timedelta, timezone, tzinfo
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SETTLE_MINUTES = float(os.getenv('TRADING_SETTLE_MINUTES', '30'))
+
+DATE_FORMAT = '%Y-%m-%d'
+
+# 向后查找交易日的最大天数（最长的休市如春节连同周末不超过两周）
+MAX_LOOKAHEAD_DAYS = 30
+
+# 市场 → (时区, 固定偏移兜底（小时）, 交易时段)
+MARKET_SESSIONS: Dict[str, Tuple[str, int, Tuple[Tuple[dtime, dtime], ...]]] = {
+    'a': ('Asia/Shanghai', 8, ((dtime(9, 30), dtime(11, 30)), (dtime(13, 0), dtime(15, 0)))),
+    'hk': ('Asia/Hong_Kong', 8, ((dtime(9, 30), dtime(12, 0)), (dtime(13, 0), dtime(16, 10)))),
+    'us': ('America/New_York', -5, ((dtime(9, 30), dtime(16, 0)),)),
+}
+
+# 休市日（不含周末）
+HOLIDAYS: Dict[str, Tuple[str, ...]] = {
+    'a': (
+        # 2025
+        '2025-01-01', '2025-01-28', '2025-01-29', '2025-01-30', '2025-01-31', '2025-02-03', '2025-02-04',
+        '2025-04-04', '2025-05-01', '2025-05-02', '2025-05-05', '2025-06-02',
+        '2025-10-01', '2025-10-02', '2025-10-03', '2025-10-06', '2025-10-07', '2025-10-08',
+        # 2026
+        '2026-01-01', '2026-01-02', '2026-02-16', '2026-02-17', '2026-02-18', '2026-02-19', '2026-02-20',
+        '2026-02-23', '2026-04-06', '2026-05-01', '2026-05-04', '2026-05-05', '2026-06-19', '2026-09-25',
+        '2026-10-01', '2026-10-02', '2026-10-05', '2026-10-06', '2026-10-07',
+    ),
+    'hk': (
+        # 2025
+        '2025-01-01', '2025-01-29', '2025-01-30', '2025-01-31', '2025-04-04', '2025-04-18', '2025-04-21',
+        '2025-05-01', '2025-05-05', '2025-07-01', '2025-10-01', '2025-10-07', '2025-10-29',
+        '2025-12-25', '2025-12-26',
+        # 2026
+        '2026-01-01', '2026-02-17', '2026-02-18', '2026-02-19', '2026-04-03', '2026-04-06', '2026-04-07',
+        '2026-05-01', '2026-05-25', '2026-06-19', '2026-07-01', '2026-10-01', '2026-10-19',
+        '2026-12-25', '2026-12-28',
+    ),
+    'us': (
+        # 2025
+        '2025-01-01', '2025-01-09', '2025-01-20', '2025-02-17', '2025-04-18', '2025-05-26', '2025-06-19',
+        '2025-07-04', '2025-09-01', '2025-11-27', '2025-12-25',
+        # 2026
+        '2026-01-01', '2026-01-19', '2026-02-16', '2026-04-03', '2026-05-25', '2026-06-19', '2026-07-03',
+        '2026-09-07', '2026-11-26', '2026-12-25',
+    ),
+}
+
+
+def _load_zone(name: str, fallback_hours: int) -> tzinfo:
+    """加载时区；系统缺少时区数据时退回固定偏移（美股夏令时期间会差一小时）"""
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(name)
+    except Exception as e:
+        logger.warning(f"[Calendar] ⚠️ 无法加载时区 {name}（{type(e).__name__}），使用固定偏移 UTC{fallback_hours:+d}")
+        return timezone(timedelta(hours=fallback_hours))
+
+
+def _parse_holidays(values: Iterable[str]) -> FrozenSet[date]:
+    holidays = set()
+    for value in values:
+        value = value.strip()
+        if not value:
+            continue
+        try:
+            holidays.add(datetime.strptime(value, DATE_FORMAT).date())
+        except ValueError:
+            logger.warning(f"[Calendar] ⚠️ 休市日 {value} 不是合法日期（YYYY-MM-DD），已忽略")
+    return frozenset(holidays)
+
+
+class TradingCalendar:
+    """单个市场的交易日历"""
+
+    def __init__(self, market: str, zone: tzinfo, sessions: Tuple[Tuple[dtime, dtime], ...],
+                 holidays: Iterable[date], settle_minutes: float = SETTLE_MINUTES):
+        """
+        Args:
+            market: 市场代码（a / hk / us）
+            zone: 市场当地时区
+            sessions: 当地时间的交易时段 ((开盘, 收盘), ...)
+            holidays: 休市日（不含周末）
+            settle_minutes: 收盘后多少分钟视为当天K线已确定
+        """
+        self.market = market
+        self.zone = zone
+        self.sessions = sessions
+        self.holidays = frozenset(holidays)
+        self.settle_seconds = settle_minutes * 60
+
+    def local_date(self, ts: float) -> date:
+        """时间戳对应的市场当地日期"""
+        return datetime.fromtimestamp(ts, self.zone).date()
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.holidays
+
+    def _windows(self, day: date) -> List[Tuple[float, float]]:
+        """交易日的各交易时段（时间戳），最后一个时段延长到收盘确定"""
+        windows = [
+            (datetime.combine(day, start, self.zone).timestamp(), datetime.combine(day, end, self.zone).timestamp())
+            for start, end in self.sessions
+        ]
+        last_start, last_end = windows[-1]
+        windows[-1] = (last_start, last_end + self.settle_seconds)
+        return windows
+
+    def _trading_days_from(self, day: date) -> Iterable[date]:
+        for offset in range(MAX_LOOKAHEAD_DAYS):
+            candidate = day + timedelta(days=offset)
+            if self.is_trading_day(candidate):
+                yield candidate
+
+    def live_until(self, ts: float) -> Optional[float]:
+        """
+        ts 处于交易时段（含收盘后的确定窗口）时返回该时段的结束时间
+
+        Returns:
+            时段结束的时间戳；不在交易时段时返回None
+        """
+        day = self.local_date(ts)
+        if not self.is_trading_day(day):
+            return None
+        for start, end in self._windows(day):
+            if start <= ts < end:
+                return end
+        return None
+
+    def next_open(self, ts: float) -> float:
+        """ts 之后下一个交易时段的开始时间（ts 处于交易时段时返回 ts）"""
+        for day in self._trading_days_from(self.local_date(ts)):
+            for start, end in self._windows(day):
+                if ts < end:
+                    return max(ts, start)
+        return ts + 86400
+
+    def close_after(self, ts: float, sessions: int = 1) -> float:
+        """
+        ts 之后第 sessions 个交易日收盘确定的时间
+
+        Args:
+            ts: 起始时间戳
+            sessions: 交易日个数（当天尚未收盘确定时计为第一个）
+
+        Returns:
+            收盘确定的时间戳
+        """
+        remaining = max(1, sessions)
+        day = self.local_date(ts)
+        for offset in range(MAX_LOOKAHEAD_DAYS * remaining):
+            candidate = day + timedelta(days=offset)
+            if not self.is_trading_day(candidate) or self._windows(candidate)[-1][1] <= ts:
+                continue
+            remaining -= 1
+            if remaining == 0:
+                return self._windows(candidate)[-1][1]
+        return ts + sessions * 86400
+
+    def settled_through(self, ts: float) -> str:
+        """截至 ts 已确定K线的最后日期（YYYY-MM-DD）：当天已收盘确定或当天休市时为当天，否则为前一天"""
+        day = self.local_date(ts)
+        if self.is_trading_day(day) and ts < self._windows(day)[-1][1]:
+            day -= timedelta(days=1)
+        return day.strftime(DATE_FORMAT)
+
+    def last_settled_trading_day(self, ts: float) -> str:
+        """截至 ts 已收盘确定的最后一个交易日（YYYY-MM-DD）：settled_through 落在休市日时向前回退到交易日"""
+        day = datetime.strptime(self.settled_through(ts), DATE_FORMAT).date()
+        for _ in range(MAX_LOOKAHEAD_DAYS):
+            if self.is_trading_day(day):
+                break
+            day -= timedelta(days=1)
+        return day.strftime(DATE_FORMAT)
+
+    def trim(self, start: str, end: str) -> Optional[Tuple[str, str]]:
+        """去掉日期区间两端的休市日（周末 / 节假日），区间内没有交易日时返回None"""
+        first = datetime.strptime(start, DATE_FORMAT).date()
+        last = datetime.strptime(end, DATE_FORMAT).date()
+        while first <= last and not self.is_trading_day(first):
+            first += timedelta(days=1)
+        while last >= first and not self.is_trading_day(last):
+            last -= timedelta(days=1)
+        if first > last:
+            return None
+        return first.strftime(DATE_FORMAT), last.strftime(DATE_FORMAT)
+
+
+# 全局日历实例
+_calendars: Dict[str, TradingCalendar] = {}
+_calendars_lock = threading.Lock()
+
+
+def get_trading_calendar(market: str) -> Optional[TradingCalendar]:
+    """
+    获取指定市场的交易日历（单例，首次访问时创建）
+
+    Args:
+        market: 市场代码（a / hk / us）
+
+    Returns:
+        TradingCalendar实例；未知市场返回None
+    """
+    market = (market or '').lower()
+    calendar = _calendars.get(market)
+    if calendar is not None or market not in MARKET_SESSIONS:
+        return calendar
+
+    with _calendars_lock:
+        if market not in _calendars:
+            zone_name, fallback_hours, sessions = MARKET_SESSIONS[market]
+            extra = os.getenv(f'TRADING_HOLIDAYS_{market.upper()}', '').split(',')
+            holidays = _parse_holidays(HOLIDAYS.get(market, ()) + tuple(extra))
+            _calendars[market] = TradingCalendar(market, _load_zone(zone_name, fallback_hours), sessions, holidays)
+        return _calendars[market]